@@ -0,0 +1,130 @@
+"""
+Token-aware document chunking.
+
+Documents are split into windows of `chunk_tokens` tokens with `overlap_tokens`
+tokens shared between neighbouring windows, so long runbooks and log dumps are
+embedded in full instead of being truncated by the model's context window.
+
+Token boundaries come from a "token spans" function that maps a batch of texts
+to the (char_start, char_end) span of every token. Adapters are provided for
+HuggingFace fast tokenizers and tiktoken, which both tokenize whole batches
+natively; when no tokenizer is available a regex heuristic is used instead.
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+TokenSpans = List[Tuple[int, int]]
+TokenSpansFn = Callable[[List[str]], List[TokenSpans]]
+
+# Approximates sub-word tokenization: words are split into pieces of at most 4 word
+# characters and each punctuation mark is its own token. This slightly over-counts
+# compared to BPE tokenizers, which keeps chunks safely inside the context window.
+HEURISTIC_TOKEN_PATTERN = re.compile(r"\w{1,4}|[^\w\s]")
+
+
+@dataclass
+class Chunk:
+    """A window of a document, with its character span in the parent document."""
+    text: str
+    index: int
+    char_start: int
+    char_end: int
+    token_count: int
+
+
+def heuristic_token_spans(texts: List[str]) -> List[TokenSpans]:
+    """Token spans from the regex heuristic."""
+    return [[match.span() for match in HEURISTIC_TOKEN_PATTERN.finditer(text)] for text in texts]
+
+
+def hf_token_spans(tokenizer: Any) -> TokenSpansFn:
+    """Adapts a HuggingFace fast tokenizer, which reports character offsets for a whole batch."""
+    def spans(texts: List[str]) -> List[TokenSpans]:
+        encoded = tokenizer(texts, add_special_tokens=False, return_offsets_mapping=True)
+        return [[(int(start), int(end)) for start, end in offsets] for offsets in encoded["offset_mapping"]]
+    return spans
+
+
+def tiktoken_token_spans(encoding: Any) -> TokenSpansFn:
+    """Adapts a tiktoken encoding, using its batch encoder and decoded token offsets."""
+    def spans(texts: List[str]) -> List[TokenSpans]:
+        result = []
+        for text, tokens in zip(texts, encoding.encode_ordinary_batch(texts)):
+            decoded, starts = encoding.decode_with_offsets(tokens)
+            if decoded != text:
+                # Offsets only line up when the text round-trips exactly
+                result.extend(heuristic_token_spans([text]))
+                continue
+            ends = starts[1:] + [len(text)]
+            result.append(list(zip(starts, ends)))
+        return result
+    return spans
+
+
+class TokenChunker:
+    """Splits documents into overlapping token windows."""
+
+    def __init__(self, chunk_tokens: int, overlap_tokens: int = 0, token_spans: Optional[TokenSpansFn] = None):
+        if not isinstance(chunk_tokens, int) or chunk_tokens <= 0:
+            raise ValueError("chunk_tokens must be a positive integer.")
+        if not isinstance(overlap_tokens, int) or not (0 <= overlap_tokens < chunk_tokens):
+            raise ValueError("chunk_overlap must be a non-negative integer smaller than chunk_tokens.")
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.token_spans = token_spans or heuristic_token_spans
+
+    def chunk(self, texts: List[str]) -> List[List[Chunk]]:
+        """Returns the chunks of each text. Texts that fit in one window are returned whole."""
+        step = self.chunk_tokens - self.overlap_tokens
+        result = []
+        for text, spans in zip(texts, self.token_spans(texts)):
+            if len(spans) <= self.chunk_tokens:
+                result.append([Chunk(text, 0, 0, len(text), len(spans))])
+                continue
+            chunks = []
+            for start in range(0, len(spans), step):
+                window = spans[start:start + self.chunk_tokens]
+                char_start, char_end = window[0][0], window[-1][1]
+                chunks.append(Chunk(text[char_start:char_end], len(chunks), char_start, char_end, len(window)))
+                if start + self.chunk_tokens >= len(spans):
+                    break
+            result.append(chunks)
+        return result
+
+
+def parent_document_id(text: str) -> str:
+    """A stable identifier for a source document, shared by all of its chunks."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def iter_document_chunks(chunker: TokenChunker, documents: List[str], metadata: List[Dict[str, Any]]) -> Iterator[Tuple[int, str, Dict[str, Any]]]:
+    """
+    Chunks a batch of documents in one tokenizer call and yields (document index, chunk text,
+    chunk metadata). Chunk metadata is the parent document's metadata plus `parent_id`,
+    `chunk_index`, `chunk_count`, `char_start` and `char_end`.
+    """
+    for doc_index, (doc, meta, chunks) in enumerate(zip(documents, metadata, chunker.chunk(documents))):
+        parent_id = parent_document_id(doc)
+        for chunk in chunks:
+            entry = dict(meta)
+            entry.update({
+                "parent_id": parent_id,
+                "chunk_index": chunk.index,
+                "chunk_count": len(chunks),
+                "char_start": chunk.char_start,
+                "char_end": chunk.char_end,
+            })
+            yield doc_index, chunk.text, entry
+
+
+def chunk_documents(chunker: TokenChunker, documents: List[str], metadata: List[Dict[str, Any]]) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Chunks documents and returns the flattened chunk texts and their metadata."""
+    texts: List[str] = []
+    chunk_metadata: List[Dict[str, Any]] = []
+    for _, text, entry in iter_document_chunks(chunker, documents, metadata):
+        texts.append(text)
+        chunk_metadata.append(entry)
+    return texts, chunk_metadata
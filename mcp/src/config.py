@@ -57,6 +57,22 @@ root_logger.addHandler(file_handler)
 # The specific logger used in server.py and elsewhere will inherit this configuration.
 logger = logging.getLogger(__name__)
 
+def _parse_mapping(value: str, cast):
+    """Parses "key=value,key=value" settings into a dict, casting each value."""
+    return {
+        key.strip(): cast(item_value.strip())
+        for key, item_value in (item.split("=", 1) for item in value.split(",") if item.strip())
+    }
+
+def _parse_endpoints(value: str, default_port: int):
+    """Parses "host:port,host" settings into (host, port) pairs."""
+    endpoints = []
+    for item in value.split(","):
+        if item.strip():
+            host, _, port = item.strip().rpartition(":") if ":" in item else (item.strip(), "", "")
+            endpoints.append((host, int(port) if port else default_port))
+    return endpoints
+
 # --- Database Configuration ---
 DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = int(os.getenv("DB_PORT", 3306))
@@ -64,6 +80,25 @@ DB_USER = os.getenv("DB_USER")
 DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_NAME = os.getenv("DB_NAME")
 DB_CHARSET = os.getenv("DB_CHARSET")
+# Read replicas as "host:port,host:port" (same credentials as the primary); reads go to replicas that
+# lag at most MCP_REPLICA_MAX_LAG seconds, picked "least_loaded" or "round_robin", and to the primary otherwise
+DB_REPLICAS = _parse_endpoints(os.getenv("DB_REPLICAS", ""), DB_PORT)
+MCP_REPLICA_MAX_LAG = float(os.getenv("MCP_REPLICA_MAX_LAG", 10))
+MCP_REPLICA_ROUTING = os.getenv("MCP_REPLICA_ROUTING", "least_loaded").lower()
+MCP_REPLICA_CHECK_INTERVAL = float(os.getenv("MCP_REPLICA_CHECK_INTERVAL", 5))
+# Other database servers tools can target, as "id=host:port,id=host" (same credentials as the primary),
+# plus the rows (name, host, port) of an optional catalog table such as "lumos.databases". Each target's
+# pool opens on first use, holds at most MCP_TARGET_MAX_POOL_SIZE connections and closes after
+# MCP_TARGET_IDLE_TIMEOUT idle seconds; MCP_MAX_CONNECTIONS caps connections across all pools (0 disables)
+MCP_TARGETS = {target_id: _parse_endpoints(endpoint, DB_PORT)[0]
+               for target_id, endpoint in _parse_mapping(os.getenv("MCP_TARGETS", ""), str).items()}
+MCP_TARGET_CATALOG = os.getenv("MCP_TARGET_CATALOG")
+# Host patterns ("*.db.internal,10.0.1.*") catalog targets may point at. Targets get the primary's
+# credentials, so catalog rows for other hosts are ignored, and without patterns none are loaded
+MCP_TARGET_CATALOG_HOSTS = [pattern.strip() for pattern in os.getenv("MCP_TARGET_CATALOG_HOSTS", "").split(",") if pattern.strip()]
+MCP_TARGET_MAX_POOL_SIZE = int(os.getenv("MCP_TARGET_MAX_POOL_SIZE", 5))
+MCP_TARGET_IDLE_TIMEOUT = float(os.getenv("MCP_TARGET_IDLE_TIMEOUT", 600))
+MCP_MAX_CONNECTIONS = int(os.getenv("MCP_MAX_CONNECTIONS", 100))
 
 # --- SSL Configuration ---
 DB_SSL = os.getenv("DB_SSL", "false").lower() == "true"
@@ -77,6 +112,38 @@ DB_SSL_VERIFY_IDENTITY = os.getenv("DB_SSL_VERIFY_IDENTITY", "false").lower() ==
 # Read-only mode
 MCP_READ_ONLY = os.getenv("MCP_READ_ONLY", "true").lower() == "true"
 MCP_MAX_POOL_SIZE = int(os.getenv("MCP_MAX_POOL_SIZE", 10))
+# Identical reads running at the same time share one execution and its result
+MCP_COALESCE_READS = os.getenv("MCP_COALESCE_READS", "true").lower() == "true"
+# Connections opened (concurrently) at startup and always kept open
+MCP_MIN_POOL_SIZE = int(os.getenv("MCP_MIN_POOL_SIZE", 1))
+# Adaptive pool sizing: free connections idle this long are closed down to MCP_MIN_POOL_SIZE,
+# and acquires that wait longer than MCP_POOL_GROW_WAIT_MS make the pool keep more connections open
+MCP_POOL_IDLE_TIMEOUT = float(os.getenv("MCP_POOL_IDLE_TIMEOUT", 300))
+MCP_POOL_GROW_WAIT_MS = float(os.getenv("MCP_POOL_GROW_WAIT_MS", 50))
+# Connections silent this many seconds are pinged before use and by the pool's maintenance task;
+# after MCP_POOL_BREAKER_FAILURES failed connection attempts in a row, calls fail fast until the database is back
+MCP_POOL_PING_IDLE = float(os.getenv("MCP_POOL_PING_IDLE", 30))
+MCP_POOL_BREAKER_FAILURES = int(os.getenv("MCP_POOL_BREAKER_FAILURES", 3))
+# Deadline in seconds for the statements of one tool call (0 disables); MCP_TOOL_TIMEOUTS overrides it
+# per tool as "tool=seconds,tool=seconds", and execute_sql also takes a per-call timeout_seconds, capped
+# at the tool's deadline. Tools that can run for hours when called with background=false have no
+# deadline unless MCP_TOOL_TIMEOUTS gives them one (their background jobs never have one)
+MCP_QUERY_TIMEOUT = float(os.getenv("MCP_QUERY_TIMEOUT", 300))
+MCP_TOOL_TIMEOUTS = {
+    **{tool: 0.0 for tool in ("ingest_file_vector_store", "import_embeddings_vector_store", "reembed_vector_store",
+                              "maintain_vector_store", "benchmark_vector_store", "export_query")},
+    **_parse_mapping(os.getenv("MCP_TOOL_TIMEOUTS", ""), float),
+}
+# execute_sql_fanout: schemas queried at once, and the deadline in seconds of the query in each schema
+MCP_FANOUT_CONCURRENCY = int(os.getenv("MCP_FANOUT_CONCURRENCY", 4))
+MCP_FANOUT_DATABASE_TIMEOUT = float(os.getenv("MCP_FANOUT_DATABASE_TIMEOUT", 30))
+# Pool admission control: seconds to wait for a connection (0 waits indefinitely), most queued
+# acquires before new ones fail fast (0 is unbounded), and connection caps per priority class
+# ("interactive" tool calls, "bulk" writes, exports and background jobs) as "class=n,class=n"
+MCP_POOL_ACQUIRE_TIMEOUT = float(os.getenv("MCP_POOL_ACQUIRE_TIMEOUT", 30))
+MCP_POOL_MAX_WAITERS = int(os.getenv("MCP_POOL_MAX_WAITERS", 100))
+MCP_POOL_CLASS_LIMITS = {"bulk": max(1, MCP_MAX_POOL_SIZE // 2),
+                         **_parse_mapping(os.getenv("MCP_POOL_CLASS_LIMITS", ""), int)}
 
 # --- Embedding Configuration ---
 # Provider selection ('openai' or 'gemini' or 'huggingface')
@@ -88,6 +155,30 @@ GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
 # Open models from Huggingface
 HF_MODEL = os.getenv("HF_MODEL")
 
+# --- Vector Store Configuration ---
+# Seconds an in-memory copy of a store's int8 codes is reused for candidate generation
+MCP_QUANTIZED_CACHE_TTL = int(os.getenv("MCP_QUANTIZED_CACHE_TTL", 300))
+# Memory budget in bytes for cached int8 codes; larger stores are scanned on each search
+MCP_QUANTIZED_CACHE_MAX_BYTES = int(os.getenv("MCP_QUANTIZED_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Memory budget of the search result cache in bytes (0 disables it)
+MCP_SEARCH_CACHE_MAX_BYTES = int(os.getenv("MCP_SEARCH_CACHE_MAX_BYTES", 16 * 1024 * 1024))
+# Seconds a cached search result is served; bounds staleness from writes by other clients
+MCP_SEARCH_CACHE_TTL = int(os.getenv("MCP_SEARCH_CACHE_TTL", 60))
+
+# --- Local File Configuration ---
+# Directory tools that read or write local files are confined to; they are disabled while it is unset
+MCP_FILE_ROOT = os.getenv("MCP_FILE_ROOT")
+# Directory for server-side state such as ingestion checkpoints
+MCP_STATE_DIR = os.getenv("MCP_STATE_DIR", "state")
+
+# --- Background Job Configuration ---
+# Jobs that run concurrently; further jobs wait in the queue
+MCP_JOB_WORKERS = int(os.getenv("MCP_JOB_WORKERS", 2))
+# Days finished jobs are kept in the job database
+MCP_JOB_RETENTION_DAYS = int(os.getenv("MCP_JOB_RETENTION_DAYS", 7))
+# Daily local-time window for maintain_vector_store, e.g. "02:00-05:00"; empty means any time
+MCP_MAINTENANCE_WINDOW = os.getenv("MCP_MAINTENANCE_WINDOW", "")
+
 
 # --- Validation ---
 if not DB_USER:
@@ -3,13 +3,199 @@ Custom asyncmy Connection and Pool classes that disable MULTI_STATEMENTS capabil
 
 asyncmy hardcodes MULTI_STATEMENTS in Connection.__init__, but we need to disable it
 for security reasons (to prevent SQL injection via multiple statements).
+
+SafePool also adds admission control on top of asyncmy's pool: an acquire timeout,
+a bounded wait queue that fails fast when full, and priority classes. Callers in the
+"interactive" class are served before "bulk" ones whenever a connection frees up, and
+each class can be capped to a number of concurrently held connections. The class of
+an acquire comes from the `priority` argument or the `pool_priority` context.
+
+Connections are opened concurrently when the pool warms up to `minsize`. A
+maintenance task started by `create_safe_pool` adapts the number of connections
+kept open: it raises the target when acquires had to wait longer than
+`grow_wait` seconds, closes free connections idle for more than `idle_timeout`
+seconds down to `minsize`, and re-opens connections up to the target with
+exponential backoff while the database is unreachable.
+
+The same task pings free connections that have been silent for `ping_idle`
+seconds and drops the dead ones, and acquire pings a connection first if it has
+been silent that long. A circuit breaker opens after `breaker_failures`
+consecutive failed connection attempts: acquires then fail immediately with
+DatabaseUnavailableError instead of each waiting on a connect timeout, until a
+probe from the maintenance task (or a trial acquire once the backoff has passed)
+connects again.
+
+Pools that share a ConnectionBudget (one per database server, for example) are
+limited together: a pool that needs a connection beyond the budget closes a free
+connection of another pool first, and otherwise waits until one is released.
 """
 
 import asyncio
+import contextlib
+import logging
+import random
+import contextvars
+from collections import Counter
+from typing import Dict, Iterator, List, Optional, Tuple
+
 from asyncmy.connection import Connection
 from asyncmy.constants.CLIENT import MULTI_STATEMENTS
 from asyncmy.pool import Pool
-from asyncmy.contexts import _PoolContextManager
+from asyncmy.contexts import _PoolAcquireContextManager, _PoolContextManager
+
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, highest first
+PRIORITY_CLASSES = ("interactive", "bulk")
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Seconds between runs of the pool maintenance task
+POOL_MAINTENANCE_INTERVAL = 5.0
+# Delay before retrying to open connections after a failure, doubling up to the maximum
+RECONNECT_BACKOFF_INITIAL = 0.5
+RECONNECT_BACKOFF_MAX = 30.0
+# Weight of the newest sample in the moving average of acquire wait times
+WAIT_EWMA_ALPHA = 0.2
+# Seconds a ping may take before the connection is considered dead
+PING_TIMEOUT = 2.0
+# Seconds a half-open trial may stay unresolved before the next caller gets to try instead
+HALF_OPEN_PROBE_TIMEOUT = 30.0
+
+_priority: contextvars.ContextVar[str] = contextvars.ContextVar("pool_priority", default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def pool_priority(priority: str) -> Iterator[None]:
+    """Acquires made inside the block default to this priority class."""
+    if priority not in PRIORITY_CLASSES:
+        raise ValueError(f"Unknown priority class '{priority}'. Must be one of {list(PRIORITY_CLASSES)}.")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority() -> str:
+    """The priority class acquires default to in the current context."""
+    return _priority.get()
+
+
+class PoolOverloadedError(RuntimeError):
+    """Raised instead of waiting when the pool's wait queue is full."""
+
+
+class PoolTimeoutError(TimeoutError):
+    """Raised when no connection could be acquired within the acquire timeout."""
+
+
+class DatabaseUnavailableError(ConnectionError):
+    """Raised without trying to connect while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive connection failures. While open, `allow()`
+    is False until `retry_at`, when it is True for a single caller (the half-open trial);
+    the trial's success closes the breaker, its failure schedules the next one. A trial
+    left unresolved for HALF_OPEN_PROBE_TIMEOUT seconds is handed to the next caller.
+    """
+
+    def __init__(self, failure_threshold: int):
+        self.failure_threshold = failure_threshold
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.retry_at = 0.0
+        self.probe_started: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self, now: float) -> bool:
+        if not self.is_open:
+            return True
+        if now < self.retry_at or (self.probe_started is not None and now - self.probe_started < HALF_OPEN_PROBE_TIMEOUT):
+            return False
+        self.probe_started = now
+        return True
+
+    def record_success(self):
+        if self.is_open:
+            logger.info("Database reachable again; closing the circuit breaker.")
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.probe_started = None
+        self.last_error = None
+
+    def record_failure(self, now: float, retry_after: float, error: BaseException) -> bool:
+        """Counts a failure; returns True if this failure opened the breaker."""
+        self.consecutive_failures += 1
+        self.last_error = str(error)
+        self.retry_at = now + retry_after
+        self.probe_started = None
+        if not self.is_open and self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = now
+            logger.error(f"Database unreachable after {self.consecutive_failures} failed connection attempts "
+                         f"({error}); opening the circuit breaker.")
+            return True
+        return False
+
+    def to_dict(self, now: float) -> Dict[str, object]:
+        return {
+            "state": ("half_open" if self.probe_started is not None else "open") if self.is_open else "closed",
+            "consecutive_failures": self.consecutive_failures,
+            "open_seconds": round(now - self.opened_at, 3) if self.is_open else None,
+            "next_probe_seconds": round(max(0.0, self.retry_at - now), 3) if self.is_open else None,
+            "last_error": self.last_error,
+        }
+
+
+class ConnectionBudget:
+    """A limit on the connections open across several pools."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._pools: List["SafePool"] = []
+
+    def register(self, pool: "SafePool"):
+        self._pools.append(pool)
+
+    def unregister(self, pool: "SafePool"):
+        if pool in self._pools:
+            self._pools.remove(pool)
+
+    @property
+    def open(self) -> int:
+        return sum(pool.size for pool in self._pools)
+
+    def available(self) -> int:
+        return max(0, self.limit - self.open)
+
+    def reclaim(self, requester: "SafePool", count: int) -> int:
+        """Closes up to `count` free connections of other pools, longest idle first; returns how many."""
+        idle = sorted(((pool._idle_since.get(conn, conn.last_usage), id(conn), pool, conn)
+                       for pool in self._pools if pool is not requester for conn in pool._free),
+                      key=lambda entry: entry[:2])
+        for _, _, pool, conn in idle[:count]:
+            pool._free.remove(conn)
+            pool._idle_since.pop(conn, None)
+            conn.close()
+        return min(count, len(idle))
+
+    def wake(self, releaser: "SafePool"):
+        """Lets waiters of other pools retry once there is room, or a free connection of `releaser` to reclaim."""
+        if not self.available() and not releaser._free:
+            return
+        for pool in self._pools:
+            if pool is not releaser and sum(pool._waiting.values()):
+                asyncio.ensure_future(pool._notify_all())
+
+    def stats(self) -> Dict[str, int]:
+        return {"limit": self.limit, "open": self.open, "pools": len(self._pools)}
 
 
 class SafeConnection(Connection):
@@ -21,6 +207,9 @@ class SafeConnection(Connection):
     This class restores that safer default by clearing bit 16 before authentication.
     """
     
+    # Set when a statement on this connection was abandoned mid-flight; the pool closes it instead of reusing it
+    unclean = False
+
     async def connect(self):
         """
         Override connect to clear MULTI_STATEMENTS flag before authentication.
@@ -51,8 +240,330 @@ class SafePool(Pool):
     A Pool subclass that uses SafeConnection instead of Connection.
     
     This ensures all connections from the pool have MULTI_STATEMENTS disabled.
+    It also applies the admission control described in the module docstring:
+    `acquire_timeout` seconds (None waits indefinitely), at most `max_waiters`
+    queued acquires (None is unbounded) and per-class caps in `class_limits`.
     """
-    
+
+    def __init__(self, minsize: int, maxsize: int, acquire_timeout: Optional[float] = None,
+                 max_waiters: Optional[int] = None, class_limits: Optional[Dict[str, int]] = None,
+                 idle_timeout: Optional[float] = None, grow_wait: Optional[float] = None,
+                 ping_idle: Optional[float] = None, breaker_failures: int = 3,
+                 budget: Optional[ConnectionBudget] = None, **kwargs):
+        super().__init__(minsize=minsize, maxsize=maxsize, **kwargs)
+        for priority in class_limits or {}:
+            if priority not in PRIORITY_CLASSES:
+                raise ValueError(f"Unknown priority class '{priority}'. Must be one of {list(PRIORITY_CLASSES)}.")
+        self._acquire_timeout = acquire_timeout
+        self._max_waiters = max_waiters
+        self._class_limits = dict(class_limits or {})
+        self._waiting: Counter = Counter()
+        self._held: Counter = Counter()
+        self._held_by: Dict[Connection, str] = {}
+        self.overloaded = 0
+        self.timeouts = 0
+        # Adaptive sizing: connections to keep open, and the acquire waits that drive it
+        self._idle_timeout = idle_timeout
+        self._grow_wait = grow_wait
+        self.target = minsize
+        self.wait_ewma = 0.0
+        self._slow_acquires = 0
+        # Reconnect backoff while the database is unreachable
+        self.connect_failures = 0
+        self._backoff = 0.0
+        self._maintenance: Optional[asyncio.Task] = None
+        # Validation: connections silent this long are pinged; when each free connection was last released
+        self._ping_idle = ping_idle
+        self._idle_since: Dict[Connection, float] = {}
+        self.dead_connections = 0
+        self.breaker = CircuitBreaker(breaker_failures)
+        self._budget = budget
+        if budget is not None:
+            budget.register(self)
+
+    def acquire(self, priority: Optional[str] = None, timeout: Optional[float] = None):
+        """
+        Acquire a connection in a priority class (default: the `pool_priority` context).
+        `timeout` overrides the pool's acquire timeout for this call.
+        """
+        coro = self._acquire_in_class(priority, timeout)
+        return _PoolAcquireContextManager(coro, self)
+
+    def _admissible(self, priority: str) -> bool:
+        """True if the class is under its cap and no higher class is waiting for a connection it could take."""
+        limit = self._class_limits.get(priority)
+        if limit is not None and self._held[priority] >= limit:
+            return False
+        for higher in PRIORITY_CLASSES[:PRIORITY_CLASSES.index(priority)]:
+            higher_limit = self._class_limits.get(higher)
+            if self._waiting[higher] and (higher_limit is None or self._held[higher] < higher_limit):
+                return False
+        return True
+
+    async def _acquire_in_class(self, priority: Optional[str], timeout: Optional[float]):
+        priority = priority or _priority.get()
+        if priority not in PRIORITY_CLASSES:
+            raise ValueError(f"Unknown priority class '{priority}'. Must be one of {list(PRIORITY_CLASSES)}.")
+        if self._closing:
+            raise RuntimeError("Cannot acquire connection after closing pool")
+        trial = self._check_breaker()
+        timeout = self._acquire_timeout if timeout is None else timeout
+        deadline = asyncio.timeout(timeout)
+        started = self._loop.time()
+        try:
+            async with deadline:
+                while True:
+                    conn = await self._checkout(priority, trial)
+                    try:
+                        alive = await self._validate(conn)
+                    except BaseException:
+                        self._discard(conn)
+                        raise
+                    if alive:
+                        self._record_wait(self._loop.time() - started)
+                        return conn
+                    self._discard(conn)
+        except TimeoutError:
+            if not deadline.expired():
+                raise
+            self.timeouts += 1
+            raise PoolTimeoutError(f"No database connection became available within {timeout}s "
+                                   f"({self.size} connections busy, {sum(self._waiting.values())} waiting).") from None
+
+    def _check_breaker(self) -> bool:
+        """Raises while the breaker is open; returns True if this acquire is the half-open trial."""
+        was_open = self.breaker.is_open
+        if not self.breaker.allow(self._loop.time()):
+            self._raise_unavailable()
+        return was_open
+
+    def _raise_unavailable(self):
+        state = self.breaker.to_dict(self._loop.time())
+        raise DatabaseUnavailableError(
+            f"Database is unreachable ({state['last_error']}); next reconnect attempt in {state['next_probe_seconds']}s.")
+
+    async def _checkout(self, priority: str, trial: bool = False) -> Connection:
+        """
+        Waits, in priority order, for a free connection and marks it as held by the class.
+        Waiters fail once the breaker opens, except the half-open `trial`, which goes on to connect.
+        """
+        async with self._cond:
+            while True:
+                if self.breaker.is_open and not trial:
+                    self._raise_unavailable()
+                if self._admissible(priority):
+                    await self.fill_free_pool(True)
+                    if self._free:
+                        conn = self._free.popleft()
+                        self._idle_since.pop(conn, None)
+                        self._used.add(conn)
+                        self._held[priority] += 1
+                        self._held_by[conn] = priority
+                        return conn
+                if self._max_waiters is not None and sum(self._waiting.values()) >= self._max_waiters:
+                    self.overloaded += 1
+                    raise PoolOverloadedError(
+                        f"Database pool overloaded: {self.size} connections busy and {self._max_waiters} requests "
+                        f"already waiting. Retry later.")
+                self._waiting[priority] += 1
+                try:
+                    await self._cond.wait()
+                except BaseException:
+                    self._waiting[priority] -= 1
+                    # Waiters of lower classes may have been held back by this one
+                    self._cond.notify_all()
+                    raise
+                self._waiting[priority] -= 1
+
+    async def _validate(self, conn: Connection) -> bool:
+        """Pings a connection first if it has been silent for `ping_idle` seconds; False if it is dead."""
+        if self._ping_idle is None or self._loop.time() - conn.last_usage <= self._ping_idle:
+            return True
+        return await self._ping(conn)
+
+    async def _ping(self, conn: Connection) -> bool:
+        try:
+            await asyncio.wait_for(conn.ping(reconnect=False), PING_TIMEOUT)
+            return True
+        except Exception as e:
+            self.dead_connections += 1
+            logger.warning(f"Dropping dead pooled connection: {e!r}")
+            return False
+
+    def _discard(self, conn: Connection):
+        """Closes a held connection without returning it to the free list."""
+        priority = self._held_by.pop(conn, None)
+        if priority is not None:
+            self._held[priority] -= 1
+        self._used.discard(conn)
+        conn.close()
+        asyncio.ensure_future(self._notify_all())
+
+    def _record_wait(self, seconds: float):
+        self.wait_ewma += WAIT_EWMA_ALPHA * (seconds - self.wait_ewma)
+        if self._grow_wait is not None and seconds > self._grow_wait:
+            self._slow_acquires += 1
+
+    async def _notify_all(self):
+        async with self._cond:
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, object]:
+        """Current size, free and waiting counts per class, and overload/timeout counters."""
+        return {
+            "size": self.size,
+            "free": self.freesize,
+            "maxsize": self.maxsize,
+            "held": {priority: self._held[priority] for priority in PRIORITY_CLASSES},
+            "waiting": {priority: self._waiting[priority] for priority in PRIORITY_CLASSES},
+            "class_limits": dict(self._class_limits),
+            "overloaded": self.overloaded,
+            "timeouts": self.timeouts,
+            "minsize": self.minsize,
+            "target": self.target,
+            "wait_ewma_ms": round(self.wait_ewma * 1000, 3),
+            "connect_failures": self.connect_failures,
+            "reconnect_backoff_seconds": self._backoff,
+            "dead_connections": self.dead_connections,
+            "breaker": self.breaker.to_dict(self._loop.time()),
+        }
+
+    async def _connect_many(self, count: int) -> Tuple[List[Connection], List[BaseException]]:
+        """
+        Opens `count` connections concurrently, so warm-up pays one handshake round instead
+        of `count` in sequence. They count towards `size` while they are being opened.
+        With a shared budget, free connections of other pools are closed to make room, and
+        fewer (possibly no) connections are opened if that is not enough.
+        """
+        if self._budget is not None:
+            short = count - self._budget.available()
+            if short > 0:
+                self._budget.reclaim(self, short)
+                count = min(count, self._budget.available())
+            if count <= 0:
+                return [], []
+        self._acquiring += count
+        try:
+            results = await asyncio.gather(*(safe_connect(**self._conn_kwargs) for _ in range(count)), return_exceptions=True)
+        finally:
+            self._acquiring -= count
+        opened = [conn for conn in results if not isinstance(conn, BaseException)]
+        errors = [error for error in results if isinstance(error, BaseException)]
+        now = self._loop.time()
+        for conn in opened:
+            self._idle_since[conn] = now
+        if errors:
+            self.connect_failures += 1
+            self._backoff = min(RECONNECT_BACKOFF_MAX, self._backoff * 2 if self._backoff else RECONNECT_BACKOFF_INITIAL)
+        elif opened:
+            self._backoff = 0.0
+        if opened:
+            self.breaker.record_success()
+        elif errors and self.breaker.record_failure(now, self._backoff, errors[0]):
+            # Queued acquires fail now instead of waiting out their timeout
+            asyncio.ensure_future(self._notify_all())
+        return opened, errors
+
+    def start_maintenance(self, interval: float = POOL_MAINTENANCE_INTERVAL):
+        """Starts the background task that adapts the pool size and reconnects after outages."""
+        if self._maintenance is None:
+            self._maintenance = asyncio.ensure_future(self._maintain(interval))
+
+    def close(self):
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+            self._maintenance = None
+        if self._budget is not None:
+            self._budget.unregister(self)
+        super().close()
+
+    async def _maintain(self, interval: float):
+        while not self._closing:
+            # While the database is unreachable, retry on the backoff schedule (with jitter) instead
+            delay = self._backoff * random.uniform(0.5, 1.0) if self._backoff else interval
+            await asyncio.sleep(delay)
+            try:
+                await self.maintain()
+            except Exception as e:
+                logger.error(f"Connection pool maintenance failed: {e}")
+
+    async def maintain(self):
+        """
+        One maintenance pass: validate silent connections, adapt the target size, close idle
+        connections and open missing ones. While the breaker is open, a single connection is
+        opened as a probe instead.
+        """
+        if self.breaker.is_open:
+            opened, _ = await self._connect_many(1)
+            async with self._cond:
+                self._free.extend(opened)
+                self._cond.notify_all()
+            if not opened:
+                return
+        await self._validate_free()
+        async with self._cond:
+            if self._slow_acquires:
+                grown = min(self.maxsize, self.target + self._slow_acquires)
+                if grown != self.target:
+                    logger.info(f"Growing connection pool target from {self.target} to {grown} "
+                                f"({self._slow_acquires} slow acquires, average wait {self.wait_ewma * 1000:.1f} ms).")
+                self.target = grown
+                self._slow_acquires = 0
+            idle = []
+            if self._idle_timeout is not None:
+                now = self._loop.time()
+                while self._free and self.size > self.minsize and now - self._idle_since.get(self._free[0], self._free[0].last_usage) > self._idle_timeout:
+                    conn = self._free.popleft()
+                    self._idle_since.pop(conn, None)
+                    idle.append(conn)
+                if idle:
+                    self.target = max(self.minsize, self.size)
+            missing = self.target - self.size
+        for conn in idle:
+            try:
+                await conn.ensure_closed()
+            except Exception:
+                conn.close()
+        if idle:
+            logger.info(f"Closed {len(idle)} idle connection(s); pool target is now {self.target}.")
+        if missing <= 0:
+            return
+        opened, errors = await self._connect_many(missing)
+        async with self._cond:
+            for conn in opened:
+                self._free.append(conn)
+            self._cond.notify_all()
+        if errors:
+            logger.warning(f"Could not open {len(errors)} of {missing} connection(s): {errors[0]}. "
+                           f"Retrying in up to {self._backoff:.1f}s.")
+
+    async def _validate_free(self):
+        """Pings free connections that have been silent for `ping_idle` seconds, concurrently, and drops the dead ones."""
+        if self._ping_idle is None:
+            return
+        async with self._cond:
+            now = self._loop.time()
+            silent = [conn for conn in self._free if now - conn.last_usage > self._ping_idle]
+            for conn in silent:
+                self._free.remove(conn)
+            # Counted as in-flight so the pool does not open replacements meanwhile
+            self._acquiring += len(silent)
+        if not silent:
+            return
+        alive = [False] * len(silent)
+        try:
+            alive = await asyncio.gather(*(self._ping(conn) for conn in silent))
+        finally:
+            async with self._cond:
+                self._acquiring -= len(silent)
+                for conn, ok in zip(silent, alive):
+                    if ok:
+                        self._free.appendleft(conn)
+                    else:
+                        self._idle_since.pop(conn, None)
+                        conn.close()
+                self._cond.notify_all()
+
     async def fill_free_pool(self, override_min: bool = False):
         """
         Override fill_free_pool to use safe_connect instead of connect.
@@ -74,25 +585,57 @@ class SafePool(Pool):
                 self._free.rotate()
             n += 1
 
-        while self.size < self.minsize:
-            self._acquiring += 1
-            try:
-                conn = await safe_connect(**self._conn_kwargs)
+        missing = self.minsize - self.size
+        if missing > 0:
+            opened, errors = await self._connect_many(missing)
+            for conn in opened:
                 self._free.append(conn)
                 self._cond.notify()
-            finally:
-                self._acquiring -= 1
+            if errors and not self._free:
+                raise errors[0]
         if self._free:
             return
 
         if override_min and self.size < self.maxsize:
-            self._acquiring += 1
-            try:
-                conn = await safe_connect(**self._conn_kwargs)
-                self._free.append(conn)
-                self._cond.notify()
-            finally:
-                self._acquiring -= 1
+            opened, errors = await self._connect_many(1)
+            if errors:
+                raise errors[0]
+            self._free.extend(opened)
+            self._cond.notify()
+
+
+    def release(self, conn):
+        """
+        Release a connection back to the pool, closing it instead if it was marked `unclean`
+        (a statement on it was abandoned, so its protocol state is unknown). All waiters are
+        woken, since the next connection goes to the highest admissible class, not the oldest waiter.
+        """
+        priority = self._held_by.pop(conn, None)
+        if priority is not None:
+            self._held[priority] -= 1
+        if getattr(conn, "unclean", False) and conn in self._used:
+            self._used.remove(conn)
+            conn.close()
+        else:
+            self._idle_since[conn] = self._loop.time()
+            super().release(conn)
+        if self._budget is not None:
+            self._budget.wake(self)
+        return asyncio.ensure_future(self._notify_all())
+
+    async def kill_query(self, thread_id: int):
+        """
+        Sends KILL QUERY for a server thread on a short-lived side connection.
+
+        The side connection is opened outside the pool, so a statement can be
+        killed even while every pooled connection is busy.
+        """
+        conn = await safe_connect(**self._conn_kwargs)
+        try:
+            async with conn.cursor() as cursor:
+                await cursor.execute(f"KILL QUERY {int(thread_id)}")
+        finally:
+            await conn.ensure_closed()
 
 
 def create_safe_pool(
@@ -106,6 +649,8 @@ def create_safe_pool(
     Create a SafePool instead of a regular Pool.
     
     This is a drop-in replacement for asyncmy.create_pool() that uses SafeConnection.
+    The admission control and sizing options of SafePool (acquire_timeout, max_waiters,
+    class_limits, idle_timeout, grow_wait) can be passed along with the connection arguments.
     """
     coro = _create_safe_pool(
         minsize=minsize, 
@@ -135,4 +680,5 @@ async def _create_safe_pool(
     if minsize > 0:
         async with pool.cond:
             await pool.fill_free_pool(False)
+    pool.start_maintenance()
     return pool
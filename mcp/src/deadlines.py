@@ -0,0 +1,99 @@
+"""
+Deadlines for tool calls and the database statements they run.
+
+A deadline is an absolute point in time stored in a context variable, so it
+follows a tool call through helper methods and into tasks it gathers, without
+being threaded through every signature. `DeadlineMiddleware` starts one for
+each MCP tool call: the call's `timeout_seconds` argument if it has one,
+otherwise the tool's entry in MCP_TOOL_TIMEOUTS, otherwise MCP_QUERY_TIMEOUT.
+`_execute_query` turns the time left into MariaDB's `max_statement_time` and a
+client-side timeout. Background jobs are started in a fresh context and so are
+not bound by the deadline of the call that queued them.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import math
+from typing import Dict, Iterator, Optional
+
+from fastmcp.exceptions import ToolError
+from fastmcp.server.middleware import Middleware
+
+
+logger = logging.getLogger(__name__)
+
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("mcp_deadline", default=None)
+
+
+def _now() -> float:
+    return asyncio.get_running_loop().time()
+
+
+@contextlib.contextmanager
+def deadline(seconds: Optional[float]) -> Iterator[None]:
+    """
+    Runs the block with a deadline `seconds` from now. An enclosing deadline that
+    expires earlier still applies; None or a non-positive value adds no deadline.
+    """
+    if not seconds or seconds <= 0:
+        yield
+        return
+    expires = _now() + seconds
+    current = _deadline.get()
+    token = _deadline.set(expires if current is None else min(current, expires))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+@contextlib.contextmanager
+def no_deadline() -> Iterator[None]:
+    """Runs the block without a deadline, e.g. work shared by calls that each enforce their own."""
+    token = _deadline.set(None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Seconds left until the current deadline (negative once it has passed), or None without one."""
+    expires = _deadline.get()
+    return None if expires is None else expires - _now()
+
+
+class DeadlineMiddleware(Middleware):
+    """Starts a deadline for every tool call, from its timeout_seconds argument or the configured defaults."""
+
+    def __init__(self, default_timeout: float, tool_timeouts: Optional[Dict[str, float]] = None):
+        self.default_timeout = default_timeout
+        self.tool_timeouts = tool_timeouts or {}
+
+    def timeout_for(self, tool_name: str, arguments: Optional[Dict]) -> Optional[float]:
+        """
+        The call's deadline in seconds (0 for none). A `timeout_seconds` argument can shorten the
+        configured deadline but never lift it: larger values are capped at it, and zero or negative
+        values leave it in place (the tool's own validation decides whether they are allowed).
+        """
+        configured = self.tool_timeouts.get(tool_name, self.default_timeout)
+        requested = (arguments or {}).get("timeout_seconds")
+        if requested is None:
+            return configured
+        try:
+            seconds = float(requested) if not isinstance(requested, bool) else math.nan
+        except (TypeError, ValueError):
+            seconds = math.nan
+        if not math.isfinite(seconds):
+            logger.error(f"Invalid timeout_seconds for {tool_name}: {requested!r}. Must be a positive number.")
+            raise ToolError(f"Invalid timeout_seconds: {requested!r}. Must be a positive number.")
+        requested = seconds
+        if requested <= 0:
+            return configured
+        return min(requested, configured) if configured and configured > 0 else requested
+
+    async def on_call_tool(self, context, call_next):
+        with deadline(self.timeout_for(context.message.name, context.message.arguments)):
+            return await call_next(context)
@@ -5,6 +5,8 @@ import asyncio
 from typing import List, Optional, Dict, Any, Union, Awaitable
 import numpy as np
 
+from chunking import TokenSpansFn, hf_token_spans, tiktoken_token_spans
+
 # Import configuration variables and the logger instance
 from config import (
     EMBEDDING_PROVIDER,
@@ -67,6 +69,10 @@ HF_MODEL_DIMENSIONS = {
     "BAAI/bge-m3": 1024
 }
 
+# Models trained with Matryoshka representation learning, whose vectors can be
+# truncated to a prefix of their dimensions and re-normalized
+MATRYOSHKA_MODELS: List[str] = ["text-embedding-3-small", "text-embedding-3-large", "text-embedding-004"]
+
 class EmbeddingService:
     """
     Provides an interface to generate text embeddings using a configured provider
@@ -82,6 +88,7 @@ class EmbeddingService:
         self.gemini_client = None
         self.allowed_models: List[str] = []
         self.default_model: str = ""
+        self._token_spans_fns: Dict[str, Optional[TokenSpansFn]] = {}
 
         logger.info(f"Initializing EmbeddingService with provider: {self.provider}")
 
@@ -153,6 +160,35 @@ class EmbeddingService:
         """Returns the default model name for the current provider."""
         return self.default_model
 
+    def supports_dimension_truncation(self, model_name: Optional[str] = None) -> bool:
+        """Returns True if vectors from the model (or default model) may be truncated to fewer dimensions."""
+        return (model_name or self.default_model) in MATRYOSHKA_MODELS
+
+    def get_token_spans(self, model_name: Optional[str] = None) -> Optional[TokenSpansFn]:
+        """
+        Returns a batch tokenizer for the model (or default model) that reports the character
+        span of every token, or None if the model's tokenizer is not available locally.
+        HuggingFace models use their own fast tokenizer; OpenAI models use tiktoken if installed.
+        """
+        model = model_name or self.default_model
+        if model in self._token_spans_fns:
+            return self._token_spans_fns[model]
+        spans_fn = None
+        if self.provider == "huggingface" and model == self.default_model:
+            tokenizer = getattr(getattr(self, "huggingface_client", None), "tokenizer", None)
+            if tokenizer is not None and getattr(tokenizer, "is_fast", False):
+                spans_fn = hf_token_spans(tokenizer)
+        elif self.provider == "openai":
+            try:
+                import tiktoken
+                spans_fn = tiktoken_token_spans(tiktoken.encoding_for_model(model))
+            except Exception as e:
+                logger.info(f"tiktoken tokenizer unavailable for '{model}', using heuristic token counts: {e}")
+        if spans_fn is None:
+            logger.info(f"No local tokenizer for model '{model}'. Chunking will use heuristic token counts.")
+        self._token_spans_fns[model] = spans_fn
+        return spans_fn
+
     async def get_embedding_dimension(self, model_name: Optional[str] = None) -> int:
         """
         Returns the embedding vector dimension for the given model (or default model if not specified).
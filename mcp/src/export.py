@@ -0,0 +1,151 @@
+"""
+Streaming writers for exporting query results to local files.
+
+Rows arrive in `fetchmany` batches and are appended to the output as they come,
+so memory use is bounded by one batch regardless of result size:
+
+- CSV via the standard library, Parquet via pyarrow (optional dependency),
+  one row group per batch.
+- Embedding columns are written to a float32 `.npy` matrix that is appended
+  to batch by batch; its header is rewritten with the final row count on
+  close, so the file can be opened with `np.load(path, mmap_mode="r")`.
+  Row ids go to a sidecar text file, one per line, in matrix row order.
+"""
+
+import csv
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None  # type: ignore
+    pq = None  # type: ignore
+
+EXPORT_FORMATS = ("parquet", "csv")
+EXPORT_FORMAT_BY_EXTENSION = {".parquet": "parquet", ".csv": "csv"}
+# Fixed size of the .npy header, so it can be rewritten in place once the row count is known
+NPY_HEADER_BYTES = 128
+
+
+def detect_export_format(path: str, file_format: Optional[str] = None) -> str:
+    """Returns the explicit format if given, otherwise infers it from the file extension."""
+    if file_format:
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported file_format '{file_format}'. Must be one of {list(EXPORT_FORMATS)}.")
+        return file_format
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in EXPORT_FORMAT_BY_EXTENSION:
+        raise ValueError(f"Cannot infer the export format of '{path}'. Pass file_format as one of {list(EXPORT_FORMATS)}.")
+    return EXPORT_FORMAT_BY_EXTENSION[ext]
+
+
+class CsvRowWriter:
+    """Appends dict rows to a CSV file; the header comes from the first row."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._writer: Optional[csv.DictWriter] = None
+
+    def write(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        if self._writer is None:
+            self._writer = csv.DictWriter(self._file, fieldnames=list(rows[0].keys()))
+            self._writer.writeheader()
+        self._writer.writerows({k: v.hex() if isinstance(v, (bytes, bytearray)) else v for k, v in row.items()} for row in rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetRowWriter:
+    """Appends dict rows to a Parquet file, one row group per batch. Requires pyarrow."""
+
+    def __init__(self, path: str):
+        if pa is None:
+            raise RuntimeError("Parquet export requires the 'pyarrow' package. Install it or export to CSV.")
+        self.path = path
+        self._writer = None
+        self._schema = None
+
+    def write(self, rows: List[Dict[str, Any]]):
+        if not rows:
+            return
+        table = pa.Table.from_pylist(rows, schema=self._schema)
+        if self._writer is None:
+            self._schema = table.schema
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is None:
+            # No rows: still leave a valid (empty) file behind
+            pq.write_table(pa.table({}), self.path)
+        else:
+            self._writer.close()
+
+
+def _npy_header(rows: int, dimension: int) -> bytes:
+    """A version 1.0 .npy header for a little-endian float32 (rows, dimension) matrix, padded to NPY_HEADER_BYTES."""
+    header = f"{{'descr': '<f4', 'fortran_order': False, 'shape': ({rows}, {dimension}), }}"
+    prefix = b"\x93NUMPY\x01\x00"
+    body_length = NPY_HEADER_BYTES - len(prefix) - 2
+    body = header.ljust(body_length - 1) + "\n"
+    return prefix + body_length.to_bytes(2, "little") + body.encode("latin1")
+
+
+class NpyMatrixWriter:
+    """
+    Appends float32 vectors to a `.npy` file. The dimension is taken from the first batch;
+    the header is patched with the final row count on close.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.rows = 0
+        self.dimension: Optional[int] = None
+        self._file = open(path, "wb")
+        self._file.write(_npy_header(0, 0))
+
+    def write(self, vectors: np.ndarray):
+        vectors = np.ascontiguousarray(vectors, dtype="<f4")
+        if vectors.ndim != 2 or not len(vectors):
+            return
+        if self.dimension is None:
+            self.dimension = vectors.shape[1]
+        elif vectors.shape[1] != self.dimension:
+            raise ValueError(f"Embedding dimension changed from {self.dimension} to {vectors.shape[1]} during export.")
+        self._file.write(vectors.tobytes())
+        self.rows += len(vectors)
+
+    def close(self):
+        self._file.seek(0)
+        self._file.write(_npy_header(self.rows, self.dimension or 0))
+        self._file.close()
+
+
+class IdSidecarWriter:
+    """Writes row ids one per line, in the same order as the embedding matrix."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "w", encoding="utf-8")
+
+    def write(self, ids: List[Any]):
+        self._file.writelines(f"{row_id}\n" for row_id in ids)
+
+    def close(self):
+        self._file.close()
+
+
+def vectors_from_blobs(blobs: List[bytes]) -> np.ndarray:
+    """Stacks MariaDB VECTOR values (little-endian float32 bytes) into an (n, dimension) matrix."""
+    if not blobs:
+        return np.empty((0, 0), dtype="<f4")
+    joined = b"".join(bytes(blob) for blob in blobs)
+    return np.frombuffer(joined, dtype="<f4").reshape(len(blobs), -1)
@@ -0,0 +1,493 @@
+"""
+Streaming ingestion into vector stores, from local files or from existing tables.
+Precomputed embeddings can also be read from `.npy`/Parquet files and loaded as-is.
+
+Records flow through bounded stages:
+
+    read -> [chunk] -> batch -> [dedup] -> embed (concurrent workers) -> insert
+
+At most `max_in_flight` batches exist between the reader and the inserter at
+any time, so a slow stage applies backpressure upstream and memory stays flat
+regardless of source size. Batches are inserted in source order, which makes the
+position after the last inserted batch (a byte offset in a file, a primary key
+in a table) an exact resume point.
+"""
+
+import asyncio
+import csv
+import json
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple, Union
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None  # type: ignore
+    pq = None  # type: ignore
+
+from chunking import TokenChunker, iter_document_chunks
+from config import logger
+
+SUPPORTED_FORMATS = ("jsonl", "csv", "text")
+FORMAT_BY_EXTENSION = {
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".csv": "csv",
+    ".txt": "text",
+    ".log": "text",
+    ".md": "text",
+}
+
+
+@dataclass
+class Record:
+    """
+    One document read from the source, with the resume position just past it:
+    a byte offset for files, the record's primary key for tables.
+    """
+    text: str
+    metadata: Dict[str, Any]
+    end_offset: Union[int, str]
+
+
+@dataclass
+class StageStats:
+    """Work counters for one pipeline stage."""
+    items: int = 0
+    batches: int = 0
+    busy_seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "batches": self.batches,
+            "busy_seconds": round(self.busy_seconds, 3),
+            "items_per_second": round(self.items / self.busy_seconds, 1) if self.busy_seconds > 0 else None,
+        }
+
+
+def detect_format(path: str, file_format: Optional[str] = None) -> str:
+    """Returns the explicit format if given, otherwise infers it from the file extension."""
+    if file_format:
+        if file_format not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported file_format '{file_format}'. Must be one of {list(SUPPORTED_FORMATS)}.")
+        return file_format
+    ext = os.path.splitext(path)[1].lower()
+    if ext not in FORMAT_BY_EXTENSION:
+        raise ValueError(f"Cannot infer the format of '{path}'. Pass file_format as one of {list(SUPPORTED_FORMATS)}.")
+    return FORMAT_BY_EXTENSION[ext]
+
+
+class FileRecordReader:
+    """
+    Reads records from a JSONL, CSV or plain-text file starting at a byte offset.
+
+    - jsonl: one JSON object per line; the document is `text_field`.
+    - csv: a header row, then one record per line (quoted fields must not span lines).
+    - text: every non-empty line is a document.
+
+    Metadata is taken from `metadata_fields` if given, otherwise from a `metadata`
+    object (JSONL) or all remaining fields. Malformed lines are skipped and counted.
+    """
+
+    def __init__(self, path: str, file_format: str, text_field: str = "document",
+                 metadata_fields: Optional[List[str]] = None, start_offset: int = 0):
+        self.path = path
+        self.file_format = file_format
+        self.text_field = text_field
+        self.metadata_fields = metadata_fields
+        self.skipped = 0
+        self._file = open(path, "rb")
+        self._header: Optional[List[str]] = None
+        self.offset = 0
+        if file_format == "csv":
+            header_line = self._file.readline()
+            self.offset = len(header_line)
+            self._header = next(csv.reader([header_line.decode("utf-8-sig")]), [])
+            if text_field not in self._header:
+                self._file.close()
+                raise ValueError(f"CSV header of '{path}' has no '{text_field}' column.")
+        if start_offset > self.offset:
+            self._file.seek(start_offset)
+            self.offset = start_offset
+
+    def _metadata(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        if self.metadata_fields:
+            return {name: fields.get(name) for name in self.metadata_fields}
+        if isinstance(fields.get("metadata"), dict):
+            return fields["metadata"]
+        return {name: value for name, value in fields.items() if name != self.text_field}
+
+    def _parse(self, line: bytes, line_offset: int) -> Optional[Record]:
+        text_line = line.decode("utf-8").strip()
+        if not text_line:
+            return None
+        if self.file_format == "text":
+            return Record(text_line, {"source_file": os.path.basename(self.path), "source_offset": line_offset}, self.offset)
+        if self.file_format == "jsonl":
+            fields = json.loads(text_line)
+        else:
+            fields = dict(zip(self._header, next(csv.reader([text_line]))))
+        text = fields.get(self.text_field)
+        if not isinstance(text, str) or not text:
+            raise ValueError(f"missing or empty '{self.text_field}'")
+        return Record(text, self._metadata(fields), self.offset)
+
+    def read(self, max_records: int) -> List[Record]:
+        """Returns up to `max_records` records; an empty list means end of file. Blocking."""
+        records: List[Record] = []
+        while len(records) < max_records:
+            line = self._file.readline()
+            if not line:
+                break
+            line_offset = self.offset
+            self.offset += len(line)
+            try:
+                record = self._parse(line, line_offset)
+            except (ValueError, UnicodeDecodeError) as e:
+                self.skipped += 1
+                logger.warning(f"Skipping malformed record at byte {line_offset} of '{self.path}': {e}")
+                continue
+            if record is not None:
+                records.append(record)
+        return records
+
+    def close(self):
+        self._file.close()
+
+
+class KeysetRecordReader:
+    """
+    Reads records from a table in primary-key order, one page per `read` call.
+
+    `fetch_page(after_key, limit)` returns up to `limit` records whose key is greater
+    than `after_key` (None for the first page), ordered by key, with the key as each
+    record's `end_offset`. Keyset paging keeps every page an index range scan,
+    however deep into the table the reader is.
+    """
+
+    def __init__(self, fetch_page: Callable[[Optional[str], int], Awaitable[List[Record]]],
+                 start_after: Optional[str] = None, label: str = "table"):
+        self.fetch_page = fetch_page
+        self.offset = start_after
+        self.path = label
+        self.skipped = 0
+
+    async def read(self, max_records: int) -> List[Record]:
+        """Returns the next page of records; an empty list means the end of the table."""
+        records = await self.fetch_page(self.offset, max_records)
+        if records:
+            self.offset = records[-1].end_offset
+        return records
+
+    def close(self):
+        pass
+
+
+EMBEDDING_FORMATS = ("npy", "parquet")
+
+
+class EmbeddingFileReader:
+    """
+    Reads precomputed embeddings together with their documents, one batch per `read` call,
+    without loading the whole matrix into memory.
+
+    - npy: a float `(rows, dimension)` matrix opened with `np.load(mmap_mode="r")`. Documents and
+      metadata come from a JSONL/CSV/text file holding one record per matrix row, and ids
+      optionally from a text file with one id per line (the layout written by `export_query`).
+    - parquet: a single file with `text_field` and `embedding_column` (a list of floats or
+      float32 bytes per row), plus optional `id_column` and metadata columns. Requires pyarrow.
+
+    Each batch is returned as records, a float32 matrix and the ids (or None). Reading starts
+    at row `start_row`; for npy, `start_offset` is the matching byte offset in the documents file.
+    """
+
+    def __init__(self, embeddings_path: str, documents_path: Optional[str] = None, documents_format: Optional[str] = None,
+                 text_field: str = "document", metadata_fields: Optional[List[str]] = None, ids_path: Optional[str] = None,
+                 embedding_column: str = "embedding", id_column: Optional[str] = None, start_row: int = 0, start_offset: int = 0):
+        self.path = embeddings_path
+        self.file_format = "parquet" if embeddings_path.lower().endswith(".parquet") else "npy"
+        self.text_field = text_field
+        self.metadata_fields = metadata_fields
+        self.embedding_column = embedding_column
+        self.id_column = id_column
+        self.row = start_row
+        self._documents: Optional[FileRecordReader] = None
+        self._ids = None
+        self._batches = None
+        if self.file_format == "npy":
+            self.matrix = np.load(embeddings_path, mmap_mode="r")
+            if self.matrix.ndim != 2 or not np.issubdtype(self.matrix.dtype, np.floating):
+                raise ValueError(f"'{embeddings_path}' must hold a 2-D float matrix, got {self.matrix.dtype} with shape {self.matrix.shape}.")
+            if not documents_path:
+                raise ValueError("An .npy embeddings file needs a documents file with one record per matrix row.")
+            self.total_rows = self.matrix.shape[0]
+            self.dimension = self.matrix.shape[1]
+            self._documents = FileRecordReader(documents_path, detect_format(documents_path, documents_format),
+                                               text_field, metadata_fields, start_offset)
+            if ids_path:
+                self._ids = open(ids_path, "r", encoding="utf-8")
+                for _ in range(start_row):
+                    self._ids.readline()
+        else:
+            if pq is None:
+                raise RuntimeError("Importing Parquet files requires the 'pyarrow' package.")
+            self._parquet = pq.ParquetFile(embeddings_path)
+            self.total_rows = self._parquet.metadata.num_rows
+            embedding_type = self._parquet.schema_arrow.field(embedding_column).type
+            self.dimension = embedding_type.list_size if pa.types.is_fixed_size_list(embedding_type) else None
+
+    @property
+    def offset(self) -> int:
+        """Byte offset in the documents file after the last row read (npy), or 0."""
+        return self._documents.offset if self._documents is not None else 0
+
+    def _read_npy(self, max_rows: int) -> Tuple[List[Record], np.ndarray, Optional[List[str]]]:
+        skipped = self._documents.skipped
+        records = self._documents.read(max_rows)
+        if self._documents.skipped != skipped:
+            raise ValueError(f"Malformed record in '{self._documents.path}' near byte {self._documents.offset}; "
+                             "documents no longer line up with matrix rows.")
+        if self.row + len(records) > self.total_rows:
+            raise ValueError(f"'{self._documents.path}' has more records than '{self.path}' has rows ({self.total_rows}).")
+        if not records and self.row < self.total_rows:
+            raise ValueError(f"'{self._documents.path}' ended at record {self.row}, but '{self.path}' has {self.total_rows} rows.")
+        # Copies just this slice out of the memory-mapped matrix
+        vectors = np.asarray(self.matrix[self.row:self.row + len(records)], dtype="<f4")
+        ids = None
+        if self._ids is not None:
+            ids = [self._ids.readline().strip() for _ in records]
+            if records and not ids[-1]:
+                raise ValueError(f"The ids file has fewer lines than '{self.path}' has rows.")
+        return records, vectors, ids
+
+    def _parquet_vectors(self, column: Any) -> np.ndarray:
+        if pa.types.is_binary(column.type) or pa.types.is_large_binary(column.type) or pa.types.is_fixed_size_binary(column.type):
+            return np.frombuffer(b"".join(column.to_pylist()), dtype="<f4").reshape(len(column), -1)
+        values = column.flatten().to_numpy(zero_copy_only=False)
+        if len(column) and len(values) % len(column):
+            raise ValueError(f"Rows of '{self.embedding_column}' in '{self.path}' have different lengths.")
+        return values.astype("<f4", copy=False).reshape(len(column), -1)
+
+    def _read_parquet(self, max_rows: int) -> Tuple[List[Record], np.ndarray, Optional[List[str]]]:
+        if self._batches is None:
+            columns = [self.text_field, self.embedding_column]
+            if self.id_column:
+                columns.append(self.id_column)
+            names = self._parquet.schema_arrow.names
+            columns += self.metadata_fields or (["metadata"] if "metadata" in names else [])
+            self._batches = self._parquet.iter_batches(batch_size=max_rows, columns=columns)
+            self._to_skip = self.row
+        for batch in self._batches:
+            if self._to_skip:
+                dropped = min(self._to_skip, batch.num_rows)
+                batch = batch.slice(dropped)
+                self._to_skip -= dropped
+                if not batch.num_rows:
+                    continue
+            texts = batch.column(self.text_field).to_pylist()
+            if self.metadata_fields:
+                fields = {name: batch.column(name).to_pylist() for name in self.metadata_fields}
+                metadata = [{name: values[i] for name, values in fields.items()} for i in range(batch.num_rows)]
+            elif "metadata" in batch.schema.names:
+                metadata = [json.loads(m) if isinstance(m, str) else (m or {}) for m in batch.column("metadata").to_pylist()]
+            else:
+                metadata = [{} for _ in range(batch.num_rows)]
+            records = [Record(text, meta, self.row + i + 1) for i, (text, meta) in enumerate(zip(texts, metadata))]
+            ids = [str(i) for i in batch.column(self.id_column).to_pylist()] if self.id_column else None
+            return records, self._parquet_vectors(batch.column(self.embedding_column)), ids
+        return [], np.empty((0, self.dimension or 0), dtype="<f4"), None
+
+    def read(self, max_rows: int) -> Tuple[List[Record], np.ndarray, Optional[List[str]]]:
+        """Returns the next batch as (records, float32 vectors, ids or None); no records means the end. Blocking."""
+        records, vectors, ids = self._read_npy(max_rows) if self.file_format == "npy" else self._read_parquet(max_rows)
+        self.row += len(records)
+        return records, vectors, ids
+
+    def close(self):
+        if self._documents is not None:
+            self._documents.close()
+        if self._ids is not None:
+            self._ids.close()
+
+
+def chunk_records(chunker: TokenChunker, records: List[Record]) -> List[Record]:
+    """
+    Replaces each record by its chunks, tokenizing the whole batch at once. Chunks keep
+    their source record's end offset, so resume points stay on record boundaries.
+    """
+    return [
+        Record(text, metadata, records[index].end_offset)
+        for index, text, metadata in iter_document_chunks(chunker, [r.text for r in records], [r.metadata for r in records])
+    ]
+
+
+class IngestPipeline:
+    """
+    Runs a `FileRecordReader` or `KeysetRecordReader` through batched, concurrent embedding
+    and in-order insertion.
+
+    - `embed_batch(texts)` returns the vectors for a batch.
+    - `insert_batch(records, vectors)` stores a batch and returns the number of rows written.
+    - `on_checkpoint(offset)` is called after each insert with the new resume offset.
+    - `chunker`, if given, splits each read batch into token windows before embedding;
+      `batch_size` then counts source records, not chunks.
+    - `content_keys(texts)` and `find_existing(keys)`, if given, drop records whose key is
+      already stored (one lookup per batch) or repeats one read earlier in this run, before
+      they are embedded. They are counted as `skipped_duplicates`.
+    """
+
+    def __init__(self,
+                 reader: Union[FileRecordReader, KeysetRecordReader],
+                 embed_batch: Callable[[List[str]], Awaitable[Any]],
+                 insert_batch: Callable[[List[Record], Any], Awaitable[int]],
+                 batch_size: int = 64,
+                 concurrency: int = 4,
+                 on_checkpoint: Optional[Callable[[int], None]] = None,
+                 chunker: Optional[TokenChunker] = None,
+                 content_keys: Optional[Callable[[List[str]], List[Hashable]]] = None,
+                 find_existing: Optional[Callable[[List[Hashable]], Awaitable[set]]] = None):
+        self.reader = reader
+        self.embed_batch = embed_batch
+        self.insert_batch = insert_batch
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_in_flight = concurrency * 2
+        self.on_checkpoint = on_checkpoint
+        self.chunker = chunker
+        self.stats = {"read": StageStats(), "embed": StageStats(), "insert": StageStats()}
+        if chunker is not None:
+            self.stats = {"read": self.stats["read"], "chunk": StageStats(), "embed": self.stats["embed"], "insert": self.stats["insert"]}
+        self.content_keys = content_keys
+        self.find_existing = find_existing
+        # Keys of the batches that may not be inserted yet; older ones are found by `find_existing`
+        self._recent_keys: deque = deque(maxlen=self.max_in_flight)
+        self.duplicates = 0
+        self.inserted = 0
+        self.resume_offset = reader.offset
+
+    async def _drop_duplicates(self, records: List[Record]) -> List[Record]:
+        keys = self.content_keys([record.text for record in records])
+        existing = await self.find_existing(keys)
+        batch_keys = set()
+        kept = []
+        for record, key in zip(records, keys):
+            if key in existing or key in batch_keys or any(key in recent for recent in self._recent_keys):
+                self.duplicates += 1
+            else:
+                batch_keys.add(key)
+                kept.append(record)
+        self._recent_keys.append(batch_keys)
+        return kept
+
+    async def _read_stage(self, embed_queue: asyncio.Queue, in_flight: asyncio.Semaphore):
+        seq = 0
+        while True:
+            await in_flight.acquire()
+            started = time.perf_counter()
+            if asyncio.iscoroutinefunction(self.reader.read):
+                records = await self.reader.read(self.batch_size)
+            else:
+                records = await asyncio.to_thread(self.reader.read, self.batch_size)
+            self.stats["read"].busy_seconds += time.perf_counter() - started
+            if not records:
+                in_flight.release()
+                break
+            self.stats["read"].items += len(records)
+            self.stats["read"].batches += 1
+            if self.chunker is not None:
+                started = time.perf_counter()
+                records = await asyncio.to_thread(chunk_records, self.chunker, records)
+                self.stats["chunk"].busy_seconds += time.perf_counter() - started
+                self.stats["chunk"].items += len(records)
+                self.stats["chunk"].batches += 1
+            end_offset = records[-1].end_offset
+            if self.find_existing is not None:
+                records = await self._drop_duplicates(records)
+            await embed_queue.put((seq, records, end_offset))
+            seq += 1
+        for _ in range(self.concurrency):
+            await embed_queue.put(None)
+
+    async def _embed_worker(self, embed_queue: asyncio.Queue, insert_queue: asyncio.Queue):
+        while True:
+            item = await embed_queue.get()
+            if item is None:
+                return
+            seq, records, end_offset = item
+            vectors = None
+            if records:
+                started = time.perf_counter()
+                vectors = await self.embed_batch([record.text for record in records])
+                self.stats["embed"].busy_seconds += time.perf_counter() - started
+                self.stats["embed"].items += len(records)
+                self.stats["embed"].batches += 1
+            await insert_queue.put((seq, records, vectors, end_offset))
+
+    async def _embed_stage(self, embed_queue: asyncio.Queue, insert_queue: asyncio.Queue):
+        await asyncio.gather(*(self._embed_worker(embed_queue, insert_queue) for _ in range(self.concurrency)))
+        await insert_queue.put(None)
+
+    async def _insert_stage(self, insert_queue: asyncio.Queue, in_flight: asyncio.Semaphore):
+        pending: Dict[int, Any] = {}
+        next_seq = 0
+        while True:
+            item = await insert_queue.get()
+            if item is None:
+                return
+            pending[item[0]] = item
+            while next_seq in pending:
+                _, records, vectors, end_offset = pending.pop(next_seq)
+                if records:
+                    started = time.perf_counter()
+                    self.inserted += await self.insert_batch(records, vectors)
+                    self.stats["insert"].busy_seconds += time.perf_counter() - started
+                    self.stats["insert"].items += len(records)
+                    self.stats["insert"].batches += 1
+                self.resume_offset = end_offset
+                if self.on_checkpoint:
+                    self.on_checkpoint(self.resume_offset)
+                next_seq += 1
+                in_flight.release()
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Runs the pipeline to completion. Failures stop every stage; the result then
+        carries status 'error' and the offset from which the file can be resumed.
+        """
+        embed_queue: asyncio.Queue = asyncio.Queue()
+        insert_queue: asyncio.Queue = asyncio.Queue()
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        started = time.perf_counter()
+        error = None
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(self._read_stage(embed_queue, in_flight))
+                tg.create_task(self._embed_stage(embed_queue, insert_queue))
+                tg.create_task(self._insert_stage(insert_queue, in_flight))
+        except* Exception as eg:
+            error = eg.exceptions[0]
+            logger.error(f"Ingestion of '{self.reader.path}' stopped at {self.resume_offset!r}: {error}", exc_info=error)
+        finally:
+            self.reader.close()
+        elapsed = time.perf_counter() - started
+        result = {
+            "status": "error" if error else "success",
+            "inserted": self.inserted,
+            "skipped": self.reader.skipped,
+            "resume_offset": self.resume_offset,
+            "elapsed_seconds": round(elapsed, 3),
+            "records_per_second": round(self.inserted / elapsed, 1) if elapsed > 0 else None,
+            "stages": {name: stats.to_dict() for name, stats in self.stats.items()},
+        }
+        if self.find_existing is not None:
+            result["skipped_duplicates"] = self.duplicates
+        if error:
+            result["message"] = str(error)
+        return result
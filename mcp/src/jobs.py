@@ -0,0 +1,334 @@
+"""
+Background jobs for long-running tools.
+
+A tool that may run for minutes (bulk ingestion, re-embedding, maintenance)
+submits a coroutine to the `JobManager` and returns a job ID immediately.
+Jobs run on a bounded set of workers; clients poll, wait for, cancel and
+fetch the result of a job through the job tools.
+
+Job state is kept in a local SQLite file so it survives restarts. Jobs that
+were queued or running when the server stopped are marked `interrupted` on
+the next start; their last progress message tells the client how to resume.
+"""
+
+import asyncio
+import contextvars
+import datetime
+import json
+import os
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import logger
+
+JOB_STATUSES = ("queued", "running", "succeeded", "failed", "cancelled", "interrupted")
+FINISHED_STATUSES = ("succeeded", "failed", "cancelled", "interrupted")
+# Minimum seconds between progress writes to SQLite; in-memory progress is always current
+PROGRESS_PERSIST_INTERVAL = 1.0
+
+
+def parse_window(window: str) -> Tuple[datetime.time, datetime.time]:
+    """Parses a daily time window such as '02:00-05:00' (local time); it may wrap past midnight."""
+    try:
+        start, end = (datetime.time.fromisoformat(part.strip()) for part in window.split("-"))
+    except ValueError as e:
+        raise ValueError(f"Invalid time window '{window}'. Use 'HH:MM-HH:MM'.") from e
+    if start == end:
+        raise ValueError(f"Invalid time window '{window}': start and end are equal.")
+    return start, end
+
+
+def seconds_until_window(window: Optional[str], now: Optional[datetime.datetime] = None) -> float:
+    """Seconds from `now` until the daily window opens; 0 inside the window or without one."""
+    if not window:
+        return 0.0
+    start, end = parse_window(window)
+    now = now or datetime.datetime.now()
+    current = now.time()
+    inside = start <= current < end if start < end else (current >= start or current < end)
+    if inside:
+        return 0.0
+    opens = datetime.datetime.combine(now.date(), start)
+    if opens <= now:
+        opens += datetime.timedelta(days=1)
+    return (opens - now).total_seconds()
+
+
+def seconds_left_in_window(window: Optional[str], now: Optional[datetime.datetime] = None) -> Optional[float]:
+    """Seconds from `now` until the daily window closes; 0 outside the window, None without one."""
+    if not window:
+        return None
+    if seconds_until_window(window, now):
+        return 0.0
+    _, end = parse_window(window)
+    now = now or datetime.datetime.now()
+    closes = datetime.datetime.combine(now.date(), end)
+    if closes <= now:
+        closes += datetime.timedelta(days=1)
+    return (closes - now).total_seconds()
+
+
+@dataclass
+class Job:
+    """State of one background job."""
+    id: str
+    kind: str
+    params: Dict[str, Any]
+    status: str = "queued"
+    progress: float = 0.0
+    total: Optional[float] = None
+    message: Optional[str] = None
+    result: Any = None
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self, include_result: bool = False) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "params": self.params,
+            "status": self.status,
+            "progress": self.progress,
+            "total": self.total,
+            "message": self.message,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class JobHandle:
+    """Passed to a running job so it can report progress."""
+
+    def __init__(self, manager: "JobManager", job: Job):
+        self._manager = manager
+        self._job = job
+
+    @property
+    def job_id(self) -> str:
+        return self._job.id
+
+    def report(self, progress: float, total: Optional[float] = None, message: Optional[str] = None):
+        """Records progress. `total` and `message` keep their previous values when omitted."""
+        self._job.progress = progress
+        if total is not None:
+            self._job.total = total
+        if message is not None:
+            self._job.message = message
+        self._manager._progress_changed(self._job)
+
+
+class JobManager:
+    """
+    Runs jobs on at most `max_workers` concurrent workers and persists their state in SQLite.
+    The database is opened on first use.
+    """
+
+    def __init__(self, db_path: str, max_workers: int = 2, retention_seconds: int = 7 * 24 * 3600):
+        if max_workers <= 0:
+            raise ValueError("max_workers must be a positive integer.")
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.retention_seconds = retention_seconds
+        self._jobs: Dict[str, Job] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._last_persisted: Dict[str, float] = {}
+        self._workers: Optional[asyncio.Semaphore] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._shutting_down = False
+
+    # --- Persistence ---
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress REAL NOT NULL,
+                    total REAL,
+                    message TEXT,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                )
+            """)
+            self._recover()
+        return self._conn
+
+    def _recover(self):
+        """Marks jobs left unfinished by a previous process as interrupted and drops expired ones."""
+        now = time.time()
+        with self._conn:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'interrupted', finished_at = ? WHERE status IN ('queued', 'running')", (now,))
+            if cursor.rowcount:
+                logger.warning(f"Marked {cursor.rowcount} unfinished job(s) from a previous run as interrupted.")
+            self._conn.execute("DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?", (now - self.retention_seconds,))
+
+    def _persist(self, job: Job):
+        self._last_persisted[job.id] = time.monotonic()
+        with self._db():
+            self._conn.execute(
+                "INSERT OR REPLACE INTO jobs (id, kind, params, status, progress, total, message, result, error, created_at, started_at, finished_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job.id, job.kind, json.dumps(job.params, default=str), job.status, job.progress, job.total, job.message,
+                 json.dumps(job.result, default=str) if job.result is not None else None, job.error,
+                 job.created_at, job.started_at, job.finished_at))
+
+    def _load(self, job_id: str) -> Optional[Job]:
+        row = self._db().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    @staticmethod
+    def _from_row(row: sqlite3.Row) -> Job:
+        return Job(id=row["id"], kind=row["kind"], params=json.loads(row["params"]), status=row["status"],
+                   progress=row["progress"], total=row["total"], message=row["message"],
+                   result=json.loads(row["result"]) if row["result"] is not None else None, error=row["error"],
+                   created_at=row["created_at"], started_at=row["started_at"], finished_at=row["finished_at"])
+
+    # --- State changes ---
+
+    def _notify(self, job: Job):
+        event = self._changed.pop(job.id, None)
+        if event is not None:
+            event.set()
+
+    def _progress_changed(self, job: Job):
+        if time.monotonic() - self._last_persisted.get(job.id, 0.0) >= PROGRESS_PERSIST_INTERVAL:
+            self._persist(job)
+        self._notify(job)
+
+    def _set_status(self, job: Job, status: str, **updates):
+        job.status = status
+        for name, value in updates.items():
+            setattr(job, name, value)
+        self._persist(job)
+        self._notify(job)
+
+    # --- Public API ---
+
+    def submit(self, kind: str, params: Dict[str, Any], run: Callable[[JobHandle], Awaitable[Any]],
+               delay: float = 0.0) -> Dict[str, Any]:
+        """
+        Queues `run(handle)` as a job and returns its initial state. The coroutine's
+        return value becomes the job result; an exception marks the job failed.
+        With a `delay`, the job stays queued for that many seconds before it competes
+        for a worker, so a job scheduled for later does not hold one while it waits.
+        """
+        self._db()
+        if self._workers is None:
+            self._workers = asyncio.Semaphore(self.max_workers)
+        job = Job(id=uuid.uuid4().hex, kind=kind, params=params)
+        if delay > 0:
+            job.message = f"scheduled to start in {delay:.0f}s"
+        self._jobs[job.id] = job
+        self._persist(job)
+        # Jobs outlive the call that queued them, so they must not inherit its context (e.g. its deadline)
+        self._tasks[job.id] = asyncio.create_task(self._run(job, run, delay), name=f"job-{kind}-{job.id}",
+                                                  context=contextvars.Context())
+        logger.info(f"Queued job {job.id} ({kind}){f' to start in {delay:.0f}s' if delay > 0 else ''}.")
+        return job.to_dict()
+
+    async def _run(self, job: Job, run: Callable[[JobHandle], Awaitable[Any]], delay: float = 0.0):
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+            async with self._workers:
+                self._set_status(job, "running", started_at=time.time())
+                logger.info(f"Job {job.id} ({job.kind}) started.")
+                result = await run(JobHandle(self, job))
+            self._set_status(job, "succeeded", result=result, finished_at=time.time())
+            logger.info(f"Job {job.id} ({job.kind}) succeeded.")
+        except asyncio.CancelledError:
+            status = "interrupted" if self._shutting_down else "cancelled"
+            self._set_status(job, status, finished_at=time.time())
+            logger.info(f"Job {job.id} ({job.kind}) {status}.")
+        except Exception as e:
+            self._set_status(job, "failed", error=str(e), finished_at=time.time())
+            logger.error(f"Job {job.id} ({job.kind}) failed: {e}", exc_info=True)
+        finally:
+            # Finished jobs are served from SQLite from now on
+            self._tasks.pop(job.id, None)
+            self._jobs.pop(job.id, None)
+            self._last_persisted.pop(job.id, None)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Returns the job from memory, or from SQLite for jobs of earlier runs."""
+        return self._jobs.get(job_id) or self._load(job_id)
+
+    def list(self, status: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Most recent jobs first, optionally filtered by status."""
+        if status is not None and status not in JOB_STATUSES:
+            raise ValueError(f"Invalid status '{status}'. Must be one of {list(JOB_STATUSES)}.")
+        for job in self._jobs.values():
+            if job.status not in FINISHED_STATUSES:
+                self._persist(job)
+        sql = "SELECT * FROM jobs"
+        params: tuple = ()
+        if status is not None:
+            sql += " WHERE status = ?"
+            params = (status,)
+        sql += " ORDER BY created_at DESC LIMIT ?"
+        rows = self._db().execute(sql, params + (limit,)).fetchall()
+        return [self._from_row(row).to_dict() for row in rows]
+
+    def cancel(self, job_id: str) -> bool:
+        """Requests cancellation. Returns False if the job is unknown or already finished."""
+        task = self._tasks.get(job_id)
+        if task is None or task.done():
+            return False
+        task.cancel()
+        return True
+
+    async def wait(self, job_id: str, timeout: float,
+                   on_progress: Optional[Callable[[Job], Awaitable[None]]] = None) -> Optional[Job]:
+        """
+        Waits until the job finishes or `timeout` seconds pass, calling `on_progress`
+        on every state change. Returns the job, or None if it is unknown.
+        """
+        job = self.get(job_id)
+        deadline = time.monotonic() + timeout
+        while job is not None and job.status not in FINISHED_STATUSES:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            event = self._changed.setdefault(job_id, asyncio.Event())
+            try:
+                await asyncio.wait_for(event.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if on_progress is not None:
+                await on_progress(job)
+        return job
+
+    async def shutdown(self):
+        """Stops running jobs, marking them interrupted, and closes the database."""
+        self._shutting_down = True
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
@@ -0,0 +1,166 @@
+"""
+Helpers for compact vector storage.
+
+- Matryoshka-style dimension truncation: models trained with Matryoshka
+  representation learning keep most of their quality in the leading
+  components, so a vector can be cut to its first `n` dimensions and
+  re-normalized to unit length.
+- int8 scalar quantization: a 4x smaller shadow copy of each vector that is
+  used to generate search candidates, which are then re-scored with the
+  full-precision `embedding` column.
+- `QuantizedCodeCache`: an LRU of stores' codes bounded by bytes.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# Rows scored per block during int8 candidate generation, bounds temporary memory
+INT8_SCORE_BLOCK_ROWS = 65536
+# Rows fetched per batch when a store's codes are scanned instead of cached
+INT8_SCAN_BATCH_ROWS = 10000
+
+
+def truncate_embeddings(vectors: Union[Sequence[float], Sequence[Sequence[float]], np.ndarray], dimensions: int) -> np.ndarray:
+    """
+    Keeps the first `dimensions` components of each vector and re-normalizes it to unit length.
+    Accepts a single vector or a batch and returns float32 data of the same rank.
+    """
+    arr = np.asarray(vectors, dtype=np.float32)
+    single = arr.ndim == 1
+    arr = np.atleast_2d(arr)
+    if dimensions <= 0 or dimensions > arr.shape[1]:
+        raise ValueError(f"Cannot truncate {arr.shape[1]}-dimension vectors to {dimensions} dimensions.")
+    truncated = arr[:, :dimensions]
+    norms = np.linalg.norm(truncated, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    truncated = truncated / norms
+    return truncated[0] if single else truncated
+
+
+def quantize_int8(vectors: Union[Sequence[float], Sequence[Sequence[float]], np.ndarray]) -> np.ndarray:
+    """
+    Symmetric per-vector scalar quantization to int8.
+
+    Each vector is scaled so its largest absolute component maps to 127. The scale
+    is not kept: the codes preserve direction, which is all cosine candidate
+    ranking needs, and exact distances come from the full-precision re-score.
+    """
+    arr = np.asarray(vectors, dtype=np.float32)
+    single = arr.ndim == 1
+    arr = np.atleast_2d(arr)
+    scale = np.abs(arr).max(axis=1, keepdims=True)
+    scale[scale == 0] = 1.0
+    codes = np.round(arr / scale * 127.0).astype(np.int8)
+    return codes[0] if single else codes
+
+
+def int8_codes_from_bytes(blobs: List[bytes], dimensions: int) -> np.ndarray:
+    """Stacks VARBINARY int8 codes read from the database into an (n, dimensions) matrix."""
+    if not blobs:
+        return np.empty((0, dimensions), dtype=np.int8)
+    return np.frombuffer(b"".join(blobs), dtype=np.int8).reshape(len(blobs), dimensions)
+
+
+def int8_distances(codes: np.ndarray, code_norms: np.ndarray, query: Union[Sequence[float], np.ndarray],
+                   distance_function: str = "COSINE", vector_norms: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Approximate distances (lower is closer) from `query` to the vectors behind `codes`.
+
+    The codes keep only each vector's direction, which is enough for COSINE. EUCLIDEAN also
+    needs each vector's length, passed as `vector_norms`: ||q - v||² = ||q||² + ||v||² - 2·||q||·||v||·cos.
+    `code_norms` are the precomputed L2 norms of `codes`. Scoring runs in blocks so the
+    int8 matrix is never upcast as a whole.
+    """
+    total = codes.shape[0]
+    query = np.asarray(query, dtype=np.float32)
+    q = quantize_int8(query).astype(np.float32)
+    q_norm = float(np.linalg.norm(q)) or 1.0
+    sims = np.empty(total, dtype=np.float32)
+    for start in range(0, total, INT8_SCORE_BLOCK_ROWS):
+        block = codes[start:start + INT8_SCORE_BLOCK_ROWS].astype(np.float32)
+        sims[start:start + len(block)] = block @ q
+    safe_norms = np.where(code_norms == 0, 1.0, code_norms)
+    sims /= safe_norms * q_norm
+    if distance_function == "COSINE":
+        return 1.0 - sims
+    if distance_function == "EUCLIDEAN":
+        if vector_norms is None:
+            raise ValueError("EUCLIDEAN candidates need the norms of the full-precision vectors.")
+        query_norm = float(np.linalg.norm(query))
+        squared = query_norm ** 2 + vector_norms ** 2 - 2.0 * query_norm * vector_norms * sims
+        return np.sqrt(np.maximum(squared, 0.0))
+    raise ValueError(f"Unsupported distance function for int8 candidates: '{distance_function}'.")
+
+
+def nearest(distances: np.ndarray, n: int) -> np.ndarray:
+    """Indices of the `n` smallest distances, closest first."""
+    if distances.shape[0] == 0 or n <= 0:
+        return np.empty(0, dtype=np.int64)
+    n = min(n, distances.shape[0])
+    top = np.argpartition(distances, n - 1)[:n]
+    return top[np.argsort(distances[top])]
+
+
+def int8_candidates(codes: np.ndarray, code_norms: np.ndarray, query: Union[Sequence[float], np.ndarray], n: int,
+                    distance_function: str = "COSINE", vector_norms: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Returns the row indices of the `n` codes closest to `query` under the store's distance
+    function, best first (see `int8_distances`).
+    """
+    if codes.shape[0] == 0 or n <= 0:
+        return np.empty(0, dtype=np.int64)
+    return nearest(int8_distances(codes, code_norms, query, distance_function, vector_norms), n)
+
+
+def int8_code_norms(codes: np.ndarray) -> np.ndarray:
+    """L2 norms of int8 codes, computed without upcasting the matrix to float."""
+    if codes.shape[0] == 0:
+        return np.empty(0, dtype=np.float32)
+    return np.sqrt(np.einsum('ij,ij->i', codes, codes, dtype=np.int32)).astype(np.float32)
+
+
+class QuantizedCodeCache:
+    """
+    In-memory copies of stores' int8 codes for candidate generation, reused for `ttl_seconds`
+    and evicted least recently used first once they exceed `max_bytes` together.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, int, Any]]" = OrderedDict()
+        self.bytes = 0
+        self.evictions = 0
+
+    def fits(self, nbytes: int) -> bool:
+        return nbytes <= self.max_bytes
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] > self.ttl_seconds:
+            self.pop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry[2]
+
+    def put(self, key: Hashable, value: Any, nbytes: int):
+        self.pop(key)
+        if not self.fits(nbytes):
+            return
+        self._entries[key] = (time.monotonic(), nbytes, value)
+        self.bytes += nbytes
+        while self.bytes > self.max_bytes:
+            self.pop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        self.bytes -= entry[1]
+        return entry[2]
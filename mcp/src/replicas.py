@@ -0,0 +1,158 @@
+"""
+Read replicas: extra endpoints, each with its own SafePool, that take the reads
+`_execute_query` would otherwise send to the primary.
+
+A monitor task checks every replica every few seconds with SHOW SLAVE STATUS. A
+replica is eligible for reads while its check succeeds, its pool's circuit
+breaker is closed and it lags the primary by at most `max_lag` seconds; an
+endpoint that is not replicating (no slave status rows) is taken to be current.
+`pick()` spreads reads over the eligible replicas, round robin or to the one
+with the fewest connections in use, and returns None when there is none, in
+which case the read goes to the primary.
+
+Once a tool call has written to the primary, the rest of that call reads from
+the primary too (`pin_to_primary`), so it never misses its own writes on a
+lagging replica.
+"""
+
+import asyncio
+import contextvars
+import itertools
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import asyncmy
+
+
+logger = logging.getLogger(__name__)
+
+ROUND_ROBIN = "round_robin"
+LEAST_LOADED = "least_loaded"
+ROUTING_POLICIES = (ROUND_ROBIN, LEAST_LOADED)
+# Seconds a replica health check may take before the replica counts as down
+CHECK_TIMEOUT = 5.0
+
+_pinned: contextvars.ContextVar[bool] = contextvars.ContextVar("pinned_to_primary", default=False)
+
+
+def pin_to_primary():
+    """Sends the remaining reads of the current tool call (task context) to the primary."""
+    _pinned.set(True)
+
+
+def pinned_to_primary() -> bool:
+    return _pinned.get()
+
+
+@dataclass
+class Replica:
+    """A replica endpoint, its pool and the outcome of its last health check."""
+    name: str
+    pool: Any
+    healthy: bool = False
+    lag: Optional[float] = None
+    last_error: Optional[str] = None
+    reads: int = 0
+
+    @property
+    def in_use(self) -> int:
+        return self.pool.size - self.pool.freesize
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "healthy": self.healthy, "lag_seconds": self.lag, "last_error": self.last_error,
+                "reads": self.reads, "in_use": self.in_use}
+
+
+class ReplicaSet:
+    """Health-checked replicas and the policy that picks one for a read."""
+
+    def __init__(self, replicas: List[Replica], max_lag: float, routing: str = LEAST_LOADED, check_interval: float = 5.0):
+        if routing not in ROUTING_POLICIES:
+            raise ValueError(f"Unknown replica routing '{routing}'. Must be one of {list(ROUTING_POLICIES)}.")
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.routing = routing
+        self.check_interval = check_interval
+        self.fallbacks = 0
+        self._turn = itertools.count()
+        self._monitor: Optional[asyncio.Task] = None
+
+    def eligible(self) -> List[Replica]:
+        return [replica for replica in self.replicas
+                if replica.healthy and not replica.pool.breaker.is_open
+                and replica.lag is not None and replica.lag <= self.max_lag]
+
+    def pick(self) -> Optional[Replica]:
+        """The replica for the next read, or None if the read should go to the primary."""
+        candidates = self.eligible()
+        if not candidates:
+            self.fallbacks += 1
+            return None
+        turn = next(self._turn)
+        if self.routing == ROUND_ROBIN:
+            replica = candidates[turn % len(candidates)]
+        else:
+            # Rotating the start breaks ties between equally loaded replicas
+            rotated = candidates[turn % len(candidates):] + candidates[:turn % len(candidates)]
+            replica = min(rotated, key=lambda r: r.in_use)
+        replica.reads += 1
+        return replica
+
+    def mark_down(self, replica: Replica, error: BaseException):
+        """Takes a replica out of rotation until its next successful health check."""
+        if replica.healthy:
+            logger.warning(f"Replica {replica.name} taken out of rotation: {error}")
+        replica.healthy = False
+        replica.last_error = str(error)
+
+    async def check(self, replica: Replica):
+        """Reads the replica's lag with SHOW SLAVE STATUS and updates its health."""
+        try:
+            async with replica.pool.acquire() as conn:
+                async with conn.cursor(cursor=asyncmy.cursors.DictCursor) as cursor:
+                    try:
+                        await asyncio.wait_for(cursor.execute("SHOW SLAVE STATUS"), CHECK_TIMEOUT)
+                        rows = await cursor.fetchall()
+                    except asyncio.TimeoutError:
+                        conn.unclean = True
+                        raise TimeoutError(f"health check took longer than {CHECK_TIMEOUT}s") from None
+        except Exception as e:
+            self.mark_down(replica, e)
+            return
+        lags = [row.get("Seconds_Behind_Master") for row in rows or []]
+        if any(lag is None for lag in lags):
+            self.mark_down(replica, RuntimeError("replication is not running"))
+            return
+        lag = float(max(lags, default=0))
+        if not replica.healthy:
+            logger.info(f"Replica {replica.name} is healthy (lag {lag:.0f}s).")
+        elif lag > self.max_lag >= (replica.lag or 0):
+            logger.warning(f"Replica {replica.name} lags {lag:.0f}s behind the primary; reads go elsewhere.")
+        replica.healthy = True
+        replica.lag = lag
+        replica.last_error = None
+
+    async def check_all(self):
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    def start_monitoring(self):
+        if self._monitor is None:
+            self._monitor = asyncio.create_task(self._monitor_loop(), context=contextvars.Context())
+
+    async def _monitor_loop(self):
+        while True:
+            await self.check_all()
+            await asyncio.sleep(self.check_interval)
+
+    async def close(self):
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+        for replica in self.replicas:
+            replica.pool.close()
+            await replica.pool.wait_closed()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"routing": self.routing, "max_lag_seconds": self.max_lag, "fallbacks_to_primary": self.fallbacks,
+                "replicas": [replica.to_dict() for replica in self.replicas]}
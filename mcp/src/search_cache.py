@@ -0,0 +1,97 @@
+"""
+In-memory cache of vector search results.
+
+Entries are keyed by the store, the store's version and everything that shapes
+the result (query text or query vector hash, k and search options). The server
+bumps a store's version whenever it writes to the store, so entries cached
+before a write can no longer be looked up and simply age out of the LRU.
+Writes made by other clients are not seen; a TTL bounds how stale such
+entries can get.
+
+Results are stored as their JSON encoding, which makes the byte budget exact
+and hands every caller its own copy.
+"""
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+
+class SearchCache:
+    """LRU of search results bounded by the total size of their JSON encodings."""
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, str]]" = OrderedDict()
+        self._versions: Dict[Tuple[str, str], int] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def version(self, database_name: str, vector_store_name: str) -> int:
+        return self._versions.get((database_name, vector_store_name), 0)
+
+    def bump(self, database_name: str, vector_store_name: str):
+        """Marks a store as changed, invalidating every cached result for it."""
+        key = (database_name, vector_store_name)
+        self._versions[key] = self._versions.get(key, 0) + 1
+
+    def key(self, database_name: str, vector_store_name: str, query: Hashable, **options) -> Hashable:
+        """Cache key for a search: the store and its current version, the query and the sorted options."""
+        return (database_name, vector_store_name, self.version(database_name, vector_store_name), query,
+                tuple(sorted((name, json.dumps(value, sort_keys=True)) for name, value in options.items())))
+
+    @staticmethod
+    def vector_digest(vector: Any) -> str:
+        """Identifies a query vector by the hash of its float32 bytes."""
+        return hashlib.sha256(vector.astype("<f4").tobytes()).hexdigest()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return json.loads(entry[1])
+
+    def put(self, key: Hashable, results: Any):
+        encoded = json.dumps(results, default=str)
+        if len(encoded) > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic(), encoded)
+        self.bytes += len(encoded)
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        _, encoded = self._entries.pop(key)
+        self.bytes -= len(encoded)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+        }
@@ -3,26 +3,41 @@
 # Import configuration settings
 from config import (
     DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME, DB_CHARSET,
+    DB_REPLICAS, MCP_REPLICA_MAX_LAG, MCP_REPLICA_ROUTING, MCP_REPLICA_CHECK_INTERVAL,
+    MCP_TARGETS, MCP_TARGET_CATALOG, MCP_TARGET_CATALOG_HOSTS, MCP_TARGET_MAX_POOL_SIZE, MCP_TARGET_IDLE_TIMEOUT, MCP_MAX_CONNECTIONS,
     DB_SSL, DB_SSL_CA, DB_SSL_CERT, DB_SSL_KEY, DB_SSL_VERIFY_CERT, DB_SSL_VERIFY_IDENTITY,
-    MCP_READ_ONLY, MCP_MAX_POOL_SIZE, EMBEDDING_PROVIDER,
+    MCP_READ_ONLY, MCP_MAX_POOL_SIZE, MCP_COALESCE_READS, MCP_QUERY_TIMEOUT, MCP_TOOL_TIMEOUTS, MCP_FANOUT_CONCURRENCY, MCP_FANOUT_DATABASE_TIMEOUT, EMBEDDING_PROVIDER, MCP_QUANTIZED_CACHE_TTL, MCP_QUANTIZED_CACHE_MAX_BYTES,
+    MCP_MIN_POOL_SIZE, MCP_POOL_IDLE_TIMEOUT, MCP_POOL_GROW_WAIT_MS, MCP_POOL_PING_IDLE, MCP_POOL_BREAKER_FAILURES,
+    MCP_POOL_ACQUIRE_TIMEOUT, MCP_POOL_MAX_WAITERS, MCP_POOL_CLASS_LIMITS,
+    MCP_SEARCH_CACHE_MAX_BYTES, MCP_SEARCH_CACHE_TTL,
+    MCP_FILE_ROOT, MCP_STATE_DIR, MCP_JOB_WORKERS, MCP_JOB_RETENTION_DAYS, MCP_MAINTENANCE_WINDOW,
     ALLOWED_ORIGINS, ALLOWED_HOSTS,
     logger
 )
 
 import asyncio
 import argparse
+import contextlib
 import re
-from typing import List, Dict, Any, Optional
+import sys
+import time
+from typing import List, Dict, Any, Optional, Tuple, Callable, AsyncIterator, Awaitable, Hashable, Union
 from functools import partial
 import os
 import ssl
 
+import numpy as np
+
 import asyncmy
 import anyio 
 from fastmcp import FastMCP, Context
 
 # Import custom connection pool that disables MULTI_STATEMENTS
-from custom_connection import create_safe_pool
+from custom_connection import (BULK, ConnectionBudget, DatabaseUnavailableError, PoolOverloadedError, create_safe_pool,
+                               current_priority, pool_priority)
+from replicas import Replica, ReplicaSet, pin_to_primary, pinned_to_primary
+from singleflight import Singleflight, normalize_sql
+from targets import Target, TargetMiddleware, TargetRegistry, current_target, use_target
 
 from starlette.middleware import Middleware
 from starlette.middleware.cors import CORSMiddleware
@@ -30,6 +45,16 @@ from starlette.middleware.trustedhost import TrustedHostMiddleware
 
 # Import EmbeddingService for vector store creation
 from embeddings import EmbeddingService
+from quantization import truncate_embeddings, quantize_int8, int8_codes_from_bytes, int8_code_norms, int8_distances, nearest, QuantizedCodeCache, INT8_SCAN_BATCH_ROWS
+from ingest import EmbeddingFileReader, FileRecordReader, IngestPipeline, KeysetRecordReader, Record, detect_format
+from chunking import TokenChunker, chunk_documents
+from jobs import JobManager, JOB_STATUSES, parse_window, seconds_left_in_window, seconds_until_window
+from sharding import ShardedStore, group_by_shard, merge_top_k, parse_shards
+from search_cache import SearchCache
+import deadlines
+from deadlines import DeadlineMiddleware
+from export import (CsvRowWriter, IdSidecarWriter, NpyMatrixWriter, ParquetRowWriter, detect_export_format,
+                    vectors_from_blobs)
 
 # Singleton instance for embedding service
 embedding_service = None
@@ -38,6 +63,59 @@ if EMBEDDING_PROVIDER is not None:
 
 from asyncmy.errors import Error as AsyncMyError
 
+# Valid ranges for the MariaDB MHNSW vector index tuning parameters
+MHNSW_M_MIN, MHNSW_M_MAX = 3, 200
+MHNSW_EF_SEARCH_MIN, MHNSW_EF_SEARCH_MAX = 1, 10000
+DEFAULT_BENCHMARK_EF_SEARCH = [10, 20, 40, 80, 160]
+DEFAULT_BENCHMARK_OVERSAMPLE = [2, 4, 8]
+VALID_QUANTIZATIONS = ("int8",)
+VALID_DISTANCE_FUNCTIONS = ("COSINE", "EUCLIDEAN")
+VALID_DUPLICATE_MODES = ("skip", "upsert")
+# Metadata keys usable in filters; they are inlined into JSON paths
+METADATA_KEY_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+# Per-database table recording how each vector store was created
+VECTOR_STORE_CATALOG_TABLE = "mcp_vector_stores"
+# Per-database table recording the shard key and member stores of each sharded vector store
+SHARDED_STORE_CATALOG_TABLE = "mcp_sharded_stores"
+# Suffixes of the tables used while re-embedding a store: the new copy, and the old one after the swap
+REEMBED_SHADOW_SUFFIX = "__reembed"
+REEMBED_OLD_SUFFIX = "__old"
+# MariaDB identifier length limit
+MAX_IDENTIFIER_LENGTH = 64
+# Range search (max_distance): factor by which the candidate window grows, and the most rows it returns
+RANGE_SEARCH_GROWTH = 2
+MAX_RANGE_SEARCH_RESULTS = 1000
+# Operations maintain_vector_store can run: OPTIMIZE TABLE rebuilds the table and its vector index,
+# ANALYZE TABLE ... PERSISTENT FOR ALL refreshes the statistics used by vector_store_stats
+VALID_MAINTENANCE_OPERATIONS = ("optimize", "analyze")
+# Stored vectors sampled as probe queries to time searches before and after maintenance
+MAINTENANCE_PROBE_QUERIES = 20
+# Most ids a single get_docs_vector_store call fetches
+MAX_GET_DOCS_IDS = 1000
+# Upper bound for a single wait_job call, so a waiting client never holds a request indefinitely
+MAX_JOB_WAIT_SECONDS = 300
+# execute_sql_fanout: most schemas per call, most merged rows returned, and the column naming each row's schema
+MAX_FANOUT_DATABASES = 500
+MAX_FANOUT_ROWS = 10000
+FANOUT_SOURCE_COLUMN = "source_database"
+# Schemas a database_pattern never matches; they can still be listed by name
+SYSTEM_DATABASES = ("information_schema", "performance_schema", "mysql", "sys")
+# Tools that run on this process rather than a database server, and so take no `target` argument
+UNTARGETED_TOOLS = ("list_jobs", "get_job", "wait_job", "cancel_job", "get_job_result", "list_targets")
+# Extra client-side wait past a statement's deadline, so MariaDB's max_statement_time fires first
+DEADLINE_GRACE_SECONDS = 1.0
+# How long a killed statement may take to return before its connection is closed instead of reused
+KILL_QUERY_WAIT_SECONDS = 5.0
+# MariaDB errors for a statement stopped by KILL QUERY (ER_QUERY_INTERRUPTED) or max_statement_time (ER_STATEMENT_TIMEOUT)
+QUERY_INTERRUPTED_ERRORS = (1317, 1969)
+# Client errors for a server that cannot be reached or dropped the connection (CR_CONN_HOST_ERROR,
+# CR_SERVER_GONE_ERROR, CR_SERVER_LOST); a read that fails with one on a replica is retried on the primary
+CONNECTION_LOST_ERRORS = (2003, 2006, 2013)
+# Reads never shared between concurrent callers: each call expects its own value or side effect
+UNSHAREABLE_READ = re.compile(r"\b(RAND|UUID|UUID_SHORT|SLEEP|GET_LOCK|RELEASE_LOCK|IS_FREE_LOCK|LAST_INSERT_ID|FOUND_ROWS|"
+                              r"ROW_COUNT|CONNECTION_ID|NEXTVAL|LASTVAL|SETVAL)\s*\(|\bNEXT\s+VALUE\s+FOR\b|\bFOR\s+UPDATE\b",
+                              re.IGNORECASE)
+
 # --- MariaDB MCP Server Class ---
 class MariaDBServer:
     """
@@ -46,14 +124,61 @@ class MariaDBServer:
     """
     def __init__(self, server_name="MariaDB_Server", autocommit=True):
         self.mcp = FastMCP(server_name)
+        self.mcp.add_middleware(DeadlineMiddleware(MCP_QUERY_TIMEOUT, MCP_TOOL_TIMEOUTS))
+        self.mcp.add_middleware(TargetMiddleware(UNTARGETED_TOOLS))
         self.pool: Optional[asyncmy.Pool] = None
+        # Read replicas from DB_REPLICAS, each with its own pool; None without replicas
+        self.replicas: Optional[ReplicaSet] = None
+        # Other servers tools can target (MCP_TARGETS, MCP_TARGET_CATALOG), sharing the primary's connection budget
+        self.targets: Optional[TargetRegistry] = None
+        self._pool_params: Dict[str, Any] = {}
+        # Identical reads running at the same time share one execution; each caller gets its own rows
+        self.read_flights: Optional[Singleflight] = Singleflight(lambda rows: [dict(row) for row in rows]) if MCP_COALESCE_READS else None
         self.autocommit = not MCP_READ_ONLY
         self.is_read_only = MCP_READ_ONLY
+        # Caches keyed by (database, store), kept per target since store names repeat across servers
+        self._target_states: Dict[Optional[str], Dict[str, Any]] = {}
+        # Background jobs for long-running tools, persisted under MCP_STATE_DIR
+        self.jobs = JobManager(os.path.join(MCP_STATE_DIR, "jobs.sqlite3"), MCP_JOB_WORKERS, MCP_JOB_RETENTION_DAYS * 24 * 3600)
         logger.info(f"Initializing {server_name}...")
         if self.is_read_only:
             logger.warning("Server running in READ-ONLY mode. Write operations are disabled.")
 
-    async def create_vector_store(self, database_name: str, vector_store_name: str, model_name: Optional[str] = None, distance_function: Optional[str] = None) -> dict:
+    def _target_state(self) -> Dict[str, Any]:
+        """The caches of the current tool call's target, created on first use."""
+        target_id = current_target()
+        state = self._target_states.get(target_id)
+        if state is None:
+            state = self._target_states[target_id] = {
+                "quantized_cache": QuantizedCodeCache(MCP_QUANTIZED_CACHE_MAX_BYTES, MCP_QUANTIZED_CACHE_TTL),
+                "store_catalog": {},
+                "search_cache": SearchCache(MCP_SEARCH_CACHE_MAX_BYTES, MCP_SEARCH_CACHE_TTL),
+                "sharded_stores": {},
+            }
+        return state
+
+    @property
+    def _quantized_cache(self) -> QuantizedCodeCache:
+        """(database, store) -> (ids, int8 codes, code norms, vector norms or None)"""
+        return self._target_state()["quantized_cache"]
+
+    @property
+    def _store_catalog(self) -> Dict[Tuple[str, str], Dict[str, Any]]:
+        """In-memory mirror of the vector store catalog: (database, store) -> store info"""
+        return self._target_state()["store_catalog"]
+
+    @property
+    def search_cache(self) -> SearchCache:
+        """Search results, invalidated per store by a version counter bumped on local writes"""
+        return self._target_state()["search_cache"]
+
+    @property
+    def _sharded_stores(self) -> Dict[Tuple[str, str], ShardedStore]:
+        """Sharded stores read from SHARDED_STORE_CATALOG_TABLE: (database, sharded store) -> ShardedStore"""
+        return self._target_state()["sharded_stores"]
+
+    async def create_vector_store(self, database_name: str, vector_store_name: str, model_name: Optional[str] = None, distance_function: Optional[str] = None, hnsw_m: Optional[int] = None,
+                                  dimensions: Optional[int] = None, quantization: Optional[str] = None, dedup: bool = False) -> dict:
         """
         This tool creates a table which stores embeddings.
         
@@ -69,8 +194,13 @@ class MariaDBServer:
         - embedding_service: An instance of EmbeddingService to get model details.
         - model_name (str, optional): The embedding model to use (defaults to service default).
         - distance_function (str, optional): 'euclidean' or 'cosine'. Defaults to 'cosine'.
+        - hnsw_m (int, optional): The MHNSW index `M` parameter (3-200). Defaults to the server's `mhnsw_default_m`.
+        - dimensions (int, optional): Truncate embeddings to this many dimensions (Matryoshka models only).
+        - quantization (str, optional): 'int8' to add a quantized shadow column for candidate generation.
+        - dedup (bool, optional): Add a unique content-hash column so duplicate documents are not re-embedded.
         """
-        return await self.create_vector_store_tool(database_name, vector_store_name, embedding_service, model_name, distance_function)
+        return await self.create_vector_store_tool(database_name, vector_store_name, embedding_service, model_name, distance_function, hnsw_m,
+                                                   dimensions, quantization, dedup)
 
     async def initialize_pool(self):
         """Initializes the asyncmy connection pool within the running event loop."""
@@ -127,22 +257,36 @@ class MariaDBServer:
                 "user": DB_USER,
                 "password": DB_PASSWORD,
                 "db": DB_NAME,
-                "minsize": 1,
+                "minsize": MCP_MIN_POOL_SIZE,
                 "maxsize": MCP_MAX_POOL_SIZE,
                 "autocommit": self.autocommit,
-                "pool_recycle": 3600
+                "pool_recycle": 3600,
+                "acquire_timeout": MCP_POOL_ACQUIRE_TIMEOUT or None,
+                "max_waiters": MCP_POOL_MAX_WAITERS or None,
+                "class_limits": MCP_POOL_CLASS_LIMITS,
+                "idle_timeout": MCP_POOL_IDLE_TIMEOUT or None,
+                "grow_wait": MCP_POOL_GROW_WAIT_MS / 1000 if MCP_POOL_GROW_WAIT_MS else None,
+                "ping_idle": MCP_POOL_PING_IDLE or None,
+                "breaker_failures": MCP_POOL_BREAKER_FAILURES,
             }
             if DB_SSL and ssl_context is not None:
                 pool_params["ssl"] = ssl_context
 
             if DB_CHARSET:
                 pool_params["charset"] = DB_CHARSET
-                logger.info(f"Creating connection pool for {DB_USER}@{DB_HOST}:{DB_PORT}/{DB_NAME} (max size: {MCP_MAX_POOL_SIZE}, charset: {DB_CHARSET})")
+                logger.info(f"Creating connection pool for {DB_USER}@{DB_HOST}:{DB_PORT}/{DB_NAME} (size: {MCP_MIN_POOL_SIZE}-{MCP_MAX_POOL_SIZE}, charset: {DB_CHARSET})")
             else:
-                logger.info(f"Creating connection pool for {DB_USER}@{DB_HOST}:{DB_PORT}/{DB_NAME} (max size: {MCP_MAX_POOL_SIZE})")
+                logger.info(f"Creating connection pool for {DB_USER}@{DB_HOST}:{DB_PORT}/{DB_NAME} (size: {MCP_MIN_POOL_SIZE}-{MCP_MAX_POOL_SIZE})")
             
+            if MCP_MAX_CONNECTIONS:
+                pool_params["budget"] = ConnectionBudget(MCP_MAX_CONNECTIONS)
+            self._pool_params = pool_params
             self.pool = await create_safe_pool(**pool_params)
             logger.info("Connection pool initialized successfully.")
+            if DB_REPLICAS:
+                await self._initialize_replicas(pool_params)
+            if MCP_TARGETS or MCP_TARGET_CATALOG:
+                await self._initialize_targets()
         except AsyncMyError as e:
             logger.error(f"Failed to initialize database connection pool: {e}", exc_info=True)
             self.pool = None
@@ -152,8 +296,91 @@ class MariaDBServer:
             self.pool = None
             raise
 
+    async def _initialize_replicas(self, pool_params: Dict[str, Any]):
+        """
+        Creates a pool per DB_REPLICAS endpoint with the primary's settings. Replica pools start
+        empty, so an unreachable replica does not hold up startup; the first health check connects.
+        """
+        replicas = []
+        for host, port in DB_REPLICAS:
+            logger.info(f"Creating connection pool for read replica {host}:{port}")
+            pool = await create_safe_pool(**{**pool_params, "host": host, "port": port, "minsize": 0})
+            replicas.append(Replica(f"{host}:{port}", pool))
+        self.replicas = ReplicaSet(replicas, MCP_REPLICA_MAX_LAG, MCP_REPLICA_ROUTING, MCP_REPLICA_CHECK_INTERVAL)
+        await self.replicas.check_all()
+        self.replicas.start_monitoring()
+
+    async def _initialize_targets(self):
+        """Registers the configured targets and those of the catalog table; their pools open on first use."""
+        self.targets = TargetRegistry(self._create_target_pool, MCP_TARGET_IDLE_TIMEOUT or None,
+                                      self._load_target_catalog if MCP_TARGET_CATALOG else None)
+        for target_id, (host, port) in MCP_TARGETS.items():
+            self.targets.add(Target(target_id, host, port))
+        try:
+            await self.targets.load_catalog()
+        except Exception as e:
+            logger.error(f"Could not load targets from {MCP_TARGET_CATALOG}: {e}")
+        logger.info(f"Registered {len(self.targets.targets)} target(s): {sorted(self.targets.targets)}")
+        self.targets.start_reaper()
+
+    async def _create_target_pool(self, target: Target):
+        """A pool for a target with the primary's settings, its own size cap and no warm connections."""
+        return await create_safe_pool(**{**self._pool_params, "host": target.host, "port": target.port,
+                                         "db": target.database, "minsize": 0, "maxsize": MCP_TARGET_MAX_POOL_SIZE})
+
+    async def _load_target_catalog(self) -> List[Target]:
+        """
+        Reads targets from MCP_TARGET_CATALOG ("database.table" with name, host and port columns) on the primary.
+        Targets are dialled with the primary's credentials, so only rows whose host matches a pattern of
+        MCP_TARGET_CATALOG_HOSTS are used: anyone who can write the catalog table could otherwise send
+        those credentials to a server of their choosing.
+        """
+        import fnmatch
+        database, _, table = MCP_TARGET_CATALOG.partition(".")
+        if not database.isidentifier() or not table.isidentifier():
+            logger.error(f"MCP_TARGET_CATALOG must be 'database.table', got '{MCP_TARGET_CATALOG}'.")
+            raise ValueError(f"MCP_TARGET_CATALOG must be 'database.table', got '{MCP_TARGET_CATALOG}'.")
+        if not MCP_TARGET_CATALOG_HOSTS:
+            logger.error(f"Ignoring {MCP_TARGET_CATALOG}: set MCP_TARGET_CATALOG_HOSTS to the hosts its targets may use.")
+            return []
+        with use_target(None):
+            rows = await self._execute_query(f"SELECT `name`, `host`, `port` FROM `{database}`.`{table}`")
+        targets = []
+        for row in rows:
+            host = row["host"] or "localhost"
+            if not any(fnmatch.fnmatch(host.lower(), pattern.lower()) for pattern in MCP_TARGET_CATALOG_HOSTS):
+                logger.warning(f"Ignoring catalog target '{row['name']}': host '{host}' is not allowed by MCP_TARGET_CATALOG_HOSTS.")
+                continue
+            targets.append(Target(str(row["name"]), host, int(row["port"] or DB_PORT)))
+        return targets
+
+    async def _current_pool(self):
+        """The pool of the current tool call's target; the primary's without a target."""
+        target_id = current_target()
+        if target_id is None:
+            return self.pool
+        if self.targets is None:
+            raise ValueError(f"Unknown target '{target_id}': no targets are configured (MCP_TARGETS, MCP_TARGET_CATALOG).")
+        return await self.targets.pool(target_id)
+
     async def close_pool(self):
         """Closes the connection pool gracefully."""
+        if self.targets:
+            logger.info("Closing target pools...")
+            try:
+                await self.targets.close()
+            except Exception as e:
+                logger.error(f"Error closing target pools: {e}", exc_info=True)
+            finally:
+                self.targets = None
+        if self.replicas:
+            logger.info("Closing read replica pools...")
+            try:
+                await self.replicas.close()
+            except Exception as e:
+                logger.error(f"Error closing replica pools: {e}", exc_info=True)
+            finally:
+                self.replicas = None
         if self.pool:
             logger.info("Closing database connection pool...")
             try:
@@ -165,12 +392,9 @@ class MariaDBServer:
             finally:
                 self.pool = None
 
-    async def _execute_query(self, sql: str, params: Optional[tuple] = None, database: Optional[str] = None) -> List[Dict[str, Any]]:
-        """Helper function to execute SELECT queries using the pool."""
-        if self.pool is None:
-            logger.error("Connection pool is not initialized.")
-            raise RuntimeError("Database connection pool not available.")
-
+    @staticmethod
+    def _is_read_query(sql: str) -> bool:
+        """True if the statement, with SQL comments stripped, starts with a read-only keyword."""
         allowed_prefixes = ('SELECT', 'SHOW', 'DESC', 'DESCRIBE', 'USE')
         
         # Strip SQL comments from query
@@ -181,42 +405,149 @@ class MariaDBServer:
         sql_no_comments = sql_no_comments.strip()
         
         query_upper = sql_no_comments.upper()
-        is_allowed_read_query = any(query_upper.startswith(prefix) for prefix in allowed_prefixes)
+        return any(query_upper.startswith(prefix) for prefix in allowed_prefixes)
+
+    async def _execute_query(self, sql: str, params: Optional[tuple] = None, database: Optional[str] = None,
+                             statement_vars: Optional[Dict[str, Union[int, float]]] = None,
+                             timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """
+        Helper function to execute SELECT queries using the pool.
+
+        `statement_vars` (e.g. {"mhnsw_ef_search": 40}) are applied with
+        `SET STATEMENT ... FOR`, so they only affect this statement on this connection.
+
+        The statement is bounded by `timeout` seconds, or else by the time left until the
+        current tool call's deadline (see deadlines.py). SELECTs also get that budget as
+        `max_statement_time`; every statement is killed with KILL QUERY if it runs past it
+        or the call is cancelled, and a TimeoutError is raised.
+
+        Reads go to a read replica when one is healthy and current enough (see replicas.py),
+        and to the primary if it turns out to be unreachable. After a write, the rest of the
+        tool call reads from the primary.
+
+        A read identical to one already running (same normalized SQL, parameters, statement
+        variables, schema, target and priority class) waits for that execution and shares its
+        result (see singleflight.py), unless it must see this call's own writes or has side
+        effects. The shared execution runs without a deadline; each caller enforces its own on
+        its wait, and the execution is killed once every caller has given up. Completed writes
+        stop later reads from joining executions that started before them.
+        """
+        if self.pool is None:
+            logger.error("Connection pool is not initialized.")
+            raise RuntimeError("Database connection pool not available.")
+
+        is_allowed_read_query = self._is_read_query(sql)
 
         if self.is_read_only and not is_allowed_read_query:
              logger.warning(f"Blocked potentially non-read-only query in read-only mode: {sql[:100]}...")
              raise PermissionError("Operation forbidden: Server is in read-only mode.")
 
-        logger.info(f"Executing query (DB: {database or DB_NAME}): {sql[:100]}...")
+        if not is_allowed_read_query:
+            pin_to_primary()
+            try:
+                return await self._dispatch_query(sql, params, database, statement_vars, timeout, False)
+            finally:
+                self._forget_shared_reads()
+        if self.read_flights is not None and not pinned_to_primary() and not UNSHAREABLE_READ.search(sql):
+            return await self._execute_shared_read(sql, params, database, statement_vars, timeout)
+        return await self._dispatch_query(sql, params, database, statement_vars, timeout, True)
+
+    async def _execute_shared_read(self, sql: str, params: Optional[tuple], database: Optional[str],
+                                   statement_vars: Optional[Dict[str, Union[int, float]]], timeout: Optional[float]) -> List[Dict[str, Any]]:
+        """Runs a read through `read_flights`, bounded by this caller's own budget; see `_execute_query`."""
+        budget = self._statement_budget(timeout)
+        key = (current_target(), current_priority(), database, normalize_sql(sql), repr(params),
+               repr(sorted((statement_vars or {}).items())))
+
+        async def shared():
+            # Whoever starts the execution must not impose its deadline on the others
+            with deadlines.no_deadline():
+                return await self._dispatch_query(sql, params, database, statement_vars, None, True)
+        try:
+            return await self.read_flights.do(key, shared, timeout=budget)
+        except asyncio.TimeoutError:
+            logger.warning(f"Shared read did not finish within the caller's deadline of {budget:.1f}s.")
+            raise TimeoutError(f"Query exceeded its deadline of {budget:.1f}s.") from None
+
+    def _forget_shared_reads(self):
+        """Reads started before a completed write must not be joined by the calls that follow it."""
+        if self.read_flights is not None:
+            self.read_flights.forget()
+
+    async def _dispatch_query(self, sql: str, params: Optional[tuple], database: Optional[str],
+                              statement_vars: Optional[Dict[str, Union[int, float]]], timeout: Optional[float],
+                              is_allowed_read_query: bool) -> List[Dict[str, Any]]:
+        """Picks the pool (target, replica or primary) for a classified statement and runs it; see `_execute_query`."""
+        pool = await self._current_pool()
+        replica = None
+        if is_allowed_read_query and pool is self.pool and self.replicas is not None and not pinned_to_primary():
+            replica = self.replicas.pick()
+
+        budget = self._statement_budget(timeout)
+        if budget is not None and sql.lstrip().upper().startswith("SELECT"):
+            statement_vars = {**(statement_vars or {}), "max_statement_time": round(budget, 3)}
+
+        if statement_vars:
+            assignments = []
+            for name, value in statement_vars.items():
+                if not re.fullmatch(r'[a-z_]+', name) or not isinstance(value, (int, float)) or isinstance(value, bool):
+                    logger.error(f"Invalid statement variable: {name}={value!r}")
+                    raise ValueError(f"Invalid statement variable: {name}={value!r}")
+                assignments.append(f"{name}={value}")
+            sql = f"SET STATEMENT {', '.join(assignments)} FOR {sql.strip()}"
+
+        where = f", target {current_target()}" if current_target() else f", replica {replica.name}" if replica else ""
+        logger.info(f"Executing query (DB: {database or DB_NAME}{where}): {sql[:100]}...")
         if params:
             logger.debug(f"Parameters: {params}")
 
         conn = None
-        try:
-            async with self.pool.acquire() as conn:
+
+        async def execute(pool):
+            nonlocal conn
+            # Target pools have no default database
+            pool_db_name = DB_NAME if current_target() is None else None
+            async with pool.acquire() as conn:
                 async with conn.cursor(cursor=asyncmy.cursors.DictCursor) as cursor:
-                    current_db_query = "SELECT DATABASE()"
-                    await cursor.execute(current_db_query)
-                    current_db_result = await cursor.fetchone()
-                    current_db_name = current_db_result.get('DATABASE()') if current_db_result else None
-                    pool_db_name = DB_NAME
-                    actual_current_db = current_db_name or pool_db_name
-
-                    if database and database != actual_current_db:
-                        logger.info(f"Switching database context from '{actual_current_db}' to '{database}'")
-                        await cursor.execute(f"USE `{database}`")
+                    async def run():
+                        current_db_query = "SELECT DATABASE()"
+                        await cursor.execute(current_db_query)
+                        current_db_result = await cursor.fetchone()
+                        current_db_name = current_db_result.get('DATABASE()') if current_db_result else None
+                        actual_current_db = current_db_name or pool_db_name
 
-                    await cursor.execute(sql, params)
-                    results = await cursor.fetchall()
+                        if database and database != actual_current_db:
+                            logger.info(f"Switching database context from '{actual_current_db}' to '{database}'")
+                            await cursor.execute(f"USE `{database}`")
+
+                        await cursor.execute(sql, params)
+                        return await cursor.fetchall()
+
+                    results = await self._run_with_deadline(conn, run(), budget, pool)
                     logger.info(f"Query executed successfully, {len(results)} rows returned.")
                     return results if results else []
+
+        try:
+            if replica is not None:
+                try:
+                    return await execute(replica.pool)
+                except (DatabaseUnavailableError, AsyncMyError) as e:
+                    if isinstance(e, AsyncMyError) and not (e.args and e.args[0] in CONNECTION_LOST_ERRORS):
+                        raise
+                    # Unreachable replica: the primary can still answer the read
+                    self.replicas.mark_down(replica, e)
+                    conn = None
+            return await execute(pool)
         except AsyncMyError as e:
+            if e.args and e.args[0] in QUERY_INTERRUPTED_ERRORS:
+                logger.warning(f"Query stopped at its deadline of {budget}s: {e}")
+                raise TimeoutError(f"Query exceeded its deadline of {budget:.1f}s and was stopped.") from e
             conn_state = f"Connection: {'acquired' if conn else 'not acquired'}"
             logger.error(f"Database error executing query ({conn_state}): {e}", exc_info=True)
             # Check for specific connection-related errors if possible
             raise RuntimeError(f"Database error: {e}") from e
-        except PermissionError as e:
-             logger.warning(f"Permission denied: {e}")
+        except (PermissionError, TimeoutError, PoolOverloadedError, DatabaseUnavailableError) as e:
+             logger.warning(f"Query not completed: {e}")
              raise e
         except Exception as e:
             # Catch potential loop closed errors here too, although ideally fixed by structure change
@@ -228,6 +559,127 @@ class MariaDBServer:
             logger.error(f"Unexpected error during query execution ({conn_state}): {e}", exc_info=True)
             raise RuntimeError(f"An unexpected error occurred: {e}") from e
             
+    @staticmethod
+    def _statement_budget(timeout: Optional[float] = None) -> Optional[float]:
+        """
+        Seconds a statement may run: `timeout` if given, otherwise the time left until the
+        current deadline, or None without either. Raises TimeoutError if the deadline has passed.
+        """
+        budget = timeout if timeout is not None else deadlines.remaining()
+        if budget is not None and budget <= 0:
+            logger.warning("Deadline exceeded before the statement was sent.")
+            raise TimeoutError("Deadline exceeded before the query could run.")
+        return budget
+
+    async def _run_with_deadline(self, conn, operation: Awaitable, budget: Optional[float], pool=None):
+        """
+        Awaits `operation`, which runs statements on `conn`, for at most `budget` seconds plus
+        DEADLINE_GRACE_SECONDS. If it runs past that, or the caller is cancelled, the running
+        statement is killed from a side connection and awaited for up to KILL_QUERY_WAIT_SECONDS,
+        so the connection returns to the pool in a clean state. A statement that does not come
+        back in time marks the connection unclean, and the pool closes it instead.
+        `pool` is the pool `conn` came from, the primary's by default.
+        """
+        task = asyncio.ensure_future(operation)
+        try:
+            if budget is None:
+                return await asyncio.shield(task)
+            return await asyncio.wait_for(asyncio.shield(task), budget + DEADLINE_GRACE_SECONDS)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if task.done():
+                raise
+            await self._kill_running_statement(conn, task, pool)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise TimeoutError(f"Query exceeded its deadline of {budget:.1f}s and was killed.") from None
+
+    async def _kill_running_statement(self, conn, task: asyncio.Future, pool=None):
+        """Sends KILL QUERY for the statement running on `conn` and waits for it to return."""
+        thread_id = conn.thread_id()
+        logger.warning(f"Killing statement on server thread {thread_id}.")
+        try:
+            await (pool or self.pool).kill_query(thread_id)
+        except Exception as e:
+            logger.error(f"KILL QUERY {thread_id} failed: {e}")
+        try:
+            await asyncio.wait_for(task, KILL_QUERY_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            logger.error(f"Statement on server thread {thread_id} did not return after KILL QUERY; discarding its connection.")
+            conn.unclean = True
+        except Exception:
+            # The interrupted statement's own error; the connection is back in a known state
+            pass
+
+    async def _execute_transaction(self, statements: List[Tuple[str, Optional[tuple]]], database: Optional[str] = None) -> List[int]:
+        """
+        Executes write statements in one transaction on a single pooled connection and
+        returns the number of affected rows of each. Rolls back if any statement fails.
+        """
+        if self.pool is None:
+            logger.error("Connection pool is not initialized.")
+            raise RuntimeError("Database connection pool not available.")
+        if self.is_read_only:
+            logger.warning("Blocked transaction in read-only mode.")
+            raise PermissionError("Operation forbidden: Server is in read-only mode.")
+        budget = self._statement_budget()
+        pin_to_primary()
+        pool = await self._current_pool()
+        logger.info(f"Executing transaction of {len(statements)} statement(s) (DB: {database or DB_NAME}).")
+        try:
+            async with pool.acquire(priority=BULK) as conn:
+                async with conn.cursor() as cursor:
+                    async def run():
+                        if database:
+                            await cursor.execute(f"USE `{database}`")
+                        await conn.begin()
+                        try:
+                            counts = [await cursor.execute(sql, params) for sql, params in statements]
+                            await conn.commit()
+                        except BaseException:
+                            await conn.rollback()
+                            raise
+                        return counts
+
+                    return await self._run_with_deadline(conn, run(), budget, pool)
+        except AsyncMyError as e:
+            if e.args and e.args[0] in QUERY_INTERRUPTED_ERRORS:
+                logger.warning(f"Transaction stopped at its deadline of {budget}s: {e}")
+                raise TimeoutError(f"Transaction exceeded its deadline of {budget:.1f}s and was rolled back.") from e
+            logger.error(f"Database error executing transaction: {e}", exc_info=True)
+            raise RuntimeError(f"Database error: {e}") from e
+        finally:
+            self._forget_shared_reads()
+
+    async def _stream_query(self, sql: str, params: Optional[tuple] = None, database: Optional[str] = None,
+                            batch_size: int = 1000) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Runs a read query with an unbuffered (server-side) cursor and yields rows in
+        `fetchmany(batch_size)` batches, so at most one batch is held in memory.
+        The connection stays checked out until the generator is exhausted or closed.
+        """
+        if self.pool is None:
+            logger.error("Connection pool is not initialized.")
+            raise RuntimeError("Database connection pool not available.")
+        if not self._is_read_query(sql):
+            logger.warning(f"Blocked non-read query in streaming read: {sql[:100]}...")
+            raise PermissionError("Only SELECT, SHOW and DESCRIBE queries can be streamed.")
+        logger.info(f"Streaming query (DB: {database or DB_NAME}, batch {batch_size}): {sql[:100]}...")
+        pool = await self._current_pool()
+        try:
+            async with pool.acquire(priority=BULK) as conn:
+                async with conn.cursor(cursor=asyncmy.cursors.SSDictCursor) as cursor:
+                    if database:
+                        await cursor.execute(f"USE `{database}`")
+                    await cursor.execute(sql, params)
+                    while True:
+                        rows = await cursor.fetchmany(batch_size)
+                        if not rows:
+                            return
+                        yield rows
+        except AsyncMyError as e:
+            logger.error(f"Database error streaming query: {e}", exc_info=True)
+            raise RuntimeError(f"Database error: {e}") from e
+
     async def _database_exists(self, database_name: str) -> bool:
         """Checks if a database exists."""
         if not database_name or not database_name.isidentifier():
@@ -260,8 +712,10 @@ class MariaDBServer:
     async def _is_vector_store(self, database_name: str, table_name: str) -> bool:
         """
         Checks if the specified table in the given database is a vector store.
-        A table is considered a vector store if it has an indexed column named 'embedding'
-        with a data type of 'VECTOR'.
+        Stores in the catalog (or its in-memory mirror) are recognised without touching
+        information_schema. Only tables missing from the catalog, such as stores created before
+        it existed, fall back to the legacy check: an indexed column named 'embedding' with a
+        data type of 'VECTOR'.
 
         Parameters:
         - database_name (str): The name of the database.
@@ -277,7 +731,17 @@ class MariaDBServer:
             logger.warning(f"_is_vector_store called with invalid names: db='{database_name}', table='{table_name}'")
             return False
 
-        # SQL query to verify vector store criteria
+        info = self._store_catalog.get((database_name, table_name))
+        if info is None:
+            try:
+                info = (await self._load_catalog(database_name) or {}).get(table_name)
+            except Exception as e:
+                logger.warning(f"Could not read the vector store catalog of '{database_name}': {e}")
+        if info and info["cataloged"]:
+            logger.debug(f"Confirmation: '{database_name}.{table_name}' is a cataloged vector store.")
+            return True
+
+        # Legacy fallback for uncataloged tables: verify the vector store criteria
         sql_query = """
         SELECT COUNT(T1.TABLE_NAME) AS vector_store_count
         FROM information_schema.COLUMNS AS T1
@@ -302,7 +766,353 @@ class MariaDBServer:
             logger.error(f"Error checking if '{database_name}.{table_name}' is a vector store: {e}", exc_info=True)
             return False # Treat errors as "not a vector store" for safety in deletion context
 
-    
+    async def _ensure_catalog_table(self, database_name: str):
+        """Creates the vector store catalog table in the database if it does not exist."""
+        sql = f"""
+        CREATE TABLE IF NOT EXISTS `{database_name}`.`{VECTOR_STORE_CATALOG_TABLE}` (
+            store_name VARCHAR(64) NOT NULL PRIMARY KEY,
+            model_name VARCHAR(255) NOT NULL,
+            dimension INT NOT NULL,
+            distance_function VARCHAR(16) NOT NULL,
+            options JSON NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        """
+        await self._execute_query(sql, database=database_name)
+
+    async def _load_catalog(self, database_name: str, check_exists: bool = True) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Reads the database's catalog table into the in-memory mirror and returns its entries
+        keyed by store name. Returns None if the database has no catalog table; callers that
+        already know it exists pass `check_exists=False`.
+        """
+        import json
+        if check_exists and not await self._table_exists(database_name, VECTOR_STORE_CATALOG_TABLE):
+            return None
+        sql = f"SELECT store_name, model_name, dimension, distance_function, options FROM `{database_name}`.`{VECTOR_STORE_CATALOG_TABLE}`"
+        rows = await self._execute_query(sql, database=database_name)
+        entries = {}
+        for row in rows:
+            options = row.get('options') or {}
+            if isinstance(options, str):
+                options = json.loads(options)
+            entries[row['store_name']] = {
+                "model_name": row['model_name'],
+                "dimension": int(row['dimension']),
+                "distance_function": row['distance_function'].upper(),
+                "quantized": options.get("quantization") == "int8",
+                "deduplicated": bool(options.get("dedup")),
+                "options": options,
+                "cataloged": True,
+            }
+        for key in [key for key in self._store_catalog if key[0] == database_name]:
+            del self._store_catalog[key]
+        self._store_catalog.update({(database_name, name): info for name, info in entries.items()})
+        return entries
+
+    async def _get_store_info(self, database_name: str, vector_store_name: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the model, dimension, distance function and options of a vector store,
+        served from the in-memory catalog mirror after the first lookup.
+
+        Stores created before the catalog existed are described from information_schema,
+        assuming the default model and cosine distance. Returns None if the store does not exist.
+        """
+        key = (database_name, vector_store_name)
+        info = self._store_catalog.get(key)
+        if info is not None:
+            return info
+        entries = await self._load_catalog(database_name)
+        if entries and vector_store_name in entries:
+            return entries[vector_store_name]
+        layout = await self._get_vector_store_layout(database_name, vector_store_name)
+        if layout["dimension"] is None:
+            return None
+        info = {
+            "model_name": embedding_service.get_default_model() if embedding_service else None,
+            "dimension": layout["dimension"],
+            "distance_function": "COSINE",
+            "quantized": layout["quantized"],
+            "deduplicated": layout["deduplicated"],
+            "options": {},
+            "cataloged": False,
+        }
+        self._store_catalog[key] = info
+        return info
+
+    async def _require_store_info(self, database_name: str, vector_store_name: str) -> Dict[str, Any]:
+        """Like `_get_store_info`, but raises ValueError if the vector store does not exist."""
+        info = await self._get_store_info(database_name, vector_store_name)
+        if info is None:
+            logger.error(f"Vector store '{database_name}.{vector_store_name}' does not exist.")
+            raise ValueError(f"Vector store '{database_name}.{vector_store_name}' does not exist.")
+        return info
+
+    async def _get_vector_store_layout(self, database_name: str, vector_store_name: str) -> Dict[str, Any]:
+        """
+        Returns the stored embedding dimension and whether the store carries an
+        int8 `embedding_q` shadow column and a `content_hash` column.
+        The dimension is None if the store does not exist.
+        """
+        sql = """
+        SELECT COLUMN_NAME, COLUMN_TYPE
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME IN ('embedding', 'embedding_q', 'content_hash')
+        """
+        results = await self._execute_query(sql, params=(database_name, vector_store_name), database='information_schema')
+        layout = {"dimension": None, "quantized": False, "deduplicated": False}
+        for row in results:
+            if row.get('COLUMN_NAME') == 'embedding':
+                match = re.search(r'\((\d+)\)', row.get('COLUMN_TYPE') or '')
+                layout["dimension"] = int(match.group(1)) if match else None
+            elif row.get('COLUMN_NAME') == 'embedding_q':
+                layout["quantized"] = True
+            elif row.get('COLUMN_NAME') == 'content_hash':
+                layout["deduplicated"] = True
+        return layout
+
+    def _fit_embeddings(self, embeddings: Any, dimension: Optional[int], model_name: Optional[str] = None) -> np.ndarray:
+        """
+        Converts provider embeddings to a float32 matrix matching the store dimension,
+        truncating and re-normalizing them when the store was created with fewer dimensions.
+        """
+        vectors = np.atleast_2d(np.asarray(embeddings, dtype=np.float32))
+        if dimension is None or vectors.shape[1] == dimension:
+            return vectors
+        if vectors.shape[1] > dimension and embedding_service.supports_dimension_truncation(model_name):
+            return truncate_embeddings(vectors, dimension)
+        logger.error(f"Embedding dimension {vectors.shape[1]} does not match vector store dimension {dimension}.")
+        raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match vector store dimension {dimension}.")
+
+    def _quantized_code_query(self, database_name: str, vector_store_name: str, info: Dict[str, Any]) -> Tuple[str, tuple]:
+        """
+        SELECT for a store's int8 codes. EUCLIDEAN stores also need each vector's length,
+        which the codes do not keep; it is read as the distance from the origin.
+        """
+        import json
+        if info["distance_function"] == "EUCLIDEAN":
+            return (f"SELECT id, embedding_q, VEC_DISTANCE_EUCLIDEAN(embedding, VEC_FromText(%s)) AS norm "
+                    f"FROM `{database_name}`.`{vector_store_name}`", (json.dumps([0.0] * info["dimension"]),))
+        return f"SELECT id, embedding_q FROM `{database_name}`.`{vector_store_name}`", ()
+
+    def _quantized_batch(self, rows: List[Dict[str, Any]], info: Dict[str, Any]) -> Tuple[List[str], np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """(ids, int8 codes, code norms, vector norms or None) of a batch of rows from `_quantized_code_query`."""
+        codes = int8_codes_from_bytes([bytes(row['embedding_q']) for row in rows], info["dimension"])
+        vector_norms = np.array([row['norm'] for row in rows], dtype=np.float32) if info["distance_function"] == "EUCLIDEAN" else None
+        return [row['id'] for row in rows], codes, int8_code_norms(codes), vector_norms
+
+    async def _load_quantized_codes(self, database_name: str, vector_store_name: str,
+                                    info: Dict[str, Any]) -> Optional[Tuple[List[str], np.ndarray, np.ndarray, Optional[np.ndarray]]]:
+        """
+        Returns (ids, int8 codes, code norms, vector norms or None) for a quantized store from
+        the in-memory cache, loading them if the store fits in MCP_QUANTIZED_CACHE_MAX_BYTES.
+        Returns None for stores that would not fit; those are scanned on every search instead.
+        """
+        key = (database_name, vector_store_name)
+        cached = self._quantized_cache.get(key)
+        if cached is not None:
+            return cached
+        estimated_rows = int((await self._table_storage(database_name, vector_store_name)).get('TABLE_ROWS') or 0)
+        if not self._quantized_cache.fits(estimated_rows * self._quantized_row_bytes(info["dimension"])):
+            logger.info(f"int8 codes of {database_name}.{vector_store_name} (~{estimated_rows} rows) exceed MCP_QUANTIZED_CACHE_MAX_BYTES; scanning them instead.")
+            return None
+        sql, params = self._quantized_code_query(database_name, vector_store_name, info)
+        rows = await self._execute_query(sql, params=params or None, database=database_name)
+        loaded = self._quantized_batch(rows, info)
+        nbytes = len(rows) * self._quantized_row_bytes(info["dimension"])
+        self._quantized_cache.put(key, loaded, nbytes)
+        logger.info(f"Loaded {len(rows)} int8 codes for {database_name}.{vector_store_name} (~{nbytes} bytes).")
+        return loaded
+
+    @staticmethod
+    def _quantized_row_bytes(dimension: int) -> int:
+        # The code, two float32 norms, and the id string with its list slot
+        return dimension + 8 + sys.getsizeof("0" * 36) + 8
+
+    def _store_changed(self, database_name: str, vector_store_name: str):
+        """
+        Drops cached copies of a store's contents after a local write. Writes by other
+        clients are not seen: the int8 codes are reloaded after MCP_QUANTIZED_CACHE_TTL
+        seconds, and search results expire after MCP_SEARCH_CACHE_TTL.
+        """
+        self._quantized_cache.pop((database_name, vector_store_name), None)
+        self.search_cache.bump(database_name, vector_store_name)
+
+    async def _search_quantized(self, database_name: str, vector_store_name: str, query_vector: np.ndarray,
+                                info: Dict[str, Any], k: int, oversample: int,
+                                columns: Tuple[str, ...] = ("id", "document", "metadata")) -> List[Dict[str, Any]]:
+        """
+        Generates `k * oversample` candidates from the int8 codes under the store's distance
+        function and re-scores them with the full-precision embedding column, selecting
+        `columns` for the top `k`. Stores too large for the code cache are scanned in
+        batches, keeping only the running candidates in memory.
+
+        Cached codes may miss rows written by other clients since they were loaded; those
+        rows cannot be candidates until the cache expires. Rows deleted since then are
+        dropped by the re-score, which reads the table itself, and updated rows are ranked
+        by their current embedding.
+        """
+        import json
+        n = k * oversample
+        distance_function = info["distance_function"]
+        loaded = await self._load_quantized_codes(database_name, vector_store_name, info)
+        if loaded is not None:
+            ids, codes, norms, vector_norms = loaded
+            candidate_ids = [ids[i] for i in nearest(int8_distances(codes, norms, query_vector, distance_function, vector_norms), n)]
+        else:
+            candidate_ids, best = [], np.empty(0, dtype=np.float32)
+            sql, params = self._quantized_code_query(database_name, vector_store_name, info)
+            async for rows in self._stream_query(sql, params or None, database_name, INT8_SCAN_BATCH_ROWS):
+                ids, codes, norms, vector_norms = self._quantized_batch(rows, info)
+                candidate_ids = candidate_ids + ids
+                best = np.concatenate([best, int8_distances(codes, norms, query_vector, distance_function, vector_norms)])
+                keep = nearest(best, n)
+                candidate_ids, best = [candidate_ids[i] for i in keep], best[keep]
+        if not candidate_ids:
+            return []
+        rescore_query = self._build_search_query(database_name, vector_store_name, info["distance_function"], exact=True,
+                                                 id_filter_count=len(candidate_ids), columns=columns)
+        return await self._execute_query(rescore_query, params=(json.dumps(query_vector.tolist()), *candidate_ids, k), database=database_name)
+
+    def _resolve_local_path(self, file_path: str, must_exist: bool = True) -> str:
+        """
+        Expands and absolutizes a local file path, which must resolve inside MCP_FILE_ROOT.
+
+        Tools that read or write local files are disabled while MCP_FILE_ROOT is unset:
+        otherwise any client could read (e.g. ingest `.env` into a searchable store) or
+        overwrite any file the server process can access.
+        """
+        if not MCP_FILE_ROOT:
+            logger.error("Local file access is disabled: MCP_FILE_ROOT is not set.")
+            raise PermissionError("Tools that access local files are disabled until MCP_FILE_ROOT is set.")
+        if not file_path or not isinstance(file_path, str):
+            logger.error("file_path must be a non-empty string.")
+            raise ValueError("file_path must be a non-empty string.")
+        resolved = os.path.realpath(os.path.expanduser(file_path))
+        root = os.path.realpath(os.path.expanduser(MCP_FILE_ROOT))
+        if os.path.commonpath([root, resolved]) != root:
+            logger.warning(f"Blocked access to '{resolved}' outside MCP_FILE_ROOT '{root}'.")
+            raise PermissionError(f"Access to '{file_path}' is outside the allowed file root.")
+        if must_exist and not os.path.isfile(resolved):
+            logger.error(f"File not found: '{resolved}'")
+            raise FileNotFoundError(f"File not found: '{file_path}'")
+        return resolved
+
+    async def _table_storage(self, database_name: str, table_name: str) -> Dict[str, Any]:
+        """Estimated row count, sizes and last update time of a table, from information_schema (no table scan)."""
+        rows = await self._execute_query(
+            "SELECT TABLE_ROWS, DATA_LENGTH, INDEX_LENGTH, DATA_FREE, AVG_ROW_LENGTH, UPDATE_TIME "
+            "FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s",
+            params=(database_name, table_name), database='information_schema')
+        return rows[0] if rows else {}
+
+    def _bulk_insert_statement(self, database_name: str, vector_store_name: str, info: Dict[str, Any],
+                               documents: List[str], vectors: np.ndarray, metadata: List[dict],
+                               ids: Optional[List[str]] = None) -> Tuple[str, tuple]:
+        """
+        Builds one multi-row INSERT for a batch of documents, sending embeddings in
+        MariaDB's binary vector form (little-endian float32) instead of JSON text.
+        In deduplicated stores, rows whose content hash is already present are left unchanged.
+        With explicit `ids`, rows whose id is already present are left unchanged, so a
+        batch can be replayed safely after a crash.
+        """
+        import json
+        vectors = np.asarray(vectors, dtype='<f4')
+        columns = ["document", "embedding"]
+        if ids is not None:
+            columns.insert(0, "id")
+        if info["quantized"]:
+            columns.append("embedding_q")
+        if info["deduplicated"]:
+            columns.append("content_hash")
+        columns.append("metadata")
+        row_placeholder = f"({', '.join(['%s'] * len(columns))})"
+        codes = quantize_int8(vectors) if info["quantized"] else None
+        hashes = self._content_hashes(documents) if info["deduplicated"] else None
+        params: List[Any] = []
+        for i, (doc, meta) in enumerate(zip(documents, metadata)):
+            if ids is not None:
+                params.append(ids[i])
+            params.extend((doc, vectors[i].tobytes()))
+            if codes is not None:
+                params.append(codes[i].tobytes())
+            if hashes is not None:
+                params.append(hashes[i])
+            params.append(json.dumps(meta))
+        sql = f"INSERT INTO `{database_name}`.`{vector_store_name}` ({', '.join(columns)}) VALUES {', '.join([row_placeholder] * len(documents))}"
+        if hashes is not None or ids is not None:
+            sql += " ON DUPLICATE KEY UPDATE id = id"
+        return sql, tuple(params)
+
+    async def _bulk_insert_vectors(self, database_name: str, vector_store_name: str, info: Dict[str, Any],
+                                   documents: List[str], vectors: np.ndarray, metadata: List[dict],
+                                   ids: Optional[List[str]] = None) -> int:
+        """Inserts a batch of documents with one multi-row INSERT (see `_bulk_insert_statement`)."""
+        if not documents:
+            return 0
+        sql, params = self._bulk_insert_statement(database_name, vector_store_name, info, documents, vectors, metadata, ids)
+        await self._execute_query(sql, params=params, database=database_name)
+        self._store_changed(database_name, vector_store_name)
+        return len(documents)
+
+    @staticmethod
+    def _content_hashes(documents: List[str]) -> List[bytes]:
+        """SHA-256 digests of document texts, as stored in the `content_hash` column."""
+        import hashlib
+        return [hashlib.sha256(doc.encode("utf-8")).digest() for doc in documents]
+
+    async def _existing_content_hashes(self, database_name: str, vector_store_name: str, hashes: List[bytes]) -> set:
+        """Returns the subset of `hashes` already stored, using one indexed IN lookup."""
+        if not hashes:
+            return set()
+        unique = list(dict.fromkeys(hashes))
+        sql = f"SELECT content_hash FROM `{database_name}`.`{vector_store_name}` WHERE content_hash IN ({', '.join(['%s'] * len(unique))})"
+        rows = await self._execute_query(sql, params=tuple(unique), database=database_name)
+        return {bytes(row['content_hash']) for row in rows}
+
+    async def _update_metadata_by_hash(self, database_name: str, vector_store_name: str, metadata_by_hash: Dict[bytes, dict]):
+        """Replaces the metadata of already-stored documents, keyed by content hash, in one UPDATE."""
+        import json
+        if not metadata_by_hash:
+            return
+        cases = " ".join(["WHEN %s THEN %s"] * len(metadata_by_hash))
+        sql = (f"UPDATE `{database_name}`.`{vector_store_name}` SET metadata = CASE content_hash {cases} END "
+               f"WHERE content_hash IN ({', '.join(['%s'] * len(metadata_by_hash))})")
+        params: List[Any] = []
+        for content_hash, meta in metadata_by_hash.items():
+            params.extend((content_hash, json.dumps(meta)))
+        params.extend(metadata_by_hash)
+        await self._execute_query(sql, params=tuple(params), database=database_name)
+
+    def _ingest_checkpoint_path(self, file_path: str, database_name: str, vector_store_name: str) -> str:
+        """Location of the resume checkpoint for ingesting `file_path` into a store."""
+        import hashlib
+        digest = hashlib.sha1(f"{file_path}|{database_name}|{vector_store_name}".encode("utf-8")).hexdigest()[:16]
+        return os.path.join(MCP_STATE_DIR, "ingest", f"{digest}.json")
+
+    def _reembed_checkpoint_path(self, database_name: str, vector_store_name: str) -> str:
+        """Location of the resume checkpoint for re-embedding a store."""
+        return os.path.join(MCP_STATE_DIR, "reembed", f"{database_name}.{vector_store_name}.json")
+
+    @staticmethod
+    def _read_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+        """Returns a checkpoint written by `_write_checkpoint`, or None if there is none."""
+        import json
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _write_checkpoint(path: str, data: Dict[str, Any]):
+        """Atomically replaces a JSON checkpoint file, so a crash never leaves a partial one."""
+        import json
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
     # --- MCP Tool Definitions ---
 
     async def list_databases(self) -> List[str]:
@@ -449,25 +1259,283 @@ class MariaDBServer:
             raise RuntimeError(f"Could not retrieve schema with relations for table '{database_name}.{table_name}': {str(e)}")
 
 
-    async def execute_sql(self, sql_query: str, database_name: str, parameters: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+    async def execute_sql(self, sql_query: str, database_name: str, parameters: Optional[List[Any]] = None,
+                          timeout_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
         """
         Executes a read-only SQL query (primarily SELECT, SHOW, DESCRIBE) against a specified database
         and returns the results. Uses parameterized queries for safety.
         Example `parameters`: ["value1", 123] corresponding to %s placeholders in `sql_query`.
+        `timeout_seconds` shortens the configured deadline for this call; a query still running
+        at the deadline is killed on the server and a TimeoutError is raised.
         """
         logger.info(f"TOOL START: execute_sql called. database_name={database_name}, sql_query={sql_query[:100]}, parameters={parameters}")
         if database_name and not database_name.isidentifier():
             logger.warning(f"TOOL WARNING: execute_sql called with invalid database_name: {database_name}")
             raise ValueError(f"Invalid database name provided: {database_name}")
+        if timeout_seconds is not None and (isinstance(timeout_seconds, bool) or not isinstance(timeout_seconds, (int, float)) or timeout_seconds <= 0):
+            logger.error(f"Invalid timeout_seconds: {timeout_seconds!r}. Must be a positive number.")
+            raise ValueError(f"Invalid timeout_seconds: {timeout_seconds!r}. Must be a positive number.")
         param_tuple = tuple(parameters) if parameters is not None else None
+        # timeout_seconds may shorten the call's deadline, never extend it
+        remaining = deadlines.remaining()
+        if timeout_seconds is not None and remaining is not None:
+            timeout_seconds = min(timeout_seconds, remaining)
         try:
-            results = await self._execute_query(sql_query, params=param_tuple, database=database_name)
+            results = await self._execute_query(sql_query, params=param_tuple, database=database_name, timeout=timeout_seconds)
             logger.info(f"TOOL END: execute_sql completed. Rows returned: {len(results)}.")
             return results
         except Exception as e:
             logger.error(f"TOOL ERROR: execute_sql failed for database_name={database_name}, sql_query={sql_query[:100]}, parameters={parameters}: {e}", exc_info=True)
             raise
             
+    async def execute_sql_fanout(self, sql_query: str, database_names: Optional[List[str]] = None,
+                                 database_pattern: Optional[str] = None, parameters: Optional[List[Any]] = None,
+                                 max_concurrency: Optional[int] = None,
+                                 timeout_seconds_per_database: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Runs one read-only statement in every schema of `database_names`, or every schema whose
+        name matches the SQL LIKE `database_pattern` (system schemas excluded), at most
+        `max_concurrency` at a time. Each schema's query gets its own deadline. Rows are merged
+        in schema order with a `source_database` column; a schema that fails or times out, or whose
+        result already has a `source_database` column, is reported under `errors` and does not fail the call.
+        """
+        logger.info(f"TOOL START: execute_sql_fanout called. database_names={database_names}, database_pattern={database_pattern}, "
+                     f"sql_query={sql_query[:100]}, parameters={parameters}")
+        if not self._is_read_query(sql_query):
+            logger.warning(f"Blocked non-read query in execute_sql_fanout: {sql_query[:100]}...")
+            raise PermissionError("execute_sql_fanout only runs read-only queries (SELECT, SHOW, DESCRIBE).")
+        if (database_names is None) == (database_pattern is None):
+            logger.error("Provide exactly one of database_names or database_pattern.")
+            raise ValueError("Provide exactly one of database_names or database_pattern.")
+        if max_concurrency is None:
+            max_concurrency = MCP_FANOUT_CONCURRENCY
+        if isinstance(max_concurrency, bool) or not isinstance(max_concurrency, int) or not 1 <= max_concurrency <= MCP_FANOUT_CONCURRENCY:
+            logger.error(f"Invalid max_concurrency: {max_concurrency!r}. Must be between 1 and {MCP_FANOUT_CONCURRENCY}.")
+            raise ValueError(f"Invalid max_concurrency: {max_concurrency!r}. Must be between 1 and {MCP_FANOUT_CONCURRENCY}.")
+        if timeout_seconds_per_database is None:
+            timeout_seconds_per_database = MCP_FANOUT_DATABASE_TIMEOUT
+        if isinstance(timeout_seconds_per_database, bool) or not isinstance(timeout_seconds_per_database, (int, float)) or timeout_seconds_per_database <= 0:
+            logger.error(f"Invalid timeout_seconds_per_database: {timeout_seconds_per_database!r}. Must be a positive number.")
+            raise ValueError(f"Invalid timeout_seconds_per_database: {timeout_seconds_per_database!r}. Must be a positive number.")
+
+        if database_names is not None:
+            if not isinstance(database_names, list) or not database_names:
+                logger.error("database_names must be a non-empty list.")
+                raise ValueError("database_names must be a non-empty list.")
+            invalid = [name for name in database_names if not isinstance(name, str) or not name.isidentifier()]
+            if invalid:
+                logger.error(f"Invalid database names: {invalid}")
+                raise ValueError(f"Invalid database names: {invalid}")
+            databases = list(dict.fromkeys(database_names))
+        else:
+            if not isinstance(database_pattern, str) or not database_pattern:
+                logger.error("database_pattern must be a non-empty LIKE pattern, e.g. 'app_%'.")
+                raise ValueError("database_pattern must be a non-empty LIKE pattern, e.g. 'app_%'.")
+            rows = await self._execute_query(
+                "SELECT SCHEMA_NAME FROM information_schema.SCHEMATA WHERE SCHEMA_NAME LIKE %s ORDER BY SCHEMA_NAME",
+                params=(database_pattern,))
+            databases = [row["SCHEMA_NAME"] for row in rows if row["SCHEMA_NAME"] not in SYSTEM_DATABASES]
+        if len(databases) > MAX_FANOUT_DATABASES:
+            logger.error(f"{len(databases)} schemas selected; execute_sql_fanout runs in at most {MAX_FANOUT_DATABASES}.")
+            raise ValueError(f"{len(databases)} schemas selected; execute_sql_fanout runs in at most {MAX_FANOUT_DATABASES}.")
+
+        param_tuple = tuple(parameters) if parameters is not None else None
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def run_in(database: str) -> List[Dict[str, Any]]:
+            async with semaphore:
+                # The schema's own deadline, cut short by the call's deadline
+                remaining = deadlines.remaining()
+                timeout = timeout_seconds_per_database if remaining is None else min(timeout_seconds_per_database, remaining)
+                return await self._execute_query(sql_query, params=param_tuple, database=database, timeout=timeout)
+
+        outcomes = await asyncio.gather(*(run_in(database) for database in databases), return_exceptions=True)
+        rows, errors, truncated = [], [], False
+        for database, outcome in zip(databases, outcomes):
+            if isinstance(outcome, BaseException):
+                if isinstance(outcome, asyncio.CancelledError):
+                    raise outcome
+                errors.append({"database": database, "error": str(outcome), "timed_out": isinstance(outcome, TimeoutError)})
+                continue
+            if outcome and FANOUT_SOURCE_COLUMN in outcome[0]:
+                # Overwriting it would silently replace the query's own column
+                logger.error(f"execute_sql_fanout result in '{database}' already has a '{FANOUT_SOURCE_COLUMN}' column.")
+                errors.append({"database": database,
+                               "error": f"The result already has a '{FANOUT_SOURCE_COLUMN}' column; alias it to another name.",
+                               "timed_out": False})
+                continue
+            for row in outcome:
+                if len(rows) >= MAX_FANOUT_ROWS:
+                    truncated = True
+                    break
+                rows.append({**row, FANOUT_SOURCE_COLUMN: database})
+        result = {
+            "databases": len(databases),
+            "succeeded": len(databases) - len(errors),
+            "failed": len(errors),
+            "rows": rows,
+            "truncated": truncated,
+            "errors": errors,
+        }
+        logger.info(f"TOOL END: execute_sql_fanout completed in {len(databases)} schemas: {len(rows)} rows, {len(errors)} errors.")
+        return result
+
+    async def get_pool_stats(self) -> Dict[str, Any]:
+        """Connections held and waiting per priority class, plus overload and acquire-timeout counts."""
+        if self.pool is None:
+            logger.error("Connection pool is not initialized.")
+            raise RuntimeError("Database connection pool not available.")
+        stats = (await self._current_pool()).stats()
+        if self.replicas is not None and current_target() is None:
+            stats["read_replicas"] = self.replicas.stats()
+        budget = self._pool_params.get("budget")
+        if budget is not None:
+            stats["connection_budget"] = budget.stats()
+        if self.read_flights is not None:
+            stats["coalesced_reads"] = self.read_flights.stats()
+        logger.info(f"TOOL END: get_pool_stats: {stats}")
+        return stats
+
+    async def list_targets(self) -> List[Dict[str, Any]]:
+        """The database servers tools can target, with whether their pool is open and how long it has been idle."""
+        logger.info("TOOL START: list_targets called.")
+        if self.targets is None:
+            return []
+        try:
+            await self.targets.load_catalog()
+        except Exception as e:
+            logger.warning(f"Could not reload targets from {MCP_TARGET_CATALOG}: {e}")
+        targets = self.targets.list()
+        logger.info(f"TOOL END: list_targets returned {len(targets)} targets.")
+        return targets
+
+    async def export_query(self,
+                           database_name: str,
+                           output_path: str,
+                           sql_query: Optional[str] = None,
+                           parameters: Optional[List[Any]] = None,
+                           vector_store_name: Optional[str] = None,
+                           file_format: Optional[str] = None,
+                           embedding_column: Optional[str] = None,
+                           id_column: str = "id",
+                           batch_size: int = 1000,
+                           overwrite: bool = False) -> Dict[str, Any]:
+        """
+        Streams the result of a read query, or a whole vector store, to a local Parquet or CSV file.
+
+        Rows are fetched with an unbuffered cursor in `batch_size` batches and appended to the
+        file as they arrive, so memory use does not grow with the result size. If
+        `embedding_column` is set (implied for vector stores), that column is written to a
+        float32 `<output>.npy` matrix instead, loadable with `np.load(path, mmap_mode='r')`,
+        and `id_column` values go to `<output>.ids.txt`, one per line in matrix row order.
+        Files are written under a temporary name and renamed when complete.
+
+        Parameters:
+        - database_name (str): The database name.
+        - output_path (str): Path of the output file on the server host.
+        - sql_query (str, optional): A SELECT/SHOW query with %s placeholders. Required unless
+          `vector_store_name` is given.
+        - parameters (List[Any], optional): Values for the placeholders.
+        - vector_store_name (str, optional): Export this vector store (id, document, metadata and embeddings).
+        - file_format (str, optional): 'parquet' or 'csv'. Inferred from the extension if omitted.
+        - embedding_column (str, optional): Column holding VECTOR values to write to the `.npy` matrix.
+        - id_column (str, optional): Column written to the id sidecar (default 'id').
+        - batch_size (int, optional): Rows per fetch (default 1000).
+        - overwrite (bool, optional): Replace existing output files (default False).
+
+        Returns:
+        - Dict[str, Any]: Output paths, rows exported, bytes written and elapsed time.
+        """
+        logger.info(f"TOOL START: export_query called. DB: '{database_name}', Store: {vector_store_name}, Output: '{output_path}', Format: {file_format}, Batch: {batch_size}")
+        if not database_name or not database_name.isidentifier():
+            logger.error(f"Invalid database_name: '{database_name}'")
+            raise ValueError(f"Invalid database_name: '{database_name}'")
+        if not isinstance(batch_size, int) or batch_size <= 0:
+            logger.error("batch_size must be a positive integer.")
+            raise ValueError("batch_size must be a positive integer.")
+        if vector_store_name is not None:
+            if sql_query:
+                logger.error("export_query takes either sql_query or vector_store_name, not both.")
+                raise ValueError("Provide either sql_query or vector_store_name, not both.")
+            if not vector_store_name.isidentifier():
+                logger.error(f"Invalid vector_store_name: '{vector_store_name}'")
+                raise ValueError(f"Invalid vector_store_name: '{vector_store_name}'")
+            await self._require_store_info(database_name, vector_store_name)
+            sql_query = f"SELECT id, document, metadata, embedding FROM `{database_name}`.`{vector_store_name}` ORDER BY id"
+            embedding_column = embedding_column or "embedding"
+        elif not sql_query:
+            logger.error("export_query requires sql_query or vector_store_name.")
+            raise ValueError("Provide sql_query or vector_store_name.")
+
+        resolved_path = self._resolve_local_path(output_path, must_exist=False)
+        resolved_format = detect_export_format(resolved_path, file_format)
+        base_path = os.path.splitext(resolved_path)[0]
+        outputs = {"path": resolved_path}
+        if embedding_column:
+            outputs.update({"embeddings_path": base_path + ".npy", "ids_path": base_path + ".ids.txt"})
+        for target in outputs.values():
+            # The sidecar and temporary names are derived, so check them too: a symlink
+            # at one of them must not lead outside the root
+            for path in (target, target + ".tmp"):
+                self._resolve_local_path(path, must_exist=False)
+            if os.path.exists(target) and not overwrite:
+                logger.error(f"Output file '{target}' already exists.")
+                raise FileExistsError(f"Output file '{target}' already exists. Pass overwrite=true to replace it.")
+        os.makedirs(os.path.dirname(resolved_path), exist_ok=True)
+
+        row_writer_class = ParquetRowWriter if resolved_format == "parquet" else CsvRowWriter
+        writers = {}
+
+        def write_batch(rows: List[Dict[str, Any]]):
+            if embedding_column:
+                if embedding_column not in rows[0] or id_column not in rows[0]:
+                    raise ValueError(f"Query result must include the '{embedding_column}' and '{id_column}' columns.")
+                writers["embeddings_path"].write(vectors_from_blobs([row.pop(embedding_column) for row in rows]))
+                writers["ids_path"].write([row[id_column] for row in rows])
+            writers["path"].write(rows)
+
+        started = time.perf_counter()
+        rows_exported = 0
+        try:
+            writers["path"] = row_writer_class(resolved_path + ".tmp")
+            if embedding_column:
+                writers["embeddings_path"] = NpyMatrixWriter(outputs["embeddings_path"] + ".tmp")
+                writers["ids_path"] = IdSidecarWriter(outputs["ids_path"] + ".tmp")
+            stream = self._stream_query(sql_query, tuple(parameters) if parameters is not None else None, database_name, batch_size)
+            async with contextlib.aclosing(stream) as batches:
+                async for rows in batches:
+                    await asyncio.to_thread(write_batch, rows)
+                    rows_exported += len(rows)
+            for writer in writers.values():
+                await asyncio.to_thread(writer.close)
+            for key, writer in writers.items():
+                os.replace(writer.path, outputs[key])
+        except BaseException:
+            for writer in writers.values():
+                try:
+                    writer.close()
+                except Exception:
+                    pass
+                if os.path.exists(writer.path):
+                    os.remove(writer.path)
+            logger.error(f"TOOL ERROR: export_query to '{resolved_path}' failed after {rows_exported} rows.", exc_info=True)
+            raise
+
+        elapsed = time.perf_counter() - started
+        result = dict(outputs)
+        result.update({
+            "status": "success",
+            "format": resolved_format,
+            "rows": rows_exported,
+            "bytes": sum(os.path.getsize(target) for target in outputs.values()),
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(rows_exported / elapsed, 1) if elapsed > 0 else None,
+        })
+        if embedding_column:
+            result["dimension"] = writers["embeddings_path"].dimension
+        logger.info(f"TOOL END: export_query exported {rows_exported} rows ({result['bytes']} bytes) to '{resolved_path}'.")
+        return result
+
     async def create_database(self, database_name: str) -> Dict[str, Any]:
         """
         Creates a new database if it doesn't exist.
@@ -501,7 +1569,11 @@ class MariaDBServer:
                                   vector_store_name: str,
                                   embedding_service: EmbeddingService,
                                   model_name: Optional[str] = None,
-                                  distance_function: Optional[str] = None) -> Dict[str, Any]:
+                                  distance_function: Optional[str] = None,
+                                  hnsw_m: Optional[int] = None,
+                                  dimensions: Optional[int] = None,
+                                  quantization: Optional[str] = None,
+                                  dedup: bool = False) -> Dict[str, Any]:
         """
         This tool creates a new table which stores embeddings.
 
@@ -517,8 +1589,28 @@ class MariaDBServer:
         - embedding_service: An instance of EmbeddingService to get model details.
         - model_name (str, optional): The embedding model to use (defaults to service default).
         - distance_function (str, optional): 'euclidean' or 'cosine'. Defaults to 'cosine'.
+        - hnsw_m (int, optional): The MHNSW index `M` parameter (3-200). Larger values improve recall
+          at the cost of index size and insert speed. Defaults to the server's `mhnsw_default_m`.
+        - dimensions (int, optional): Store only the first `dimensions` components of each embedding,
+          re-normalized to unit length. Only allowed for Matryoshka-trained models.
+        - quantization (str, optional): 'int8' adds an `embedding_q` column with int8 codes that
+          search can use for candidate generation before re-scoring with full precision.
+        - dedup (bool, optional): Add a unique `content_hash` column (SHA-256 of the document) so
+          inserts can skip or update documents that are already stored instead of re-embedding them.
         """
         embedding_length = await embedding_service.get_embedding_dimension(model_name)
+        native_dimension = embedding_length
+        if dimensions is not None:
+            if not isinstance(dimensions, int) or isinstance(dimensions, bool) or not (0 < dimensions <= embedding_length):
+                logger.error(f"Invalid dimensions: {dimensions}. Must be an integer between 1 and {embedding_length}.")
+                raise ValueError(f"Invalid dimensions: {dimensions}. Must be an integer between 1 and {embedding_length}.")
+            if dimensions < embedding_length and not embedding_service.supports_dimension_truncation(model_name):
+                logger.error(f"Model '{model_name or embedding_service.get_default_model()}' does not support dimension truncation.")
+                raise ValueError(f"Model '{model_name or embedding_service.get_default_model()}' does not support dimension truncation.")
+            embedding_length = dimensions
+        if quantization is not None and quantization not in VALID_QUANTIZATIONS:
+            logger.error(f"Invalid quantization: '{quantization}'. Must be one of {list(VALID_QUANTIZATIONS)}.")
+            raise ValueError(f"Invalid quantization: '{quantization}'. Must be one of {list(VALID_QUANTIZATIONS)}.")
         logger.info(f"TOOL START: create_vector_store called. DB: '{database_name}', Store: '{vector_store_name}', Model: '{model_name}', Embedding_Length: {embedding_length}, Distance_Requested: '{distance_function}'")
 
         # --- Input Validation ---
@@ -549,6 +1641,8 @@ class MariaDBServer:
         
         logger.info(f"Using SQL distance function: '{processed_distance_function_sql}'.")
 
+        self._validate_hnsw_m(hnsw_m)
+
         # --- Database Existence Check ---
         if not await self._database_exists(database_name):
             logger.info(f"Database '{database_name}' does not exist. Attempting to create it.")
@@ -570,41 +1664,105 @@ class MariaDBServer:
             }
 
         # --- SQL Query for Vector Store Table Creation ---
-        schema_query = f"""
-        CREATE TABLE IF NOT EXISTS `{vector_store_name}` (
-            id VARCHAR(36) NOT NULL DEFAULT UUID_v7() PRIMARY KEY,
-            document TEXT NOT NULL,
-            embedding VECTOR({embedding_length}) NOT NULL,
-            metadata JSON NOT NULL,
-            VECTOR INDEX (embedding) DISTANCE={processed_distance_function_sql}
-        );
-        """
+        schema_query = self._vector_store_ddl(vector_store_name, embedding_length, processed_distance_function_sql, hnsw_m, quantization, dedup)
 
         try:
             # --- Execute Query ---
             await self._execute_query(schema_query, database=database_name)
-            
-            success_message = f"Vector store '{vector_store_name}' created successfully in database '{database_name}' with {processed_distance_function_sql} distance."
-            logger.info(f"TOOL END: create_vector_store completed. {success_message}")
-            return {
-                "status": "success",
-                "message": success_message,
-                "database_name": database_name,
-                "vector_store_name": vector_store_name
-            }
         except Exception as e:
             error_message = f"Failed to create vector store '{vector_store_name}' in database '{database_name}'."
             logger.error(f"TOOL ERROR: create_vector_store failed. {error_message} Error: {e}", exc_info=True)
             raise RuntimeError(f"{error_message} Reason: {str(e)}")
 
-    async def list_vector_stores(self, database_name: str) -> List[str]:
+        try:
+            await self._register_vector_store(database_name, vector_store_name, {
+                "model_name": model_name or embedding_service.get_default_model(),
+                "dimension": embedding_length,
+                "distance_function": processed_distance_function_sql,
+                "quantized": quantization == "int8",
+                "deduplicated": bool(dedup),
+                "options": {"hnsw_m": hnsw_m, "quantization": quantization, "truncated_from": native_dimension if embedding_length != native_dimension else None,
+                            "dedup": bool(dedup)},
+                "cataloged": True,
+            })
+        except Exception as e:
+            # Without its catalog row the new table would be read with the default model and
+            # cosine distance, so it is dropped and the creation reported as failed
+            error_message = f"Created table '{vector_store_name}' in database '{database_name}' but could not record it in the vector store catalog."
+            try:
+                await self._execute_query(f"DROP TABLE IF EXISTS `{database_name}`.`{vector_store_name}`", database=database_name)
+                error_message += " The table was dropped; retry the creation."
+            except Exception as drop_e:
+                logger.error(f"Failed to drop uncataloged table '{database_name}.{vector_store_name}': {drop_e}", exc_info=True)
+                error_message += f" Dropping the table also failed ({drop_e}); drop it before retrying."
+            logger.error(f"TOOL ERROR: create_vector_store failed. {error_message} Error: {e}", exc_info=True)
+            raise RuntimeError(f"{error_message} Reason: {str(e)}")
+
+        success_message = f"Vector store '{vector_store_name}' created successfully in database '{database_name}' with {processed_distance_function_sql} distance, {embedding_length} dimensions{', int8 quantized' if quantization else ''}."
+        logger.info(f"TOOL END: create_vector_store completed. {success_message}")
+        return {
+            "status": "success",
+            "message": success_message,
+            "database_name": database_name,
+            "vector_store_name": vector_store_name
+        }
+
+    def _validate_hnsw_m(self, hnsw_m: Optional[int]):
+        """Checks an MHNSW `M` value; None means the server default."""
+        if hnsw_m is not None and (not isinstance(hnsw_m, int) or isinstance(hnsw_m, bool) or not (MHNSW_M_MIN <= hnsw_m <= MHNSW_M_MAX)):
+            logger.error(f"Invalid hnsw_m: {hnsw_m}. Must be an integer between {MHNSW_M_MIN} and {MHNSW_M_MAX}.")
+            raise ValueError(f"Invalid hnsw_m: {hnsw_m}. Must be an integer between {MHNSW_M_MIN} and {MHNSW_M_MAX}.")
+
+    def _vector_store_ddl(self, table_name: str, dimension: int, distance_function: str, hnsw_m: Optional[int] = None,
+                          quantization: Optional[str] = None, dedup: bool = False) -> str:
+        """CREATE TABLE statement for a vector store table with the given layout and index options."""
+        index_options = f"DISTANCE={distance_function}"
+        if hnsw_m is not None:
+            index_options = f"M={hnsw_m} {index_options}"
+        quantized_column = f"embedding_q VARBINARY({dimension}) NOT NULL," if quantization == "int8" else ""
+        hash_column = "content_hash BINARY(32) NOT NULL," if dedup else ""
+        hash_index = "UNIQUE KEY (content_hash)," if dedup else ""
+        return f"""
+        CREATE TABLE IF NOT EXISTS `{table_name}` (
+            id VARCHAR(36) NOT NULL DEFAULT UUID_v7() PRIMARY KEY,
+            document TEXT NOT NULL,
+            embedding VECTOR({dimension}) NOT NULL,
+            {quantized_column}
+            {hash_column}
+            metadata JSON NOT NULL,
+            {hash_index}
+            VECTOR INDEX (embedding) {index_options}
+        );
+        """
+
+    async def _register_vector_store(self, database_name: str, vector_store_name: str, info: Dict[str, Any]):
+        """Records a newly created vector store in the catalog table and its in-memory mirror."""
+        import json
+        await self._ensure_catalog_table(database_name)
+        sql = f"""
+        INSERT INTO `{database_name}`.`{VECTOR_STORE_CATALOG_TABLE}` (store_name, model_name, dimension, distance_function, options)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE model_name = VALUES(model_name), dimension = VALUES(dimension),
+            distance_function = VALUES(distance_function), options = VALUES(options)
+        """
+        params = (vector_store_name, info["model_name"], info["dimension"], info["distance_function"], json.dumps(info["options"]))
+        await self._execute_query(sql, params=params, database=database_name)
+        self._store_catalog[(database_name, vector_store_name)] = info
+
+    async def list_vector_stores(self, database_name: str, include_uncataloged: bool = False) -> List[str]:
         """
-        Lists all tables within the specified database that are identified as vector stores.
-        A table is considered a vector store if it contains an indexed column named 'embedding'
-        with a data type of 'VECTOR'.
+        Lists the vector stores of the specified database from its vector store catalog.
+        Catalog rows whose table no longer exists are left out of the listing and the in-memory
+        mirror; they are not deleted, since a store being re-embedded is briefly renamed away.
+
+        Databases without a catalog table, and calls with `include_uncataloged=True`, also scan
+        information_schema for legacy stores created before the catalog: tables that contain an
+        indexed column named 'embedding' with a data type of 'VECTOR'. That join is expensive,
+        so it is not part of the regular listing.
 
         Parameters:
-        - database_name (str): The name of the database to scan.
+        - database_name (str): The name of the database.
+        - include_uncataloged (bool, optional): Also list vector tables missing from the catalog.
 
         Returns:
         - List[str]: A list of table names that are identified as vector stores.
@@ -614,7 +1772,7 @@ class MariaDBServer:
         - ValueError: If the database_name is invalid.
         - RuntimeError: For database errors during the operation.
         """
-        logger.info(f"TOOL START: list_vector_stores called for database: '{database_name}'")
+        logger.info(f"TOOL START: list_vector_stores called for database: '{database_name}', include_uncataloged: {include_uncataloged}")
 
         # --- Input Validation ---
         if not database_name or not database_name.isidentifier():
@@ -625,7 +1783,40 @@ class MariaDBServer:
             logger.warning(f"Database '{database_name}' does not exist. Cannot list vector stores.")
             return []
 
-        # --- SQL Query ---
+        try:
+            # One lookup of the schema's table names both finds the catalog and prunes dropped stores
+            tables = {row['TABLE_NAME'] for row in await self._execute_query(
+                "SELECT TABLE_NAME FROM information_schema.TABLES WHERE TABLE_SCHEMA = %s",
+                params=(database_name,), database='information_schema')}
+            stores = set()
+            cataloged = VECTOR_STORE_CATALOG_TABLE in tables
+            if cataloged:
+                entries = await self._load_catalog(database_name, check_exists=False)
+                stores = set(entries) & tables
+                dropped = sorted(set(entries) - tables)
+                if dropped:
+                    logger.warning(f"Catalog of database '{database_name}' lists stores whose tables no longer exist: {dropped}")
+                    for name in dropped:
+                        self._store_catalog.pop((database_name, name), None)
+            if not cataloged or include_uncataloged:
+                stores |= set(await self._scan_vector_tables(database_name))
+            store_list = sorted(stores)
+            
+            if not store_list:
+                logger.info(f"No vector stores found in database '{database_name}'.")
+            else:
+                logger.info(f"Found {len(store_list)} vector store(s) in database '{database_name}': {store_list}")
+            
+            logger.info(f"TOOL END: list_vector_stores completed for database '{database_name}'.")
+            return store_list
+
+        except Exception as e:
+            error_message = f"Failed to list vector stores in database '{database_name}'."
+            logger.error(f"TOOL ERROR: list_vector_stores. {error_message} Error: {e}", exc_info=True)
+            raise RuntimeError(f"{error_message} Reason: {str(e)}")
+
+    async def _scan_vector_tables(self, database_name: str) -> List[str]:
+        """Legacy store discovery: tables with an indexed VECTOR column named 'embedding', from information_schema."""
         # This query identifies tables that have:
         # 1. A column named 'embedding'.
         # 2. The data type of this 'embedding' column is 'VECTOR'.
@@ -642,24 +1833,8 @@ class MariaDBServer:
           AND UPPER(T1.DATA_TYPE) = 'VECTOR' 
         ORDER BY T1.TABLE_NAME;
         """
-
-        try:
-            results = await self._execute_query(sql_query, params=(database_name,), database='information_schema')
-            
-            store_list = [row['TABLE_NAME'] for row in results if 'TABLE_NAME' in row]
-            
-            if not store_list:
-                logger.info(f"No vector stores found in database '{database_name}'.")
-            else:
-                logger.info(f"Found {len(store_list)} vector store(s) in database '{database_name}': {store_list}")
-            
-            logger.info(f"TOOL END: list_vector_stores completed for database '{database_name}'.")
-            return store_list
-
-        except Exception as e:
-            error_message = f"Failed to list vector stores in database '{database_name}'."
-            logger.error(f"TOOL ERROR: list_vector_stores. {error_message} Error: {e}", exc_info=True)
-            raise RuntimeError(f"{error_message} Reason: {str(e)}")
+        results = await self._execute_query(sql_query, params=(database_name,), database='information_schema')
+        return [row['TABLE_NAME'] for row in results if 'TABLE_NAME' in row]
             
     async def delete_vector_store(self,
                                   database_name: str,
@@ -711,6 +1886,11 @@ class MariaDBServer:
 
         try:
             await self._execute_query(drop_query, database=database_name)
+            if await self._table_exists(database_name, VECTOR_STORE_CATALOG_TABLE):
+                await self._execute_query(f"DELETE FROM `{database_name}`.`{VECTOR_STORE_CATALOG_TABLE}` WHERE store_name = %s",
+                                          params=(vector_store_name,), database=database_name)
+            self._store_catalog.pop((database_name, vector_store_name), None)
+            self._store_changed(database_name, vector_store_name)
             
             success_message = f"Vector store '{vector_store_name}' deleted successfully from database '{database_name}'."
             logger.info(f"TOOL END: delete_vector_store. {success_message}")
@@ -730,11 +1910,32 @@ class MariaDBServer:
                 "vector_store_name": vector_store_name
             }
             
-    async def insert_docs_vector_store(self, database_name: str, vector_store_name: str, documents: List[str], metadata: Optional[List[dict]] = None) -> dict:
+    def _make_chunker(self, chunk_tokens: Optional[int], chunk_overlap: int, model_name: str) -> Optional[TokenChunker]:
+        """
+        Returns a chunker for the store's embedding model, or None when chunking is off.
+        Token counts come from the model's own tokenizer when it is available locally,
+        otherwise from a regex heuristic.
+        """
+        if chunk_tokens is None:
+            return None
+        try:
+            return TokenChunker(chunk_tokens, chunk_overlap, embedding_service.get_token_spans(model_name))
+        except ValueError as e:
+            logger.error(str(e))
+            raise
+
+    async def insert_docs_vector_store(self, database_name: str, vector_store_name: str, documents: List[str], metadata: Optional[List[dict]] = None,
+                                       chunk_tokens: Optional[int] = None, chunk_overlap: int = 0, on_duplicate: str = "skip") -> dict:
         """
         Insert a batch of documents (with optional metadata) into a vector store.
         Documents must be a non-empty list of strings. Metadata, if provided, must be a list of dicts of the same length as documents.
         If metadata is not provided, an empty dict will be used for each document.
+        If `chunk_tokens` is set, documents longer than that many tokens are split into windows sharing
+        `chunk_overlap` tokens; each chunk is stored as its own row with `parent_id`, `chunk_index`,
+        `chunk_count`, `char_start` and `char_end` added to its metadata.
+        In stores created with `dedup`, documents whose content hash is already stored are found with one
+        bulk lookup before embedding: `on_duplicate='skip'` leaves them untouched, `'upsert'` replaces
+        their metadata. Either way they are not re-embedded, and repeats within the batch are skipped.
         """
         import json
         if not database_name or not database_name.isidentifier():
@@ -752,69 +1953,973 @@ class MariaDBServer:
         if not isinstance(metadata, list) or len(metadata) != len(documents):
             logger.error("'metadata' must be a list of dicts, same length as documents (or omitted).")
             raise ValueError("'metadata' must be a list of dicts, same length as documents (or omitted).")
-        # Generate embeddings
-        embeddings = await embedding_service.embed(documents)
-        # Prepare metadata JSON
-        metadata_json = [json.dumps(m) for m in metadata]
-        # Prepare values for batch insert
-        insert_query = f"INSERT INTO `{database_name}`.`{vector_store_name}` (document, embedding, metadata) VALUES (%s, VEC_FromText(%s), %s)"
+        if on_duplicate not in VALID_DUPLICATE_MODES:
+            logger.error(f"Invalid on_duplicate: '{on_duplicate}'. Must be one of {list(VALID_DUPLICATE_MODES)}.")
+            raise ValueError(f"Invalid on_duplicate: '{on_duplicate}'. Must be one of {list(VALID_DUPLICATE_MODES)}.")
+        info = await self._require_store_info(database_name, vector_store_name)
+        source_count = len(documents)
+        chunker = self._make_chunker(chunk_tokens, chunk_overlap, info["model_name"])
+        if chunker is not None:
+            documents, metadata = await asyncio.to_thread(chunk_documents, chunker, documents, metadata)
+            logger.info(f"Split {source_count} documents into {len(documents)} chunks of at most {chunk_tokens} tokens.")
+        chunk_total = len(documents)
+        hashes = None
+        skipped = 0
+        updated: Dict[bytes, dict] = {}
+        if info["deduplicated"]:
+            hashes = self._content_hashes(documents)
+            existing = await self._existing_content_hashes(database_name, vector_store_name, hashes)
+            seen = set()
+            keep = []
+            for i, content_hash in enumerate(hashes):
+                if content_hash in seen or content_hash in updated:
+                    skipped += 1
+                elif content_hash in existing:
+                    if on_duplicate == "upsert":
+                        updated[content_hash] = metadata[i]
+                    else:
+                        skipped += 1
+                else:
+                    seen.add(content_hash)
+                    keep.append(i)
+            await self._update_metadata_by_hash(database_name, vector_store_name, updated)
+            documents = [documents[i] for i in keep]
+            metadata = [metadata[i] for i in keep]
+            hashes = [hashes[i] for i in keep]
+            logger.info(f"Dedup on {database_name}.{vector_store_name}: {len(documents)} new, {len(updated)} updated, {skipped} skipped.")
         inserted = 0
         errors = []
-        for doc, emb, meta in zip(documents, embeddings, metadata_json):
-            emb_str = json.dumps(emb)
+        vectors = codes = None
+        if documents:
+            # Generate embeddings
+            embeddings = await embedding_service.embed(documents, model_name=info["model_name"])
+            vectors = self._fit_embeddings(embeddings, info["dimension"], info["model_name"])
+            codes = quantize_int8(vectors) if info["quantized"] else None
+        # Prepare values for batch insert
+        columns = ["document", "embedding"]
+        placeholders = ["%s", "VEC_FromText(%s)"]
+        if info["quantized"]:
+            columns.append("embedding_q")
+            placeholders.append("%s")
+        if hashes is not None:
+            columns.append("content_hash")
+            placeholders.append("%s")
+        insert_query = (f"INSERT INTO `{database_name}`.`{vector_store_name}` ({', '.join(columns)}, metadata) "
+                        f"VALUES ({', '.join(placeholders)}, %s)")
+        if hashes is not None:
+            # A concurrent insert of the same content wins; this one becomes a no-op
+            insert_query += " ON DUPLICATE KEY UPDATE id = id"
+        for i, doc in enumerate(documents):
+            params = [doc, json.dumps(vectors[i].tolist())]
+            if codes is not None:
+                params.append(codes[i].tobytes())
+            if hashes is not None:
+                params.append(hashes[i])
+            params.append(json.dumps(metadata[i]))
             try:
-                await self._execute_query(insert_query, params=(doc, emb_str, meta), database=database_name)
+                await self._execute_query(insert_query, params=tuple(params), database=database_name)
                 inserted += 1
             except Exception as e:
                 logger.error(f"Failed to insert doc into {database_name}.{vector_store_name}: {e}", exc_info=True)
                 errors.append(str(e))
+        if inserted or updated:
+            self._store_changed(database_name, vector_store_name)
         logger.info(f"Inserted {inserted} documents into {database_name}.{vector_store_name} (errors: {len(errors)})")
         result = {"status": "success" if inserted == len(documents) else "partial", "inserted": inserted}
+        if chunker is not None:
+            result["documents"] = source_count
+            result["chunks"] = chunk_total
+        if info["deduplicated"]:
+            result["skipped"] = skipped
+            if on_duplicate == "upsert":
+                result["updated"] = len(updated)
         if errors:
             result["errors"] = errors
         return result
         
-    async def search_vector_store(self, user_query: str, database_name: str, vector_store_name: str, k: int = 7) -> list:
+    def _metadata_filter_sql(self, metadata_filter: Dict[str, Any]) -> Tuple[str, List[Any]]:
         """
-        Search a vector store for the most similar documents to a query using semantic search.
+        Builds a WHERE fragment matching rows whose metadata contains all the given key/value
+        pairs. A list value matches any of its elements; None matches a missing or null key.
+        """
+        if not isinstance(metadata_filter, dict) or not metadata_filter:
+            logger.error("metadata_filter must be a non-empty dict.")
+            raise ValueError("metadata_filter must be a non-empty dict.")
+        clauses: List[str] = []
+        params: List[Any] = []
+        for key, value in metadata_filter.items():
+            if not isinstance(key, str) or not METADATA_KEY_PATTERN.fullmatch(key):
+                logger.error(f"Invalid metadata filter key: {key!r}")
+                raise ValueError(f"Invalid metadata filter key: {key!r}. Keys may contain letters, digits and underscores.")
+            expr = f"JSON_VALUE(metadata, '$.{key}')"
+            values = value if isinstance(value, list) else [value]
+            if not values or not all(v is None or isinstance(v, (str, int, float, bool)) for v in values):
+                logger.error(f"Invalid metadata filter value for '{key}': {value!r}")
+                raise ValueError(f"Invalid metadata filter value for '{key}': {value!r}. Use a scalar, null or a non-empty list of scalars.")
+            if values == [None]:
+                clauses.append(f"{expr} IS NULL")
+                continue
+            # JSON_VALUE returns booleans as the strings 'true' / 'false'
+            values = [("true" if v else "false") if isinstance(v, bool) else v for v in values]
+            clauses.append(f"{expr} IN ({', '.join(['%s'] * len(values))})" if len(values) > 1 else f"{expr} = %s")
+            params.extend(values)
+        return " AND ".join(clauses), params
+
+    async def _matching_id_batches(self, database_name: str, vector_store_name: str, metadata_filter: Dict[str, Any], batch_size: int):
+        """
+        Yields the ids of rows matching `metadata_filter` in primary-key order, one batch at a time.
+        Keyset paging resumes after the last id, so rows deleted by the caller are never rescanned.
+        """
+        where, filter_params = self._metadata_filter_sql(metadata_filter)
+        last_id = None
+        while True:
+            keyset = "id > %s AND " if last_id is not None else ""
+            sql = f"SELECT id FROM `{database_name}`.`{vector_store_name}` WHERE {keyset}{where} ORDER BY id LIMIT %s"
+            params = ([last_id] if last_id is not None else []) + filter_params + [batch_size]
+            rows = await self._execute_query(sql, params=tuple(params), database=database_name)
+            if not rows:
+                return
+            last_id = rows[-1]['id']
+            yield [row['id'] for row in rows]
+            if len(rows) < batch_size:
+                return
+
+    @staticmethod
+    async def _throttle(started: float, rows_done: int, max_rows_per_second: Optional[float]):
+        """Sleeps as needed so that `rows_done` rows since `started` stay within the rate limit."""
+        if not max_rows_per_second:
+            return
+        delay = rows_done / max_rows_per_second - (time.perf_counter() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def _validate_bulk_write_args(self, database_name: str, vector_store_name: str, batch_size: int, max_rows_per_second: Optional[float]):
+        """Shared argument and read-only checks of the bulk write tools."""
+        if not database_name or not database_name.isidentifier():
+            logger.error(f"Invalid database_name: '{database_name}'")
+            raise ValueError(f"Invalid database_name: '{database_name}'")
+        if not vector_store_name or not vector_store_name.isidentifier():
+            logger.error(f"Invalid vector_store_name: '{vector_store_name}'")
+            raise ValueError(f"Invalid vector_store_name: '{vector_store_name}'")
+        if not isinstance(batch_size, int) or isinstance(batch_size, bool) or batch_size <= 0:
+            logger.error("batch_size must be a positive integer.")
+            raise ValueError("batch_size must be a positive integer.")
+        if max_rows_per_second is not None and (not isinstance(max_rows_per_second, (int, float)) or max_rows_per_second <= 0):
+            logger.error("max_rows_per_second must be a positive number.")
+            raise ValueError("max_rows_per_second must be a positive number.")
+        if self.is_read_only:
+            logger.warning("Blocked vector store write in read-only mode.")
+            raise PermissionError("Operation forbidden: Server is in read-only mode.")
+
+    async def delete_docs_vector_store(self,
+                                       database_name: str,
+                                       vector_store_name: str,
+                                       ids: Optional[List[str]] = None,
+                                       metadata_filter: Optional[Dict[str, Any]] = None,
+                                       batch_size: int = 500,
+                                       max_rows_per_second: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Deletes documents from a vector store by id, by metadata filter, or both (ANDed).
+
+        Rows are deleted in batches of `batch_size`, each in its own short transaction, so locks
+        are held briefly and replicas keep up. With `max_rows_per_second`, batches are spaced out
+        to stay under that rate. Filter matches are found with keyset paging over the primary key.
+
         Parameters:
-            user_query (str): The search query string.
-            database_name (str): The database name.
-            vector_store_name (str): The vector store (table) name.
-            k (int, optional): Number of top results to retrieve (default 7).
+        - database_name (str): The database name.
+        - vector_store_name (str): The vector store (table) name.
+        - ids (List[str], optional): Ids of the documents to delete.
+        - metadata_filter (dict, optional): Delete documents whose metadata has all these key/value
+          pairs. A list value matches any element; null matches a missing key.
+        - batch_size (int, optional): Rows per transaction (default 500).
+        - max_rows_per_second (float, optional): Throttle for the whole operation.
+
         Returns:
-            List of dicts with document, metadata, and distance.
+        - Dict[str, Any]: Status, rows deleted, number of batches and the achieved rate.
+        """
+        logger.info(f"TOOL START: delete_docs_vector_store called. DB: '{database_name}', Store: '{vector_store_name}', ids: {len(ids) if ids else 0}, filter: {metadata_filter}")
+        self._validate_bulk_write_args(database_name, vector_store_name, batch_size, max_rows_per_second)
+        if not ids and not metadata_filter:
+            logger.error("Provide ids and/or metadata_filter.")
+            raise ValueError("Provide ids and/or metadata_filter; refusing to delete every document.")
+        if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, str) and i for i in ids)):
+            logger.error("'ids' must be a list of non-empty strings.")
+            raise ValueError("'ids' must be a list of non-empty strings.")
+        await self._require_store_info(database_name, vector_store_name)
+
+        table = f"`{database_name}`.`{vector_store_name}`"
+        where, filter_params = self._metadata_filter_sql(metadata_filter) if metadata_filter else ("", [])
+        started = time.perf_counter()
+        deleted = 0
+        batches = 0
+
+        async def id_batches():
+            if ids:
+                unique = list(dict.fromkeys(ids))
+                for start in range(0, len(unique), batch_size):
+                    yield unique[start:start + batch_size]
+            else:
+                async for batch in self._matching_id_batches(database_name, vector_store_name, metadata_filter, batch_size):
+                    yield batch
+
+        async for batch in id_batches():
+            sql = f"DELETE FROM {table} WHERE id IN ({', '.join(['%s'] * len(batch))})"
+            params = list(batch)
+            if ids and where:
+                sql += f" AND {where}"
+                params.extend(filter_params)
+            deleted += (await self._execute_transaction([(sql, tuple(params))], database=database_name))[0]
+            batches += 1
+            await self._throttle(started, deleted, max_rows_per_second)
+
+        if deleted:
+            self._store_changed(database_name, vector_store_name)
+        elapsed = time.perf_counter() - started
+        logger.info(f"TOOL END: delete_docs_vector_store deleted {deleted} rows from {database_name}.{vector_store_name} in {batches} batches.")
+        return {
+            "status": "success",
+            "deleted": deleted,
+            "batches": batches,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(deleted / elapsed, 1) if elapsed > 0 else None,
+        }
+
+    async def update_docs_vector_store(self,
+                                       database_name: str,
+                                       vector_store_name: str,
+                                       updates: Optional[List[Dict[str, Any]]] = None,
+                                       metadata_filter: Optional[Dict[str, Any]] = None,
+                                       metadata_patch: Optional[Dict[str, Any]] = None,
+                                       batch_size: int = 100,
+                                       max_rows_per_second: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Updates documents of a vector store, either individually by id or in bulk by metadata filter.
+
+        - `updates`: a list of {"id", "document"?, "metadata"?}. The current text of each batch is
+          read first and only documents whose text actually changed are re-embedded (in one
+          embedding request per batch); `metadata` replaces the stored metadata.
+        - `metadata_filter` + `metadata_patch`: merges the patch into the metadata of every matching
+          document (JSON merge-patch semantics: a null value removes a key). Nothing is re-embedded.
+
+        Each batch of `batch_size` documents is applied in one transaction; `max_rows_per_second`
+        spaces batches out to stay under that rate. Updates that cannot be applied are skipped and
+        listed in `rejected_updates` instead of failing their batch: an id repeated in `updates`
+        (only its first update is applied) and, in a deduplicating store, a new text that another
+        document already has or that an earlier update in the call already uses.
+
+        Returns:
+        - Dict[str, Any]: Status and counts of updated, re-embedded, unchanged, missing and rejected
+          documents, with `rejected_updates` giving the position, id and reason of each rejection.
         """
         import json
-        # Input validation
-        if not user_query or not isinstance(user_query, str):
-            logger.error("user_query must be a non-empty string.")
-            raise ValueError("user_query must be a non-empty string.")
+        logger.info(f"TOOL START: update_docs_vector_store called. DB: '{database_name}', Store: '{vector_store_name}', updates: {len(updates) if updates else 0}, filter: {metadata_filter}")
+        self._validate_bulk_write_args(database_name, vector_store_name, batch_size, max_rows_per_second)
+        if bool(updates) == bool(metadata_filter):
+            logger.error("Provide either updates, or metadata_filter with metadata_patch.")
+            raise ValueError("Provide either updates, or metadata_filter with metadata_patch.")
+        if metadata_filter and (not isinstance(metadata_patch, dict) or not metadata_patch):
+            logger.error("metadata_patch must be a non-empty dict when updating by metadata_filter.")
+            raise ValueError("metadata_patch must be a non-empty dict when updating by metadata_filter.")
+        if updates:
+            for update in updates:
+                if (not isinstance(update, dict) or not isinstance(update.get("id"), str)
+                        or not ("document" in update or "metadata" in update)
+                        or ("document" in update and (not isinstance(update["document"], str) or not update["document"]))
+                        or ("metadata" in update and not isinstance(update["metadata"], dict))):
+                    logger.error(f"Invalid update: {update!r}")
+                    raise ValueError(f"Invalid update: {update!r}. Each update needs an 'id' and a non-empty 'document' and/or a 'metadata' dict.")
+        info = await self._require_store_info(database_name, vector_store_name)
+
+        table = f"`{database_name}`.`{vector_store_name}`"
+        started = time.perf_counter()
+        counts = {"updated": 0, "reembedded": 0, "unchanged": 0, "not_found": 0, "rejected": 0}
+        rejected_updates: List[Dict[str, Any]] = []
+        batches = 0
+
+        if metadata_filter:
+            async for batch in self._matching_id_batches(database_name, vector_store_name, metadata_filter, batch_size):
+                sql = f"UPDATE {table} SET metadata = JSON_MERGE_PATCH(metadata, %s) WHERE id IN ({', '.join(['%s'] * len(batch))})"
+                await self._execute_transaction([(sql, (json.dumps(metadata_patch), *batch))], database=database_name)
+                counts["updated"] += len(batch)
+                batches += 1
+                await self._throttle(started, counts["updated"], max_rows_per_second)
+        else:
+            rejected_positions = set()
+
+            def reject(position: int, update: Dict[str, Any], reason: str):
+                rejected_positions.add(position)
+                rejected_updates.append({"position": position, "id": update["id"], "reason": reason})
+
+            seen_ids = set()
+            # Content hashes given to documents by earlier updates of this call
+            claimed_hashes: Dict[bytes, str] = {}
+            for start in range(0, len(updates), batch_size):
+                batch = []
+                for position, update in enumerate(updates[start:start + batch_size], start):
+                    if update["id"] in seen_ids:
+                        reject(position, update, "id repeated in updates; only its first update is applied")
+                    else:
+                        seen_ids.add(update["id"])
+                        batch.append((position, update))
+                if not batch:
+                    continue
+                rows = await self._execute_query(
+                    f"SELECT id, document FROM {table} WHERE id IN ({', '.join(['%s'] * len(batch))})",
+                    params=tuple(u["id"] for _, u in batch), database=database_name)
+                current = {row['id']: row['document'] for row in rows}
+                changed_positions = {position for position, u in batch
+                                     if u["id"] in current and "document" in u and u["document"] != current[u["id"]]}
+                hash_of: Dict[int, bytes] = {}
+                if info["deduplicated"] and changed_positions:
+                    # A unique-key violation would roll back the whole batch, so collisions are found up front
+                    changed_updates = [(position, u) for position, u in batch if position in changed_positions]
+                    hash_of = dict(zip((position for position, _ in changed_updates),
+                                       self._content_hashes([u["document"] for _, u in changed_updates])))
+                    owner_rows = await self._execute_query(
+                        f"SELECT id, content_hash FROM {table} WHERE content_hash IN ({', '.join(['%s'] * len(hash_of))})",
+                        params=tuple(hash_of.values()), database=database_name)
+                    owners = {bytes(row['content_hash']): row['id'] for row in owner_rows}
+                    for position, update in changed_updates:
+                        content_hash = hash_of[position]
+                        owner = claimed_hashes.get(content_hash) or owners.get(content_hash)
+                        if owner is not None and owner != update["id"]:
+                            reject(position, update, f"document text is already stored as id '{owner}'")
+                            changed_positions.discard(position)
+                        else:
+                            claimed_hashes[content_hash] = update["id"]
+                changed = [u for position, u in batch if position in changed_positions]
+                hashes = [hash_of[position] for position, _ in batch if position in changed_positions] if info["deduplicated"] else None
+                vectors = codes = None
+                if changed:
+                    embeddings = await embedding_service.embed([u["document"] for u in changed], model_name=info["model_name"])
+                    vectors = np.asarray(self._fit_embeddings(embeddings, info["dimension"], info["model_name"]), dtype='<f4')
+                    codes = quantize_int8(vectors) if info["quantized"] else None
+                statements: List[Tuple[str, Optional[tuple]]] = []
+                for i, update in enumerate(changed):
+                    assignments = ["document = %s", "embedding = %s"]
+                    params: List[Any] = [update["document"], vectors[i].tobytes()]
+                    if codes is not None:
+                        assignments.append("embedding_q = %s")
+                        params.append(codes[i].tobytes())
+                    if hashes is not None:
+                        assignments.append("content_hash = %s")
+                        params.append(hashes[i])
+                    if "metadata" in update:
+                        assignments.append("metadata = %s")
+                        params.append(json.dumps(update["metadata"]))
+                    statements.append((f"UPDATE {table} SET {', '.join(assignments)} WHERE id = %s", (*params, update["id"])))
+                for position, update in batch:
+                    if update["id"] not in current:
+                        counts["not_found"] += 1
+                    elif position in changed_positions or position in rejected_positions:
+                        continue
+                    elif "metadata" in update:
+                        statements.append((f"UPDATE {table} SET metadata = %s WHERE id = %s", (json.dumps(update["metadata"]), update["id"])))
+                    else:
+                        counts["unchanged"] += 1
+                if statements:
+                    await self._execute_transaction(statements, database=database_name)
+                counts["updated"] += len(statements)
+                counts["reembedded"] += len(changed)
+                batches += 1
+                await self._throttle(started, min(start + batch_size, len(updates)), max_rows_per_second)
+            if counts["reembedded"]:
+                self._store_changed(database_name, vector_store_name)
+        if counts["updated"]:
+            self.search_cache.bump(database_name, vector_store_name)
+        counts["rejected"] = len(rejected_updates)
+        if rejected_updates:
+            logger.warning(f"update_docs_vector_store skipped {len(rejected_updates)} update(s): {rejected_updates[:10]}")
+
+        elapsed = time.perf_counter() - started
+        logger.info(f"TOOL END: update_docs_vector_store on {database_name}.{vector_store_name}: {counts} in {batches} batches.")
+        return {
+            "status": "success",
+            **counts,
+            "rejected_updates": rejected_updates,
+            "batches": batches,
+            "elapsed_seconds": round(elapsed, 3),
+        }
+
+    async def ingest_file_vector_store(self,
+                                       database_name: str,
+                                       vector_store_name: str,
+                                       file_path: str,
+                                       file_format: Optional[str] = None,
+                                       text_field: str = "document",
+                                       metadata_fields: Optional[List[str]] = None,
+                                       batch_size: int = 64,
+                                       concurrency: int = 4,
+                                       start_offset: int = 0,
+                                       resume: bool = False,
+                                       chunk_tokens: Optional[int] = None,
+                                       chunk_overlap: int = 0,
+                                       progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        """
+        Streams a local JSONL, CSV or text file into a vector store.
+
+        Records pass through bounded stages (read -> [chunk] -> embed -> bulk insert), with
+        `concurrency` embedding requests in flight and batches inserted in file order.
+        After every insert the byte offset of the last stored record is checkpointed under
+        MCP_STATE_DIR, so an interrupted run can continue with `resume=True` (or an explicit
+        `start_offset`) without duplicating or losing records. In a deduplicating store, each
+        batch's content hashes are looked up in one query before embedding, and records already
+        stored or repeated within the file are skipped without being embedded.
+
+        Parameters:
+        - database_name (str): The database name.
+        - vector_store_name (str): The vector store (table) name.
+        - file_path (str): Path of the file on the server host.
+        - file_format (str, optional): 'jsonl', 'csv' or 'text'. Inferred from the extension if omitted.
+        - text_field (str, optional): JSONL key / CSV column holding the document text (default 'document').
+        - metadata_fields (List[str], optional): Fields copied into metadata. Defaults to a `metadata`
+          object (JSONL) or all other fields.
+        - batch_size (int, optional): Documents per embedding request and INSERT (default 64).
+        - concurrency (int, optional): Concurrent embedding requests (default 4).
+        - start_offset (int, optional): Byte offset to start reading from (default 0).
+        - resume (bool, optional): Continue from the last checkpoint for this file and store.
+        - chunk_tokens (int, optional): Split records longer than this many tokens into chunks.
+        - chunk_overlap (int, optional): Tokens shared between neighbouring chunks (default 0).
+        - progress (callable, optional): Called as `progress(bytes_done, file_size, message)` after each insert.
+
+        Returns:
+        - Dict[str, Any]: Status, rows inserted, skipped lines (and `skipped_duplicates` in deduplicating
+          stores), `resume_offset` and per-stage throughput.
+        """
+        logger.info(f"TOOL START: ingest_file_vector_store called. DB: '{database_name}', Store: '{vector_store_name}', File: '{file_path}', Format: {file_format}, Batch: {batch_size}, Concurrency: {concurrency}")
         if not database_name or not database_name.isidentifier():
             logger.error(f"Invalid database_name: '{database_name}'")
             raise ValueError(f"Invalid database_name: '{database_name}'")
         if not vector_store_name or not vector_store_name.isidentifier():
             logger.error(f"Invalid vector_store_name: '{vector_store_name}'")
             raise ValueError(f"Invalid vector_store_name: '{vector_store_name}'")
-        if not isinstance(k, int) or k <= 0:
-            logger.error("k must be a positive integer.")
-            raise ValueError("k must be a positive integer.")
-        # Generate embedding for the query
-        embedding = await embedding_service.embed(user_query)
-        emb_str = json.dumps(embedding)
-        # Prepare the search query
-        search_query = f"""
+        if not isinstance(batch_size, int) or batch_size <= 0:
+            logger.error("batch_size must be a positive integer.")
+            raise ValueError("batch_size must be a positive integer.")
+        if not isinstance(concurrency, int) or concurrency <= 0:
+            logger.error("concurrency must be a positive integer.")
+            raise ValueError("concurrency must be a positive integer.")
+        if not isinstance(start_offset, int) or start_offset < 0:
+            logger.error("start_offset must be a non-negative integer.")
+            raise ValueError("start_offset must be a non-negative integer.")
+        if self.is_read_only:
+            logger.warning("Blocked ingest_file_vector_store in read-only mode.")
+            raise PermissionError("Operation forbidden: Server is in read-only mode.")
+
+        resolved_path = self._resolve_local_path(file_path)
+        resolved_format = detect_format(resolved_path, file_format)
+        info = await self._require_store_info(database_name, vector_store_name)
+        chunker = self._make_chunker(chunk_tokens, chunk_overlap, info["model_name"])
+
+        checkpoint_path = self._ingest_checkpoint_path(resolved_path, database_name, vector_store_name)
+        checkpoint = self._read_checkpoint(checkpoint_path) if resume else None
+        if checkpoint:
+            start_offset = checkpoint.get("offset", 0)
+            logger.info(f"Resuming ingestion of '{resolved_path}' from byte {start_offset}.")
+
+        file_size = os.path.getsize(resolved_path)
+
+        def save_checkpoint(offset: int):
+            self._write_checkpoint(checkpoint_path, {"file_path": resolved_path, "database_name": database_name,
+                                                     "vector_store_name": vector_store_name, "offset": offset})
+            if progress is not None:
+                progress(offset, file_size, f"{pipeline.inserted} rows inserted; resume with start_offset={offset}")
+
+        async def embed_batch(texts: List[str]) -> np.ndarray:
+            embeddings = await embedding_service.embed(texts, model_name=info["model_name"])
+            return self._fit_embeddings(embeddings, info["dimension"], info["model_name"])
+
+        async def insert_batch(records, vectors) -> int:
+            return await self._bulk_insert_vectors(database_name, vector_store_name, info,
+                                                   [r.text for r in records], vectors, [r.metadata for r in records])
+
+        async def find_existing(hashes: List[bytes]) -> set:
+            return await self._existing_content_hashes(database_name, vector_store_name, hashes)
+
+        reader = FileRecordReader(resolved_path, resolved_format, text_field, metadata_fields, start_offset)
+        dedup = (self._content_hashes, find_existing) if info["deduplicated"] else (None, None)
+        pipeline = IngestPipeline(reader, embed_batch, insert_batch, batch_size, concurrency, save_checkpoint, chunker, *dedup)
+        result = await pipeline.run()
+        result.update({"database_name": database_name, "vector_store_name": vector_store_name,
+                       "file_path": resolved_path, "start_offset": start_offset})
+        logger.info(f"TOOL END: ingest_file_vector_store {result['status']}. Inserted {result['inserted']} documents from '{resolved_path}' (resume_offset={result['resume_offset']}).")
+        return result
+
+    async def import_embeddings_vector_store(self,
+                                             database_name: str,
+                                             vector_store_name: str,
+                                             embeddings_path: str,
+                                             documents_path: Optional[str] = None,
+                                             documents_format: Optional[str] = None,
+                                             text_field: str = "document",
+                                             metadata_fields: Optional[List[str]] = None,
+                                             ids_path: Optional[str] = None,
+                                             embedding_column: str = "embedding",
+                                             id_column: Optional[str] = None,
+                                             batch_size: int = 500,
+                                             rows_per_transaction: int = 5000,
+                                             resume: bool = False,
+                                             progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        """
+        Loads precomputed embeddings into a vector store without calling the embedding provider.
+
+        An `.npy` matrix is memory-mapped and read slice by slice alongside a JSONL/CSV/text
+        documents file (one record per matrix row) and an optional ids file; a Parquet file
+        carries documents, embeddings and optional ids itself. Each slice is sent as binary
+        float32 vectors in multi-row INSERTs, committed every `rows_per_transaction` rows.
+        The row after the last commit is checkpointed under MCP_STATE_DIR, so an interrupted
+        import can continue with `resume=True`.
+
+        Parameters:
+        - database_name (str): The database name.
+        - vector_store_name (str): The vector store (table) name.
+        - embeddings_path (str): `.npy` matrix or `.parquet` file on the server host.
+        - documents_path (str, optional): Documents file for an `.npy` matrix.
+        - documents_format (str, optional): 'jsonl', 'csv' or 'text'. Inferred from the extension if omitted.
+        - text_field (str, optional): Field or column holding the document text (default 'document').
+        - metadata_fields (List[str], optional): Fields copied into metadata.
+        - ids_path (str, optional): Text file with one id per matrix row (e.g. from export_query).
+        - embedding_column (str, optional): Parquet column holding the embeddings (default 'embedding').
+        - id_column (str, optional): Parquet column holding the ids.
+        - batch_size (int, optional): Rows per INSERT (default 500).
+        - rows_per_transaction (int, optional): Rows per commit (default 5000).
+        - resume (bool, optional): Continue from the last checkpoint for this file and store.
+        - progress (callable, optional): Called as `progress(rows_done, total_rows, message)` after each commit.
+
+        Returns:
+        - Dict[str, Any]: Status, rows imported, transactions and the row to resume from.
+        """
+        logger.info(f"TOOL START: import_embeddings_vector_store called. DB: '{database_name}', Store: '{vector_store_name}', Embeddings: '{embeddings_path}', Documents: {documents_path}")
+        self._validate_bulk_write_args(database_name, vector_store_name, batch_size, None)
+        if not isinstance(rows_per_transaction, int) or rows_per_transaction <= 0:
+            logger.error("rows_per_transaction must be a positive integer.")
+            raise ValueError("rows_per_transaction must be a positive integer.")
+
+        resolved_path = self._resolve_local_path(embeddings_path)
+        resolved_documents = self._resolve_local_path(documents_path) if documents_path else None
+        resolved_ids = self._resolve_local_path(ids_path) if ids_path else None
+        info = await self._require_store_info(database_name, vector_store_name)
+
+        checkpoint_path = self._ingest_checkpoint_path(resolved_path, database_name, vector_store_name)
+        checkpoint = (self._read_checkpoint(checkpoint_path) if resume else None) or {}
+        start_row = checkpoint.get("row", 0)
+        if checkpoint:
+            logger.info(f"Resuming import of '{resolved_path}' from row {start_row}.")
+
+        reader = await asyncio.to_thread(EmbeddingFileReader, resolved_path, resolved_documents, documents_format, text_field,
+                                         metadata_fields, resolved_ids, embedding_column, id_column, start_row,
+                                         checkpoint.get("offset", 0))
+        started = time.perf_counter()
+        imported = 0
+        transactions = 0
+        resume_row = start_row
+        error = None
+        try:
+            if reader.dimension is not None and reader.dimension != info["dimension"]:
+                raise ValueError(f"Embeddings in '{resolved_path}' have dimension {reader.dimension}, "
+                                 f"but vector store '{vector_store_name}' expects {info['dimension']}.")
+            statements: List[Tuple[str, tuple]] = []
+            pending = 0
+            while True:
+                records, vectors, ids = await asyncio.to_thread(reader.read, batch_size)
+                if records:
+                    if vectors.shape[1] != info["dimension"]:
+                        raise ValueError(f"Embeddings in '{resolved_path}' have dimension {vectors.shape[1]}, "
+                                         f"but vector store '{vector_store_name}' expects {info['dimension']}.")
+                    statements.append(self._bulk_insert_statement(database_name, vector_store_name, info, [r.text for r in records],
+                                                                  vectors, [r.metadata for r in records], ids))
+                    pending += len(records)
+                if statements and (pending >= rows_per_transaction or not records):
+                    await self._execute_transaction(statements, database=database_name)
+                    imported += pending
+                    transactions += 1
+                    resume_row = reader.row
+                    statements, pending = [], 0
+                    self._write_checkpoint(checkpoint_path, {"file_path": resolved_path, "database_name": database_name,
+                                                             "vector_store_name": vector_store_name, "row": reader.row,
+                                                             "offset": reader.offset})
+                    if progress is not None:
+                        progress(reader.row, reader.total_rows, f"{imported} rows imported; resume with resume=true")
+                if not records:
+                    break
+        except Exception as e:
+            error = e
+            logger.error(f"Import of '{resolved_path}' into '{database_name}.{vector_store_name}' stopped at row {resume_row}: {e}", exc_info=True)
+        finally:
+            reader.close()
+            self._store_changed(database_name, vector_store_name)
+
+        elapsed = time.perf_counter() - started
+        result = {
+            "status": "error" if error else "success",
+            "database_name": database_name,
+            "vector_store_name": vector_store_name,
+            "embeddings_path": resolved_path,
+            "imported": imported,
+            "total_rows": reader.total_rows,
+            "dimension": info["dimension"],
+            "transactions": transactions,
+            "start_row": start_row,
+            "resume_row": resume_row,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(imported / elapsed, 1) if elapsed > 0 else None,
+        }
+        if error:
+            result["message"] = str(error)
+        elif os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        logger.info(f"TOOL END: import_embeddings_vector_store {result['status']}. Imported {imported} rows from '{resolved_path}' (resume_row={resume_row}).")
+        return result
+
+    async def reembed_vector_store(self,
+                                   database_name: str,
+                                   vector_store_name: str,
+                                   model_name: str,
+                                   dimensions: Optional[int] = None,
+                                   batch_size: int = 128,
+                                   concurrency: int = 2,
+                                   keep_old: bool = False,
+                                   progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        """
+        Re-embeds every document of a vector store with another model, e.g. to migrate models.
+
+        A shadow table `<store>__reembed` is created with the new model's dimension and the
+        store's distance function, index and column options. Rows are streamed from the store in
+        primary-key order (keyset pages), embedded in batches with `concurrency` requests in flight
+        and bulk-inserted into the shadow table with their original ids. The last copied id is
+        checkpointed under MCP_STATE_DIR, so calling the tool again with the same model resumes
+        where it stopped.
+
+        Once all rows are copied, the changes made to the store meanwhile are caught up: shadow
+        rows whose source row was deleted or got a new text are removed, missing rows are embedded
+        and inserted, and changed metadata is copied. The store is then renamed to `<store>__old`,
+        which makes writes to it fail instead of being lost, the changes of the last moments are
+        caught up again from the frozen table, and the shadow table is renamed to the store. The
+        store is unavailable only during that last catch-up. The tool refuses to start if
+        `<store>__old` already exists.
+
+        Parameters:
+        - database_name (str): The database name.
+        - vector_store_name (str): The vector store (table) name.
+        - model_name (str): The embedding model to switch to.
+        - dimensions (int, optional): Truncate the new embeddings (Matryoshka models only).
+        - batch_size (int, optional): Rows per page, embedding request and INSERT (default 128).
+        - concurrency (int, optional): Concurrent embedding requests (default 2).
+        - keep_old (bool, optional): Keep the previous table as `<store>__old` instead of dropping it.
+        - progress (callable, optional): Called as `progress(rows_done, rows_estimated, message)`
+          after each batch, with throughput and ETA in the message.
+
+        Returns:
+        - Dict[str, Any]: Status, rows copied, throughput, the new model and dimension.
+        """
+        import json
+        logger.info(f"TOOL START: reembed_vector_store called. DB: '{database_name}', Store: '{vector_store_name}', Model: '{model_name}', Dimensions: {dimensions}")
+        if not database_name or not database_name.isidentifier():
+            logger.error(f"Invalid database_name: '{database_name}'")
+            raise ValueError(f"Invalid database_name: '{database_name}'")
+        if not vector_store_name or not vector_store_name.isidentifier():
+            logger.error(f"Invalid vector_store_name: '{vector_store_name}'")
+            raise ValueError(f"Invalid vector_store_name: '{vector_store_name}'")
+        shadow_name = f"{vector_store_name}{REEMBED_SHADOW_SUFFIX}"
+        old_name = f"{vector_store_name}{REEMBED_OLD_SUFFIX}"
+        if len(shadow_name) > MAX_IDENTIFIER_LENGTH:
+            logger.error(f"vector_store_name '{vector_store_name}' is too long to re-embed (shadow table name exceeds {MAX_IDENTIFIER_LENGTH} characters).")
+            raise ValueError(f"vector_store_name '{vector_store_name}' is too long to re-embed (shadow table name exceeds {MAX_IDENTIFIER_LENGTH} characters).")
+        if not isinstance(batch_size, int) or batch_size <= 0:
+            logger.error("batch_size must be a positive integer.")
+            raise ValueError("batch_size must be a positive integer.")
+        if not isinstance(concurrency, int) or concurrency <= 0:
+            logger.error("concurrency must be a positive integer.")
+            raise ValueError("concurrency must be a positive integer.")
+        if self.is_read_only:
+            logger.warning("Blocked reembed_vector_store in read-only mode.")
+            raise PermissionError("Operation forbidden: Server is in read-only mode.")
+
+        info = await self._require_store_info(database_name, vector_store_name)
+        if await self._table_exists(database_name, old_name):
+            logger.error(f"Cannot re-embed {database_name}.{vector_store_name}: table '{old_name}' already exists.")
+            raise ValueError(f"Table '{old_name}' already exists (e.g. kept by an earlier keep_old run). Drop or rename it first.")
+        native_dimension = await embedding_service.get_embedding_dimension(model_name)
+        dimension = native_dimension
+        if dimensions is not None:
+            if not isinstance(dimensions, int) or isinstance(dimensions, bool) or not (0 < dimensions <= native_dimension):
+                logger.error(f"Invalid dimensions: {dimensions}. Must be an integer between 1 and {native_dimension}.")
+                raise ValueError(f"Invalid dimensions: {dimensions}. Must be an integer between 1 and {native_dimension}.")
+            if dimensions < native_dimension and not embedding_service.supports_dimension_truncation(model_name):
+                logger.error(f"Model '{model_name}' does not support dimension truncation.")
+                raise ValueError(f"Model '{model_name}' does not support dimension truncation.")
+            dimension = dimensions
+
+        options = dict(info["options"])
+        options["truncated_from"] = native_dimension if dimension != native_dimension else None
+        quantization = "int8" if info["quantized"] else None
+        new_info = {
+            "model_name": model_name,
+            "dimension": dimension,
+            "distance_function": info["distance_function"],
+            "quantized": info["quantized"],
+            "deduplicated": info["deduplicated"],
+            "options": options,
+            "cataloged": True,
+        }
+
+        # Resume only if the checkpoint is for the same target and the shadow table survived
+        target = {"model_name": model_name, "dimension": dimension}
+        checkpoint_path = self._reembed_checkpoint_path(database_name, vector_store_name)
+        checkpoint = self._read_checkpoint(checkpoint_path)
+        if checkpoint and checkpoint.get("target") == target and await self._table_exists(database_name, shadow_name):
+            watermark, copied_before = checkpoint.get("watermark"), checkpoint.get("copied", 0)
+            logger.info(f"Resuming re-embedding of {database_name}.{vector_store_name} after id {watermark!r} ({copied_before} rows already copied).")
+        else:
+            watermark, copied_before = None, 0
+            await self._execute_query(f"DROP TABLE IF EXISTS `{database_name}`.`{shadow_name}`", database=database_name)
+        await self._execute_query(self._vector_store_ddl(shadow_name, dimension, info["distance_function"], options.get("hnsw_m"),
+                                                         quantization, info["deduplicated"]), database=database_name)
+        estimated_rows = int((await self._table_storage(database_name, vector_store_name)).get('TABLE_ROWS') or 0)
+
+        async def fetch_page(after_id: Optional[str], limit: int) -> List[Record]:
+            if after_id is None:
+                sql = f"SELECT id, document, metadata FROM `{database_name}`.`{vector_store_name}` ORDER BY id LIMIT %s"
+                params = (limit,)
+            else:
+                sql = f"SELECT id, document, metadata FROM `{database_name}`.`{vector_store_name}` WHERE id > %s ORDER BY id LIMIT %s"
+                params = (after_id, limit)
+            rows = await self._execute_query(sql, params=params, database=database_name)
+            return [to_record(row) for row in rows]
+
+        def to_record(row: Dict[str, Any]) -> Record:
+            return Record(row['document'], json.loads(row['metadata']) if isinstance(row['metadata'], str) else (row['metadata'] or {}), row['id'])
+
+        started = time.perf_counter()
+
+        def save_checkpoint(last_id: str):
+            copied = copied_before + pipeline.inserted
+            self._write_checkpoint(checkpoint_path, {"target": target, "watermark": last_id, "copied": copied})
+            if progress is not None:
+                elapsed = time.perf_counter() - started
+                rate = pipeline.inserted / elapsed if elapsed > 0 else 0.0
+                total = max(estimated_rows, copied)
+                eta = f"{(total - copied) / rate:.0f}s" if rate > 0 else "unknown"
+                progress(copied, total, f"{rate:.1f} rows/s, ETA {eta}, watermark id={last_id}")
+
+        async def embed_batch(texts: List[str]) -> np.ndarray:
+            embeddings = await embedding_service.embed(texts, model_name=model_name)
+            return self._fit_embeddings(embeddings, dimension, model_name)
+
+        async def insert_batch(records, vectors) -> int:
+            return await self._bulk_insert_vectors(database_name, shadow_name, new_info, [r.text for r in records], vectors,
+                                                   [r.metadata for r in records], ids=[r.end_offset for r in records])
+
+        reader = KeysetRecordReader(fetch_page, watermark, f"{database_name}.{vector_store_name}")
+        pipeline = IngestPipeline(reader, embed_batch, insert_batch, batch_size, concurrency, save_checkpoint)
+        result = await pipeline.run()
+        result.pop("skipped", None)
+        result.update({"database_name": database_name, "vector_store_name": vector_store_name, "model_name": model_name,
+                       "dimension": dimension, "copied": copied_before + pipeline.inserted})
+        if result["status"] == "error":
+            result["message"] = f"{result.get('message')}. Call reembed_vector_store again with the same model to resume."
+            logger.error(f"TOOL ERROR: reembed_vector_store stopped for {database_name}.{vector_store_name}: {result['message']}")
+            return result
+
+        async def catch_up(source_name: str) -> Dict[str, int]:
+            """Applies the changes made to `source_name` after its rows were copied to the shadow table."""
+            source, shadow = f"`{database_name}`.`{source_name}`", f"`{database_name}`.`{shadow_name}`"
+            stale = [row['id'] for row in await self._execute_query(
+                f"SELECT n.id FROM {shadow} n LEFT JOIN {source} s ON s.id = n.id "
+                f"WHERE s.id IS NULL OR NOT (s.document <=> n.document)", database=database_name)]
+            for start in range(0, len(stale), batch_size):
+                chunk = stale[start:start + batch_size]
+                await self._execute_query(f"DELETE FROM {shadow} WHERE id IN ({', '.join(['%s'] * len(chunk))})",
+                                          params=tuple(chunk), database=database_name)
+            reembedded, after_id = 0, ""
+            while True:
+                records = [to_record(row) for row in await self._execute_query(
+                    f"SELECT s.id, s.document, s.metadata FROM {source} s LEFT JOIN {shadow} n ON n.id = s.id "
+                    f"WHERE n.id IS NULL AND s.id > %s ORDER BY s.id LIMIT %s", params=(after_id, batch_size), database=database_name)]
+                if not records:
+                    break
+                reembedded += await insert_batch(records, await embed_batch([r.text for r in records]))
+                after_id = records[-1].end_offset
+            await self._execute_query(f"UPDATE {shadow} n JOIN {source} s ON s.id = n.id SET n.metadata = s.metadata "
+                                      f"WHERE NOT (n.metadata <=> s.metadata)", database=database_name)
+            return {"removed": len(stale), "reembedded": reembedded}
+
+        # Catch up while the store stays online, then freeze it by moving it aside and
+        # catch up the last few changes before putting the shadow table in its place
+        changes = await catch_up(vector_store_name)
+        await self._execute_query(f"RENAME TABLE `{database_name}`.`{vector_store_name}` TO `{database_name}`.`{old_name}`",
+                                  database=database_name)
+        try:
+            final_changes = await catch_up(old_name)
+            await self._execute_query(f"RENAME TABLE `{database_name}`.`{shadow_name}` TO `{database_name}`.`{vector_store_name}`",
+                                      database=database_name)
+        except Exception as e:
+            logger.error(f"TOOL ERROR: reembed_vector_store could not finish the swap of {database_name}.{vector_store_name}: {e}", exc_info=True)
+            await self._execute_query(f"RENAME TABLE `{database_name}`.`{old_name}` TO `{database_name}`.`{vector_store_name}`",
+                                      database=database_name)
+            result.update({"status": "error", "message": f"Swap failed and the store was restored: {e}. "
+                                                        "Call reembed_vector_store again with the same model to retry."})
+            return result
+        result["caught_up"] = {key: changes[key] + final_changes[key] for key in changes}
+        await self._register_vector_store(database_name, vector_store_name, new_info)
+        self._store_changed(database_name, vector_store_name)
+        if not keep_old:
+            await self._execute_query(f"DROP TABLE `{database_name}`.`{old_name}`", database=database_name)
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        result["previous_model_name"] = info["model_name"]
+        result["old_table"] = old_name if keep_old else None
+        logger.info(f"TOOL END: reembed_vector_store swapped {database_name}.{vector_store_name} to '{model_name}' ({dimension} dims, {result['copied']} rows).")
+        return result
+
+    def _build_search_query(self, database_name: str, vector_store_name: str, distance_function: str = "COSINE",
+                            exact: bool = False, id_filter_count: int = 0,
+                            columns: Tuple[str, ...] = ("id", "document", "metadata")) -> str:
+        """
+        Builds the k-nearest-neighbour query used by search and benchmarking.
+        Parameters are (query embedding as text, [ids...], k). The distance function must
+        match the one the vector index was built with, otherwise MariaDB cannot use the index.
+        With `exact=True` the vector index is ignored, which yields the brute-force ground truth;
+        `id_filter_count` restricts the scan to that many candidate ids (used for re-scoring).
+        `columns` are selected alongside the distance.
+        """
+        if distance_function not in VALID_DISTANCE_FUNCTIONS:
+            raise ValueError(f"Invalid distance function: '{distance_function}'.")
+        index_hint = " IGNORE INDEX (embedding)" if exact else ""
+        id_filter = f"WHERE id IN ({', '.join(['%s'] * id_filter_count)})" if id_filter_count else ""
+        selected = "".join(f"{column},\n                " for column in columns)
+        return f"""
             SELECT 
-                document,
-                metadata,
-                VEC_DISTANCE_COSINE(embedding, VEC_FromText(%s)) AS distance
-            FROM `{database_name}`.`{vector_store_name}`
+                {selected}VEC_DISTANCE_{distance_function}(embedding, VEC_FromText(%s)) AS distance
+            FROM `{database_name}`.`{vector_store_name}`{index_hint}
+            {id_filter}
             ORDER BY distance ASC
             LIMIT %s
         """
+
+    def _validate_ef_search(self, ef_search: Optional[int]) -> Optional[Dict[str, int]]:
+        """Validates `ef_search` and returns the matching statement variables (or None)."""
+        if ef_search is None:
+            return None
+        if not isinstance(ef_search, int) or isinstance(ef_search, bool) or not (MHNSW_EF_SEARCH_MIN <= ef_search <= MHNSW_EF_SEARCH_MAX):
+            logger.error(f"Invalid ef_search: {ef_search}. Must be an integer between {MHNSW_EF_SEARCH_MIN} and {MHNSW_EF_SEARCH_MAX}.")
+            raise ValueError(f"Invalid ef_search: {ef_search}. Must be an integer between {MHNSW_EF_SEARCH_MIN} and {MHNSW_EF_SEARCH_MAX}.")
+        return {"mhnsw_ef_search": ef_search}
+
+    def _projection_columns(self, include_document: bool = True, snippet_chars: Optional[int] = None,
+                            include_metadata: bool = True, metadata_keys: Optional[List[str]] = None) -> Tuple[str, ...]:
+        """
+        SELECT expressions for a search projection. The id is always selected. A snippet is the
+        first `snippet_chars` characters of the document plus its full length; `metadata_keys`
+        extracts just those keys server-side, so the rest of the JSON is never transferred.
+        """
+        columns = ["id"]
+        if snippet_chars is not None:
+            if not isinstance(snippet_chars, int) or isinstance(snippet_chars, bool) or snippet_chars <= 0:
+                logger.error("snippet_chars must be a positive integer.")
+                raise ValueError("snippet_chars must be a positive integer.")
+            columns += [f"LEFT(document, {snippet_chars}) AS snippet", "CHAR_LENGTH(document) AS document_length"]
+        elif include_document:
+            columns.append("document")
+        if metadata_keys is not None:
+            if not metadata_keys or not all(isinstance(key, str) and METADATA_KEY_PATTERN.fullmatch(key) for key in metadata_keys):
+                logger.error(f"Invalid metadata_keys: {metadata_keys!r}")
+                raise ValueError("metadata_keys must be a non-empty list of keys made of letters, digits and underscores.")
+            pairs = ", ".join(f"'{key}', JSON_EXTRACT(metadata, '$.{key}')" for key in metadata_keys)
+            columns.append(f"JSON_OBJECT({pairs}) AS metadata")
+        elif include_metadata:
+            columns.append("metadata")
+        return tuple(columns)
+
+    async def _fetch_docs_by_id(self, database_name: str, vector_store_name: str, ids: List[str],
+                                columns: Tuple[str, ...] = ("id", "document", "metadata")) -> Dict[str, Dict[str, Any]]:
+        """Fetches the given rows with one primary-key IN query, keyed by id."""
+        if not ids:
+            return {}
+        rows = await self._execute_query(
+            f"SELECT {', '.join(columns)} FROM `{database_name}`.`{vector_store_name}` WHERE id IN ({', '.join(['%s'] * len(ids))})",
+            params=tuple(ids), database=database_name)
+        return {row["id"]: row for row in rows}
+
+    async def _range_search(self, database_name: str, vector_store_name: str, info: Dict[str, Any], emb_str: str,
+                            max_distance: float, initial_window: int, statement_vars: Optional[Dict[str, int]],
+                            columns: Tuple[str, ...] = ("id", "document", "metadata")) -> List[Dict[str, Any]]:
+        """
+        Returns every row within `max_distance` of the query, nearest first.
+
+        Candidates are read from the vector index as (id, distance) only, in a window that
+        grows by RANGE_SEARCH_GROWTH until its farthest row passes the threshold, the table
+        runs out of rows, or the window reaches MAX_RANGE_SEARCH_RESULTS. Documents are then
+        fetched for the matching ids alone, with the given projection `columns`.
+        """
+        candidate_query = self._build_search_query(database_name, vector_store_name, info["distance_function"], columns=("id",))
+        window = min(initial_window, MAX_RANGE_SEARCH_RESULTS)
+        while True:
+            candidates = await self._execute_query(candidate_query, params=(emb_str, window), database=database_name, statement_vars=statement_vars)
+            matches = [row for row in candidates if row["distance"] <= max_distance]
+            if len(matches) < len(candidates) or len(candidates) < window:
+                break
+            if window >= MAX_RANGE_SEARCH_RESULTS:
+                logger.warning(f"Range search in {database_name}.{vector_store_name} stopped at {MAX_RANGE_SEARCH_RESULTS} results "
+                               f"before passing max_distance={max_distance}.")
+                break
+            window = min(window * RANGE_SEARCH_GROWTH, MAX_RANGE_SEARCH_RESULTS)
+        if columns == ("id",):
+            return matches
+        docs = await self._fetch_docs_by_id(database_name, vector_store_name, [row["id"] for row in matches], columns)
+        return [dict(docs[row["id"]], distance=row["distance"]) for row in matches if row["id"] in docs]
+
+    def _validate_search_args(self, database_name: str, vector_store_name: str, k: int, ef_search: Optional[int], use_quantized: bool,
+                              oversample: int, max_distance: Optional[float]) -> Optional[Dict[str, int]]:
+        """Shared argument checks of the search tools; returns the statement variables for `ef_search`."""
+        if not database_name or not database_name.isidentifier():
+            logger.error(f"Invalid database_name: '{database_name}'")
+            raise ValueError(f"Invalid database_name: '{database_name}'")
+        if not vector_store_name or not vector_store_name.isidentifier():
+            logger.error(f"Invalid vector_store_name: '{vector_store_name}'")
+            raise ValueError(f"Invalid vector_store_name: '{vector_store_name}'")
+        if not isinstance(k, int) or k <= 0:
+            logger.error("k must be a positive integer.")
+            raise ValueError("k must be a positive integer.")
+        statement_vars = self._validate_ef_search(ef_search)
+        if not isinstance(oversample, int) or oversample <= 0:
+            logger.error("oversample must be a positive integer.")
+            raise ValueError("oversample must be a positive integer.")
+        if max_distance is not None:
+            if not isinstance(max_distance, (int, float)) or isinstance(max_distance, bool) or max_distance < 0:
+                logger.error("max_distance must be a non-negative number.")
+                raise ValueError("max_distance must be a non-negative number.")
+            if use_quantized:
+                logger.error("max_distance cannot be combined with use_quantized.")
+                raise ValueError("max_distance cannot be combined with use_quantized.")
+        return statement_vars
+
+    def _require_quantized(self, database_name: str, vector_store_name: str, info: Dict[str, Any]):
+        if not info["quantized"]:
+            logger.error(f"Vector store '{database_name}.{vector_store_name}' has no int8 codes; create it with quantization='int8'.")
+            raise ValueError(f"Vector store '{database_name}.{vector_store_name}' has no int8 codes; create it with quantization='int8'.")
+
+    async def _search_with_vector(self, database_name: str, vector_store_name: str, info: Dict[str, Any], query_vector: np.ndarray,
+                                  k: int, statement_vars: Optional[Dict[str, int]], use_quantized: bool, oversample: int,
+                                  max_distance: Optional[float], columns: Tuple[str, ...], raise_errors: bool = False) -> List[Dict[str, Any]]:
+        """
+        Runs a top-k, range or quantized search for a query vector that already fits the store.
+        A failing search is logged and yields no results, or is re-raised with `raise_errors`.
+        """
+        import json
+        emb_str = json.dumps(query_vector.tolist())
+        keep_ids = "document" not in columns
+        search_query = self._build_search_query(database_name, vector_store_name, info["distance_function"], columns=columns)
         try:
-            results = await self._execute_query(search_query, params=(emb_str, k), database=database_name)
+            if max_distance is not None:
+                results = await self._range_search(database_name, vector_store_name, info, emb_str, max_distance, k, statement_vars, columns)
+            elif use_quantized:
+                results = await self._search_quantized(database_name, vector_store_name, query_vector, info, k, oversample, columns)
+            else:
+                results = await self._execute_query(search_query, params=(emb_str, k), database=database_name, statement_vars=statement_vars)
             for row in results:
+                if not keep_ids:
+                    row.pop('id', None)
                 if isinstance(row.get('metadata'), str):
                     try:
                         row['metadata'] = json.loads(row['metadata'])
@@ -824,8 +2929,899 @@ class MariaDBServer:
             return results
         except Exception as e:
             logger.error(f"Failed to search vector store {database_name}.{vector_store_name}: {e}", exc_info=True)
+            if raise_errors:
+                raise
             return []
-            
+
+    async def _cached_search(self, database_name: str, vector_store_name: str, query: Hashable, options: Dict[str, Any],
+                             search: Callable[[], Awaitable[list]]) -> list:
+        """
+        Serves a search from the result cache, or runs `search()` and caches its non-empty result.
+        The key is taken before searching, so a write during the search never lets its
+        result be served under the new store version.
+        """
+        if not self.search_cache.enabled:
+            return await search()
+        key = self.search_cache.key(database_name, vector_store_name, query, **options)
+        cached = self.search_cache.get(key)
+        if cached is not None:
+            logger.info(f"Search in {database_name}.{vector_store_name} served from cache ({len(cached)} results).")
+            return cached
+        results = await search()
+        if results:
+            self.search_cache.put(key, results)
+        return results
+
+    async def search_vector_store(self, user_query: str, database_name: str, vector_store_name: str, k: int = 7, ef_search: Optional[int] = None,
+                                  use_quantized: bool = False, oversample: int = 4, max_distance: Optional[float] = None,
+                                  include_document: bool = True, snippet_chars: Optional[int] = None,
+                                  include_metadata: bool = True, metadata_keys: Optional[List[str]] = None) -> list:
+        """
+        Search a vector store for the most similar documents to a query using semantic search.
+        Parameters:
+            user_query (str): The search query string.
+            database_name (str): The database name.
+            vector_store_name (str): The vector store (table) name.
+            k (int, optional): Number of top results to retrieve (default 7).
+            ef_search (int, optional): MHNSW search breadth (`mhnsw_ef_search`) for this query only.
+                Higher values trade latency for recall. Defaults to the server setting.
+            use_quantized (bool, optional): Generate candidates from the store's int8 codes instead of
+                the vector index, then re-score them with full precision. Requires a quantized store.
+            oversample (int, optional): Candidates generated per requested result when `use_quantized` is set (default 4).
+            max_distance (float, optional): Return every document within this distance instead of the top `k`.
+                `k` is then the initial candidate window, which grows until the threshold is passed
+                (up to MAX_RANGE_SEARCH_RESULTS results).
+            include_document (bool, optional): Return the full document text (default True).
+            snippet_chars (int, optional): Return only the first `snippet_chars` characters as `snippet`,
+                with `document_length`, instead of the document.
+            include_metadata (bool, optional): Return the metadata (default True).
+            metadata_keys (List[str], optional): Return only these metadata keys.
+        Returns:
+            List of dicts with document, metadata, and distance. When the full document is not
+            returned, each result carries its `id` for a later `get_docs_vector_store` call.
+        """
+        # Input validation
+        if not user_query or not isinstance(user_query, str):
+            logger.error("user_query must be a non-empty string.")
+            raise ValueError("user_query must be a non-empty string.")
+        statement_vars = self._validate_search_args(database_name, vector_store_name, k, ef_search, use_quantized, oversample, max_distance)
+        columns = self._projection_columns(include_document, snippet_chars, include_metadata, metadata_keys)
+        info = await self._require_store_info(database_name, vector_store_name)
+        if use_quantized:
+            self._require_quantized(database_name, vector_store_name, info)
+
+        async def search():
+            # Generate embedding for the query
+            embedding = await embedding_service.embed(user_query, model_name=info["model_name"])
+            query_vector = self._fit_embeddings(embedding, info["dimension"], info["model_name"])[0]
+            return await self._search_with_vector(database_name, vector_store_name, info, query_vector, k, statement_vars,
+                                                  use_quantized, oversample, max_distance, columns)
+
+        options = dict(k=k, ef_search=ef_search, use_quantized=use_quantized, oversample=oversample, max_distance=max_distance, columns=columns)
+        return await self._cached_search(database_name, vector_store_name, ("text", info["model_name"], user_query), options, search)
+
+    @staticmethod
+    def _decode_query_vector(vector: Any) -> np.ndarray:
+        """
+        Parses a query vector given as a list of numbers, a JSON array string, or base64
+        of little-endian float32 bytes.
+        """
+        import base64
+        import binascii
+        import json
+        if isinstance(vector, str):
+            text = vector.strip()
+            if text.startswith("["):
+                try:
+                    vector = json.loads(text)
+                except ValueError as e:
+                    raise ValueError(f"vector is not a valid JSON array: {e}") from e
+            else:
+                try:
+                    raw = base64.b64decode(text, validate=True)
+                except (binascii.Error, ValueError) as e:
+                    raise ValueError(f"vector is neither a JSON array nor valid base64: {e}") from e
+                if not raw or len(raw) % 4:
+                    raise ValueError("base64 vector must decode to a whole number of float32 values.")
+                return np.frombuffer(raw, dtype="<f4")
+        if not isinstance(vector, list) or not vector or not all(isinstance(x, (int, float)) and not isinstance(x, bool) for x in vector):
+            raise ValueError("vector must be a non-empty list of numbers.")
+        return np.asarray(vector, dtype="<f4")
+
+    async def search_vector_store_by_vector(self, vector: Any, database_name: str, vector_store_name: str, k: int = 7,
+                                            ef_search: Optional[int] = None, use_quantized: bool = False, oversample: int = 4,
+                                            max_distance: Optional[float] = None, include_document: bool = True,
+                                            snippet_chars: Optional[int] = None, include_metadata: bool = True,
+                                            metadata_keys: Optional[List[str]] = None) -> list:
+        """
+        Searches a vector store with a precomputed query embedding, without calling the
+        embedding provider. Takes the same options as `search_vector_store`.
+        Parameters:
+            vector (list | str): The query embedding as a list of numbers, a JSON array string,
+                or base64 of little-endian float32 bytes. Its dimension must match the store.
+        Returns:
+            List of dicts with document, metadata, and distance.
+        """
+        statement_vars = self._validate_search_args(database_name, vector_store_name, k, ef_search, use_quantized, oversample, max_distance)
+        columns = self._projection_columns(include_document, snippet_chars, include_metadata, metadata_keys)
+        try:
+            query_vector = self._decode_query_vector(vector)
+        except ValueError as e:
+            logger.error(f"Invalid query vector: {e}")
+            raise
+        if not np.all(np.isfinite(query_vector)):
+            logger.error("Query vector contains NaN or infinite values.")
+            raise ValueError("vector must not contain NaN or infinite values.")
+        info = await self._require_store_info(database_name, vector_store_name)
+        if query_vector.shape[0] != info["dimension"]:
+            logger.error(f"Query vector has dimension {query_vector.shape[0]}, but '{database_name}.{vector_store_name}' expects {info['dimension']}.")
+            raise ValueError(f"Query vector has dimension {query_vector.shape[0]}, but vector store '{vector_store_name}' expects {info['dimension']}.")
+        if use_quantized:
+            self._require_quantized(database_name, vector_store_name, info)
+
+        async def search():
+            return await self._search_with_vector(database_name, vector_store_name, info, query_vector, k, statement_vars,
+                                                  use_quantized, oversample, max_distance, columns)
+
+        options = dict(k=k, ef_search=ef_search, use_quantized=use_quantized, oversample=oversample, max_distance=max_distance, columns=columns)
+        return await self._cached_search(database_name, vector_store_name, ("vector", SearchCache.vector_digest(query_vector)), options, search)
+
+    async def get_search_cache_stats(self) -> Dict[str, Any]:
+        """Size, hit ratio and eviction count of the search result cache."""
+        stats = self.search_cache.stats()
+        logger.info(f"TOOL END: get_search_cache_stats: {stats}")
+        return stats
+
+    async def get_docs_vector_store(self, database_name: str, vector_store_name: str, ids: List[str],
+                                    include_metadata: bool = True, metadata_keys: Optional[List[str]] = None,
+                                    snippet_chars: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Fetches documents by id with a single primary-key IN query, typically for the
+        hits of a search that returned ids and distances only.
+
+        Parameters:
+        - database_name (str): The database name.
+        - vector_store_name (str): The vector store (table) name.
+        - ids (List[str]): Document ids (at most MAX_GET_DOCS_IDS).
+        - include_metadata (bool, optional): Return the metadata (default True).
+        - metadata_keys (List[str], optional): Return only these metadata keys.
+        - snippet_chars (int, optional): Return a `snippet` of this many characters instead of the document.
+
+        Returns:
+        - List[Dict[str, Any]]: The found documents, in the order of `ids`. Unknown ids are skipped.
+        """
+        import json
+        logger.info(f"TOOL START: get_docs_vector_store called. DB: '{database_name}', Store: '{vector_store_name}', IDs: {len(ids) if ids else 0}")
+        if not database_name or not database_name.isidentifier():
+            logger.error(f"Invalid database_name: '{database_name}'")
+            raise ValueError(f"Invalid database_name: '{database_name}'")
+        if not vector_store_name or not vector_store_name.isidentifier():
+            logger.error(f"Invalid vector_store_name: '{vector_store_name}'")
+            raise ValueError(f"Invalid vector_store_name: '{vector_store_name}'")
+        if not ids or not isinstance(ids, list) or not all(isinstance(i, str) and i for i in ids):
+            logger.error("ids must be a non-empty list of strings.")
+            raise ValueError("ids must be a non-empty list of strings.")
+        if len(ids) > MAX_GET_DOCS_IDS:
+            logger.error(f"get_docs_vector_store accepts at most {MAX_GET_DOCS_IDS} ids.")
+            raise ValueError(f"At most {MAX_GET_DOCS_IDS} ids can be fetched per call.")
+        columns = self._projection_columns(True, snippet_chars, include_metadata, metadata_keys)
+        await self._require_store_info(database_name, vector_store_name)
+        unique_ids = list(dict.fromkeys(ids))
+        docs = await self._fetch_docs_by_id(database_name, vector_store_name, unique_ids, columns)
+        results = []
+        for doc_id in unique_ids:
+            row = docs.get(doc_id)
+            if row is None:
+                continue
+            if isinstance(row.get('metadata'), str):
+                try:
+                    row['metadata'] = json.loads(row['metadata'])
+                except Exception:
+                    pass
+            results.append(row)
+        logger.info(f"TOOL END: get_docs_vector_store returned {len(results)} of {len(unique_ids)} documents.")
+        return results
+
+    # --- Sharded Vector Stores ---
+
+    async def _get_sharded_store(self, database_name: str, sharded_store_name: str) -> ShardedStore:
+        """Returns a sharded store from the in-memory mirror or its catalog table; raises ValueError if unknown."""
+        import json
+        if not database_name or not database_name.isidentifier():
+            logger.error(f"Invalid database_name: '{database_name}'")
+            raise ValueError(f"Invalid database_name: '{database_name}'")
+        if not sharded_store_name or not sharded_store_name.isidentifier():
+            logger.error(f"Invalid sharded_store_name: '{sharded_store_name}'")
+            raise ValueError(f"Invalid sharded_store_name: '{sharded_store_name}'")
+        key = (database_name, sharded_store_name)
+        store = self._sharded_stores.get(key)
+        if store is not None:
+            return store
+        rows = []
+        if await self._table_exists(database_name, SHARDED_STORE_CATALOG_TABLE):
+            rows = await self._execute_query(
+                f"SELECT store_name, shard_key, shards FROM `{database_name}`.`{SHARDED_STORE_CATALOG_TABLE}` WHERE store_name = %s",
+                params=(sharded_store_name,), database=database_name)
+        if not rows:
+            logger.error(f"Sharded vector store '{database_name}.{sharded_store_name}' does not exist.")
+            raise ValueError(f"Sharded vector store '{database_name}.{sharded_store_name}' does not exist.")
+        shards = rows[0]["shards"]
+        if isinstance(shards, str):
+            shards = json.loads(shards)
+        store = ShardedStore(rows[0]["store_name"], rows[0]["shard_key"], parse_shards(shards, database_name))
+        self._sharded_stores[key] = store
+        return store
+
+    async def _shard_infos(self, store: ShardedStore) -> Dict[str, Any]:
+        """Store info shared by all shards. Raises ValueError if a shard is missing or the shards disagree."""
+        infos = await asyncio.gather(*(self._require_store_info(shard.database_name, shard.vector_store_name) for shard in store.shards))
+        first = infos[0]
+        for shard, info in zip(store.shards, infos):
+            if (info["model_name"], info["dimension"], info["distance_function"]) != (first["model_name"], first["dimension"], first["distance_function"]):
+                logger.error(f"Shard {shard.label} of '{store.name}' uses a different model, dimension or distance function.")
+                raise ValueError(f"All shards of '{store.name}' must use the same model, dimension and distance function; {shard.label} differs.")
+        return first
+
+    async def create_sharded_vector_store(self,
+                                          database_name: str,
+                                          sharded_store_name: str,
+                                          shard_key: str,
+                                          shards: List[Dict[str, Any]],
+                                          model_name: Optional[str] = None,
+                                          distance_function: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Defines a sharded vector store: a shard key and a list of member stores, recorded in
+        the database's sharded store catalog. Member stores that do not exist yet are created
+        with `model_name` and `distance_function`; all members must use the same model,
+        dimension and distance function.
+
+        Parameters:
+        - database_name (str): The database holding the sharded store definition.
+        - sharded_store_name (str): Name of the sharded store.
+        - shard_key (str): Metadata field used to route inserts.
+        - shards (List[dict]): Member stores as `{"vector_store_name", "database_name" (optional, defaults to
+          `database_name`), "values" (optional list of shard key values routed to this member)}`.
+          Values not listed anywhere are hashed over the members without a `values` list.
+        - model_name (str, optional): Embedding model for new members.
+        - distance_function (str, optional): Distance function for new members.
+
+        Returns:
+        - Dict[str, Any]: Status, the sharded store definition and the members that were created.
+        """
+        import json
+        logger.info(f"TOOL START: create_sharded_vector_store called. DB: '{database_name}', Sharded store: '{sharded_store_name}', Key: '{shard_key}', Shards: {len(shards) if shards else 0}")
+        if not database_name or not database_name.isidentifier():
+            logger.error(f"Invalid database_name: '{database_name}'")
+            raise ValueError(f"Invalid database_name: '{database_name}'")
+        if not sharded_store_name or not sharded_store_name.isidentifier():
+            logger.error(f"Invalid sharded_store_name: '{sharded_store_name}'")
+            raise ValueError(f"Invalid sharded_store_name: '{sharded_store_name}'")
+        if not isinstance(shard_key, str) or not METADATA_KEY_PATTERN.fullmatch(shard_key):
+            logger.error(f"Invalid shard_key: {shard_key!r}")
+            raise ValueError("shard_key must be a metadata key made of letters, digits and underscores.")
+        if self.is_read_only:
+            logger.warning("Blocked create_sharded_vector_store in read-only mode.")
+            raise PermissionError("Operation forbidden: Server is in read-only mode.")
+        store = ShardedStore(sharded_store_name, shard_key, parse_shards(shards, database_name))
+
+        created = []
+        for shard in store.shards:
+            if await self._get_store_info(shard.database_name, shard.vector_store_name) is None:
+                await self.create_vector_store(shard.database_name, shard.vector_store_name, model_name, distance_function)
+                created.append(shard.label)
+        await self._shard_infos(store)
+
+        await self._execute_query(f"""
+        CREATE TABLE IF NOT EXISTS `{database_name}`.`{SHARDED_STORE_CATALOG_TABLE}` (
+            store_name VARCHAR(64) NOT NULL PRIMARY KEY,
+            shard_key VARCHAR(64) NOT NULL,
+            shards JSON NOT NULL,
+            created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+        """, database=database_name)
+        await self._execute_query(
+            f"INSERT INTO `{database_name}`.`{SHARDED_STORE_CATALOG_TABLE}` (store_name, shard_key, shards) VALUES (%s, %s, %s) "
+            "ON DUPLICATE KEY UPDATE shard_key = VALUES(shard_key), shards = VALUES(shards)",
+            params=(sharded_store_name, shard_key, json.dumps([shard.to_dict() for shard in store.shards])), database=database_name)
+        self._sharded_stores[(database_name, sharded_store_name)] = store
+        logger.info(f"TOOL END: create_sharded_vector_store recorded '{database_name}.{sharded_store_name}' with {len(store.shards)} shards ({len(created)} created).")
+        return {"status": "success", "database_name": database_name, **store.to_dict(), "created": created}
+
+    async def search_sharded_vector_store(self, user_query: str, database_name: str, sharded_store_name: str, k: int = 7,
+                                          ef_search: Optional[int] = None, max_distance: Optional[float] = None,
+                                          include_document: bool = True, snippet_chars: Optional[int] = None,
+                                          include_metadata: bool = True, metadata_keys: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Searches every shard of a sharded vector store concurrently and merges the
+        per-shard top-k lists into a global top-k. The query is embedded once.
+        Each result carries a `shard` field naming the member store it came from.
+
+        Returns `{"results": [...], "failed_shards": [{"shard", "error"}]}`: the merge covers only
+        the shards that answered, so a non-empty `failed_shards` means the top-k is incomplete.
+        Raises RuntimeError if no shard answered.
+        """
+        if not user_query or not isinstance(user_query, str):
+            logger.error("user_query must be a non-empty string.")
+            raise ValueError("user_query must be a non-empty string.")
+        statement_vars = self._validate_search_args(database_name, sharded_store_name, k, ef_search, False, 1, max_distance)
+        columns = self._projection_columns(include_document, snippet_chars, include_metadata, metadata_keys)
+        store = await self._get_sharded_store(database_name, sharded_store_name)
+        info = await self._shard_infos(store)
+        embedding = await embedding_service.embed(user_query, model_name=info["model_name"])
+        query_vector = self._fit_embeddings(embedding, info["dimension"], info["model_name"])[0]
+
+        failed_shards = []
+
+        async def search_shard(shard):
+            try:
+                shard_info = await self._require_store_info(shard.database_name, shard.vector_store_name)
+                rows = await self._search_with_vector(shard.database_name, shard.vector_store_name, shard_info, query_vector, k,
+                                                      statement_vars, False, 1, max_distance, columns, raise_errors=True)
+            except Exception as e:
+                logger.warning(f"Shard {shard.label} of '{sharded_store_name}' failed and is left out of the merge: {e}")
+                failed_shards.append({"shard": shard.label, "error": str(e)})
+                return []
+            for row in rows:
+                row["shard"] = shard.label
+            return rows
+
+        started = time.perf_counter()
+        per_shard = await asyncio.gather(*(search_shard(shard) for shard in store.shards))
+        if len(failed_shards) == len(store.shards):
+            logger.error(f"Sharded search in {database_name}.{sharded_store_name} failed on every shard.")
+            raise RuntimeError(f"Search failed on every shard of '{sharded_store_name}': {failed_shards[0]['error']}")
+        results = merge_top_k(per_shard, MAX_RANGE_SEARCH_RESULTS if max_distance is not None else k)
+        logger.info(f"Sharded search in {database_name}.{sharded_store_name} over {len(store.shards)} shards returned {len(results)} results "
+                    f"in {(time.perf_counter() - started) * 1000:.1f} ms ({len(failed_shards)} shards failed).")
+        return {"results": results, "failed_shards": failed_shards}
+
+    async def insert_docs_sharded_vector_store(self, database_name: str, sharded_store_name: str, documents: List[str],
+                                               metadata: Optional[List[dict]] = None) -> Dict[str, Any]:
+        """
+        Routes each document to a shard by the value of the shard key in its metadata and
+        inserts every shard's documents concurrently with `insert_docs_vector_store`.
+        Returns the total inserted and the per-shard results.
+        """
+        logger.info(f"TOOL START: insert_docs_sharded_vector_store called. DB: '{database_name}', Sharded store: '{sharded_store_name}', Docs: {len(documents) if documents else 0}")
+        if not database_name or not database_name.isidentifier():
+            logger.error(f"Invalid database_name: '{database_name}'")
+            raise ValueError(f"Invalid database_name: '{database_name}'")
+        if not sharded_store_name or not sharded_store_name.isidentifier():
+            logger.error(f"Invalid sharded_store_name: '{sharded_store_name}'")
+            raise ValueError(f"Invalid sharded_store_name: '{sharded_store_name}'")
+        if not documents or not isinstance(documents, list) or not all(isinstance(doc, str) and doc for doc in documents):
+            logger.error("documents must be a non-empty list of non-empty strings.")
+            raise ValueError("documents must be a non-empty list of non-empty strings.")
+        metadata = metadata or [{} for _ in documents]
+        if len(metadata) != len(documents):
+            logger.error("Length of metadata must match length of documents.")
+            raise ValueError("Length of metadata must match length of documents.")
+        store = await self._get_sharded_store(database_name, sharded_store_name)
+        groups = group_by_shard(store, metadata)
+
+        async def insert_shard(shard, positions):
+            return shard.label, await self.insert_docs_vector_store(shard.database_name, shard.vector_store_name,
+                                                                    [documents[i] for i in positions], [metadata[i] for i in positions])
+
+        per_shard = dict(await asyncio.gather(*(insert_shard(shard, positions) for shard, positions in groups)))
+        inserted = sum(result.get("inserted", 0) for result in per_shard.values())
+        status = "success" if all(result.get("status") == "success" for result in per_shard.values()) else "partial"
+        logger.info(f"TOOL END: insert_docs_sharded_vector_store inserted {inserted} documents across {len(per_shard)} shards.")
+        return {"status": status, "inserted": inserted, "shards": per_shard}
+
+    @staticmethod
+    def _latency_summary(samples: List[float]) -> Dict[str, float]:
+        """p50/p99/mean in milliseconds of latencies measured in seconds."""
+        arr = np.asarray(samples) * 1000.0
+        return {
+            "p50": round(float(np.percentile(arr, 50)), 3),
+            "p99": round(float(np.percentile(arr, 99)), 3),
+            "mean": round(float(arr.mean()), 3),
+        }
+
+    async def benchmark_vector_store(self,
+                                     database_name: str,
+                                     vector_store_name: str,
+                                     k: int = 10,
+                                     num_queries: int = 20,
+                                     ef_search_values: Optional[List[int]] = None,
+                                     oversample_values: Optional[List[int]] = None) -> Dict[str, Any]:
+        """
+        Measures the recall/latency trade-off of a vector store's MHNSW index.
+
+        Samples `num_queries` stored vectors as queries, computes the exact top-k for each
+        with a brute-force scan (index ignored), then runs the indexed search once per
+        `ef_search` value and reports recall@k and p50/p99 latency for each setting.
+        For int8-quantized stores the candidate-generation + re-score path is also measured
+        once per `oversample` value. The store's dimension and on-disk size are reported
+        alongside, so stores created with different compaction settings can be compared.
+        Queries run one at a time so latencies are not skewed by pool contention.
+
+        Parameters:
+        - database_name (str): The database name.
+        - vector_store_name (str): The vector store (table) name.
+        - k (int, optional): Number of neighbours per query (default 10).
+        - num_queries (int, optional): Number of sampled query vectors (default 20).
+        - ef_search_values (List[int], optional): `mhnsw_ef_search` values to sweep.
+          Defaults to [10, 20, 40, 80, 160].
+        - oversample_values (List[int], optional): Oversampling factors to sweep for quantized stores.
+          Defaults to [2, 4, 8].
+
+        Returns:
+        - Dict[str, Any]: Per-setting recall and latency, plus the exact-scan latency for reference.
+        """
+        import json
+
+        logger.info(f"TOOL START: benchmark_vector_store called for '{database_name}.{vector_store_name}' (k={k}, num_queries={num_queries}, ef_search_values={ef_search_values})")
+        if not database_name or not database_name.isidentifier():
+            logger.error(f"Invalid database_name: '{database_name}'")
+            raise ValueError(f"Invalid database_name: '{database_name}'")
+        if not vector_store_name or not vector_store_name.isidentifier():
+            logger.error(f"Invalid vector_store_name: '{vector_store_name}'")
+            raise ValueError(f"Invalid vector_store_name: '{vector_store_name}'")
+        if not isinstance(k, int) or k <= 0:
+            logger.error("k must be a positive integer.")
+            raise ValueError("k must be a positive integer.")
+        if not isinstance(num_queries, int) or num_queries <= 0:
+            logger.error("num_queries must be a positive integer.")
+            raise ValueError("num_queries must be a positive integer.")
+        ef_search_values = ef_search_values or DEFAULT_BENCHMARK_EF_SEARCH
+        for ef in ef_search_values:
+            self._validate_ef_search(ef)
+        oversample_values = oversample_values or DEFAULT_BENCHMARK_OVERSAMPLE
+        if not all(isinstance(o, int) and o > 0 for o in oversample_values):
+            logger.error("oversample_values must be positive integers.")
+            raise ValueError("oversample_values must be positive integers.")
+
+        if not await self._is_vector_store(database_name, vector_store_name):
+            message = f"Table '{vector_store_name}' in database '{database_name}' is not a valid vector store."
+            logger.warning(message)
+            return {"status": "not_vector_store", "message": message}
+
+        sample_query = f"SELECT VEC_ToText(embedding) AS embedding FROM `{database_name}`.`{vector_store_name}` ORDER BY RAND() LIMIT %s"
+        samples = await self._execute_query(sample_query, params=(num_queries,), database=database_name)
+        query_vectors = [row['embedding'] for row in samples if row.get('embedding')]
+        if not query_vectors:
+            message = f"Vector store '{database_name}.{vector_store_name}' is empty; nothing to benchmark."
+            logger.info(f"TOOL END: benchmark_vector_store. {message}")
+            return {"status": "empty", "message": message}
+
+        info = await self._require_store_info(database_name, vector_store_name)
+
+        # Ground truth from an exact scan
+        exact_query = self._build_search_query(database_name, vector_store_name, info["distance_function"], exact=True)
+        ground_truth = []
+        exact_latencies = []
+        for vec in query_vectors:
+            started = time.perf_counter()
+            rows = await self._execute_query(exact_query, params=(vec, k), database=database_name)
+            exact_latencies.append(time.perf_counter() - started)
+            ground_truth.append({row['id'] for row in rows})
+
+        storage = await self._table_storage(database_name, vector_store_name)
+
+        ann_query = self._build_search_query(database_name, vector_store_name, info["distance_function"])
+        settings = []
+        for ef in ef_search_values:
+            statement_vars = self._validate_ef_search(ef)
+            latencies = []
+            recalls = []
+            for vec, truth in zip(query_vectors, ground_truth):
+                started = time.perf_counter()
+                rows = await self._execute_query(ann_query, params=(vec, k), database=database_name, statement_vars=statement_vars)
+                latencies.append(time.perf_counter() - started)
+                if truth:
+                    recalls.append(len(truth & {row['id'] for row in rows}) / len(truth))
+            settings.append({
+                "ef_search": ef,
+                "recall_at_k": round(float(np.mean(recalls)), 4) if recalls else None,
+                "latency_ms": self._latency_summary(latencies),
+            })
+
+        quantized_settings = []
+        if info["quantized"]:
+            parsed_vectors = [np.asarray(json.loads(vec), dtype=np.float32) for vec in query_vectors]
+            for oversample in oversample_values:
+                latencies = []
+                recalls = []
+                for vec, truth in zip(parsed_vectors, ground_truth):
+                    started = time.perf_counter()
+                    rows = await self._search_quantized(database_name, vector_store_name, vec, info, k, oversample)
+                    latencies.append(time.perf_counter() - started)
+                    if truth:
+                        recalls.append(len(truth & {row['id'] for row in rows}) / len(truth))
+                quantized_settings.append({
+                    "oversample": oversample,
+                    "recall_at_k": round(float(np.mean(recalls)), 4) if recalls else None,
+                    "latency_ms": self._latency_summary(latencies),
+                })
+
+        logger.info(f"TOOL END: benchmark_vector_store completed for '{database_name}.{vector_store_name}' over {len(query_vectors)} queries.")
+        return {
+            "status": "success",
+            "database_name": database_name,
+            "vector_store_name": vector_store_name,
+            "k": k,
+            "num_queries": len(query_vectors),
+            "model_name": info["model_name"],
+            "dimension": info["dimension"],
+            "distance_function": info["distance_function"],
+            "quantized": info["quantized"],
+            "storage": {
+                "rows": storage.get('TABLE_ROWS'),
+                "data_bytes": storage.get('DATA_LENGTH'),
+                "index_bytes": storage.get('INDEX_LENGTH'),
+            },
+            "exact_latency_ms": self._latency_summary(exact_latencies),
+            "results": settings,
+            "quantized_results": quantized_settings,
+        }
+
+    async def vector_store_stats(self, database_name: str, vector_store_name: str) -> Dict[str, Any]:
+        """
+        Reports size and fragmentation of a vector store from catalog statistics only, so it
+        is cheap on stores of any size: estimated rows, data/index bytes and `data_free`
+        from information_schema.TABLES, and the average document length from the engine-
+        independent statistics in mysql.column_stats. Row counts are InnoDB estimates, and the
+        document length is only available after `maintain_vector_store(operation="analyze")`
+        (or any ANALYZE TABLE ... PERSISTENT FOR ALL) has collected it; otherwise it is null.
+
+        Parameters:
+        - database_name (str): The database name.
+        - vector_store_name (str): The vector store (table) name.
+
+        Returns:
+        - Dict[str, Any]: Catalog settings of the store plus its storage statistics.
+        """
+        logger.info(f"TOOL START: vector_store_stats called for '{database_name}.{vector_store_name}'")
+        if not database_name or not database_name.isidentifier():
+            logger.error(f"Invalid database_name: '{database_name}'")
+            raise ValueError(f"Invalid database_name: '{database_name}'")
+        if not vector_store_name or not vector_store_name.isidentifier():
+            logger.error(f"Invalid vector_store_name: '{vector_store_name}'")
+            raise ValueError(f"Invalid vector_store_name: '{vector_store_name}'")
+        info = await self._require_store_info(database_name, vector_store_name)
+        storage = await self._table_storage(database_name, vector_store_name)
+
+        avg_document_length = None
+        try:
+            column_stats = await self._execute_query(
+                "SELECT avg_length FROM mysql.column_stats WHERE db_name = %s AND table_name = %s AND column_name = 'document'",
+                params=(database_name, vector_store_name), database=database_name)
+            if column_stats and column_stats[0].get('avg_length') is not None:
+                avg_document_length = round(float(column_stats[0]['avg_length']), 1)
+        except RuntimeError as e:
+            # mysql.column_stats may not be readable by this user; the statistic is optional
+            logger.warning(f"Could not read column statistics of '{database_name}.{vector_store_name}': {e}")
+
+        data_bytes = int(storage.get('DATA_LENGTH') or 0)
+        index_bytes = int(storage.get('INDEX_LENGTH') or 0)
+        free_bytes = int(storage.get('DATA_FREE') or 0)
+        allocated = data_bytes + index_bytes + free_bytes
+        updated_at = storage.get('UPDATE_TIME')
+        stats = {
+            "database_name": database_name,
+            "vector_store_name": vector_store_name,
+            "model_name": info["model_name"],
+            "dimension": info["dimension"],
+            "distance_function": info["distance_function"],
+            "quantized": info["quantized"],
+            "deduplicated": info["deduplicated"],
+            "rows_estimate": storage.get('TABLE_ROWS'),
+            "data_bytes": data_bytes,
+            "index_bytes": index_bytes,
+            "data_free_bytes": free_bytes,
+            "fragmentation_ratio": round(free_bytes / allocated, 4) if allocated else None,
+            "avg_row_bytes": storage.get('AVG_ROW_LENGTH'),
+            "avg_document_length": avg_document_length,
+            "updated_at": updated_at.isoformat() if hasattr(updated_at, "isoformat") else updated_at,
+        }
+        logger.info(f"TOOL END: vector_store_stats for '{database_name}.{vector_store_name}': {stats['rows_estimate']} rows, "
+                    f"{data_bytes + index_bytes} bytes, fragmentation {stats['fragmentation_ratio']}.")
+        return stats
+
+    async def _probe_latency(self, database_name: str, vector_store_name: str, info: Dict[str, Any],
+                             query_vectors: List[str], k: int) -> Optional[Dict[str, float]]:
+        """Times one indexed search per probe vector, one at a time; None without probes."""
+        if not query_vectors:
+            return None
+        ann_query = self._build_search_query(database_name, vector_store_name, info["distance_function"], columns=("id",))
+        latencies = []
+        for vec in query_vectors:
+            started = time.perf_counter()
+            await self._execute_query(ann_query, params=(vec, k), database=database_name)
+            latencies.append(time.perf_counter() - started)
+        return self._latency_summary(latencies)
+
+    async def maintain_vector_store(self,
+                                    database_name: str,
+                                    vector_store_name: str,
+                                    operation: str = "optimize",
+                                    maintenance_window: Optional[str] = None,
+                                    probe_queries: int = MAINTENANCE_PROBE_QUERIES,
+                                    k: int = 10,
+                                    progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        """
+        Runs table maintenance on a vector store and reports search latency before and after.
+
+        - "optimize" runs OPTIMIZE TABLE, which rebuilds the table and its MHNSW index, reclaiming
+          the space and graph quality lost to deletes and updates. The table stays readable but
+          writes wait for the rebuild, so it is best run in a quiet period.
+        - "analyze" runs ANALYZE TABLE ... PERSISTENT FOR ALL, refreshing the optimizer and
+          column statistics (including the average document length in `vector_store_stats`).
+
+        If a maintenance window is set ("HH:MM-HH:MM" in server local time, may wrap past
+        midnight; falls back to MCP_MAINTENANCE_WINDOW), the call is refused outside the window,
+        and the operation is killed (and rolled back) if it is still running when the window
+        closes. `submit_maintenance_job` schedules the job to start when the window opens.
+        The same `probe_queries` stored vectors are searched before and after the operation.
+
+        Parameters:
+        - database_name (str): The database name.
+        - vector_store_name (str): The vector store (table) name.
+        - operation (str, optional): "optimize" (default) or "analyze".
+        - maintenance_window (str, optional): Daily window to run in, e.g. "02:00-05:00".
+        - probe_queries (int, optional): Sampled stored vectors used to time searches (0 disables).
+        - k (int, optional): Neighbours per probe search (default 10).
+        - progress (callable, optional): Called as `progress(step, steps, message)` between steps.
+
+        Returns:
+        - Dict[str, Any]: Status, elapsed time of the operation, stats and probe latency before and after.
+        """
+        logger.info(f"TOOL START: maintain_vector_store called for '{database_name}.{vector_store_name}' (operation={operation}, window={maintenance_window})")
+        if not database_name or not database_name.isidentifier():
+            logger.error(f"Invalid database_name: '{database_name}'")
+            raise ValueError(f"Invalid database_name: '{database_name}'")
+        if not vector_store_name or not vector_store_name.isidentifier():
+            logger.error(f"Invalid vector_store_name: '{vector_store_name}'")
+            raise ValueError(f"Invalid vector_store_name: '{vector_store_name}'")
+        if operation not in VALID_MAINTENANCE_OPERATIONS:
+            logger.error(f"Invalid operation: '{operation}'. Must be one of {list(VALID_MAINTENANCE_OPERATIONS)}.")
+            raise ValueError(f"Invalid operation: '{operation}'. Must be one of {list(VALID_MAINTENANCE_OPERATIONS)}.")
+        if not isinstance(probe_queries, int) or isinstance(probe_queries, bool) or probe_queries < 0:
+            logger.error("probe_queries must be a non-negative integer.")
+            raise ValueError("probe_queries must be a non-negative integer.")
+        if not isinstance(k, int) or k <= 0:
+            logger.error("k must be a positive integer.")
+            raise ValueError("k must be a positive integer.")
+        window = maintenance_window or MCP_MAINTENANCE_WINDOW or None
+        if window:
+            parse_window(window)
+        if self.is_read_only:
+            logger.warning("Blocked maintain_vector_store in read-only mode.")
+            raise PermissionError("Operation forbidden: Server is in read-only mode.")
+
+        info = await self._require_store_info(database_name, vector_store_name)
+        steps = 3
+
+        delay = seconds_until_window(window)
+        if delay:
+            message = f"Outside the maintenance window {window}; it opens in {delay:.0f}s. Run with background=true to schedule it."
+            logger.warning(f"maintain_vector_store refused for '{database_name}.{vector_store_name}': {message}")
+            return {"status": "error", "message": message, "operation": operation, "starts_in_seconds": round(delay)}
+
+        query_vectors: List[str] = []
+        if probe_queries:
+            sample_query = f"SELECT VEC_ToText(embedding) AS embedding FROM `{database_name}`.`{vector_store_name}` ORDER BY RAND() LIMIT %s"
+            samples = await self._execute_query(sample_query, params=(probe_queries,), database=database_name)
+            query_vectors = [row['embedding'] for row in samples if row.get('embedding')]
+        stats_before = await self.vector_store_stats(database_name, vector_store_name)
+        latency_before = await self._probe_latency(database_name, vector_store_name, info, query_vectors, k)
+        if progress:
+            progress(1, steps, f"running {operation}")
+
+        statement = (f"OPTIMIZE TABLE `{database_name}`.`{vector_store_name}`" if operation == "optimize"
+                     else f"ANALYZE TABLE `{database_name}`.`{vector_store_name}` PERSISTENT FOR ALL")
+        # The operation must not outlast the window; a killed OPTIMIZE leaves the table as it was
+        budget = seconds_left_in_window(window)
+        if budget is not None and deadlines.remaining() is not None:
+            budget = min(budget, deadlines.remaining())
+        if budget is not None and budget <= 0:
+            message = f"The maintenance window {window} closed before {operation} could start."
+            logger.warning(f"maintain_vector_store skipped for '{database_name}.{vector_store_name}': {message}")
+            return {"status": "error", "message": message, "operation": operation}
+        started = time.perf_counter()
+        try:
+            rows = await self._execute_query(statement, database=database_name, timeout=budget)
+        except TimeoutError:
+            limit = f"the end of the maintenance window {window}" if window else "its deadline"
+            message = (f"{operation} of '{database_name}.{vector_store_name}' was stopped after {time.perf_counter() - started:.0f}s "
+                       f"at {limit}; the table is unchanged.")
+            logger.error(message)
+            return {"status": "error", "message": message, "operation": operation}
+        elapsed = time.perf_counter() - started
+        messages = [f"{row.get('Msg_type')}: {row.get('Msg_text')}" for row in rows]
+        errors = [row.get('Msg_text') for row in rows if str(row.get('Msg_type', '')).lower() == 'error']
+        if errors:
+            message = f"{operation} of '{database_name}.{vector_store_name}' failed: {'; '.join(map(str, errors))}"
+            logger.error(message)
+            return {"status": "error", "message": message, "operation": operation, "messages": messages}
+        self._store_changed(database_name, vector_store_name)
+        if progress:
+            progress(2, steps, f"{operation} finished in {elapsed:.1f}s; measuring latency")
+
+        stats_after = await self.vector_store_stats(database_name, vector_store_name)
+        latency_after = await self._probe_latency(database_name, vector_store_name, info, query_vectors, k)
+        if progress:
+            progress(steps, steps, "done")
+        logger.info(f"TOOL END: maintain_vector_store {operation} of '{database_name}.{vector_store_name}' took {elapsed:.1f}s.")
+        return {
+            "status": "success",
+            "database_name": database_name,
+            "vector_store_name": vector_store_name,
+            "operation": operation,
+            "elapsed_seconds": round(elapsed, 3),
+            "messages": messages,
+            "probe_queries": len(query_vectors),
+            "k": k,
+            "latency_ms_before": latency_before,
+            "latency_ms_after": latency_after,
+            "stats_before": stats_before,
+            "stats_after": stats_after,
+        }
+
+    # --- Background Jobs ---
+
+    def _submit_job(self, kind: str, params: Dict[str, Any], run: Callable[[Any], Awaitable[Any]], delay: float = 0.0) -> Dict[str, Any]:
+        """
+        Queues a background job whose connections are acquired in the pool's bulk priority class,
+        on the target of the submitting call. It starts no earlier than `delay` seconds from now.
+        """
+        target_id = current_target()
+
+        async def run_as_bulk(handle):
+            with pool_priority(BULK), use_target(target_id):
+                return await run(handle)
+
+        if target_id is not None:
+            params = {**params, "target": target_id}
+        return self.jobs.submit(kind, params, run_as_bulk, delay=delay)
+
+    async def submit_ingest_file_job(self, database_name: str, vector_store_name: str, file_path: str, **options) -> Dict[str, Any]:
+        """
+        Runs `ingest_file_vector_store` as a background job and returns the queued job.
+        Read-only mode and the file path are checked before queuing; progress is reported
+        in bytes of the file. A pipeline error fails the job with its resume offset.
+        """
+        if self.is_read_only:
+            logger.warning("Blocked ingest_file_vector_store in read-only mode.")
+            raise PermissionError("Operation forbidden: Server is in read-only mode.")
+        resolved_path = self._resolve_local_path(file_path)
+        detect_format(resolved_path, options.get("file_format"))
+
+        async def run(handle):
+            result = await self.ingest_file_vector_store(database_name, vector_store_name, resolved_path, progress=handle.report, **options)
+            if result["status"] == "error":
+                raise RuntimeError(f"{result.get('message')} (resume with start_offset={result['resume_offset']})")
+            return result
+
+        params = {"database_name": database_name, "vector_store_name": vector_store_name, "file_path": resolved_path, **options}
+        return self._submit_job("ingest_file_vector_store", params, run)
+
+    async def submit_import_embeddings_job(self, database_name: str, vector_store_name: str, embeddings_path: str, **options) -> Dict[str, Any]:
+        """
+        Runs `import_embeddings_vector_store` as a background job and returns the queued job.
+        Progress is reported in rows of the embeddings file.
+        """
+        if self.is_read_only:
+            logger.warning("Blocked import_embeddings_vector_store in read-only mode.")
+            raise PermissionError("Operation forbidden: Server is in read-only mode.")
+        resolved_path = self._resolve_local_path(embeddings_path)
+
+        async def run(handle):
+            result = await self.import_embeddings_vector_store(database_name, vector_store_name, resolved_path, progress=handle.report, **options)
+            if result["status"] == "error":
+                raise RuntimeError(f"{result.get('message')} (resume with resume=true from row {result['resume_row']})")
+            return result
+
+        params = {"database_name": database_name, "vector_store_name": vector_store_name, "embeddings_path": resolved_path, **options}
+        return self._submit_job("import_embeddings_vector_store", params, run)
+
+    async def submit_benchmark_job(self, database_name: str, vector_store_name: str, **options) -> Dict[str, Any]:
+        """Runs `benchmark_vector_store` as a background job and returns the queued job."""
+        async def run(handle):
+            return await self.benchmark_vector_store(database_name, vector_store_name, **options)
+
+        params = {"database_name": database_name, "vector_store_name": vector_store_name, **options}
+        return self._submit_job("benchmark_vector_store", params, run)
+
+    async def submit_reembed_job(self, database_name: str, vector_store_name: str, model_name: str, **options) -> Dict[str, Any]:
+        """
+        Runs `reembed_vector_store` as a background job and returns the queued job.
+        Progress is reported in rows, with throughput and ETA in the message.
+        """
+        if self.is_read_only:
+            logger.warning("Blocked reembed_vector_store in read-only mode.")
+            raise PermissionError("Operation forbidden: Server is in read-only mode.")
+
+        async def run(handle):
+            result = await self.reembed_vector_store(database_name, vector_store_name, model_name, progress=handle.report, **options)
+            if result["status"] == "error":
+                raise RuntimeError(result["message"])
+            return result
+
+        params = {"database_name": database_name, "vector_store_name": vector_store_name, "model_name": model_name, **options}
+        return self._submit_job("reembed_vector_store", params, run)
+
+    async def submit_maintenance_job(self, database_name: str, vector_store_name: str, **options) -> Dict[str, Any]:
+        """
+        Runs `maintain_vector_store` as a background job and returns the queued job.
+        With a maintenance window, the job is scheduled to start when the window opens and
+        holds no worker until then.
+        """
+        if self.is_read_only:
+            logger.warning("Blocked maintain_vector_store in read-only mode.")
+            raise PermissionError("Operation forbidden: Server is in read-only mode.")
+        window = options.get("maintenance_window") or MCP_MAINTENANCE_WINDOW or None
+        if window:
+            parse_window(window)
+
+        async def run(handle):
+            result = await self.maintain_vector_store(database_name, vector_store_name, progress=handle.report, **options)
+            if result["status"] == "error":
+                raise RuntimeError(result["message"])
+            return result
+
+        params = {"database_name": database_name, "vector_store_name": vector_store_name, **options}
+        return self._submit_job("maintain_vector_store", params, run, delay=seconds_until_window(window))
+
+    async def get_job(self, job_id: str) -> Dict[str, Any]:
+        """Returns the status and progress of a background job."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            logger.warning(f"Unknown job '{job_id}'.")
+            raise ValueError(f"Unknown job '{job_id}'.")
+        return job.to_dict()
+
+    async def list_jobs(self, status: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Lists recent background jobs, newest first, optionally filtered by status."""
+        if status is not None and status not in JOB_STATUSES:
+            logger.error(f"Invalid job status: '{status}'. Must be one of {list(JOB_STATUSES)}.")
+            raise ValueError(f"Invalid job status: '{status}'. Must be one of {list(JOB_STATUSES)}.")
+        if not isinstance(limit, int) or limit <= 0:
+            logger.error("limit must be a positive integer.")
+            raise ValueError("limit must be a positive integer.")
+        return self.jobs.list(status, limit)
+
+    async def cancel_job(self, job_id: str) -> Dict[str, Any]:
+        """Requests cancellation of a queued or running job."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            logger.warning(f"Unknown job '{job_id}'.")
+            raise ValueError(f"Unknown job '{job_id}'.")
+        if not self.jobs.cancel(job_id):
+            return {"status": "not_running", "job_id": job_id, "job_status": job.status}
+        logger.info(f"Cancellation requested for job {job_id}.")
+        return {"status": "cancelling", "job_id": job_id}
+
+    async def get_job_result(self, job_id: str) -> Dict[str, Any]:
+        """Returns a finished job with its result (or error)."""
+        job = self.jobs.get(job_id)
+        if job is None:
+            logger.warning(f"Unknown job '{job_id}'.")
+            raise ValueError(f"Unknown job '{job_id}'.")
+        return job.to_dict(include_result=True)
+
+    async def wait_job(self, job_id: str, timeout_seconds: float = 30, ctx: Optional[Context] = None) -> Dict[str, Any]:
+        """
+        Waits up to `timeout_seconds` for a job to finish. While waiting, every progress
+        update is forwarded to the client as an MCP progress notification (if the client
+        sent a progress token). Returns the job, with its result once it has finished.
+        """
+        if not isinstance(timeout_seconds, (int, float)) or not (0 <= timeout_seconds <= MAX_JOB_WAIT_SECONDS):
+            logger.error(f"timeout_seconds must be between 0 and {MAX_JOB_WAIT_SECONDS}.")
+            raise ValueError(f"timeout_seconds must be between 0 and {MAX_JOB_WAIT_SECONDS}.")
+
+        async def forward_progress(job):
+            if ctx is not None:
+                await ctx.report_progress(job.progress, job.total, job.message)
+
+        job = await self.jobs.wait(job_id, timeout_seconds, forward_progress)
+        if job is None:
+            logger.warning(f"Unknown job '{job_id}'.")
+            raise ValueError(f"Unknown job '{job_id}'.")
+        return job.to_dict(include_result=job.status == "succeeded")
+
     # --- Tool Registration (Synchronous) ---
     def register_tools(self):
         """Registers the class methods as MCP tools using the instance. This is synchronous."""
@@ -854,25 +3850,81 @@ class MariaDBServer:
             return await self.get_table_schema_with_relations(database_name, table_name)
             
         @self.mcp.tool
-        async def execute_sql(sql_query: str, database_name: str, parameters: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
-            """Executes a read-only SQL query against a specified database."""
-            return await self.execute_sql(sql_query, database_name, parameters)
+        async def execute_sql(sql_query: str, database_name: str, parameters: Optional[List[Any]] = None,
+                              timeout_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+            """Executes a read-only SQL query against a specified database.
+            timeout_seconds shortens the configured deadline; a query still running then is killed."""
+            return await self.execute_sql(sql_query, database_name, parameters, timeout_seconds)
+
+        @self.mcp.tool
+        async def execute_sql_fanout(sql_query: str, database_names: Optional[List[str]] = None, database_pattern: Optional[str] = None,
+                                     parameters: Optional[List[Any]] = None, max_concurrency: Optional[int] = None,
+                                     timeout_seconds_per_database: Optional[float] = None) -> Dict[str, Any]:
+            """Runs one read-only query in each listed schema, or each schema matching a LIKE pattern, concurrently.
+            Returns the merged rows with a source_database column and the errors of schemas that failed."""
+            return await self.execute_sql_fanout(sql_query, database_names, database_pattern, parameters, max_concurrency,
+                                                 timeout_seconds_per_database)
             
+        @self.mcp.tool
+        async def export_query(database_name: str, output_path: str, sql_query: Optional[str] = None, parameters: Optional[List[Any]] = None,
+                               vector_store_name: Optional[str] = None, file_format: Optional[str] = None, embedding_column: Optional[str] = None,
+                               id_column: str = "id", batch_size: int = 1000, overwrite: bool = False) -> Dict[str, Any]:
+            """Streams a read query's rows (or a whole vector store) to a local Parquet/CSV file with constant memory.
+            Embeddings go to a float32 .npy matrix with an id sidecar file."""
+            return await self.export_query(database_name, output_path, sql_query, parameters, vector_store_name, file_format,
+                                           embedding_column, id_column, batch_size, overwrite)
+
+        @self.mcp.tool
+        async def get_pool_stats() -> Dict[str, Any]:
+            """Reports connections held and waiting per priority class and how many acquires were rejected or timed out."""
+            return await self.get_pool_stats()
+
+        @self.mcp.tool
+        async def list_targets() -> List[Dict[str, Any]]:
+            """Lists the database servers other tools can run on through their `target` argument."""
+            return await self.list_targets()
+
         @self.mcp.tool
         async def create_database(database_name: str) -> Dict[str, Any]:
             """Creates a new database if it doesn't exist."""
             return await self.create_database(database_name)
+
+        @self.mcp.tool
+        async def list_jobs(status: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+            """Lists recent background jobs (newest first), optionally filtered by status."""
+            return await self.list_jobs(status, limit)
+
+        @self.mcp.tool
+        async def get_job(job_id: str) -> Dict[str, Any]:
+            """Returns the status and progress of a background job."""
+            return await self.get_job(job_id)
+
+        @self.mcp.tool
+        async def wait_job(job_id: str, ctx: Context, timeout_seconds: float = 30) -> Dict[str, Any]:
+            """Waits for a background job, streaming progress notifications. Returns the result once finished."""
+            return await self.wait_job(job_id, timeout_seconds, ctx)
+
+        @self.mcp.tool
+        async def cancel_job(job_id: str) -> Dict[str, Any]:
+            """Cancels a queued or running background job."""
+            return await self.cancel_job(job_id)
+
+        @self.mcp.tool
+        async def get_job_result(job_id: str) -> Dict[str, Any]:
+            """Returns a background job with its result or error."""
+            return await self.get_job_result(job_id)
             
         if EMBEDDING_PROVIDER is not None:
             @self.mcp.tool
-            async def create_vector_store(database_name: str, vector_store_name: str, model_name: Optional[str] = None, distance_function: Optional[str] = None) -> dict:
+            async def create_vector_store(database_name: str, vector_store_name: str, model_name: Optional[str] = None, distance_function: Optional[str] = None, hnsw_m: Optional[int] = None,
+                                          dimensions: Optional[int] = None, quantization: Optional[str] = None, dedup: bool = False) -> dict:
                 """Creates a table which stores embeddings."""
-                return await self.create_vector_store(database_name, vector_store_name, model_name, distance_function)
+                return await self.create_vector_store(database_name, vector_store_name, model_name, distance_function, hnsw_m, dimensions, quantization, dedup)
                 
             @self.mcp.tool
-            async def list_vector_stores(database_name: str) -> List[str]:
-                """Lists all vector stores in a database."""
-                return await self.list_vector_stores(database_name)
+            async def list_vector_stores(database_name: str, include_uncataloged: bool = False) -> List[str]:
+                """Lists the vector stores of a database from its catalog; include_uncataloged also scans for stores created before the catalog."""
+                return await self.list_vector_stores(database_name, include_uncataloged)
                 
             @self.mcp.tool
             async def delete_vector_store(database_name: str, vector_store_name: str) -> Dict[str, Any]:
@@ -880,14 +3932,149 @@ class MariaDBServer:
                 return await self.delete_vector_store(database_name, vector_store_name)
                 
             @self.mcp.tool
-            async def insert_docs_vector_store(database_name: str, vector_store_name: str, documents: List[str], metadata: Optional[List[dict]] = None) -> dict:
-                """Insert a batch of documents into a vector store."""
-                return await self.insert_docs_vector_store(database_name, vector_store_name, documents, metadata)
+            async def insert_docs_vector_store(database_name: str, vector_store_name: str, documents: List[str], metadata: Optional[List[dict]] = None,
+                                               chunk_tokens: Optional[int] = None, chunk_overlap: int = 0, on_duplicate: str = "skip") -> dict:
+                """Insert a batch of documents into a vector store, optionally split into overlapping token chunks. Deduplicating stores skip or upsert known content."""
+                return await self.insert_docs_vector_store(database_name, vector_store_name, documents, metadata, chunk_tokens, chunk_overlap, on_duplicate)
+
+            @self.mcp.tool
+            async def delete_docs_vector_store(database_name: str, vector_store_name: str, ids: Optional[List[str]] = None,
+                                               metadata_filter: Optional[Dict[str, Any]] = None, batch_size: int = 500,
+                                               max_rows_per_second: Optional[float] = None) -> Dict[str, Any]:
+                """Deletes documents from a vector store by id and/or metadata filter, in throttled batches."""
+                return await self.delete_docs_vector_store(database_name, vector_store_name, ids, metadata_filter, batch_size, max_rows_per_second)
+
+            @self.mcp.tool
+            async def update_docs_vector_store(database_name: str, vector_store_name: str, updates: Optional[List[Dict[str, Any]]] = None,
+                                               metadata_filter: Optional[Dict[str, Any]] = None, metadata_patch: Optional[Dict[str, Any]] = None,
+                                               batch_size: int = 100, max_rows_per_second: Optional[float] = None) -> Dict[str, Any]:
+                """Updates documents by id (re-embedding only changed text) or patches metadata by filter, in throttled batches."""
+                return await self.update_docs_vector_store(database_name, vector_store_name, updates, metadata_filter, metadata_patch,
+                                                           batch_size, max_rows_per_second)
                 
             @self.mcp.tool
-            async def search_vector_store(user_query: str, database_name: str, vector_store_name: str, k: int = 7) -> list:
-                """Search a vector store for similar documents."""
-                return await self.search_vector_store(user_query, database_name, vector_store_name, k)
+            async def search_vector_store(user_query: str, database_name: str, vector_store_name: str, k: int = 7, ef_search: Optional[int] = None,
+                                          use_quantized: bool = False, oversample: int = 4, max_distance: Optional[float] = None,
+                                          include_document: bool = True, snippet_chars: Optional[int] = None,
+                                          include_metadata: bool = True, metadata_keys: Optional[List[str]] = None) -> list:
+                """Search a vector store for similar documents. With max_distance, returns every document within that distance.
+                Set include_document=false (and include_metadata=false) for ids and distances only, or snippet_chars/metadata_keys
+                for a smaller payload; fetch full documents afterwards with get_docs_vector_store."""
+                return await self.search_vector_store(user_query, database_name, vector_store_name, k, ef_search, use_quantized, oversample,
+                                                      max_distance, include_document, snippet_chars, include_metadata, metadata_keys)
+
+            @self.mcp.tool
+            async def search_vector_store_by_vector(vector: Union[List[float], str], database_name: str, vector_store_name: str, k: int = 7,
+                                                    ef_search: Optional[int] = None, use_quantized: bool = False, oversample: int = 4,
+                                                    max_distance: Optional[float] = None, include_document: bool = True,
+                                                    snippet_chars: Optional[int] = None, include_metadata: bool = True,
+                                                    metadata_keys: Optional[List[str]] = None) -> list:
+                """Search a vector store with a precomputed query embedding (JSON array of floats or base64 float32),
+                skipping the embedding provider. The dimension must match the store. Same options as search_vector_store."""
+                return await self.search_vector_store_by_vector(vector, database_name, vector_store_name, k, ef_search, use_quantized, oversample,
+                                                                max_distance, include_document, snippet_chars, include_metadata, metadata_keys)
+
+            @self.mcp.tool
+            async def create_sharded_vector_store(database_name: str, sharded_store_name: str, shard_key: str, shards: List[Dict[str, Any]],
+                                                  model_name: Optional[str] = None, distance_function: Optional[str] = None) -> Dict[str, Any]:
+                """Defines a vector store sharded over several member stores (possibly in other databases), routed by a metadata shard key.
+                Each shard is {"vector_store_name", "database_name"?, "values"?}; missing members are created."""
+                return await self.create_sharded_vector_store(database_name, sharded_store_name, shard_key, shards, model_name, distance_function)
+
+            @self.mcp.tool
+            async def search_sharded_vector_store(user_query: str, database_name: str, sharded_store_name: str, k: int = 7,
+                                                  ef_search: Optional[int] = None, max_distance: Optional[float] = None,
+                                                  include_document: bool = True, snippet_chars: Optional[int] = None,
+                                                  include_metadata: bool = True, metadata_keys: Optional[List[str]] = None) -> Dict[str, Any]:
+                """Searches all shards of a sharded vector store concurrently and returns the merged global top-k,
+                with any shards that failed (and are missing from the merge) listed in failed_shards."""
+                return await self.search_sharded_vector_store(user_query, database_name, sharded_store_name, k, ef_search, max_distance,
+                                                              include_document, snippet_chars, include_metadata, metadata_keys)
+
+            @self.mcp.tool
+            async def insert_docs_sharded_vector_store(database_name: str, sharded_store_name: str, documents: List[str],
+                                                       metadata: Optional[List[dict]] = None) -> Dict[str, Any]:
+                """Inserts documents into a sharded vector store, routing each one by the shard key in its metadata."""
+                return await self.insert_docs_sharded_vector_store(database_name, sharded_store_name, documents, metadata)
+
+            @self.mcp.tool
+            async def get_search_cache_stats() -> Dict[str, Any]:
+                """Reports entries, bytes, hit ratio and evictions of the search result cache."""
+                return await self.get_search_cache_stats()
+
+            @self.mcp.tool
+            async def get_docs_vector_store(database_name: str, vector_store_name: str, ids: List[str], include_metadata: bool = True,
+                                            metadata_keys: Optional[List[str]] = None, snippet_chars: Optional[int] = None) -> List[Dict[str, Any]]:
+                """Fetches documents of a vector store by id in one query, e.g. for hits of an ids-only search."""
+                return await self.get_docs_vector_store(database_name, vector_store_name, ids, include_metadata, metadata_keys, snippet_chars)
+
+            @self.mcp.tool
+            async def ingest_file_vector_store(database_name: str, vector_store_name: str, file_path: str, file_format: Optional[str] = None,
+                                               text_field: str = "document", metadata_fields: Optional[List[str]] = None, batch_size: int = 64,
+                                               concurrency: int = 4, start_offset: int = 0, resume: bool = False,
+                                               chunk_tokens: Optional[int] = None, chunk_overlap: int = 0, background: bool = True) -> Dict[str, Any]:
+                """Streams a local JSONL/CSV/text file into a vector store with batched, concurrent embedding. Resumable.
+                Runs as a background job by default and returns its job_id; set background=false to wait for the result."""
+                options = dict(file_format=file_format, text_field=text_field, metadata_fields=metadata_fields, batch_size=batch_size,
+                               concurrency=concurrency, start_offset=start_offset, resume=resume, chunk_tokens=chunk_tokens,
+                               chunk_overlap=chunk_overlap)
+                if background:
+                    return await self.submit_ingest_file_job(database_name, vector_store_name, file_path, **options)
+                return await self.ingest_file_vector_store(database_name, vector_store_name, file_path, **options)
+
+            @self.mcp.tool
+            async def import_embeddings_vector_store(database_name: str, vector_store_name: str, embeddings_path: str,
+                                                     documents_path: Optional[str] = None, documents_format: Optional[str] = None,
+                                                     text_field: str = "document", metadata_fields: Optional[List[str]] = None,
+                                                     ids_path: Optional[str] = None, embedding_column: str = "embedding",
+                                                     id_column: Optional[str] = None, batch_size: int = 500, rows_per_transaction: int = 5000,
+                                                     resume: bool = False, background: bool = True) -> Dict[str, Any]:
+                """Loads precomputed embeddings from a memory-mapped .npy matrix (plus documents file) or a Parquet file,
+                without calling the embedding provider. Resumable. Runs as a background job by default and returns its job_id."""
+                options = dict(documents_path=documents_path, documents_format=documents_format, text_field=text_field,
+                               metadata_fields=metadata_fields, ids_path=ids_path, embedding_column=embedding_column, id_column=id_column,
+                               batch_size=batch_size, rows_per_transaction=rows_per_transaction, resume=resume)
+                if background:
+                    return await self.submit_import_embeddings_job(database_name, vector_store_name, embeddings_path, **options)
+                return await self.import_embeddings_vector_store(database_name, vector_store_name, embeddings_path, **options)
+
+            @self.mcp.tool
+            async def reembed_vector_store(database_name: str, vector_store_name: str, model_name: str, dimensions: Optional[int] = None,
+                                           batch_size: int = 128, concurrency: int = 2, keep_old: bool = False, background: bool = True) -> Dict[str, Any]:
+                """Re-embeds a vector store with another model into a shadow table, then swaps it in atomically. Resumable.
+                Runs as a background job by default and returns its job_id."""
+                options = dict(dimensions=dimensions, batch_size=batch_size, concurrency=concurrency, keep_old=keep_old)
+                if background:
+                    return await self.submit_reembed_job(database_name, vector_store_name, model_name, **options)
+                return await self.reembed_vector_store(database_name, vector_store_name, model_name, **options)
+
+            @self.mcp.tool
+            async def vector_store_stats(database_name: str, vector_store_name: str) -> Dict[str, Any]:
+                """Reports estimated rows, data/index size, data_free, fragmentation and average document length
+                of a vector store from catalog statistics, without scanning it."""
+                return await self.vector_store_stats(database_name, vector_store_name)
+
+            @self.mcp.tool
+            async def maintain_vector_store(database_name: str, vector_store_name: str, operation: str = "optimize",
+                                            maintenance_window: Optional[str] = None, probe_queries: int = MAINTENANCE_PROBE_QUERIES,
+                                            k: int = 10, background: bool = True) -> Dict[str, Any]:
+                """Rebuilds (operation="optimize") or re-analyzes (operation="analyze") a vector store, optionally waiting for a
+                daily "HH:MM-HH:MM" window, and reports search latency before and after.
+                Runs as a background job by default and returns its job_id."""
+                options = dict(operation=operation, maintenance_window=maintenance_window, probe_queries=probe_queries, k=k)
+                if background:
+                    return await self.submit_maintenance_job(database_name, vector_store_name, **options)
+                return await self.maintain_vector_store(database_name, vector_store_name, **options)
+
+            @self.mcp.tool
+            async def benchmark_vector_store(database_name: str, vector_store_name: str, k: int = 10, num_queries: int = 20, ef_search_values: Optional[List[int]] = None,
+                                             oversample_values: Optional[List[int]] = None, background: bool = False) -> Dict[str, Any]:
+                """Reports recall@k, p50/p99 latency and storage size of a vector store for a sweep of search settings.
+                With background=true it runs as a background job and returns its job_id."""
+                options = dict(k=k, num_queries=num_queries, ef_search_values=ef_search_values, oversample_values=oversample_values)
+                if background:
+                    return await self.submit_benchmark_job(database_name, vector_store_name, **options)
+                return await self.benchmark_vector_store(database_name, vector_store_name, **options)
                 
         logger.info("Registered MCP tools explicitly.")
 
@@ -939,6 +4126,7 @@ class MariaDBServer:
             logger.critical(f"Server execution failed with an unexpected error: {e}", exc_info=True)
             raise
         finally:
+            await self.jobs.shutdown()
             await self.close_pool()
 
 
@@ -0,0 +1,110 @@
+"""
+Sharded vector stores: one logical store split across several member stores,
+possibly in different databases (by tenant, by time range, ...).
+
+A sharded store is a shard key (a metadata field) plus a list of member stores.
+Inserts are routed by the value of the shard key: a shard that lists the value
+explicitly receives it, other values are spread over the shards without an
+explicit list by a stable hash. Searches fan out to every member and the local
+top-k lists are merged into a global top-k.
+"""
+
+import hashlib
+import heapq
+import itertools
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Tuple
+
+
+@dataclass
+class Shard:
+    """A member store of a sharded store."""
+    database_name: str
+    vector_store_name: str
+    values: List[Any] = field(default_factory=list)
+
+    @property
+    def label(self) -> str:
+        return f"{self.database_name}.{self.vector_store_name}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"database_name": self.database_name, "vector_store_name": self.vector_store_name, "values": self.values}
+
+
+@dataclass
+class ShardedStore:
+    """A shard key and the member stores documents are routed to."""
+    name: str
+    shard_key: str
+    shards: List[Shard]
+
+    def __post_init__(self):
+        self._by_value: Dict[str, Shard] = {}
+        for shard in self.shards:
+            for value in shard.values:
+                key = self._value_key(value)
+                if key in self._by_value:
+                    raise ValueError(f"Shard key value {value!r} is assigned to both {self._by_value[key].label} and {shard.label}.")
+                self._by_value[key] = shard
+        self._hashed = [shard for shard in self.shards if not shard.values]
+
+    @staticmethod
+    def _value_key(value: Any) -> str:
+        # Metadata values arrive as JSON scalars; compare them by their text form
+        return "" if value is None else str(value)
+
+    def route(self, metadata: Dict[str, Any]) -> Shard:
+        """Returns the shard a document with this metadata belongs to."""
+        value = metadata.get(self.shard_key)
+        key = self._value_key(value)
+        shard = self._by_value.get(key)
+        if shard is not None:
+            return shard
+        if not self._hashed:
+            raise ValueError(f"No shard of '{self.name}' accepts {self.shard_key}={value!r}.")
+        digest = hashlib.sha1(key.encode("utf-8")).digest()
+        return self._hashed[int.from_bytes(digest[:8], "big") % len(self._hashed)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"name": self.name, "shard_key": self.shard_key, "shards": [shard.to_dict() for shard in self.shards]}
+
+
+def merge_top_k(result_lists: Iterable[List[Dict[str, Any]]], k: int) -> List[Dict[str, Any]]:
+    """
+    Merges per-shard results, each already sorted by ascending distance, into the
+    global top `k` with a k-way heap merge.
+    """
+    return list(itertools.islice(heapq.merge(*result_lists, key=lambda row: row["distance"]), k))
+
+
+def parse_shards(shards: List[Dict[str, Any]], default_database: str) -> List[Shard]:
+    """Validates shard definitions given as dicts of database_name (optional), vector_store_name and values (optional)."""
+    if not shards or not isinstance(shards, list):
+        raise ValueError("shards must be a non-empty list.")
+    parsed = []
+    for entry in shards:
+        if not isinstance(entry, dict):
+            raise ValueError("Each shard must be an object with vector_store_name and optional database_name and values.")
+        database_name = entry.get("database_name") or default_database
+        vector_store_name = entry.get("vector_store_name")
+        values = entry.get("values") or []
+        if not isinstance(database_name, str) or not database_name.isidentifier():
+            raise ValueError(f"Invalid shard database_name: {database_name!r}")
+        if not isinstance(vector_store_name, str) or not vector_store_name.isidentifier():
+            raise ValueError(f"Invalid shard vector_store_name: {vector_store_name!r}")
+        if not isinstance(values, list):
+            raise ValueError(f"Shard values of '{database_name}.{vector_store_name}' must be a list.")
+        parsed.append(Shard(database_name, vector_store_name, values))
+    labels = [shard.label for shard in parsed]
+    if len(set(labels)) != len(labels):
+        raise ValueError("A vector store can only be one shard of a sharded store.")
+    return parsed
+
+
+def group_by_shard(store: ShardedStore, metadata: List[Dict[str, Any]]) -> List[Tuple[Shard, List[int]]]:
+    """Routes each document and returns every shard that received documents with their positions."""
+    groups: Dict[str, Tuple[Shard, List[int]]] = {}
+    for position, meta in enumerate(metadata):
+        shard = store.route(meta)
+        groups.setdefault(shard.label, (shard, []))[1].append(position)
+    return list(groups.values())
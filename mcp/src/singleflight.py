@@ -0,0 +1,85 @@
+"""
+In-flight deduplication of identical reads ("singleflight").
+
+While a read is running, an identical read (same key) does not start a second
+execution: it waits for the running one and gets its result or its error.
+Nothing is kept once the execution finishes, but a caller may join an
+execution that started shortly before its call. The owner calls `forget`
+after each write it completes, so executions already in flight are not joined
+by later calls and a caller never gets a result that misses a write made
+through this process before its call. Each waiter past the first gets its own
+copy of the result. Every waiter bounds its own wait with `timeout`, and the
+shared execution is cancelled only when every waiter has given up.
+"""
+
+import asyncio
+import re
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+# String literals and quoted identifiers, kept verbatim, or a run of whitespace
+_TOKEN = re.compile(r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`[^`]*`)|\s+""", re.DOTALL)
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapses whitespace outside quotes and drops trailing semicolons, so formatting does not split flights."""
+    return _TOKEN.sub(lambda match: match.group(1) or " ", sql).strip().rstrip(";").rstrip()
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class Singleflight:
+    """Runs at most one execution per key at a time and shares it with concurrent callers."""
+
+    def __init__(self, copy: Optional[Callable[[Any], Any]] = None):
+        self._copy = copy or (lambda result: result)
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, run: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """
+        Returns the result of `run()`, shared with concurrent calls with the same key.
+        Waits at most `timeout` seconds (TimeoutError); the execution goes on for other waiters.
+        """
+        flight = self._flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(run()))
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+        flight.waiters += 1
+        try:
+            if timeout is None:
+                result = await asyncio.shield(flight.task)
+            else:
+                result = await asyncio.wait_for(asyncio.shield(flight.task), timeout)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every caller gave up; stop the shared execution too
+                flight.task.cancel()
+        return result if leader else self._copy(result)
+
+    def forget(self):
+        """Lets the executions in flight finish for their current waiters, but starts new ones for later calls."""
+        self._flights.clear()
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.executions + self.coalesced
+        return {
+            "in_flight": len(self._flights),
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / calls, 4) if calls else None,
+        }
@@ -0,0 +1,191 @@
+"""
+Target registry: the database servers one MCP process can work on besides the
+primary (DB_HOST).
+
+Targets come from MCP_TARGETS and, optionally, a catalog table such as Lumos'
+`databases` table (name, host, port). Every tool except the job tools takes an
+optional `target` argument; TargetMiddleware adds it to the tool schemas and
+sets the target of the call in a context variable, so the server's query
+helpers pick the target's pool without each tool passing it along. Without a
+target, calls go to the primary as before.
+
+A target's pool is created on its first use, capped at its own size, and
+closed once it has sat idle with no connection in use. All pools share one
+ConnectionBudget, so the global connection limit holds across targets.
+"""
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional
+
+from fastmcp.server.middleware import Middleware
+
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between catalog reloads triggered by an unknown target
+CATALOG_RELOAD_INTERVAL = 30.0
+# Seconds between checks for idle target pools
+IDLE_CHECK_INTERVAL = 30.0
+TARGET_ARGUMENT_SCHEMA = {
+    "type": "string",
+    "description": "ID of the database server to run on (see list_targets). Defaults to the primary server.",
+}
+
+_target: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("target", default=None)
+
+
+@contextlib.contextmanager
+def use_target(target_id: Optional[str]) -> Iterator[None]:
+    """Runs the enclosed calls against a target; None is the primary server."""
+    token = _target.set(target_id or None)
+    try:
+        yield
+    finally:
+        _target.reset(token)
+
+
+def current_target() -> Optional[str]:
+    return _target.get()
+
+
+@dataclass
+class Target:
+    """A database server the tools can be pointed at; credentials are the primary's."""
+    id: str
+    host: str
+    port: int
+    database: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"id": self.id, "host": self.host, "port": self.port, "database": self.database}
+
+
+class TargetRegistry:
+    """Known targets and their lazily created pools."""
+
+    def __init__(self, pool_factory: Callable[[Target], Awaitable[Any]], idle_timeout: Optional[float],
+                 catalog_loader: Optional[Callable[[], Awaitable[List[Target]]]] = None):
+        self.targets: Dict[str, Target] = {}
+        self._pool_factory = pool_factory
+        self._idle_timeout = idle_timeout
+        self._catalog_loader = catalog_loader
+        self._catalog_loaded_at: Optional[float] = None
+        self._pools: Dict[str, Any] = {}
+        self._opening: Dict[str, asyncio.Future] = {}
+        self._last_used: Dict[str, float] = {}
+        self._reaper: Optional[asyncio.Task] = None
+
+    def add(self, target: Target):
+        self.targets[target.id] = target
+
+    async def load_catalog(self):
+        """Adds the targets listed in the catalog table; configured targets keep precedence."""
+        if self._catalog_loader is None:
+            return
+        self._catalog_loaded_at = time.monotonic()
+        for target in await self._catalog_loader():
+            self.targets.setdefault(target.id, target)
+
+    async def resolve(self, target_id: str) -> Target:
+        target = self.targets.get(target_id)
+        if target is None and self._catalog_loader is not None and (
+                self._catalog_loaded_at is None or time.monotonic() - self._catalog_loaded_at > CATALOG_RELOAD_INTERVAL):
+            await self.load_catalog()
+            target = self.targets.get(target_id)
+        if target is None:
+            raise ValueError(f"Unknown target '{target_id}'. Known targets: {sorted(self.targets)}.")
+        return target
+
+    async def pool(self, target_id: str):
+        """The target's pool, created on first use; concurrent first calls share one creation."""
+        self._last_used[target_id] = time.monotonic()
+        if target_id in self._pools:
+            return self._pools[target_id]
+        if target_id not in self._opening:
+            target = await self.resolve(target_id)
+            if target_id in self._pools:
+                return self._pools[target_id]
+            if target_id not in self._opening:
+                self._opening[target_id] = asyncio.ensure_future(self._open(target))
+        return await asyncio.shield(self._opening[target_id])
+
+    async def _open(self, target: Target):
+        logger.info(f"Opening connection pool for target '{target.id}' ({target.host}:{target.port}).")
+        try:
+            pool = await self._pool_factory(target)
+            self._pools[target.id] = pool
+            return pool
+        finally:
+            self._opening.pop(target.id, None)
+
+    async def close_idle(self):
+        """Closes the pools of targets unused for `idle_timeout` seconds that have no connection in use."""
+        if self._idle_timeout is None:
+            return
+        now = time.monotonic()
+        for target_id, pool in list(self._pools.items()):
+            if now - self._last_used.get(target_id, now) > self._idle_timeout and pool.size == pool.freesize:
+                logger.info(f"Closing idle connection pool of target '{target_id}'.")
+                del self._pools[target_id]
+                pool.close()
+                await pool.wait_closed()
+
+    def start_reaper(self):
+        if self._reaper is None and self._idle_timeout is not None:
+            self._reaper = asyncio.create_task(self._reap(), context=contextvars.Context())
+
+    async def _reap(self):
+        while True:
+            await asyncio.sleep(min(IDLE_CHECK_INTERVAL, self._idle_timeout))
+            try:
+                await self.close_idle()
+            except Exception as e:
+                logger.error(f"Closing idle target pools failed: {e}", exc_info=True)
+
+    async def close(self):
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.close()
+            await pool.wait_closed()
+
+    def stats(self, target_id: str) -> Optional[Dict[str, Any]]:
+        pool = self._pools.get(target_id)
+        return pool.stats() if pool is not None else None
+
+    def list(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [{**target.to_dict(), "pool_open": target_id in self._pools,
+                 "pool_size": self._pools[target_id].size if target_id in self._pools else 0,
+                 "idle_seconds": round(now - self._last_used[target_id], 1) if target_id in self._last_used else None}
+                for target_id, target in sorted(self.targets.items())]
+
+
+class TargetMiddleware(Middleware):
+    """Adds an optional `target` argument to the tools and runs each call against its target."""
+
+    def __init__(self, untargeted_tools: tuple = ()):
+        self.untargeted_tools = set(untargeted_tools)
+
+    async def on_list_tools(self, context, call_next):
+        tools = await call_next(context)
+        return [tool if tool.name in self.untargeted_tools else tool.model_copy(update={"parameters": {
+                    **tool.parameters,
+                    "properties": {**tool.parameters.get("properties", {}), "target": TARGET_ARGUMENT_SCHEMA}}})
+                for tool in tools]
+
+    async def on_call_tool(self, context, call_next):
+        arguments = context.message.arguments or {}
+        target_id = arguments.pop("target", None)
+        if target_id is not None and (not isinstance(target_id, str) or context.message.name in self.untargeted_tools):
+            raise ValueError(f"Tool '{context.message.name}' does not take a target."
+                             if isinstance(target_id, str) else "target must be a string.")
+        with use_target(target_id):
+            return await call_next(context)
@@ -0,0 +1,82 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from chunking import TokenChunker, chunk_documents, heuristic_token_spans, parent_document_id
+from ingest import FileRecordReader, IngestPipeline
+
+
+def word_spans(texts):
+    """One token per whitespace-separated word."""
+    result = []
+    for text in texts:
+        spans, pos = [], 0
+        for word in text.split():
+            start = text.index(word, pos)
+            spans.append((start, start + len(word)))
+            pos = start + len(word)
+        result.append(spans)
+    return result
+
+
+class TestTokenChunker(unittest.TestCase):
+    def test_short_text_is_one_chunk(self):
+        chunks = TokenChunker(10, 2, word_spans).chunk(["a b c"])[0]
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual((chunks[0].text, chunks[0].char_start, chunks[0].char_end), ("a b c", 0, 5))
+
+    def test_windows_overlap(self):
+        text = " ".join(f"w{i}" for i in range(10))
+        chunks = TokenChunker(4, 1, word_spans).chunk([text])[0]
+        self.assertEqual([c.text for c in chunks], ["w0 w1 w2 w3", "w3 w4 w5 w6", "w6 w7 w8 w9"])
+        for chunk in chunks:
+            self.assertEqual(text[chunk.char_start:chunk.char_end], chunk.text)
+
+    def test_invalid_overlap(self):
+        with self.assertRaises(ValueError):
+            TokenChunker(4, 4)
+        with self.assertRaises(ValueError):
+            TokenChunker(0)
+
+    def test_heuristic_splits_long_words_and_punctuation(self):
+        spans = heuristic_token_spans(["internationalization, ok"])[0]
+        self.assertEqual(len(spans), 7)
+
+    def test_chunk_documents_adds_parent_metadata(self):
+        text = " ".join(f"w{i}" for i in range(6))
+        texts, metadata = chunk_documents(TokenChunker(4, 0, word_spans), [text, "short"], [{"src": "a"}, {}])
+        self.assertEqual(texts, ["w0 w1 w2 w3", "w4 w5", "short"])
+        self.assertEqual(metadata[1]["src"], "a")
+        self.assertEqual(metadata[1]["parent_id"], parent_document_id(text))
+        self.assertEqual((metadata[1]["chunk_index"], metadata[1]["chunk_count"]), (1, 2))
+        self.assertEqual(metadata[2]["chunk_count"], 1)
+
+
+class TestChunkedIngestion(unittest.TestCase):
+    def test_chunks_keep_record_offsets(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "docs.jsonl")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(json.dumps({"document": "a b c d e"}) + "\n" + json.dumps({"document": "f"}) + "\n")
+            inserted = []
+
+            async def embed_batch(texts):
+                return [[0.0] for _ in texts]
+
+            async def insert_batch(records, vectors):
+                inserted.extend(records)
+                return len(records)
+
+            pipeline = IngestPipeline(FileRecordReader(path, "jsonl"), embed_batch, insert_batch,
+                                      batch_size=1, concurrency=1, chunker=TokenChunker(2, 0, word_spans))
+            result = asyncio.run(pipeline.run())
+        self.assertEqual([r.text for r in inserted], ["a b", "c d", "e", "f"])
+        self.assertEqual(len({r.end_offset for r in inserted[:3]}), 1)
+        self.assertEqual(result["stages"]["chunk"]["items"], 4)
+        self.assertEqual(result["resume_offset"], inserted[-1].end_offset)
+
+
+if __name__ == "__main__":
+    unittest.main()
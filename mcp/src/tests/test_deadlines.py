@@ -0,0 +1,187 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from asyncmy.errors import OperationalError
+from fastmcp.exceptions import ToolError
+
+import deadlines
+from custom_connection import SafePool
+from deadlines import DeadlineMiddleware, deadline
+from jobs import JobManager
+from src.server import MariaDBServer
+
+
+class SlowCursor:
+    """Runs the user statement until KILL QUERY arrives, then fails it like MariaDB does."""
+    def __init__(self, pool, returns_after_kill=True):
+        self.pool = pool
+        self.returns_after_kill = returns_after_kill
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=None):
+        self.pool.executed.append(sql)
+        if sql.startswith("SELECT DATABASE()"):
+            return
+        if self.returns_after_kill:
+            await self.pool.killed.wait()
+            raise OperationalError(1317, "Query execution was interrupted")
+        await asyncio.sleep(3600)
+
+    async def fetchone(self):
+        return {'DATABASE()': 'test_db'}
+
+    async def fetchall(self):
+        return []
+
+
+class SlowPool:
+    def __init__(self, returns_after_kill=True):
+        self.executed = []
+        self.killed = asyncio.Event()
+        self.acquired = 0
+        self.conn = MagicMock()
+        self.conn.unclean = False
+        self.conn.thread_id = MagicMock(return_value=42)
+        self.conn.cursor = lambda cursor=None: SlowCursor(self, returns_after_kill)
+        self.kill_query = AsyncMock(side_effect=lambda thread_id: self.killed.set())
+
+    def acquire(self):
+        pool = self
+
+        class _Ctx:
+            async def __aenter__(self_inner):
+                pool.acquired += 1
+                return pool.conn
+
+            async def __aexit__(self_inner, *exc):
+                return False
+        return _Ctx()
+
+
+class TestDeadlineScope(unittest.IsolatedAsyncioTestCase):
+    async def test_nested_deadline_keeps_the_earlier_one(self):
+        self.assertIsNone(deadlines.remaining())
+        with deadline(10):
+            with deadline(100):
+                self.assertLessEqual(deadlines.remaining(), 10)
+            with deadline(None):
+                self.assertIsNotNone(deadlines.remaining())
+        self.assertIsNone(deadlines.remaining())
+
+    def test_middleware_prefers_call_argument_over_tool_setting(self):
+        middleware = DeadlineMiddleware(300, {"execute_sql": 30, "maintain_vector_store": 0})
+        self.assertEqual(middleware.timeout_for("execute_sql", {}), 30)
+        self.assertEqual(middleware.timeout_for("execute_sql", {"timeout_seconds": 5}), 5)
+        self.assertEqual(middleware.timeout_for("list_databases", None), 300)
+        self.assertEqual(middleware.timeout_for("maintain_vector_store", {}), 0)
+
+    def test_call_argument_cannot_lift_the_deadline(self):
+        middleware = DeadlineMiddleware(300, {"execute_sql": 30, "maintain_vector_store": 0})
+        self.assertEqual(middleware.timeout_for("execute_sql", {"timeout_seconds": 3600}), 30)
+        self.assertEqual(middleware.timeout_for("execute_sql", {"timeout_seconds": 0}), 30)
+        self.assertEqual(middleware.timeout_for("execute_sql", {"timeout_seconds": -1}), 30)
+        self.assertEqual(middleware.timeout_for("maintain_vector_store", {"timeout_seconds": 3600}), 3600)
+        for invalid in ("soon", True, float("nan"), [5]):
+            with self.assertRaises(ToolError):
+                middleware.timeout_for("execute_sql", {"timeout_seconds": invalid})
+
+    def test_long_tools_have_no_default_deadline(self):
+        from config import MCP_TOOL_TIMEOUTS
+        self.assertEqual(MCP_TOOL_TIMEOUTS.get("reembed_vector_store"), 0)
+
+    async def test_middleware_sets_deadline_for_the_call(self):
+        middleware = DeadlineMiddleware(300)
+        context = SimpleNamespace(message=SimpleNamespace(name="execute_sql", arguments={"timeout_seconds": 2}))
+
+        async def call_next(ctx):
+            return deadlines.remaining()
+        self.assertLessEqual(await middleware.on_call_tool(context, call_next), 2)
+
+    async def test_jobs_do_not_inherit_the_deadline(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            manager = JobManager(os.path.join(tmp, "jobs.sqlite3"), 1, 3600)
+
+            async def run(handle):
+                return deadlines.remaining()
+            with deadline(5):
+                job_id = manager.submit("test", {}, run)["job_id"]
+            job = await manager.wait(job_id, 5)
+            await manager.shutdown()
+        self.assertEqual(job.status, "succeeded")
+        self.assertIsNone(job.result)
+
+
+class TestQueryDeadlines(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.server.pool = SlowPool()
+
+    async def test_select_gets_max_statement_time(self):
+        self.server.pool.killed.set()
+        with self.assertRaises(TimeoutError):
+            await self.server._execute_query("SELECT SLEEP(100)", timeout=30)
+        self.assertTrue(self.server.pool.executed[-1].startswith("SET STATEMENT max_statement_time=30 FOR SELECT"))
+
+    async def test_runaway_query_is_killed_on_side_connection(self):
+        with patch('src.server.DEADLINE_GRACE_SECONDS', 0):
+            with self.assertRaises(TimeoutError):
+                await self.server.execute_sql("SELECT SLEEP(100)", 'test_db', timeout_seconds=0.05)
+        self.server.pool.kill_query.assert_awaited_once_with(42)
+        self.assertFalse(self.server.pool.conn.unclean)
+
+    async def test_connection_is_discarded_if_statement_does_not_return(self):
+        self.server.pool = SlowPool(returns_after_kill=False)
+        with patch('src.server.DEADLINE_GRACE_SECONDS', 0), patch('src.server.KILL_QUERY_WAIT_SECONDS', 0.05):
+            with self.assertRaises(TimeoutError):
+                await self.server._execute_query("SELECT SLEEP(100)", timeout=0.05)
+        self.assertTrue(self.server.pool.conn.unclean)
+
+    async def test_cancelled_call_kills_query(self):
+        task = asyncio.create_task(self.server._execute_query("SELECT SLEEP(100)"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.server.pool.kill_query.assert_awaited_once_with(42)
+
+    async def test_expired_deadline_fails_before_acquiring(self):
+        with deadline(0.01):
+            await asyncio.sleep(0.02)
+            with self.assertRaises(TimeoutError):
+                await self.server._execute_query("SELECT 1")
+        self.assertEqual(self.server.pool.acquired, 0)
+
+    async def test_timeout_argument_cannot_outlast_the_call_deadline(self):
+        self.server.pool.killed.set()
+        with deadline(20):
+            with self.assertRaises(TimeoutError):
+                await self.server.execute_sql("SELECT SLEEP(100)", 'test_db', timeout_seconds=3600)
+        self.assertRegex(self.server.pool.executed[-1], r"^SET STATEMENT max_statement_time=(19|20)(\.\d+)? FOR SELECT")
+
+    async def test_invalid_timeout(self):
+        with self.assertRaises(ValueError):
+            await self.server.execute_sql("SELECT 1", 'test_db', timeout_seconds=-1)
+
+
+class TestSafePoolRelease(unittest.IsolatedAsyncioTestCase):
+    async def test_unclean_connection_is_closed_not_reused(self):
+        pool = SafePool(minsize=0, maxsize=2)
+        conn = MagicMock()
+        conn.unclean = True
+        pool._used.add(conn)
+        await pool.release(conn)
+        conn.close.assert_called_once()
+        self.assertEqual((pool.freesize, pool.size), (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
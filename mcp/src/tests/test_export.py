@@ -0,0 +1,160 @@
+import csv
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import numpy as np
+
+import export
+from export import CsvRowWriter, NpyMatrixWriter, detect_export_format, vectors_from_blobs
+from src.server import MariaDBServer
+
+
+class TestExportWriters(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_detect_export_format(self):
+        self.assertEqual(detect_export_format("/x/out.parquet"), "parquet")
+        self.assertEqual(detect_export_format("/x/out.dat", "csv"), "csv")
+        with self.assertRaises(ValueError):
+            detect_export_format("/x/out.json")
+
+    def test_npy_matrix_is_appended_and_memory_mappable(self):
+        path = os.path.join(self.tmp.name, "vectors.npy")
+        writer = NpyMatrixWriter(path)
+        writer.write(np.ones((3, 4)))
+        writer.write(np.zeros((2, 4)))
+        writer.close()
+        matrix = np.load(path, mmap_mode="r")
+        self.assertEqual(matrix.shape, (5, 4))
+        self.assertEqual(matrix.dtype, np.float32)
+        self.assertEqual(matrix[:, 0].tolist(), [1, 1, 1, 0, 0])
+
+    def test_npy_matrix_rejects_dimension_change(self):
+        writer = NpyMatrixWriter(os.path.join(self.tmp.name, "vectors.npy"))
+        writer.write(np.ones((1, 4)))
+        with self.assertRaises(ValueError):
+            writer.write(np.ones((1, 3)))
+        writer.close()
+
+    def test_csv_writer_hex_encodes_bytes(self):
+        path = os.path.join(self.tmp.name, "rows.csv")
+        writer = CsvRowWriter(path)
+        writer.write([{"id": 1, "blob": b"\x01\x02"}])
+        writer.write([{"id": 2, "blob": None}])
+        writer.close()
+        with open(path, newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(rows, [{"id": "1", "blob": "0102"}, {"id": "2", "blob": ""}])
+
+    def test_vectors_from_blobs(self):
+        blobs = [np.array([1, 2], dtype="<f4").tobytes(), np.array([3, 4], dtype="<f4").tobytes()]
+        self.assertEqual(vectors_from_blobs(blobs).tolist(), [[1, 2], [3, 4]])
+
+
+class TestExportQuery(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root_patcher = patch('src.server.MCP_FILE_ROOT', self.tmp.name)
+        self.root_patcher.start()
+
+    async def asyncTearDown(self):
+        self.root_patcher.stop()
+        self.tmp.cleanup()
+
+    def stream(self, batches):
+        async def fake_stream(sql, params=None, database=None, batch_size=1000):
+            self.streamed_sql = sql
+            for batch in batches:
+                yield [dict(row) for row in batch]
+        return fake_stream
+
+    async def test_exports_vector_store_to_csv_and_npy(self):
+        def row(i):
+            return {"id": f"id{i}", "document": f"doc {i}", "metadata": "{}", "embedding": np.array([i, -i], dtype="<f4").tobytes()}
+        output = os.path.join(self.tmp.name, "store.csv")
+        with patch.object(self.server, '_require_store_info', AsyncMock(return_value={})), \
+             patch.object(self.server, '_stream_query', self.stream([[row(1), row(2)], [row(3)]])):
+            result = await self.server.export_query('test_db', output, vector_store_name='docs', batch_size=2)
+
+        self.assertIn("ORDER BY id", self.streamed_sql)
+        self.assertEqual(result["rows"], 3)
+        self.assertEqual(result["dimension"], 2)
+        self.assertEqual(result["bytes"], sum(os.path.getsize(result[key]) for key in ("path", "embeddings_path", "ids_path")))
+        with open(output, newline="") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual([r["id"] for r in rows], ["id1", "id2", "id3"])
+        self.assertNotIn("embedding", rows[0])
+        matrix = np.load(result["embeddings_path"], mmap_mode="r")
+        self.assertEqual(matrix[:, 0].tolist(), [1, 2, 3])
+        with open(result["ids_path"]) as f:
+            self.assertEqual(f.read().split(), ["id1", "id2", "id3"])
+        self.assertFalse([name for name in os.listdir(self.tmp.name) if name.endswith(".tmp")])
+
+    async def test_refuses_to_overwrite_without_flag(self):
+        output = os.path.join(self.tmp.name, "rows.csv")
+        open(output, "w").close()
+        with patch.object(self.server, '_stream_query', self.stream([[{"a": 1}]])):
+            with self.assertRaises(FileExistsError):
+                await self.server.export_query('test_db', output, sql_query="SELECT 1 AS a")
+            result = await self.server.export_query('test_db', output, sql_query="SELECT 1 AS a", overwrite=True)
+        self.assertEqual(result["rows"], 1)
+
+    async def test_failed_export_leaves_no_partial_files(self):
+        async def failing_stream(sql, params=None, database=None, batch_size=1000):
+            yield [{"a": 1}]
+            raise RuntimeError("Database error: lost connection")
+        output = os.path.join(self.tmp.name, "rows.csv")
+        with patch.object(self.server, '_stream_query', failing_stream):
+            with self.assertRaises(RuntimeError):
+                await self.server.export_query('test_db', output, sql_query="SELECT 1 AS a")
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    async def test_requires_file_root(self):
+        with patch('src.server.MCP_FILE_ROOT', None):
+            with self.assertRaises(PermissionError):
+                await self.server.export_query('test_db', os.path.join(self.tmp.name, "rows.csv"), sql_query="SELECT 1 AS a")
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    async def test_refuses_paths_leading_outside_root(self):
+        with tempfile.TemporaryDirectory() as outside:
+            with self.assertRaises(PermissionError):
+                await self.server.export_query('test_db', os.path.join(outside, "rows.csv"), sql_query="SELECT 1 AS a")
+            os.symlink(os.path.join(outside, "rows.ids.txt"), os.path.join(self.tmp.name, "rows.ids.txt.tmp"))
+            with self.assertRaises(PermissionError):
+                await self.server.export_query('test_db', os.path.join(self.tmp.name, "rows.csv"), sql_query="SELECT id, v FROM t",
+                                               embedding_column="v")
+            self.assertEqual(os.listdir(outside), [])
+
+    async def test_failing_writer_closes_the_files_already_opened(self):
+        output = os.path.join(self.tmp.name, "rows.csv")
+        with patch('src.server.NpyMatrixWriter', side_effect=OSError("No space left on device")), \
+             patch.object(self.server, '_stream_query', self.stream([])):
+            with self.assertRaises(OSError):
+                await self.server.export_query('test_db', output, sql_query="SELECT id, v FROM t", embedding_column="v")
+        self.assertEqual(os.listdir(self.tmp.name), [])
+
+    async def test_stream_query_rejects_writes(self):
+        self.server.pool = object()
+        with self.assertRaises(PermissionError):
+            async for _ in self.server._stream_query("DELETE FROM t"):
+                pass
+
+    @unittest.skipUnless(export.pa is not None, "pyarrow is not installed")
+    async def test_exports_parquet(self):
+        import pyarrow.parquet as pq
+        output = os.path.join(self.tmp.name, "rows.parquet")
+        with patch.object(self.server, '_stream_query', self.stream([[{"a": 1}, {"a": 2}], [{"a": 3}]])):
+            result = await self.server.export_query('test_db', output, sql_query="SELECT a FROM t")
+        self.assertEqual(result["rows"], 3)
+        self.assertEqual(pq.read_table(output).column("a").to_pylist(), [1, 2, 3])
+
+
+if __name__ == '__main__':
+    unittest.main()
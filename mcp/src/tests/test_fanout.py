@@ -0,0 +1,75 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from deadlines import deadline
+from src.server import MariaDBServer
+
+
+class TestExecuteSqlFanout(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.running = 0
+        self.peak = 0
+        self.timeouts = {}
+
+    async def fake_query(self, sql, params=None, database=None, statement_vars=None, timeout=None):
+        if 'information_schema.SCHEMATA' in sql:
+            return [{'SCHEMA_NAME': name} for name in ('app_a', 'app_b', 'mysql')]
+        self.timeouts[database] = timeout
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(0.01)
+            if database == 'broken':
+                raise RuntimeError("Database error: Table 'broken.db_logs' doesn't exist")
+            if database == 'slow':
+                raise TimeoutError("Query exceeded its deadline of 1.0s and was stopped.")
+            return [{'n': len(database)}]
+        finally:
+            self.running -= 1
+
+    async def test_rows_are_merged_with_source_column(self):
+        with patch.object(self.server, '_execute_query', AsyncMock(side_effect=self.fake_query)):
+            result = await self.server.execute_sql_fanout("SELECT COUNT(*) AS n FROM db_logs", ['one', 'three', 'broken', 'slow'],
+                                                          max_concurrency=2, timeout_seconds_per_database=5)
+        self.assertEqual(result['rows'], [{'n': 3, 'source_database': 'one'}, {'n': 5, 'source_database': 'three'}])
+        self.assertEqual((result['succeeded'], result['failed']), (2, 2))
+        self.assertEqual([(e['database'], e['timed_out']) for e in result['errors']], [('broken', False), ('slow', True)])
+        self.assertEqual(self.peak, 2)
+        self.assertEqual(self.timeouts['one'], 5)
+
+    async def test_pattern_skips_system_schemas(self):
+        with patch.object(self.server, '_execute_query', AsyncMock(side_effect=self.fake_query)):
+            result = await self.server.execute_sql_fanout("SELECT 1 AS n", database_pattern='%')
+        self.assertEqual([row['source_database'] for row in result['rows']], ['app_a', 'app_b'])
+
+    async def test_call_deadline_shortens_schema_deadline(self):
+        with patch.object(self.server, '_execute_query', AsyncMock(side_effect=self.fake_query)):
+            with deadline(2):
+                await self.server.execute_sql_fanout("SELECT 1", ['one'], timeout_seconds_per_database=30)
+        self.assertLessEqual(self.timeouts['one'], 2)
+
+    async def test_result_with_its_own_source_column_is_rejected(self):
+        async def query(sql, params=None, database=None, statement_vars=None, timeout=None):
+            return [{'source_database': 'replica-7', 'n': 1}]
+        with patch.object(self.server, '_execute_query', AsyncMock(side_effect=query)):
+            result = await self.server.execute_sql_fanout("SELECT src AS source_database, 1 AS n FROM t", ['one'])
+        self.assertEqual((result['rows'], result['failed']), ([], 1))
+        self.assertIn("alias it", result['errors'][0]['error'])
+
+    async def test_invalid_calls(self):
+        with self.assertRaises(PermissionError):
+            await self.server.execute_sql_fanout("DELETE FROM db_logs", ['one'])
+        with self.assertRaises(ValueError):
+            await self.server.execute_sql_fanout("SELECT 1")
+        with self.assertRaises(ValueError):
+            await self.server.execute_sql_fanout("SELECT 1", ['one'], database_pattern='%')
+        with self.assertRaises(ValueError):
+            await self.server.execute_sql_fanout("SELECT 1", ['bad-name'])
+        with self.assertRaises(ValueError):
+            await self.server.execute_sql_fanout("SELECT 1", ['one'], max_concurrency=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
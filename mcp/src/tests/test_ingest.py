@@ -0,0 +1,198 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from ingest import EmbeddingFileReader, FileRecordReader, IngestPipeline, detect_format
+
+
+def write_file(directory, name, content):
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+    return path
+
+
+class TestFileRecordReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_detect_format(self):
+        self.assertEqual(detect_format("a/b.jsonl"), "jsonl")
+        self.assertEqual(detect_format("a/b.csv"), "csv")
+        self.assertEqual(detect_format("a/b.bin", "text"), "text")
+        with self.assertRaises(ValueError):
+            detect_format("a/b.bin")
+
+    def test_jsonl_records_and_offsets(self):
+        lines = [json.dumps({"document": f"doc {i}", "metadata": {"n": i}}) for i in range(3)]
+        path = write_file(self.tmp.name, "docs.jsonl", "\n".join(lines) + "\n")
+        reader = FileRecordReader(path, "jsonl")
+        records = reader.read(10)
+        reader.close()
+        self.assertEqual([r.text for r in records], ["doc 0", "doc 1", "doc 2"])
+        self.assertEqual(records[1].metadata, {"n": 1})
+        self.assertEqual(records[0].end_offset, len(lines[0]) + 1)
+        self.assertEqual(records[-1].end_offset, os.path.getsize(path))
+
+    def test_resume_from_offset_skips_consumed_records(self):
+        lines = [json.dumps({"document": f"doc {i}"}) for i in range(4)]
+        path = write_file(self.tmp.name, "docs.jsonl", "\n".join(lines) + "\n")
+        reader = FileRecordReader(path, "jsonl")
+        offset = reader.read(2)[-1].end_offset
+        reader.close()
+        reader = FileRecordReader(path, "jsonl", start_offset=offset)
+        self.assertEqual([r.text for r in reader.read(10)], ["doc 2", "doc 3"])
+        reader.close()
+
+    def test_csv_uses_header_and_metadata_fields(self):
+        path = write_file(self.tmp.name, "docs.csv", "id,body,severity\n1,disk full,high\n2,\"slow, query\",low\n")
+        reader = FileRecordReader(path, "csv", text_field="body", metadata_fields=["severity"])
+        records = reader.read(10)
+        reader.close()
+        self.assertEqual([r.text for r in records], ["disk full", "slow, query"])
+        self.assertEqual(records[1].metadata, {"severity": "low"})
+
+    def test_malformed_lines_are_skipped(self):
+        path = write_file(self.tmp.name, "docs.jsonl", '{"document": "ok"}\nnot json\n{"other": 1}\n')
+        reader = FileRecordReader(path, "jsonl")
+        records = reader.read(10)
+        reader.close()
+        self.assertEqual(len(records), 1)
+        self.assertEqual(reader.skipped, 2)
+
+
+class TestEmbeddingFileReader(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.matrix_path = os.path.join(self.tmp.name, "vectors.npy")
+        np.save(self.matrix_path, np.arange(10, dtype=np.float64).reshape(5, 2))
+        self.docs_path = write_file(self.tmp.name, "docs.jsonl", "".join(json.dumps({"document": f"doc {i}"}) + "\n" for i in range(5)))
+        self.ids_path = write_file(self.tmp.name, "vectors.ids.txt", "".join(f"id{i}\n" for i in range(5)))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_reads_aligned_float32_slices(self):
+        reader = EmbeddingFileReader(self.matrix_path, self.docs_path, ids_path=self.ids_path)
+        records, vectors, ids = reader.read(3)
+        self.assertEqual((reader.dimension, reader.total_rows), (2, 5))
+        self.assertEqual([r.text for r in records], ["doc 0", "doc 1", "doc 2"])
+        self.assertEqual(vectors.dtype, np.float32)
+        self.assertEqual(vectors.tolist(), [[0, 1], [2, 3], [4, 5]])
+        self.assertEqual(ids, ["id0", "id1", "id2"])
+        records, vectors, ids = reader.read(3)
+        self.assertEqual((len(records), ids), (2, ["id3", "id4"]))
+        self.assertEqual(reader.read(3)[0], [])
+        reader.close()
+
+    def test_resumes_from_row_and_offset(self):
+        reader = EmbeddingFileReader(self.matrix_path, self.docs_path, ids_path=self.ids_path)
+        reader.read(2)
+        row, offset = reader.row, reader.offset
+        reader.close()
+        reader = EmbeddingFileReader(self.matrix_path, self.docs_path, ids_path=self.ids_path, start_row=row, start_offset=offset)
+        records, vectors, ids = reader.read(10)
+        reader.close()
+        self.assertEqual(records[0].text, "doc 2")
+        self.assertEqual(vectors[0].tolist(), [4, 5])
+        self.assertEqual(ids[0], "id2")
+
+    def test_row_count_mismatch_is_an_error(self):
+        short_docs = write_file(self.tmp.name, "short.jsonl", json.dumps({"document": "only"}) + "\n")
+        reader = EmbeddingFileReader(self.matrix_path, short_docs)
+        reader.read(10)
+        with self.assertRaises(ValueError):
+            reader.read(10)
+        reader.close()
+
+    def test_malformed_document_breaks_alignment(self):
+        bad_docs = write_file(self.tmp.name, "bad.jsonl", '{"document": "a"}\nnot json\n')
+        reader = EmbeddingFileReader(self.matrix_path, bad_docs)
+        with self.assertRaises(ValueError):
+            reader.read(10)
+        reader.close()
+
+
+class TestIngestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        lines = [json.dumps({"document": f"doc {i}"}) for i in range(25)]
+        self.path = write_file(self.tmp.name, "docs.jsonl", "\n".join(lines) + "\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_batches_are_inserted_in_file_order(self):
+        inserted = []
+        checkpoints = []
+
+        async def embed_batch(texts):
+            # Later batches finish first to exercise reordering
+            await asyncio.sleep(0.01 * (30 - int(texts[0].split()[1])) / 10)
+            return [[0.0] for _ in texts]
+
+        async def insert_batch(records, vectors):
+            inserted.extend(r.text for r in records)
+            return len(records)
+
+        pipeline = IngestPipeline(FileRecordReader(self.path, "jsonl"), embed_batch, insert_batch,
+                                  batch_size=4, concurrency=3, on_checkpoint=checkpoints.append)
+        result = asyncio.run(pipeline.run())
+        self.assertEqual(result["status"], "success")
+        self.assertEqual(result["inserted"], 25)
+        self.assertEqual(inserted, [f"doc {i}" for i in range(25)])
+        self.assertEqual(checkpoints, sorted(checkpoints))
+        self.assertEqual(result["resume_offset"], os.path.getsize(self.path))
+        self.assertEqual(result["stages"]["embed"]["batches"], 7)
+
+    def test_duplicates_are_dropped_before_embedding(self):
+        lines = [json.dumps({"document": text}) for text in ("stored", "a", "b", "a", "stored", "b", "c")]
+        path = write_file(self.tmp.name, "dupes.jsonl", "\n".join(lines) + "\n")
+        embedded, inserted = [], []
+
+        async def embed_batch(texts):
+            embedded.extend(texts)
+            return [[0.0] for _ in texts]
+
+        async def insert_batch(records, vectors):
+            inserted.extend(r.text for r in records)
+            return len(records)
+
+        async def find_existing(keys):
+            return {key for key in keys if key == "stored"}
+        pipeline = IngestPipeline(FileRecordReader(path, "jsonl"), embed_batch, insert_batch, batch_size=2, concurrency=2,
+                                  content_keys=list, find_existing=find_existing)
+        result = asyncio.run(pipeline.run())
+        self.assertEqual(sorted(embedded), ["a", "b", "c"])
+        self.assertEqual(inserted, ["a", "b", "c"])
+        self.assertEqual((result["inserted"], result["skipped_duplicates"]), (3, 4))
+        self.assertEqual(result["resume_offset"], os.path.getsize(path))
+
+    def test_failure_reports_resume_offset(self):
+        async def embed_batch(texts):
+            if texts[0] == "doc 8":
+                raise RuntimeError("provider down")
+            return [[0.0] for _ in texts]
+
+        async def insert_batch(records, vectors):
+            return len(records)
+
+        pipeline = IngestPipeline(FileRecordReader(self.path, "jsonl"), embed_batch, insert_batch,
+                                  batch_size=4, concurrency=1)
+        result = asyncio.run(pipeline.run())
+        self.assertEqual(result["status"], "error")
+        self.assertEqual(result["inserted"], 8)
+        reader = FileRecordReader(self.path, "jsonl", start_offset=result["resume_offset"])
+        self.assertEqual(reader.read(1)[0].text, "doc 8")
+        reader.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import asyncio
+import datetime
+import os
+import tempfile
+import unittest
+
+from jobs import JobManager, parse_window, seconds_left_in_window, seconds_until_window
+
+
+class TestJobManager(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "jobs.sqlite3")
+        self.manager = JobManager(self.db_path, max_workers=1)
+
+    async def asyncTearDown(self):
+        await self.manager.shutdown()
+        self.tmp.cleanup()
+
+    async def test_job_result_and_progress(self):
+        async def run(handle):
+            handle.report(1, 2, "halfway")
+            await asyncio.sleep(0)
+            handle.report(2)
+            return {"rows": 2}
+
+        job_id = self.manager.submit("test", {"a": 1}, run)["job_id"]
+        seen = []
+
+        async def on_progress(job):
+            seen.append(job.progress)
+
+        job = await self.manager.wait(job_id, 5, on_progress)
+        self.assertEqual(job.status, "succeeded")
+        self.assertEqual(job.result, {"rows": 2})
+        self.assertEqual((job.progress, job.total, job.message), (2, 2, "halfway"))
+        self.assertTrue(seen)
+        # Finished jobs are read back from SQLite
+        stored = self.manager.get(job_id)
+        self.assertEqual(stored.result, {"rows": 2})
+        self.assertEqual(stored.params, {"a": 1})
+
+    async def test_workers_are_bounded_and_jobs_cancellable(self):
+        release = asyncio.Event()
+
+        async def blocker(handle):
+            await release.wait()
+
+        first = self.manager.submit("test", {}, blocker)["job_id"]
+        second = self.manager.submit("test", {}, blocker)["job_id"]
+        await asyncio.sleep(0.01)
+        self.assertEqual(self.manager.get(first).status, "running")
+        self.assertEqual(self.manager.get(second).status, "queued")
+        self.assertTrue(self.manager.cancel(second))
+        job = await self.manager.wait(second, 5)
+        self.assertEqual(job.status, "cancelled")
+        release.set()
+        self.assertEqual((await self.manager.wait(first, 5)).status, "succeeded")
+        self.assertFalse(self.manager.cancel(first))
+
+    async def test_delayed_job_does_not_hold_a_worker(self):
+        async def noop(handle):
+            return "done"
+
+        later = self.manager.submit("test", {}, noop, delay=3600)["job_id"]
+        now = self.manager.submit("test", {}, noop)["job_id"]
+        self.assertEqual((await self.manager.wait(now, 5)).status, "succeeded")
+        self.assertEqual(self.manager.get(later).status, "queued")
+        self.assertTrue(self.manager.cancel(later))
+        self.assertEqual((await self.manager.wait(later, 5)).status, "cancelled")
+
+    async def test_failure_is_recorded(self):
+        async def fail(handle):
+            raise RuntimeError("boom")
+
+        job_id = self.manager.submit("test", {}, fail)["job_id"]
+        job = await self.manager.wait(job_id, 5)
+        self.assertEqual((job.status, job.error), ("failed", "boom"))
+
+    async def test_unfinished_jobs_are_interrupted_after_restart(self):
+        async def noop(handle):
+            return None
+
+        job_id = self.manager.submit("test", {}, noop)["job_id"]
+        await self.manager.wait(job_id, 5)
+        # Simulate a crash while the job was running
+        self.manager._conn.execute("UPDATE jobs SET status = 'running', finished_at = NULL WHERE id = ?", (job_id,))
+        self.manager._conn.commit()
+        restarted = JobManager(self.db_path)
+        self.assertEqual(restarted.get(job_id).status, "interrupted")
+        self.assertEqual([j["job_id"] for j in restarted.list(status="interrupted")], [job_id])
+        await restarted.shutdown()
+
+
+if __name__ == "__main__":
+    unittest.main()
+
+
+class TestMaintenanceWindow(unittest.TestCase):
+    def at(self, hour, minute=0):
+        return datetime.datetime(2026, 3, 1, hour, minute)
+
+    def test_no_window_runs_now(self):
+        self.assertEqual(seconds_until_window(None), 0)
+
+    def test_inside_and_before_window(self):
+        self.assertEqual(seconds_until_window("02:00-05:00", self.at(3)), 0)
+        self.assertEqual(seconds_until_window("02:00-05:00", self.at(1, 30)), 1800)
+        self.assertEqual(seconds_until_window("02:00-05:00", self.at(6)), 20 * 3600)
+
+    def test_window_wrapping_midnight(self):
+        self.assertEqual(seconds_until_window("23:00-01:00", self.at(0, 30)), 0)
+        self.assertEqual(seconds_until_window("23:00-01:00", self.at(22)), 3600)
+
+    def test_seconds_left_in_window(self):
+        self.assertIsNone(seconds_left_in_window(None))
+        self.assertEqual(seconds_left_in_window("02:00-05:00", self.at(4, 30)), 1800)
+        self.assertEqual(seconds_left_in_window("02:00-05:00", self.at(6)), 0)
+        self.assertEqual(seconds_left_in_window("23:00-01:00", self.at(23)), 2 * 3600)
+
+    def test_invalid_window(self):
+        for window in ("2am-5am", "02:00", "03:00-03:00"):
+            with self.assertRaises(ValueError):
+                parse_window(window)
@@ -0,0 +1,280 @@
+import asyncio
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from custom_connection import (BULK, HALF_OPEN_PROBE_TIMEOUT, INTERACTIVE, CircuitBreaker, DatabaseUnavailableError,
+                               PoolOverloadedError, PoolTimeoutError, SafePool, pool_priority)
+
+
+def fake_connection():
+    conn = MagicMock()
+    conn.unclean = False
+    conn.connected = True
+    conn.get_transaction_status.return_value = False
+    conn._reader.at_eof.return_value = False
+    conn._reader.exception.return_value = None
+    conn.last_usage = asyncio.get_running_loop().time()
+    conn.ensure_closed = AsyncMock()
+    conn.ping = AsyncMock()
+    return conn
+
+
+class TestPoolAdmission(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        async def connect(**kwargs):
+            return fake_connection()
+        self.patcher = patch('custom_connection.safe_connect', connect)
+        self.patcher.start()
+
+    async def asyncTearDown(self):
+        self.patcher.stop()
+
+    def pool(self, maxsize=1, **options):
+        return SafePool(minsize=0, maxsize=maxsize, **options)
+
+    async def test_acquire_timeout(self):
+        pool = self.pool(acquire_timeout=0.05)
+        held = await pool._acquire_in_class(None, None)
+        with self.assertRaises(PoolTimeoutError):
+            async with pool.acquire():
+                pass
+        self.assertEqual(pool.stats()['timeouts'], 1)
+        await pool.release(held)
+
+    async def test_full_wait_queue_fails_fast(self):
+        pool = self.pool(max_waiters=1)
+        held = await pool._acquire_in_class(None, None)
+        waiter = asyncio.create_task(pool._acquire_in_class(None, None))
+        await asyncio.sleep(0.01)
+        with self.assertRaises(PoolOverloadedError):
+            await pool._acquire_in_class(None, 5)
+        self.assertEqual(pool.stats()['overloaded'], 1)
+        await pool.release(held)
+        conn = await asyncio.wait_for(waiter, 1)
+        self.assertIs(conn, held)
+
+    async def test_interactive_waiters_go_first(self):
+        pool = self.pool()
+        held = await pool._acquire_in_class(INTERACTIVE, None)
+        order = []
+
+        async def take(priority):
+            conn = await pool._acquire_in_class(priority, None)
+            order.append(priority)
+            await pool.release(conn)
+        bulk = asyncio.create_task(take(BULK))
+        await asyncio.sleep(0.01)
+        interactive = asyncio.create_task(take(INTERACTIVE))
+        await asyncio.sleep(0.01)
+        self.assertEqual(pool.stats()['waiting'], {INTERACTIVE: 1, BULK: 1})
+        await pool.release(held)
+        await asyncio.wait_for(asyncio.gather(bulk, interactive), 1)
+        self.assertEqual(order, [INTERACTIVE, BULK])
+
+    async def test_class_cap_leaves_room_for_interactive_calls(self):
+        pool = self.pool(maxsize=3, class_limits={BULK: 1})
+        with pool_priority(BULK):
+            bulk_conn = await pool._acquire_in_class(None, None)
+            with self.assertRaises(PoolTimeoutError):
+                await pool._acquire_in_class(None, 0.05)
+        interactive_conn = await pool._acquire_in_class(None, 0.05)
+        self.assertEqual(pool.stats()['held'], {INTERACTIVE: 1, BULK: 1})
+        await pool.release(bulk_conn)
+        await pool.release(interactive_conn)
+        self.assertEqual(pool.stats()['held'], {INTERACTIVE: 0, BULK: 0})
+
+    async def test_unknown_class_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.pool(class_limits={'batch': 1})
+        with self.assertRaises(ValueError):
+            await self.pool()._acquire_in_class('batch', None)
+
+
+class TestPoolSizing(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.connecting = 0
+        self.peak = 0
+        self.fail = False
+
+        async def connect(**kwargs):
+            self.connecting += 1
+            self.peak = max(self.peak, self.connecting)
+            try:
+                await asyncio.sleep(0.05)
+                if self.fail:
+                    raise OSError("Can't connect to MariaDB server")
+                return fake_connection()
+            finally:
+                self.connecting -= 1
+        self.patcher = patch('custom_connection.safe_connect', connect)
+        self.patcher.start()
+
+    async def asyncTearDown(self):
+        self.patcher.stop()
+
+    async def test_warm_up_opens_connections_concurrently(self):
+        pool = SafePool(minsize=5, maxsize=10)
+        async with pool.cond:
+            await pool.fill_free_pool(False)
+        self.assertEqual(pool.freesize, 5)
+        self.assertEqual(self.peak, 5)
+
+    async def test_slow_acquires_grow_the_pool(self):
+        pool = SafePool(minsize=1, maxsize=4, grow_wait=0.01, class_limits={'interactive': 1})
+        async with pool.cond:
+            await pool.fill_free_pool(False)
+        held = await pool._acquire_in_class(None, None)
+        waiter = asyncio.create_task(pool._acquire_in_class(None, None))
+        await asyncio.sleep(0.05)
+        await pool.release(held)
+        await pool.release(await waiter)
+        await pool.maintain()
+        self.assertEqual(pool.target, 2)
+        self.assertEqual(pool.size, 2)
+
+    async def test_idle_connections_are_closed_down_to_minsize(self):
+        pool = SafePool(minsize=1, maxsize=4, idle_timeout=60)
+        conns = [fake_connection() for _ in range(3)]
+        for conn in conns:
+            conn.last_usage -= 120
+            pool._free.append(conn)
+        pool.target = 3
+        await pool.maintain()
+        self.assertEqual((pool.size, pool.target), (1, 1))
+        self.assertEqual(sum(conn.ensure_closed.await_count for conn in conns), 2)
+
+    async def test_reconnect_backs_off_exponentially(self):
+        pool = SafePool(minsize=2, maxsize=4)
+        self.fail = True
+        await pool.maintain()
+        await pool.maintain()
+        self.assertEqual(pool.stats()['reconnect_backoff_seconds'], 1.0)
+        self.assertEqual(pool.connect_failures, 2)
+        self.fail = False
+        await pool.maintain()
+        self.assertEqual((pool.size, pool.stats()['reconnect_backoff_seconds']), (2, 0.0))
+
+
+class TestPoolValidation(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.fail = False
+        self.attempts = 0
+
+        async def connect(**kwargs):
+            self.attempts += 1
+            if self.fail:
+                raise OSError("Can't connect to MariaDB server")
+            return fake_connection()
+        self.patcher = patch('custom_connection.safe_connect', connect)
+        self.patcher.start()
+
+    async def asyncTearDown(self):
+        self.patcher.stop()
+
+    def silent_connection(self, alive=True):
+        conn = fake_connection()
+        conn.last_usage -= 120
+        if not alive:
+            conn.ping.side_effect = OSError("Lost connection to MariaDB server")
+        return conn
+
+    async def test_maintenance_drops_dead_connections(self):
+        pool = SafePool(minsize=0, maxsize=4, ping_idle=30)
+        alive, dead = self.silent_connection(), self.silent_connection(alive=False)
+        pool._free.extend([alive, dead])
+        pool.target = 2
+        self.fail = True
+        await pool.maintain()
+        self.assertEqual(list(pool._free), [alive])
+        dead.close.assert_called_once()
+        self.assertEqual(pool.stats()['dead_connections'], 1)
+
+    async def test_acquire_skips_dead_connection(self):
+        pool = SafePool(minsize=0, maxsize=2, ping_idle=30)
+        dead, fresh = self.silent_connection(alive=False), fake_connection()
+        pool._free.extend([dead, fresh])
+        conn = await pool._acquire_in_class(None, 1)
+        self.assertIs(conn, fresh)
+        fresh.ping.assert_not_awaited()
+        self.assertEqual((pool.size, pool.stats()['held'][INTERACTIVE]), (1, 1))
+        await pool.release(conn)
+
+    async def test_breaker_fails_fast_until_probe_succeeds(self):
+        pool = SafePool(minsize=0, maxsize=2, breaker_failures=2)
+        self.fail = True
+        for _ in range(2):
+            with self.assertRaises(OSError):
+                await pool._acquire_in_class(None, 1)
+        attempts = self.attempts
+        with self.assertRaises(DatabaseUnavailableError):
+            await pool._acquire_in_class(None, 1)
+        self.assertEqual(self.attempts, attempts)
+        self.assertEqual(pool.stats()['breaker']['state'], 'open')
+        self.fail = False
+        await pool.maintain()
+        self.assertEqual(pool.stats()['breaker']['state'], 'closed')
+        await pool.release(await pool._acquire_in_class(None, 1))
+
+    async def test_half_open_trial_acquire_connects_and_closes_the_breaker(self):
+        pool = SafePool(minsize=0, maxsize=2, breaker_failures=1)
+        self.fail = True
+        with self.assertRaises(OSError):
+            await pool._acquire_in_class(None, 1)
+        self.assertEqual(pool.stats()['breaker']['state'], 'open')
+        pool.breaker.retry_at = 0.0
+        self.fail = False
+        attempts = self.attempts
+        conn = await pool._acquire_in_class(None, 1)
+        self.assertEqual(self.attempts, attempts + 1)
+        self.assertEqual(pool.stats()['breaker']['state'], 'closed')
+        await pool.release(conn)
+
+    async def test_only_the_trial_acquire_goes_through_while_half_open(self):
+        pool = SafePool(minsize=0, maxsize=2, breaker_failures=1)
+        self.fail = True
+        with self.assertRaises(OSError):
+            await pool._acquire_in_class(None, 1)
+        pool.breaker.retry_at = 0.0
+        attempts = self.attempts
+        results = await asyncio.gather(pool._acquire_in_class(None, 1), pool._acquire_in_class(None, 1), return_exceptions=True)
+        self.assertIsInstance(results[0], OSError)
+        self.assertIsInstance(results[1], DatabaseUnavailableError)
+        self.assertEqual(self.attempts, attempts + 1)
+        self.assertEqual(pool.stats()['breaker']['state'], 'open')
+
+    async def test_open_breaker_fails_queued_acquires(self):
+        pool = SafePool(minsize=0, maxsize=2, breaker_failures=1, class_limits={INTERACTIVE: 1})
+        held = await pool._acquire_in_class(None, None)
+        waiter = asyncio.create_task(pool._acquire_in_class(None, 5))
+        await asyncio.sleep(0.01)
+        self.fail = True
+        pool.target = 2
+        await pool.maintain()
+        with self.assertRaises(DatabaseUnavailableError):
+            await asyncio.wait_for(waiter, 1)
+        await pool.release(held)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_half_open_lets_one_trial_through(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.record_failure(0.0, 5.0, OSError("refused"))
+        self.assertFalse(breaker.allow(1.0))
+        self.assertEqual([breaker.allow(6.0), breaker.allow(6.0)], [True, False])
+        self.assertEqual(breaker.to_dict(6.0)['state'], 'half_open')
+        breaker.record_failure(6.5, 5.0, OSError("refused"))
+        self.assertFalse(breaker.allow(7.0))
+        self.assertEqual([breaker.allow(12.0), breaker.allow(12.0)], [True, False])
+        breaker.record_success()
+        self.assertTrue(breaker.allow(12.0) and breaker.allow(12.0))
+
+    def test_unresolved_trial_is_handed_on(self):
+        breaker = CircuitBreaker(failure_threshold=1)
+        breaker.record_failure(0.0, 1.0, OSError("refused"))
+        self.assertTrue(breaker.allow(1.0))
+        self.assertFalse(breaker.allow(1.0 + HALF_OPEN_PROBE_TIMEOUT - 0.1))
+        self.assertTrue(breaker.allow(1.0 + HALF_OPEN_PROBE_TIMEOUT))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import unittest
+
+import numpy as np
+
+from quantization import (
+    truncate_embeddings, quantize_int8, int8_codes_from_bytes, int8_code_norms, int8_candidates,
+    QuantizedCodeCache
+)
+
+
+class TestTruncation(unittest.TestCase):
+    def test_truncate_renormalizes(self):
+        vectors = np.array([[3.0, 4.0, 12.0], [1.0, 0.0, 5.0]])
+        truncated = truncate_embeddings(vectors, 2)
+        self.assertEqual(truncated.shape, (2, 2))
+        np.testing.assert_allclose(np.linalg.norm(truncated, axis=1), [1.0, 1.0], rtol=1e-6)
+        np.testing.assert_allclose(truncated[0], [0.6, 0.8], rtol=1e-6)
+
+    def test_truncate_single_vector_keeps_rank(self):
+        self.assertEqual(truncate_embeddings([1.0, 2.0, 3.0], 2).shape, (2,))
+
+    def test_truncate_rejects_larger_dimension(self):
+        with self.assertRaises(ValueError):
+            truncate_embeddings([[1.0, 2.0]], 3)
+
+
+class TestInt8(unittest.TestCase):
+    def test_quantize_uses_full_range(self):
+        codes = quantize_int8([[0.5, -0.25, 0.0]])
+        self.assertEqual(codes.dtype, np.int8)
+        np.testing.assert_array_equal(codes[0], [127, -64, 0])
+
+    def test_codes_round_trip_through_bytes(self):
+        codes = quantize_int8(np.random.default_rng(0).normal(size=(4, 8)))
+        restored = int8_codes_from_bytes([row.tobytes() for row in codes], 8)
+        np.testing.assert_array_equal(restored, codes)
+
+    def test_candidates_rank_by_cosine(self):
+        rng = np.random.default_rng(1)
+        vectors = rng.normal(size=(500, 32)).astype(np.float32)
+        codes = quantize_int8(vectors)
+        query = vectors[42] + 0.01 * rng.normal(size=32).astype(np.float32)
+        top = int8_candidates(codes, int8_code_norms(codes), query, 5)
+        self.assertEqual(len(top), 5)
+        self.assertEqual(top[0], 42)
+
+    def test_euclidean_candidates_use_vector_lengths(self):
+        vectors = np.array([[1.0, 0.0], [10.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+        codes = quantize_int8(vectors)
+        norms = np.linalg.norm(vectors, axis=1)
+        top = int8_candidates(codes, int8_code_norms(codes), [9.0, 0.0], 3, "EUCLIDEAN", norms)
+        self.assertEqual(list(top), [1, 0, 2])
+        # Cosine cannot tell the two vectors on the x axis apart
+        self.assertEqual(sorted(int8_candidates(codes, int8_code_norms(codes), [9.0, 0.0], 2)), [0, 1])
+        with self.assertRaises(ValueError):
+            int8_candidates(codes, int8_code_norms(codes), [9.0, 0.0], 3, "EUCLIDEAN")
+
+    def test_candidates_on_empty_codes(self):
+        codes = np.empty((0, 4), dtype=np.int8)
+        self.assertEqual(len(int8_candidates(codes, int8_code_norms(codes), [1.0, 0, 0, 0], 3)), 0)
+
+
+class TestQuantizedCodeCache(unittest.TestCase):
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = QuantizedCodeCache(max_bytes=100, ttl_seconds=60)
+        cache.put('a', 'codes a', 40)
+        cache.put('b', 'codes b', 40)
+        self.assertEqual(cache.get('a'), 'codes a')
+        cache.put('c', 'codes c', 40)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual((cache.bytes, cache.evictions), (80, 1))
+        cache.put('d', 'codes d', 101)
+        self.assertIsNone(cache.get('d'))
+        self.assertEqual(cache.pop('a'), 'codes a')
+        self.assertEqual(cache.bytes, 40)
+
+    def test_entries_expire(self):
+        cache = QuantizedCodeCache(max_bytes=100, ttl_seconds=0)
+        cache.put('a', 'codes a', 10)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.bytes, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock
+
+from asyncmy.errors import OperationalError
+
+from custom_connection import DatabaseUnavailableError
+from replicas import LEAST_LOADED, ROUND_ROBIN, Replica, ReplicaSet
+from src.server import MariaDBServer
+
+
+class FakeCursor:
+    def __init__(self, pool):
+        self.pool = pool
+        self.rows = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=None):
+        if self.pool.error is not None:
+            raise self.pool.error
+        self.pool.executed.append(sql)
+        self.rows = self.pool.slave_status if sql == "SHOW SLAVE STATUS" else [{'name': self.pool.name}]
+        return len(self.rows)
+
+    async def fetchone(self):
+        return {'DATABASE()': 'test_db'}
+
+    async def fetchall(self):
+        return self.rows
+
+
+class FakePool:
+    """Stands in for a SafePool on one endpoint and records the statements it runs."""
+    def __init__(self, name, slave_status=None, in_use=0):
+        self.name = name
+        self.slave_status = slave_status or []
+        self.executed = []
+        self.error = None
+        self.size, self.freesize = in_use, 0
+        self.breaker = MagicMock(is_open=False)
+
+    def acquire(self, priority=None):
+        pool = self
+
+        class _Ctx:
+            async def __aenter__(self_inner):
+                if pool.error is not None and isinstance(pool.error, DatabaseUnavailableError):
+                    raise pool.error
+                conn = MagicMock()
+                conn.cursor = lambda cursor=None: FakeCursor(pool)
+                return conn
+
+            async def __aexit__(self_inner, *exc):
+                return False
+        return _Ctx()
+
+
+def replica(name, lag=0.0, in_use=0):
+    return Replica(name, FakePool(name, in_use=in_use), healthy=True, lag=lag)
+
+
+class TestReplicaSelection(unittest.TestCase):
+    def test_round_robin_skips_lagging_replicas(self):
+        replicas = ReplicaSet([replica('a'), replica('b', lag=60), replica('c')], max_lag=10, routing=ROUND_ROBIN)
+        self.assertEqual([replicas.pick().name for _ in range(4)], ['a', 'c', 'a', 'c'])
+
+    def test_least_loaded(self):
+        replicas = ReplicaSet([replica('a', in_use=3), replica('b', in_use=1)], max_lag=10, routing=LEAST_LOADED)
+        self.assertEqual(replicas.pick().name, 'b')
+
+    def test_no_eligible_replica_falls_back(self):
+        down = replica('a')
+        down.pool.breaker.is_open = True
+        replicas = ReplicaSet([down, replica('b', lag=60)], max_lag=10)
+        self.assertIsNone(replicas.pick())
+        self.assertEqual(replicas.stats()['fallbacks_to_primary'], 1)
+
+    def test_unknown_routing(self):
+        with self.assertRaises(ValueError):
+            ReplicaSet([], max_lag=10, routing='random')
+
+
+class TestReplicaHealthCheck(unittest.IsolatedAsyncioTestCase):
+    async def test_lag_is_read_from_slave_status(self):
+        lagging = Replica('a', FakePool('a', [{'Seconds_Behind_Master': 42}]))
+        broken = Replica('b', FakePool('b', [{'Seconds_Behind_Master': None}]))
+        standalone = Replica('c', FakePool('c'))
+        replicas = ReplicaSet([lagging, broken, standalone], max_lag=10)
+        await replicas.check_all()
+        self.assertEqual((lagging.healthy, lagging.lag), (True, 42.0))
+        self.assertFalse(broken.healthy)
+        self.assertEqual((standalone.healthy, standalone.lag), (True, 0.0))
+        self.assertEqual(replicas.eligible(), [standalone])
+
+
+class TestReadRouting(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.server.is_read_only = False
+        self.server.pool = FakePool('primary')
+        self.replica = replica('replica')
+        self.server.replicas = ReplicaSet([self.replica], max_lag=10)
+
+    async def run_in_call(self, coro):
+        # Each tool call runs in its own task, which scopes the read-your-writes pin
+        return await asyncio.create_task(coro)
+
+    async def test_reads_go_to_replica_and_writes_to_primary(self):
+        rows = await self.run_in_call(self.server._execute_query("SELECT 1"))
+        self.assertEqual(rows, [{'name': 'replica'}])
+        await self.run_in_call(self.server._execute_query("DELETE FROM t"))
+        self.assertIn("DELETE FROM t", self.server.pool.executed)
+        self.assertNotIn("DELETE FROM t", self.replica.pool.executed)
+
+    async def test_reads_after_a_write_stay_on_primary(self):
+        async def call():
+            await self.server._execute_query("INSERT INTO t VALUES (1)")
+            return await self.server._execute_query("SELECT * FROM t")
+        self.assertEqual(await self.run_in_call(call()), [{'name': 'primary'}])
+        self.assertEqual(await self.run_in_call(self.server._execute_query("SELECT 1")), [{'name': 'replica'}])
+
+    async def test_lagging_replica_falls_back_to_primary(self):
+        self.replica.lag = 60
+        self.assertEqual(await self.run_in_call(self.server._execute_query("SELECT 1")), [{'name': 'primary'}])
+
+    async def test_unreachable_replica_is_retried_on_primary(self):
+        self.replica.pool.error = OperationalError(2013, "Lost connection to MySQL server during query")
+        self.assertEqual(await self.run_in_call(self.server._execute_query("SELECT 1")), [{'name': 'primary'}])
+        self.assertFalse(self.replica.healthy)
+
+    async def test_query_errors_on_replica_are_not_retried(self):
+        self.replica.pool.error = OperationalError(1146, "Table 't' doesn't exist")
+        with self.assertRaises(RuntimeError):
+            await self.run_in_call(self.server._execute_query("SELECT * FROM t"))
+        self.assertEqual(self.server.pool.executed, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from sharding import Shard, ShardedStore, group_by_shard, merge_top_k, parse_shards
+from src.server import MariaDBServer
+
+
+def store_info(dimension=2):
+    return {'model_name': 'text-embedding-3-small', 'dimension': dimension, 'distance_function': 'COSINE',
+            'quantized': False, 'deduplicated': False, 'options': {}, 'cataloged': True}
+
+
+class TestShardRouting(unittest.TestCase):
+    def setUp(self):
+        self.store = ShardedStore("incidents", "tenant", [
+            Shard("db_a", "incidents_acme", ["acme"]),
+            Shard("db_b", "incidents_rest_1"),
+            Shard("db_b", "incidents_rest_2"),
+        ])
+
+    def test_listed_values_go_to_their_shard(self):
+        self.assertEqual(self.store.route({"tenant": "acme"}).label, "db_a.incidents_acme")
+
+    def test_other_values_are_hashed_stably(self):
+        first = self.store.route({"tenant": "globex"})
+        self.assertIn(first.vector_store_name, ("incidents_rest_1", "incidents_rest_2"))
+        self.assertIs(self.store.route({"tenant": "globex"}), first)
+        labels = {self.store.route({"tenant": f"t{i}"}).label for i in range(50)}
+        self.assertEqual(labels, {"db_b.incidents_rest_1", "db_b.incidents_rest_2"})
+
+    def test_unroutable_value_without_hash_shards(self):
+        store = ShardedStore("s", "tenant", [Shard("db", "a", ["x"])])
+        with self.assertRaises(ValueError):
+            store.route({"tenant": "y"})
+
+    def test_value_assigned_twice_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ShardedStore("s", "tenant", [Shard("db", "a", ["x"]), Shard("db", "b", ["x"])])
+
+    def test_group_by_shard_keeps_positions(self):
+        groups = {shard.label: positions for shard, positions in group_by_shard(self.store, [{"tenant": "acme"}, {}, {"tenant": "acme"}])}
+        self.assertEqual(groups["db_a.incidents_acme"], [0, 2])
+
+    def test_parse_shards_defaults_database_and_rejects_duplicates(self):
+        self.assertEqual(parse_shards([{"vector_store_name": "a"}], "home")[0].label, "home.a")
+        with self.assertRaises(ValueError):
+            parse_shards([{"vector_store_name": "a"}, {"vector_store_name": "a", "database_name": "home"}], "home")
+
+    def test_merge_top_k(self):
+        merged = merge_top_k([[{"distance": 0.1}, {"distance": 0.4}], [{"distance": 0.2}, {"distance": 0.3}], []], 3)
+        self.assertEqual([row["distance"] for row in merged], [0.1, 0.2, 0.3])
+
+
+class TestShardedVectorStore(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.server.is_read_only = False
+        self.server._sharded_stores[('home', 'incidents')] = ShardedStore('incidents', 'tenant', [
+            Shard('db_a', 'inc_a', ['acme']), Shard('db_b', 'inc_b', ['globex'])])
+        self.service = MagicMock()
+        self.service.embed = AsyncMock(return_value=[1.0, 0.0])
+        self.patches = [
+            patch('src.server.embedding_service', self.service),
+            patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info())),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    async def test_search_fans_out_and_merges(self):
+        async def fake_query(sql, params=None, database=None, statement_vars=None):
+            if '`db_a`.`inc_a`' in sql:
+                return [{'id': 'a1', 'document': 'a1', 'metadata': '{}', 'distance': 0.1},
+                        {'id': 'a2', 'document': 'a2', 'metadata': '{}', 'distance': 0.5}]
+            return [{'id': 'b1', 'document': 'b1', 'metadata': '{}', 'distance': 0.2},
+                    {'id': 'b2', 'document': 'b2', 'metadata': '{}', 'distance': 0.3}]
+        with patch.object(self.server, '_execute_query', AsyncMock(side_effect=fake_query)) as query:
+            found = await self.server.search_sharded_vector_store('disk full', 'home', 'incidents', k=3)
+        results = found['results']
+        self.assertEqual(found['failed_shards'], [])
+        self.assertEqual([r['document'] for r in results], ['a1', 'b1', 'b2'])
+        self.assertEqual(results[0]['shard'], 'db_a.inc_a')
+        self.assertEqual(query.call_count, 2)
+        self.service.embed.assert_awaited_once()
+
+    async def test_failed_shard_is_reported(self):
+        async def fake_query(sql, params=None, database=None, statement_vars=None):
+            if '`db_b`.`inc_b`' in sql:
+                raise RuntimeError("Database error: Lost connection to server")
+            return [{'id': 'a1', 'document': 'a1', 'metadata': '{}', 'distance': 0.1}]
+        with patch.object(self.server, '_execute_query', AsyncMock(side_effect=fake_query)):
+            found = await self.server.search_sharded_vector_store('disk full', 'home', 'incidents', k=3)
+            self.assertEqual([r['document'] for r in found['results']], ['a1'])
+            self.assertEqual([f['shard'] for f in found['failed_shards']], ['db_b.inc_b'])
+        with patch.object(self.server, '_execute_query', AsyncMock(side_effect=RuntimeError("down"))):
+            with self.assertRaises(RuntimeError):
+                await self.server.search_sharded_vector_store('disk full', 'home', 'incidents')
+
+    async def test_invalid_names_are_rejected(self):
+        with self.assertRaises(ValueError):
+            await self.server.insert_docs_sharded_vector_store('home`; DROP', 'incidents', ['x'])
+        with self.assertRaises(ValueError):
+            await self.server._get_sharded_store('home', 'inc-idents')
+
+    async def test_insert_routes_by_shard_key(self):
+        insert = AsyncMock(side_effect=lambda db, store, docs, meta: {'status': 'success', 'inserted': len(docs)})
+        with patch.object(self.server, 'insert_docs_vector_store', insert):
+            result = await self.server.insert_docs_sharded_vector_store(
+                'home', 'incidents', ['x', 'y', 'z'], [{'tenant': 'acme'}, {'tenant': 'globex'}, {'tenant': 'acme'}])
+        self.assertEqual(result['inserted'], 3)
+        calls = {(c.args[0], c.args[1]): c.args[2] for c in insert.call_args_list}
+        self.assertEqual(calls, {('db_a', 'inc_a'): ['x', 'z'], ('db_b', 'inc_b'): ['y']})
+
+    async def test_unknown_sharded_store(self):
+        with patch.object(self.server, '_table_exists', AsyncMock(return_value=False)):
+            with self.assertRaises(ValueError):
+                await self.server.search_sharded_vector_store('q', 'home', 'missing')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import asyncio
+import unittest
+from unittest.mock import patch
+
+import deadlines
+from singleflight import Singleflight, normalize_sql
+from src.server import MariaDBServer
+from tests.test_replicas import FakePool
+
+
+class TestSingleflight(unittest.IsolatedAsyncioTestCase):
+    def test_normalize_sql_keeps_literals(self):
+        self.assertEqual(normalize_sql("SELECT  *\n FROM t WHERE a = 'x  y' ;"), "SELECT * FROM t WHERE a = 'x  y'")
+
+    async def test_concurrent_calls_share_one_execution(self):
+        flights = Singleflight(copy=list)
+        calls = []
+
+        async def run():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return [1, 2]
+        first, second = await asyncio.gather(flights.do('k', run), flights.do('k', run))
+        self.assertEqual((first, second, len(calls)), ([1, 2], [1, 2], 1))
+        self.assertIsNot(first, second)
+        await flights.do('k', run)
+        self.assertEqual(flights.stats()['executions'], 2)
+        self.assertEqual(flights.stats()['coalesced'], 1)
+
+    async def test_errors_are_shared(self):
+        flights = Singleflight()
+
+        async def run():
+            await asyncio.sleep(0.01)
+            raise TimeoutError("deadline")
+        results = await asyncio.gather(flights.do('k', run), flights.do('k', run), return_exceptions=True)
+        self.assertTrue(all(isinstance(result, TimeoutError) for result in results))
+
+    async def test_execution_is_cancelled_only_when_every_caller_gives_up(self):
+        flights = Singleflight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def run():
+            started.set()
+            try:
+                await asyncio.sleep(3600)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+        first = asyncio.create_task(flights.do('k', run))
+        second = asyncio.create_task(flights.do('k', run))
+        await started.wait()
+        first.cancel()
+        await asyncio.sleep(0.01)
+        self.assertFalse(cancelled.is_set())
+        second.cancel()
+        await asyncio.wait_for(cancelled.wait(), 1)
+        self.assertEqual(flights.stats()['in_flight'], 0)
+
+    async def test_each_caller_bounds_its_own_wait(self):
+        flights = Singleflight()
+
+        async def run():
+            await asyncio.sleep(0.05)
+            return 'rows'
+        results = await asyncio.gather(flights.do('k', run, timeout=0.01), flights.do('k', run), return_exceptions=True)
+        self.assertIsInstance(results[0], asyncio.TimeoutError)
+        self.assertEqual(results[1], 'rows')
+
+    async def test_forgotten_flights_are_not_joined(self):
+        flights = Singleflight()
+
+        async def run():
+            await asyncio.sleep(0.01)
+            return 'rows'
+        first = asyncio.create_task(flights.do('k', run))
+        await asyncio.sleep(0)
+        flights.forget()
+        await asyncio.gather(first, flights.do('k', run))
+        self.assertEqual((flights.stats()['executions'], flights.stats()['coalesced']), (2, 0))
+
+
+class TestCoalescedReads(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.server.is_read_only = False
+        self.server.pool = FakePool('primary')
+
+    def statements(self, sql):
+        return self.server.pool.executed.count(sql)
+
+    async def test_identical_reads_run_once(self):
+        rows = await asyncio.gather(self.server._execute_query("SELECT * FROM t WHERE id = %s", (1,), 'db'),
+                                    self.server._execute_query("SELECT *  FROM t\n WHERE id = %s", (1,), 'db'),
+                                    self.server._execute_query("SELECT * FROM t WHERE id = %s", (2,), 'db'))
+        self.assertEqual(rows[0], rows[1])
+        self.assertEqual(self.server.read_flights.stats()['coalesced'], 1)
+        self.assertEqual(self.statements("SELECT * FROM t WHERE id = %s"), 2)
+
+    async def test_unshareable_and_pinned_reads_are_not_coalesced(self):
+        await asyncio.gather(self.server._execute_query("SELECT RAND()"), self.server._execute_query("SELECT RAND()"))
+        self.assertEqual(self.statements("SELECT RAND()"), 2)
+
+        async def after_write():
+            await self.server._execute_query("UPDATE t SET a = 1")
+            return await self.server._execute_query("SELECT a FROM t")
+        await asyncio.gather(asyncio.create_task(after_write()), asyncio.create_task(after_write()))
+        self.assertEqual(self.statements("SELECT a FROM t"), 2)
+        self.assertEqual(self.server.read_flights.stats()['coalesced'], 0)
+
+    async def test_shared_read_runs_without_the_leaders_deadline(self):
+        seen = []
+
+        async def slow_dispatch(sql, params, database, statement_vars, timeout, is_read):
+            seen.append((timeout, deadlines.remaining()))
+            await asyncio.sleep(0.05)
+            return [{'a': 1}]
+
+        async def call(timeout):
+            with deadlines.deadline(timeout):
+                return await self.server._execute_query("SELECT a FROM t", timeout=timeout)
+        with patch.object(self.server, '_dispatch_query', slow_dispatch):
+            results = await asyncio.gather(call(0.01), call(None), return_exceptions=True)
+        self.assertIsInstance(results[0], TimeoutError)
+        self.assertEqual(results[1], [{'a': 1}])
+        self.assertEqual(seen, [(None, None)])
+
+    async def test_reads_after_a_completed_write_do_not_join_older_executions(self):
+        async def dispatch(sql, params, database, statement_vars, timeout, is_read):
+            self.server.pool.executed.append(sql)
+            await asyncio.sleep(0.02 if is_read else 0)
+            return []
+        with patch.object(self.server, '_dispatch_query', dispatch):
+            before = asyncio.create_task(self.server._execute_query("SELECT a FROM t"))
+            await asyncio.sleep(0)
+
+            async def write_then_read():
+                await self.server._execute_query("UPDATE t SET a = 1")
+            await asyncio.create_task(write_then_read())
+            await asyncio.gather(before, asyncio.create_task(self.server._execute_query("SELECT a FROM t")))
+        self.assertEqual(self.statements("SELECT a FROM t"), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from custom_connection import ConnectionBudget, SafePool
+from targets import Target, TargetMiddleware, TargetRegistry, current_target, use_target
+from src.server import MariaDBServer
+from tests.test_pool import fake_connection
+
+
+def fake_pool(size=0, free=0):
+    pool = MagicMock()
+    pool.size, pool.freesize = size, free
+    pool.wait_closed = AsyncMock()
+    return pool
+
+
+class TestTargetRegistry(unittest.IsolatedAsyncioTestCase):
+    async def test_pool_is_created_once_on_first_use(self):
+        created = []
+
+        async def factory(target):
+            await asyncio.sleep(0.01)
+            created.append(target.id)
+            return fake_pool()
+        registry = TargetRegistry(factory, idle_timeout=None)
+        registry.add(Target('prod', 'db1', 3306))
+        first, second = await asyncio.gather(registry.pool('prod'), registry.pool('prod'))
+        self.assertIs(first, second)
+        self.assertEqual(created, ['prod'])
+
+    async def test_unknown_target_reloads_the_catalog(self):
+        loader = AsyncMock(side_effect=[[], [Target('new', 'db9', 3306)]])
+        registry = TargetRegistry(AsyncMock(return_value=fake_pool()), None, loader)
+        await registry.load_catalog()
+        with patch('targets.CATALOG_RELOAD_INTERVAL', 0):
+            await registry.pool('new')
+        with self.assertRaises(ValueError):
+            await registry.pool('missing')
+        self.assertEqual(loader.await_count, 2)
+
+    async def test_idle_pools_are_closed_unless_in_use(self):
+        idle, busy = fake_pool(2, 2), fake_pool(2, 1)
+        registry = TargetRegistry(AsyncMock(side_effect=[idle, busy]), idle_timeout=0.01)
+        registry.add(Target('a', 'db1', 3306))
+        registry.add(Target('b', 'db2', 3306))
+        await registry.pool('a')
+        await registry.pool('b')
+        await asyncio.sleep(0.02)
+        await registry.close_idle()
+        idle.close.assert_called_once()
+        busy.close.assert_not_called()
+        self.assertEqual([t['pool_open'] for t in registry.list()], [False, True])
+
+
+class TestConnectionBudget(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        async def connect(**kwargs):
+            return fake_connection()
+        self.patcher = patch('custom_connection.safe_connect', connect)
+        self.patcher.start()
+
+    async def asyncTearDown(self):
+        self.patcher.stop()
+
+    async def test_free_connections_of_other_pools_are_reclaimed(self):
+        budget = ConnectionBudget(2)
+        first = SafePool(minsize=0, maxsize=2, budget=budget)
+        second = SafePool(minsize=0, maxsize=2, budget=budget)
+        held = await first._acquire_in_class(None, 1)
+        await first.release(await first._acquire_in_class(None, 1))
+        await first.release(held)
+        self.assertEqual(first.freesize, 2)
+        conn = await second._acquire_in_class(None, 1)
+        self.assertEqual((first.size, second.size, budget.open), (1, 1, 2))
+        await second.release(conn)
+
+    async def test_longest_idle_connections_are_reclaimed_first(self):
+        budget = ConnectionBudget(3)
+        busy, quiet = SafePool(minsize=0, maxsize=2, budget=budget), SafePool(minsize=0, maxsize=2, budget=budget)
+        requester = SafePool(minsize=0, maxsize=2, budget=budget)
+        for pool in (busy, busy, quiet):
+            await pool.release(await pool._acquire_in_class(None, 1))
+        oldest = quiet._free[0]
+        quiet._idle_since[oldest] -= 60
+        self.assertEqual(budget.reclaim(requester, 1), 1)
+        oldest.close.assert_called_once()
+        self.assertEqual((len(busy._free), len(quiet._free)), (1, 0))
+
+    async def test_acquire_waits_for_a_connection_of_another_pool(self):
+        budget = ConnectionBudget(1)
+        first = SafePool(minsize=0, maxsize=2, budget=budget)
+        second = SafePool(minsize=0, maxsize=2, budget=budget)
+        held = await first._acquire_in_class(None, 1)
+        waiter = asyncio.create_task(second._acquire_in_class(None, 1))
+        await asyncio.sleep(0.01)
+        self.assertFalse(waiter.done())
+        await first.release(held)
+        conn = await asyncio.wait_for(waiter, 1)
+        self.assertEqual((first.size, second.size), (0, 1))
+        await second.release(conn)
+
+
+class TestTargetMiddleware(unittest.IsolatedAsyncioTestCase):
+    async def test_target_argument_is_consumed(self):
+        middleware = TargetMiddleware(('list_jobs',))
+        context = SimpleNamespace(message=SimpleNamespace(name='execute_sql', arguments={'sql_query': 'SELECT 1', 'target': 'prod'}))
+
+        async def call_next(ctx):
+            return current_target(), dict(ctx.message.arguments)
+        self.assertEqual(await middleware.on_call_tool(context, call_next), ('prod', {'sql_query': 'SELECT 1'}))
+        self.assertIsNone(current_target())
+
+    async def test_untargeted_tool_rejects_target(self):
+        middleware = TargetMiddleware(('list_jobs',))
+        context = SimpleNamespace(message=SimpleNamespace(name='list_jobs', arguments={'target': 'prod'}))
+        with self.assertRaises(ValueError):
+            await middleware.on_call_tool(context, AsyncMock())
+
+
+class TestTargetRouting(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.server.pool = MagicMock()
+        self.target_pool = MagicMock()
+        self.server.targets = TargetRegistry(AsyncMock(return_value=self.target_pool), None)
+        self.server.targets.add(Target('prod', 'db1', 3306))
+
+    async def test_catalog_targets_must_match_allowed_hosts(self):
+        rows = [{'name': 'prod', 'host': 'db1.db.internal', 'port': 3306},
+                {'name': 'evil', 'host': 'attacker.example', 'port': 3306}]
+        with patch('src.server.MCP_TARGET_CATALOG', 'lumos.databases'), \
+             patch.object(self.server, '_execute_query', AsyncMock(return_value=rows)) as query:
+            with patch('src.server.MCP_TARGET_CATALOG_HOSTS', ['*.DB.internal']):
+                self.assertEqual([t.id for t in await self.server._load_target_catalog()], ['prod'])
+            with patch('src.server.MCP_TARGET_CATALOG_HOSTS', []):
+                self.assertEqual(await self.server._load_target_catalog(), [])
+        self.assertEqual(query.await_count, 1)
+
+    async def test_current_pool_follows_the_target(self):
+        self.assertIs(await self.server._current_pool(), self.server.pool)
+        with use_target('prod'):
+            self.assertIs(await self.server._current_pool(), self.target_pool)
+            with self.assertRaises(ValueError):
+                with use_target('staging'):
+                    await self.server._current_pool()
+
+    async def test_caches_are_kept_per_target(self):
+        self.server._store_catalog[('db', 'docs')] = {'dimension': 2}
+        with use_target('prod'):
+            self.assertNotIn(('db', 'docs'), self.server._store_catalog)
+            self.server.search_cache.bump('db', 'docs')
+        self.assertEqual(self.server.search_cache.version('db', 'docs'), 0)
+
+    async def test_jobs_run_on_the_submitting_target(self):
+        submit = MagicMock(return_value={'job_id': 'j'})
+        self.server.jobs.submit = submit
+
+        async def run(handle):
+            return current_target()
+        with use_target('prod'):
+            self.server._submit_job('test', {}, run)
+        kind, params, wrapped = submit.call_args.args
+        self.assertEqual(params, {'target': 'prod'})
+        self.assertEqual(await wrapped(None), 'prod')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,889 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+
+# Import the MariaDBServer from the project
+from src.server import MariaDBServer
+
+
+class FakeCursor:
+    """Records executed statements instead of talking to MariaDB."""
+    def __init__(self, executed, rows):
+        self.executed = executed
+        self.rows = rows
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, params=None):
+        self.executed.append((sql, params))
+
+    async def fetchone(self):
+        return {'DATABASE()': 'test_db'}
+
+    async def fetchall(self):
+        return self.rows
+
+
+class FakePool:
+    def __init__(self, rows=None):
+        self.executed = []
+        self.rows = rows or []
+
+    def acquire(self):
+        pool = self
+
+        class _Ctx:
+            async def __aenter__(self_inner):
+                conn = MagicMock()
+                conn.cursor = lambda cursor=None: FakeCursor(pool.executed, pool.rows)
+                return conn
+
+            async def __aexit__(self_inner, *exc):
+                return False
+        return _Ctx()
+
+
+def store_info(dimension=2, distance_function='COSINE', quantized=False, model_name='text-embedding-3-small', deduplicated=False):
+    return {
+        'model_name': model_name,
+        'dimension': dimension,
+        'distance_function': distance_function,
+        'quantized': quantized,
+        'deduplicated': deduplicated,
+        'options': {'quantization': 'int8'} if quantized else {},
+        'cataloged': True,
+    }
+
+
+class TestStatementVars(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.server.pool = FakePool()
+
+    async def test_statement_vars_wrap_query(self):
+        await self.server._execute_query("SELECT 1", database='test_db', statement_vars={'mhnsw_ef_search': 40})
+        sql, _ = self.server.pool.executed[-1]
+        self.assertEqual(sql, "SET STATEMENT mhnsw_ef_search=40 FOR SELECT 1")
+
+    async def test_statement_vars_rejects_non_integer_values(self):
+        with self.assertRaises(ValueError):
+            await self.server._execute_query("SELECT 1", statement_vars={'mhnsw_ef_search': '1; DROP TABLE t'})
+
+    async def test_read_only_check_ignores_statement_vars(self):
+        self.server.is_read_only = True
+        with self.assertRaises(PermissionError):
+            await self.server._execute_query("DELETE FROM t", statement_vars={'mhnsw_ef_search': 40})
+
+
+class TestVectorStoreTuning(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.patcher = patch.object(self.server, '_execute_query', new_callable=AsyncMock)
+        self.mock_execute_query = self.patcher.start()
+
+    async def asyncTearDown(self):
+        self.patcher.stop()
+
+    async def test_create_vector_store_with_hnsw_m(self):
+        service = MagicMock()
+        service.get_embedding_dimension = AsyncMock(return_value=4)
+        service.get_default_model = MagicMock(return_value='text-embedding-3-small')
+        with patch.object(self.server, '_database_exists', AsyncMock(return_value=True)), \
+             patch.object(self.server, '_table_exists', AsyncMock(return_value=False)):
+            result = await self.server.create_vector_store_tool('test_db', 'store', service, hnsw_m=16)
+        self.assertEqual(result['status'], 'success')
+        create_sql = next(c.args[0] for c in self.mock_execute_query.call_args_list if 'CREATE TABLE IF NOT EXISTS `store`' in c.args[0])
+        self.assertIn("VECTOR INDEX (embedding) M=16 DISTANCE=COSINE", create_sql)
+
+    async def test_create_vector_store_rejects_invalid_hnsw_m(self):
+        service = MagicMock()
+        service.get_embedding_dimension = AsyncMock(return_value=4)
+        with self.assertRaises(ValueError):
+            await self.server.create_vector_store_tool('test_db', 'store', service, hnsw_m=1000)
+
+    async def test_search_passes_ef_search(self):
+        self.mock_execute_query.return_value = [{'id': 'a', 'document': 'doc', 'metadata': '{"x": 1}', 'distance': 0.1}]
+        service = MagicMock()
+        service.embed = AsyncMock(return_value=[0.1, 0.2])
+        with patch('src.server.embedding_service', service), \
+             patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info())):
+            results = await self.server.search_vector_store('query', 'test_db', 'store', k=3, ef_search=80)
+        self.assertEqual(results, [{'document': 'doc', 'metadata': {'x': 1}, 'distance': 0.1}])
+        self.assertEqual(self.mock_execute_query.call_args.kwargs['statement_vars'], {'mhnsw_ef_search': 80})
+
+    async def test_range_search_grows_window_until_threshold(self):
+        distances = [0.01 * i for i in range(20)]
+
+        def fake_query(sql, params=None, database=None, statement_vars=None):
+            if 'VEC_DISTANCE' in sql:
+                return [{'id': f'id{i}', 'distance': d} for i, d in enumerate(distances[:params[-1]])]
+            return [{'id': i, 'document': f'doc {i}', 'metadata': '{}'} for i in params]
+        self.mock_execute_query.side_effect = fake_query
+        service = MagicMock()
+        service.embed = AsyncMock(return_value=[0.1, 0.2])
+        with patch('src.server.embedding_service', service), \
+             patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info())):
+            results = await self.server.search_vector_store('query', 'test_db', 'store', k=2, max_distance=0.055)
+        self.assertEqual([r['document'] for r in results], [f'doc id{i}' for i in range(6)])
+        self.assertEqual([r['distance'] for r in results], distances[:6])
+        windows = [c.kwargs['params'][-1] for c in self.mock_execute_query.call_args_list if 'VEC_DISTANCE' in c.args[0]]
+        self.assertEqual(windows, [2, 4, 8])
+        candidate_sql = next(c.args[0] for c in self.mock_execute_query.call_args_list if 'VEC_DISTANCE' in c.args[0])
+        self.assertNotIn('document', candidate_sql)
+        fetch_params = self.mock_execute_query.call_args.kwargs['params']
+        self.assertEqual(len(fetch_params), 6)
+
+    async def test_range_search_stops_when_store_is_exhausted(self):
+        def fake_query(sql, params=None, database=None, statement_vars=None):
+            if 'VEC_DISTANCE' in sql:
+                return [{'id': 'a', 'distance': 0.0}]
+            return [{'id': 'a', 'document': 'doc a', 'metadata': '{}'}]
+        self.mock_execute_query.side_effect = fake_query
+        service = MagicMock()
+        service.embed = AsyncMock(return_value=[0.1, 0.2])
+        with patch('src.server.embedding_service', service), \
+             patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info())):
+            results = await self.server.search_vector_store('query', 'test_db', 'store', k=5, max_distance=1.0)
+        self.assertEqual(results, [{'document': 'doc a', 'metadata': {}, 'distance': 0.0}])
+        self.assertEqual(self.mock_execute_query.call_count, 2)
+
+    async def test_search_projection_ids_and_distances_only(self):
+        self.mock_execute_query.return_value = [{'id': 'a', 'distance': 0.1}]
+        service = MagicMock()
+        service.embed = AsyncMock(return_value=[0.1, 0.2])
+        with patch('src.server.embedding_service', service), \
+             patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info())):
+            results = await self.server.search_vector_store('query', 'test_db', 'store', include_document=False, include_metadata=False)
+        self.assertEqual(results, [{'id': 'a', 'distance': 0.1}])
+        sql = self.mock_execute_query.call_args.args[0]
+        self.assertNotIn('document', sql)
+        self.assertNotIn('metadata', sql)
+
+    async def test_search_projection_snippet_and_metadata_keys(self):
+        self.mock_execute_query.return_value = [{'id': 'a', 'snippet': 'do', 'document_length': 3, 'metadata': '{"host": "db1"}', 'distance': 0.1}]
+        service = MagicMock()
+        service.embed = AsyncMock(return_value=[0.1, 0.2])
+        with patch('src.server.embedding_service', service), \
+             patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info())):
+            results = await self.server.search_vector_store('query', 'test_db', 'store', snippet_chars=2, metadata_keys=['host'])
+            with self.assertRaises(ValueError):
+                await self.server.search_vector_store('query', 'test_db', 'store', metadata_keys=["host') OR 1=1 --"])
+        self.assertEqual(results[0]['metadata'], {'host': 'db1'})
+        self.assertEqual(results[0]['id'], 'a')
+        sql = self.mock_execute_query.call_args.args[0]
+        self.assertIn("LEFT(document, 2) AS snippet", sql)
+        self.assertIn("JSON_OBJECT('host', JSON_EXTRACT(metadata, '$.host')) AS metadata", sql)
+
+    async def test_get_docs_fetches_ids_in_one_query(self):
+        self.mock_execute_query.return_value = [{'id': 'b', 'document': 'doc b', 'metadata': '{}'},
+                                                {'id': 'a', 'document': 'doc a', 'metadata': '{}'}]
+        with patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info())):
+            results = await self.server.get_docs_vector_store('test_db', 'store', ['a', 'missing', 'b', 'a'])
+        self.assertEqual([r['id'] for r in results], ['a', 'b'])
+        self.assertEqual(self.mock_execute_query.call_count, 1)
+        self.assertIn('WHERE id IN (%s, %s, %s)', self.mock_execute_query.call_args.args[0])
+
+    async def test_search_by_vector_skips_the_provider(self):
+        import base64
+        self.mock_execute_query.return_value = [{'id': 'a', 'document': 'doc', 'metadata': '{}', 'distance': 0.0}]
+        service = MagicMock()
+        service.embed = AsyncMock()
+        encoded = base64.b64encode(np.array([0.5, 0.25], dtype='<f4').tobytes()).decode()
+        with patch('src.server.embedding_service', service), \
+             patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info())):
+            for vector in ([0.5, 0.25], '[0.5, 0.25]', encoded):
+                results = await self.server.search_vector_store_by_vector(vector, 'test_db', 'store', k=1)
+                self.assertEqual(results, [{'document': 'doc', 'metadata': {}, 'distance': 0.0}])
+                self.assertEqual(self.mock_execute_query.call_args.kwargs['params'], ('[0.5, 0.25]', 1))
+        service.embed.assert_not_called()
+        # The three encodings are the same vector, so the last two are served from the search cache
+        self.assertEqual(self.mock_execute_query.call_count, 1)
+
+    async def test_search_by_vector_checks_dimension(self):
+        with patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info(dimension=2))):
+            with self.assertRaises(ValueError):
+                await self.server.search_vector_store_by_vector([1.0, 2.0, 3.0], 'test_db', 'store')
+            with self.assertRaises(ValueError):
+                await self.server.search_vector_store_by_vector('not base64!', 'test_db', 'store')
+            with self.assertRaises(ValueError):
+                await self.server.search_vector_store_by_vector([1.0, float('nan')], 'test_db', 'store')
+        self.mock_execute_query.assert_not_called()
+
+    async def test_benchmark_reports_recall_per_setting(self):
+        def fake_query(sql, params=None, database=None, statement_vars=None):
+            if 'information_schema.TABLES' in sql:
+                return [{'TABLE_ROWS': 3, 'DATA_LENGTH': 16384, 'INDEX_LENGTH': 8192}]
+            if 'RAND()' in sql:
+                return [{'embedding': '[1,0]'}, {'embedding': '[0,1]'}]
+            if 'IGNORE INDEX' in sql:
+                return [{'id': 'a'}, {'id': 'b'}]
+            if statement_vars['mhnsw_ef_search'] == 10:
+                return [{'id': 'a'}, {'id': 'c'}]
+            return [{'id': 'a'}, {'id': 'b'}]
+        self.mock_execute_query.side_effect = fake_query
+        with patch.object(self.server, '_is_vector_store', AsyncMock(return_value=True)), \
+             patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info())):
+            result = await self.server.benchmark_vector_store('test_db', 'store', k=2, num_queries=2, ef_search_values=[10, 40])
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['num_queries'], 2)
+        recalls = {r['ef_search']: r['recall_at_k'] for r in result['results']}
+        self.assertEqual(recalls, {10: 0.5, 40: 1.0})
+        self.assertIn('p99', result['results'][0]['latency_ms'])
+        self.assertEqual(result['storage']['data_bytes'], 16384)
+        self.assertEqual(result['quantized_results'], [])
+
+    async def test_create_vector_store_truncated_and_quantized(self):
+        service = MagicMock()
+        service.get_embedding_dimension = AsyncMock(return_value=3072)
+        service.supports_dimension_truncation = MagicMock(return_value=True)
+        service.get_default_model = MagicMock(return_value='text-embedding-3-large')
+        with patch.object(self.server, '_database_exists', AsyncMock(return_value=True)), \
+             patch.object(self.server, '_table_exists', AsyncMock(return_value=False)):
+            await self.server.create_vector_store_tool('test_db', 'store', service, dimensions=256, quantization='int8')
+        create_sql = next(c.args[0] for c in self.mock_execute_query.call_args_list if 'CREATE TABLE IF NOT EXISTS `store`' in c.args[0])
+        self.assertIn("embedding VECTOR(256) NOT NULL", create_sql)
+        self.assertIn("embedding_q VARBINARY(256) NOT NULL", create_sql)
+
+    async def test_create_vector_store_rejects_truncation_for_unsupported_model(self):
+        service = MagicMock()
+        service.get_embedding_dimension = AsyncMock(return_value=1024)
+        service.supports_dimension_truncation = MagicMock(return_value=False)
+        with self.assertRaises(ValueError):
+            await self.server.create_vector_store_tool('test_db', 'store', service, dimensions=256)
+
+    async def test_quantized_search_rescores_candidates(self):
+        codes = np.array([[127, 0], [0, 127], [90, 90]], dtype=np.int8)
+        self.mock_execute_query.side_effect = [
+            [{'id': 'a', 'embedding_q': codes[0].tobytes()},
+             {'id': 'b', 'embedding_q': codes[1].tobytes()},
+             {'id': 'c', 'embedding_q': codes[2].tobytes()}],
+            [{'id': 'a', 'document': 'doc a', 'metadata': '{}', 'distance': 0.0}],
+        ]
+        service = MagicMock()
+        service.embed = AsyncMock(return_value=[1.0, 0.0])
+        with patch('src.server.embedding_service', service), \
+             patch.object(self.server, '_table_storage', AsyncMock(return_value={'TABLE_ROWS': 3})), \
+             patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info(quantized=True))):
+            results = await self.server.search_vector_store('query', 'test_db', 'store', k=1, use_quantized=True, oversample=2)
+        self.assertEqual(results, [{'document': 'doc a', 'metadata': {}, 'distance': 0.0}])
+        rescore_sql = self.mock_execute_query.call_args.args[0]
+        rescore_params = self.mock_execute_query.call_args.kwargs['params']
+        self.assertIn("IGNORE INDEX (embedding)", rescore_sql)
+        self.assertEqual(rescore_params[1:], ('a', 'c', 1))
+
+    async def test_quantized_search_scans_stores_too_large_to_cache(self):
+        codes = np.array([[127, 0], [0, 127], [90, 90]], dtype=np.int8)
+        rows = [{'id': name, 'embedding_q': code.tobytes(), 'norm': norm}
+                for name, code, norm in zip('abc', codes, (1.0, 2.0, 5.0))]
+        scanned = []
+
+        async def stream(sql, params=None, database=None, batch_size=1000):
+            scanned.append((sql, params))
+            for row in rows:
+                yield [row]
+        self.mock_execute_query.side_effect = [[{'id': 'c', 'document': 'doc c', 'metadata': '{}', 'distance': 0.0}]]
+        info = store_info(distance_function='EUCLIDEAN', quantized=True)
+        with patch.object(self.server, '_table_storage', AsyncMock(return_value={'TABLE_ROWS': 10 ** 9})), \
+             patch.object(self.server, '_stream_query', stream):
+            results = await self.server._search_quantized('test_db', 'store', np.array([4.0, 4.0]), info, k=1, oversample=2)
+        self.assertEqual(results[0]['id'], 'c')
+        self.assertIn("VEC_DISTANCE_EUCLIDEAN(embedding", scanned[0][0])
+        self.assertEqual(self.mock_execute_query.call_args.kwargs['params'][1:], ('c', 'b', 1))
+        self.assertEqual(self.server._quantized_cache.bytes, 0)
+
+    async def test_insert_chunks_long_documents(self):
+        service = MagicMock()
+        service.embed = AsyncMock(side_effect=lambda texts, model_name=None: [[1.0, 0.0] for _ in texts])
+        service.get_token_spans = MagicMock(return_value=None)
+        with patch('src.server.embedding_service', service), \
+             patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info())):
+            result = await self.server.insert_docs_vector_store('test_db', 'store', ['aa bb cc dd ee', 'ff'], chunk_tokens=2)
+        self.assertEqual((result['documents'], result['chunks'], result['inserted']), (2, 4, 4))
+        self.assertEqual(service.embed.call_args.args[0], ['aa bb', 'cc dd', 'ee', 'ff'])
+
+
+
+class TestSearchCache(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.server.is_read_only = False
+        self.service = MagicMock()
+        self.service.embed = AsyncMock(side_effect=lambda texts, model_name=None: [[1.0, 0.0]] * (1 if isinstance(texts, str) else len(texts)))
+        self.query = AsyncMock(return_value=[{'id': 'a', 'document': 'doc', 'metadata': '{}', 'distance': 0.1}])
+        self.patches = [
+            patch('src.server.embedding_service', self.service),
+            patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info())),
+            patch.object(self.server, '_execute_query', self.query),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    async def test_repeated_search_is_served_from_cache(self):
+        first = await self.server.search_vector_store('disk full', 'test_db', 'store', k=3)
+        first[0]['document'] = 'mutated by caller'
+        second = await self.server.search_vector_store('disk full', 'test_db', 'store', k=3)
+        self.assertEqual(second[0]['document'], 'doc')
+        self.assertEqual(self.service.embed.await_count, 1)
+        await self.server.search_vector_store('disk full', 'test_db', 'store', k=4)
+        self.assertEqual(self.service.embed.await_count, 2)
+        stats = await self.server.get_search_cache_stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['hit_ratio']), (1, 2, 0.3333))
+
+    async def test_insert_bumps_store_version(self):
+        await self.server.search_vector_store('disk full', 'test_db', 'store')
+        await self.server.insert_docs_vector_store('test_db', 'store', ['new incident'])
+        await self.server.search_vector_store('disk full', 'test_db', 'store')
+        self.assertEqual(self.server.search_cache.hits, 0)
+        self.assertEqual(self.server.search_cache.version('test_db', 'store'), 1)
+
+    async def test_metadata_upsert_bumps_store_version(self):
+        known = MariaDBServer._content_hashes(['known'])[0]
+        hit = [{'id': 'a', 'document': 'known', 'metadata': '{"v": 1}', 'distance': 0.1}]
+        self.query.side_effect = lambda sql, params=None, database=None, statement_vars=None: (
+            [{'content_hash': known}] if sql.startswith('SELECT content_hash') else [] if sql.startswith('UPDATE') else hit)
+        with patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info(deduplicated=True))):
+            await self.server.search_vector_store('disk full', 'test_db', 'store')
+            result = await self.server.insert_docs_vector_store('test_db', 'store', ['known'], metadata=[{'v': 2}], on_duplicate='upsert')
+            hit[0]['metadata'] = '{"v": 2}'
+            found = await self.server.search_vector_store('disk full', 'test_db', 'store')
+        self.assertEqual((result['inserted'], result['updated']), (0, 1))
+        self.assertEqual(found[0]['metadata'], {'v': 2})
+        self.assertEqual(self.server.search_cache.hits, 0)
+
+    async def test_lru_is_bounded_by_bytes(self):
+        self.server.search_cache.max_bytes = 150
+        for query in ('q1', 'q2', 'q3'):
+            await self.server.search_vector_store(query, 'test_db', 'store')
+        stats = self.server.search_cache.stats()
+        self.assertLessEqual(stats['bytes'], 150)
+        self.assertGreater(stats['evictions'], 0)
+        await self.server.search_vector_store('q3', 'test_db', 'store')
+        self.assertEqual(self.server.search_cache.hits, 1)
+
+
+class TestVectorStoreMaintenance(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.server.is_read_only = False
+        self.storage = {'TABLE_ROWS': 1000, 'DATA_LENGTH': 6000, 'INDEX_LENGTH': 2000, 'DATA_FREE': 2000,
+                        'AVG_ROW_LENGTH': 6, 'UPDATE_TIME': None}
+        self.statements = []
+
+        async def fake_query(sql, params=None, database=None, statement_vars=None, timeout=None):
+            self.statements.append(sql)
+            if 'information_schema.TABLES' in sql:
+                return [dict(self.storage)]
+            if 'mysql.column_stats' in sql:
+                return [{'avg_length': 412.25}]
+            if 'ORDER BY RAND()' in sql:
+                return [{'embedding': '[1,0]'}, {'embedding': '[0,1]'}]
+            if sql.startswith('OPTIMIZE TABLE'):
+                self.storage['DATA_FREE'] = 0
+                return [{'Table': 'test_db.store', 'Op': 'optimize', 'Msg_type': 'status', 'Msg_text': 'OK'}]
+            return [{'id': 'a', 'distance': 0.1}]
+        self.patches = [
+            patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info())),
+            patch.object(self.server, '_execute_query', AsyncMock(side_effect=fake_query)),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    async def test_stats_come_from_catalog(self):
+        stats = await self.server.vector_store_stats('test_db', 'store')
+        self.assertEqual(stats['rows_estimate'], 1000)
+        self.assertEqual(stats['data_free_bytes'], 2000)
+        self.assertEqual(stats['fragmentation_ratio'], 0.2)
+        self.assertEqual(stats['avg_document_length'], 412.2)
+        self.assertFalse([sql for sql in self.statements if 'FROM `test_db`.`store`' in sql])
+
+    async def test_optimize_reports_latency_before_and_after(self):
+        self.server.search_cache.bump('test_db', 'other')
+        progress = MagicMock()
+        result = await self.server.maintain_vector_store('test_db', 'store', probe_queries=2, progress=progress)
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['probe_queries'], 2)
+        self.assertIn('p50', result['latency_ms_before'])
+        self.assertIn('p50', result['latency_ms_after'])
+        self.assertEqual((result['stats_before']['data_free_bytes'], result['stats_after']['data_free_bytes']), (2000, 0))
+        self.assertEqual(self.server.search_cache.version('test_db', 'store'), 1)
+        self.assertEqual(progress.call_args.args[:2], (3, 3))
+
+    async def test_analyze_error_is_reported(self):
+        async def failing(sql, params=None, database=None, statement_vars=None, timeout=None):
+            if sql.startswith('ANALYZE TABLE'):
+                return [{'Msg_type': 'Error', 'Msg_text': 'Table is locked'}]
+            return [dict(self.storage)] if 'information_schema' in sql else []
+        with patch.object(self.server, '_execute_query', AsyncMock(side_effect=failing)):
+            result = await self.server.maintain_vector_store('test_db', 'store', operation='analyze', probe_queries=0)
+        self.assertEqual(result['status'], 'error')
+        self.assertIn('Table is locked', result['message'])
+
+    async def test_refuses_outside_maintenance_window(self):
+        with patch('src.server.seconds_until_window', return_value=120):
+            result = await self.server.maintain_vector_store('test_db', 'store', maintenance_window='02:00-05:00', probe_queries=0)
+        self.assertEqual((result['status'], result['starts_in_seconds']), ('error', 120))
+        self.assertFalse([sql for sql in self.statements if sql.startswith('OPTIMIZE')])
+
+    async def test_operation_is_stopped_when_the_window_closes(self):
+        timeouts = []
+
+        async def slow_optimize(sql, params=None, database=None, statement_vars=None, timeout=None):
+            if sql.startswith('OPTIMIZE TABLE'):
+                timeouts.append(timeout)
+                raise TimeoutError("Query exceeded its deadline of 90.0s and was killed.")
+            return [dict(self.storage)] if 'information_schema' in sql else []
+        with patch('src.server.seconds_until_window', return_value=0), \
+             patch('src.server.seconds_left_in_window', return_value=90), \
+             patch.object(self.server, '_execute_query', AsyncMock(side_effect=slow_optimize)):
+            result = await self.server.maintain_vector_store('test_db', 'store', maintenance_window='02:00-05:00', probe_queries=0)
+        self.assertEqual(timeouts, [90])
+        self.assertEqual(result['status'], 'error')
+        self.assertIn('end of the maintenance window', result['message'])
+
+    async def test_background_job_is_scheduled_for_the_window(self):
+        submit = MagicMock(return_value={'job_id': 'j'})
+        with patch.object(self.server.jobs, 'submit', submit), patch('src.server.seconds_until_window', return_value=3600):
+            await self.server.submit_maintenance_job('test_db', 'store', maintenance_window='02:00-05:00')
+        self.assertEqual(submit.call_args.kwargs['delay'], 3600)
+
+    async def test_rejects_bad_arguments_and_read_only(self):
+        with self.assertRaises(ValueError):
+            await self.server.maintain_vector_store('test_db', 'store', operation='vacuum')
+        with self.assertRaises(ValueError):
+            await self.server.maintain_vector_store('test_db', 'store', maintenance_window='nightly')
+        self.server.is_read_only = True
+        with self.assertRaises(PermissionError):
+            await self.server.maintain_vector_store('test_db', 'store')
+
+
+class TestVectorStoreDedup(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.patcher = patch.object(self.server, '_execute_query', new_callable=AsyncMock)
+        self.mock_execute_query = self.patcher.start()
+        self.service = MagicMock()
+        self.service.embed = AsyncMock(side_effect=lambda texts, model_name=None: [[1.0, 0.0] for _ in texts])
+        self.known = MariaDBServer._content_hashes(['known'])[0]
+
+    async def asyncTearDown(self):
+        self.patcher.stop()
+
+    async def insert(self, documents, **kwargs):
+        def fake_query(sql, params=None, database=None, statement_vars=None):
+            if sql.startswith('SELECT content_hash'):
+                return [{'content_hash': self.known}] if self.known in params else []
+            return []
+        self.mock_execute_query.side_effect = fake_query
+        with patch('src.server.embedding_service', self.service), \
+             patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info(deduplicated=True))):
+            return await self.server.insert_docs_vector_store('test_db', 'store', documents, **kwargs)
+
+    async def test_skip_mode_embeds_only_new_documents(self):
+        result = await self.insert(['known', 'new', 'new'])
+        self.assertEqual((result['inserted'], result['skipped']), (1, 2))
+        self.service.embed.assert_awaited_once_with(['new'], model_name='text-embedding-3-small')
+        lookups = [c for c in self.mock_execute_query.call_args_list if c.args[0].startswith('SELECT content_hash')]
+        self.assertEqual(len(lookups), 1)
+        insert_sql = self.mock_execute_query.call_args.args[0]
+        self.assertIn('content_hash', insert_sql)
+        self.assertIn('ON DUPLICATE KEY UPDATE', insert_sql)
+
+    async def test_upsert_mode_updates_metadata_without_embedding(self):
+        result = await self.insert(['known'], metadata=[{'v': 2}], on_duplicate='upsert')
+        self.assertEqual((result['inserted'], result['updated'], result['skipped']), (0, 1, 0))
+        self.service.embed.assert_not_awaited()
+        update_call = self.mock_execute_query.call_args
+        self.assertTrue(update_call.args[0].startswith('UPDATE `test_db`.`store` SET metadata = CASE content_hash'))
+        self.assertEqual(update_call.kwargs['params'], (self.known, '{"v": 2}', self.known))
+
+    async def test_invalid_mode(self):
+        with self.assertRaises(ValueError):
+            await self.insert(['doc'], on_duplicate='replace')
+
+
+class TestReembedVectorStore(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.server.is_read_only = False
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source = [{'id': f'id{i}', 'document': f'doc {i}', 'metadata': '{}'} for i in range(5)]
+        self.executed = []
+        self.fail_after = None
+
+        async def fake_query(sql, params=None, database=None, statement_vars=None):
+            self.executed.append((sql, params))
+            if 'information_schema.TABLES' in sql:
+                return [{'TABLE_ROWS': len(self.source)}]
+            if sql.startswith('SELECT id, document, metadata'):
+                after = params[0] if len(params) == 2 else None
+                rows = [r for r in self.source if after is None or r['id'] > after]
+                return rows[:params[-1]]
+            if sql.startswith('INSERT INTO `test_db`.`store__reembed`'):
+                if self.fail_after is not None and params[0] > self.fail_after:
+                    raise RuntimeError('connection lost')
+            return []
+        self.patches = [
+            patch.object(self.server, '_execute_query', AsyncMock(side_effect=fake_query)),
+            patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info(dimension=4))),
+            patch.object(self.server, '_table_exists', AsyncMock(side_effect=lambda db, table: not table.endswith('__old'))),
+            patch('src.server.MCP_STATE_DIR', self.tmp.name),
+        ]
+        service = MagicMock()
+        service.get_embedding_dimension = AsyncMock(return_value=2)
+        service.embed = AsyncMock(side_effect=lambda texts, model_name=None: [[1.0, 0.0] for _ in texts])
+        self.patches.append(patch('src.server.embedding_service', service))
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+
+    async def test_copies_in_key_order_and_swaps(self):
+        progress = []
+        result = await self.server.reembed_vector_store('test_db', 'store', 'bge-m3', batch_size=2,
+                                                        progress=lambda done, total, message: progress.append((done, total)))
+        self.assertEqual(result['status'], 'success')
+        self.assertEqual(result['copied'], 5)
+        inserts = [p for sql, p in self.executed if sql.startswith('INSERT INTO `test_db`.`store__reembed`')]
+        self.assertEqual([p[0] for p in inserts], ['id0', 'id2', 'id4'])
+        self.assertIn('embedding VECTOR(2)', next(sql for sql, _ in self.executed if 'CREATE TABLE' in sql))
+        renames = [sql for sql, _ in self.executed if sql.startswith('RENAME TABLE')]
+        self.assertEqual(renames, ["RENAME TABLE `test_db`.`store` TO `test_db`.`store__old`",
+                                   "RENAME TABLE `test_db`.`store__reembed` TO `test_db`.`store`"])
+        self.assertFalse(any(sql.startswith('DROP TABLE IF EXISTS `test_db`.`store__old`') for sql, _ in self.executed))
+        self.assertEqual(self.server._store_catalog[('test_db', 'store')]['model_name'], 'bge-m3')
+        self.assertEqual(progress[-1], (5, 5))
+        self.assertFalse(os.path.exists(self.server._reembed_checkpoint_path('test_db', 'store')))
+
+    async def test_resumes_after_watermark(self):
+        self.fail_after = 'id1'
+        result = await self.server.reembed_vector_store('test_db', 'store', 'bge-m3', batch_size=2, concurrency=1)
+        self.assertEqual((result['status'], result['copied'], result['resume_offset']), ('error', 2, 'id1'))
+        self.assertFalse(any(sql.startswith('RENAME TABLE') for sql, _ in self.executed))
+        self.fail_after = None
+        self.executed.clear()
+        result = await self.server.reembed_vector_store('test_db', 'store', 'bge-m3', batch_size=2)
+        self.assertEqual((result['status'], result['copied']), ('success', 5))
+        pages = [p for sql, p in self.executed if sql.startswith('SELECT id, document, metadata')]
+        self.assertEqual(pages[0], ('id1', 2))
+        self.assertFalse(any(sql.startswith('DROP TABLE IF EXISTS `test_db`.`store__reembed`') for sql, _ in self.executed))
+
+
+    async def test_refuses_when_old_table_exists(self):
+        self.server._table_exists.side_effect = None
+        self.server._table_exists.return_value = True
+        with self.assertRaises(ValueError):
+            await self.server.reembed_vector_store('test_db', 'store', 'bge-m3')
+        self.assertFalse(any('store__reembed' in sql for sql, _ in self.executed))
+
+    async def test_changes_made_during_the_copy_are_caught_up_before_the_swap(self):
+        changed = {'`test_db`.`store`': [{'id': 'id9', 'document': 'added late', 'metadata': '{}'}],
+                   '`test_db`.`store__old`': [{'id': 'id1', 'document': 'edited at the end', 'metadata': '{}'}]}
+        fake_query = self.server._execute_query.side_effect
+
+        async def query(sql, params=None, database=None, statement_vars=None):
+            if sql.startswith('SELECT n.id FROM'):
+                return [{'id': 'id1'}] if 'store__old' in sql else [{'id': 'id3'}]
+            if sql.startswith('SELECT s.id, s.document'):
+                source = sql.split(' s LEFT JOIN')[0].split('FROM ')[1]
+                return changed.pop(source, [])
+            return await fake_query(sql, params, database, statement_vars)
+        self.server._execute_query.side_effect = query
+        result = await self.server.reembed_vector_store('test_db', 'store', 'bge-m3', batch_size=2)
+        self.assertEqual(result['caught_up'], {'removed': 2, 'reembedded': 2})
+        statements = [sql for sql, _ in self.executed]
+        freeze = statements.index("RENAME TABLE `test_db`.`store` TO `test_db`.`store__old`")
+        late = [i for i, (sql, p) in enumerate(self.executed) if sql.startswith('INSERT INTO `test_db`.`store__reembed`') and p[0] in ('id9', 'id1')]
+        self.assertEqual(len(late), 2)
+        self.assertLess(late[0], freeze)
+        self.assertGreater(late[1], freeze)
+        self.assertIn('DELETE FROM `test_db`.`store__reembed` WHERE id IN (%s)', statements)
+
+    async def test_failed_final_catch_up_restores_the_store(self):
+        fake_query = self.server._execute_query.side_effect
+
+        async def query(sql, params=None, database=None, statement_vars=None):
+            if sql.startswith('SELECT n.id FROM') and 'store__old' in sql:
+                raise RuntimeError('Database error: lost connection')
+            return await fake_query(sql, params, database, statement_vars)
+        self.server._execute_query.side_effect = query
+        result = await self.server.reembed_vector_store('test_db', 'store', 'bge-m3', batch_size=2)
+        self.assertEqual(result['status'], 'error')
+        renames = [sql for sql, _ in self.executed if sql.startswith('RENAME TABLE')]
+        self.assertEqual(renames, ["RENAME TABLE `test_db`.`store` TO `test_db`.`store__old`",
+                                   "RENAME TABLE `test_db`.`store__old` TO `test_db`.`store`"])
+
+
+class TestImportEmbeddings(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.server.is_read_only = False
+        self.tmp = tempfile.TemporaryDirectory()
+        self.matrix_path = os.path.join(self.tmp.name, 'vectors.npy')
+        np.save(self.matrix_path, np.arange(10, dtype=np.float32).reshape(5, 2))
+        self.docs_path = os.path.join(self.tmp.name, 'docs.txt')
+        with open(self.docs_path, 'w') as f:
+            f.write(''.join(f'doc {i}\n' for i in range(5)))
+        self.transactions = []
+        self.fail_on = None
+
+        async def fake_transaction(statements, database=None):
+            if self.fail_on is not None and len(self.transactions) == self.fail_on:
+                raise RuntimeError('Database error: lost connection')
+            self.transactions.append(statements)
+            return [1 for _ in statements]
+        self.service = MagicMock()
+        self.patches = [
+            patch.object(self.server, '_execute_transaction', AsyncMock(side_effect=fake_transaction)),
+            patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info(dimension=2))),
+            patch('src.server.MCP_STATE_DIR', self.tmp.name),
+            patch('src.server.MCP_FILE_ROOT', self.tmp.name),
+            patch('src.server.embedding_service', self.service),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in self.patches:
+            p.stop()
+        self.tmp.cleanup()
+
+    async def test_loads_binary_vectors_in_chunked_transactions(self):
+        result = await self.server.import_embeddings_vector_store('test_db', 'store', self.matrix_path, self.docs_path,
+                                                                  batch_size=2, rows_per_transaction=4)
+        self.assertEqual((result['status'], result['imported'], result['transactions']), ('success', 5, 2))
+        self.assertEqual([len(statements) for statements in self.transactions], [2, 1])
+        sql, params = self.transactions[0][0]
+        self.assertTrue(sql.startswith('INSERT INTO `test_db`.`store` (document, embedding, metadata)'))
+        self.assertEqual(params[0], 'doc 0')
+        self.assertEqual(params[1], np.array([0, 1], dtype='<f4').tobytes())
+        self.service.embed.assert_not_called()
+
+    async def test_rejects_dimension_mismatch(self):
+        np.save(self.matrix_path, np.zeros((5, 3), dtype=np.float32))
+        result = await self.server.import_embeddings_vector_store('test_db', 'store', self.matrix_path, self.docs_path)
+        self.assertEqual(result['status'], 'error')
+        self.assertIn('dimension 3', result['message'])
+        self.assertEqual(self.transactions, [])
+
+    async def test_resumes_after_last_commit(self):
+        self.fail_on = 1
+        result = await self.server.import_embeddings_vector_store('test_db', 'store', self.matrix_path, self.docs_path,
+                                                                  batch_size=2, rows_per_transaction=2)
+        self.assertEqual((result['status'], result['imported'], result['resume_row']), ('error', 2, 2))
+        self.fail_on = None
+        result = await self.server.import_embeddings_vector_store('test_db', 'store', self.matrix_path, self.docs_path,
+                                                                  batch_size=2, rows_per_transaction=2, resume=True)
+        self.assertEqual((result['status'], result['imported'], result['start_row']), ('success', 3, 2))
+        self.assertEqual(self.transactions[1][0][1][0], 'doc 2')
+
+    async def test_local_files_require_file_root(self):
+        with patch('src.server.MCP_FILE_ROOT', None):
+            with self.assertRaises(PermissionError):
+                await self.server.import_embeddings_vector_store('test_db', 'store', self.matrix_path, self.docs_path)
+        self.assertEqual(self.transactions, [])
+
+
+class TestBulkDeleteUpdate(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.server.is_read_only = False
+        self.rows = {f'id{i}': f'doc {i}' for i in range(5)}
+        self.transactions = []
+
+        async def fake_query(sql, params=None, database=None, statement_vars=None):
+            if sql.startswith('SELECT id, document'):
+                return [{'id': i, 'document': self.rows[i]} for i in params if i in self.rows]
+            if sql.startswith('SELECT id, content_hash'):
+                stored = dict(zip(MariaDBServer._content_hashes(list(self.rows.values())), self.rows))
+                return [{'id': stored[h], 'content_hash': h} for h in params if h in stored]
+            if sql.startswith('SELECT id FROM'):
+                after = params[0] if 'id > %s' in sql else None
+                matching = sorted(i for i in self.rows if after is None or i > after)
+                return [{'id': i} for i in matching[:params[-1]]]
+            return []
+
+        async def fake_transaction(statements, database=None):
+            self.transactions.append(statements)
+            return [sum(1 for p in params if p in self.rows) if sql.startswith('DELETE') else 1 for sql, params in statements]
+        self.service = MagicMock()
+        self.service.embed = AsyncMock(side_effect=lambda texts, model_name=None: [[1.0, 0.0] for _ in texts])
+        self.patches = [
+            patch.object(self.server, '_execute_query', AsyncMock(side_effect=fake_query)),
+            patch.object(self.server, '_execute_transaction', AsyncMock(side_effect=fake_transaction)),
+            patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info())),
+            patch('src.server.embedding_service', self.service),
+        ]
+        for p in self.patches:
+            p.start()
+
+    async def asyncTearDown(self):
+        for p in self.patches:
+            p.stop()
+
+    def test_metadata_filter_sql(self):
+        where, params = self.server._metadata_filter_sql({'service': ['api', 'web'], 'resolved': True, 'owner': None})
+        self.assertEqual(where, "JSON_VALUE(metadata, '$.service') IN (%s, %s) AND JSON_VALUE(metadata, '$.resolved') = %s"
+                                " AND JSON_VALUE(metadata, '$.owner') IS NULL")
+        self.assertEqual(params, ['api', 'web', 'true'])
+        with self.assertRaises(ValueError):
+            self.server._metadata_filter_sql({"a') OR 1=1 --": 1})
+
+    async def test_delete_by_ids_in_batches(self):
+        result = await self.server.delete_docs_vector_store('test_db', 'store', ids=['id0', 'id1', 'id2', 'missing'], batch_size=2)
+        self.assertEqual((result['deleted'], result['batches']), (3, 2))
+        self.assertTrue(all(len(t) == 1 and t[0][0].startswith('DELETE FROM `test_db`.`store` WHERE id IN') for t in self.transactions))
+
+    async def test_delete_by_filter_pages_by_key_and_throttles(self):
+        with patch('src.server.asyncio.sleep', new_callable=AsyncMock) as sleep:
+            result = await self.server.delete_docs_vector_store('test_db', 'store', metadata_filter={'stale': True},
+                                                                batch_size=2, max_rows_per_second=1000)
+        self.assertEqual((result['deleted'], result['batches']), (5, 3))
+        self.assertTrue(sleep.await_count >= 1)
+
+    async def test_delete_requires_a_selector(self):
+        with self.assertRaises(ValueError):
+            await self.server.delete_docs_vector_store('test_db', 'store')
+
+    async def test_update_reembeds_only_changed_text(self):
+        result = await self.server.update_docs_vector_store('test_db', 'store', updates=[
+            {'id': 'id0', 'document': 'doc 0', 'metadata': {'v': 2}},
+            {'id': 'id1', 'document': 'new text'},
+            {'id': 'id2', 'document': 'doc 2'},
+            {'id': 'nope', 'metadata': {}},
+        ])
+        self.assertEqual((result['updated'], result['reembedded'], result['unchanged'], result['not_found']), (2, 1, 1, 1))
+        self.service.embed.assert_awaited_once_with(['new text'], model_name='text-embedding-3-small')
+        statements = self.transactions[0]
+        self.assertTrue(statements[0][0].startswith('UPDATE `test_db`.`store` SET document = %s, embedding = %s WHERE id = %s'))
+        self.assertEqual(statements[1], ('UPDATE `test_db`.`store` SET metadata = %s WHERE id = %s', ('{"v": 2}', 'id0')))
+
+    async def test_update_rejects_repeated_ids_and_duplicate_content(self):
+        with patch.object(self.server, '_get_store_info', AsyncMock(return_value=store_info(deduplicated=True))):
+            result = await self.server.update_docs_vector_store('test_db', 'store', updates=[
+                {'id': 'id0', 'document': 'doc 1'},
+                {'id': 'id2', 'document': 'fresh'},
+                {'id': 'id2', 'metadata': {'v': 2}},
+                {'id': 'id3', 'document': 'fresh', 'metadata': {'v': 3}},
+                {'id': 'id4', 'document': 'other'},
+            ], batch_size=2)
+        self.assertEqual((result['updated'], result['reembedded'], result['rejected']), (2, 2, 3))
+        self.assertEqual([(r['position'], r['id']) for r in result['rejected_updates']], [(0, 'id0'), (2, 'id2'), (3, 'id3')])
+        self.assertIn("already stored as id 'id1'", result['rejected_updates'][0]['reason'])
+        self.assertIn("already stored as id 'id2'", result['rejected_updates'][2]['reason'])
+        updated_ids = [params[-1] for statements in self.transactions for _, params in statements]
+        self.assertEqual(updated_ids, ['id2', 'id4'])
+
+    async def test_update_metadata_by_filter(self):
+        result = await self.server.update_docs_vector_store('test_db', 'store', metadata_filter={'service': 'api'},
+                                                            metadata_patch={'resolved': True}, batch_size=10)
+        self.assertEqual((result['updated'], result['reembedded']), (5, 0))
+        sql, params = self.transactions[0][0]
+        self.assertIn('JSON_MERGE_PATCH(metadata, %s)', sql)
+        self.assertEqual(params[0], '{"resolved": true}')
+        self.service.embed.assert_not_awaited()
+
+
+class TestVectorStoreCatalog(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = MariaDBServer()
+        self.patcher = patch.object(self.server, '_execute_query', new_callable=AsyncMock)
+        self.mock_execute_query = self.patcher.start()
+
+    async def asyncTearDown(self):
+        self.patcher.stop()
+
+    async def test_create_records_store_in_catalog(self):
+        service = MagicMock()
+        service.get_embedding_dimension = AsyncMock(return_value=768)
+        service.get_default_model = MagicMock(return_value='text-embedding-004')
+        with patch.object(self.server, '_database_exists', AsyncMock(return_value=True)), \
+             patch.object(self.server, '_table_exists', AsyncMock(return_value=False)):
+            await self.server.create_vector_store_tool('test_db', 'store', service, distance_function='euclidean')
+        insert_call = self.mock_execute_query.call_args
+        self.assertIn("INSERT INTO `test_db`.`mcp_vector_stores`", insert_call.args[0])
+        self.assertEqual(insert_call.kwargs['params'][:4], ('store', 'text-embedding-004', 768, 'EUCLIDEAN'))
+        self.assertEqual(self.server._store_catalog[('test_db', 'store')]['distance_function'], 'EUCLIDEAN')
+
+    async def test_store_info_is_cached(self):
+        self.mock_execute_query.return_value = [
+            {'store_name': 'store', 'model_name': 'text-embedding-004', 'dimension': 768,
+             'distance_function': 'EUCLIDEAN', 'options': '{"quantization": null}'}
+        ]
+        with patch.object(self.server, '_table_exists', AsyncMock(return_value=True)):
+            first = await self.server._get_store_info('test_db', 'store')
+            second = await self.server._get_store_info('test_db', 'store')
+        self.assertIs(first, second)
+        self.assertEqual(first['model_name'], 'text-embedding-004')
+        self.assertEqual(self.mock_execute_query.await_count, 1)
+
+    def catalog_queries(self, tables, catalog, legacy=()):
+        async def query(sql, params=None, database=None):
+            if 'information_schema.STATISTICS' in sql:
+                return [{'TABLE_NAME': name} for name in legacy]
+            if 'information_schema.TABLES' in sql:
+                return [{'TABLE_NAME': name} for name in tables if params[1:] in ((), (name,))]
+            return [{'store_name': name, 'model_name': 'm', 'dimension': 4, 'distance_function': 'COSINE', 'options': '{}'}
+                    for name in catalog]
+        self.mock_execute_query.side_effect = query
+
+    async def test_list_vector_stores_reads_catalog(self):
+        self.catalog_queries(['mcp_vector_stores', 'b_store', 'a_store', 'legacy'], ['b_store', 'a_store', 'dropped'], ['legacy'])
+        with patch.object(self.server, '_database_exists', AsyncMock(return_value=True)):
+            stores = await self.server.list_vector_stores('test_db')
+            self.assertEqual(stores, ['a_store', 'b_store'])
+            self.assertFalse(any('information_schema.STATISTICS' in c.args[0] for c in self.mock_execute_query.call_args_list))
+            self.assertNotIn(('test_db', 'dropped'), self.server._store_catalog)
+            self.assertEqual(await self.server.list_vector_stores('test_db', include_uncataloged=True), ['a_store', 'b_store', 'legacy'])
+
+    async def test_list_vector_stores_scans_databases_without_catalog(self):
+        self.catalog_queries(['legacy'], [], ['legacy'])
+        with patch.object(self.server, '_database_exists', AsyncMock(return_value=True)):
+            self.assertEqual(await self.server.list_vector_stores('test_db'), ['legacy'])
+
+    async def test_is_vector_store_checks_catalog_first(self):
+        self.catalog_queries(['mcp_vector_stores', 'store'], ['store'])
+        self.assertTrue(await self.server._is_vector_store('test_db', 'store'))
+        self.assertFalse(any('information_schema.COLUMNS' in c.args[0] for c in self.mock_execute_query.call_args_list))
+
+    async def test_create_vector_store_drops_table_when_catalog_write_fails(self):
+        service = MagicMock()
+        service.get_embedding_dimension = AsyncMock(return_value=4)
+        service.get_default_model = MagicMock(return_value='m')
+        with patch.object(self.server, '_database_exists', AsyncMock(return_value=True)), \
+             patch.object(self.server, '_table_exists', AsyncMock(return_value=False)), \
+             patch.object(self.server, '_register_vector_store', AsyncMock(side_effect=RuntimeError("catalog is read-only"))):
+            with self.assertRaisesRegex(RuntimeError, "could not record it in the vector store catalog. The table was dropped"):
+                await self.server.create_vector_store_tool('test_db', 'store', service)
+        self.assertEqual(self.mock_execute_query.call_args.args[0], "DROP TABLE IF EXISTS `test_db`.`store`")
+
+    async def test_search_uses_store_model_and_distance(self):
+        self.server._store_catalog[('test_db', 'store')] = store_info(distance_function='EUCLIDEAN', model_name='text-embedding-3-large')
+        self.mock_execute_query.return_value = []
+        service = MagicMock()
+        service.embed = AsyncMock(return_value=[0.1, 0.2])
+        with patch('src.server.embedding_service', service):
+            await self.server.search_vector_store('query', 'test_db', 'store')
+        service.embed.assert_awaited_once_with('query', model_name='text-embedding-3-large')
+        self.assertIn("VEC_DISTANCE_EUCLIDEAN", self.mock_execute_query.call_args.args[0])
+
+
+if __name__ == "__main__":
+    unittest.main(verbosity=2)